@@ -1,27 +1,41 @@
 from flask import Flask, request, Response, jsonify, send_file
 from twilio.twiml.messaging_response import MessagingResponse
 from twilio.rest import Client
+from twilio.request_validator import RequestValidator
 import os
 from dotenv import load_dotenv
 import json
 import datetime
 import re
+import math
 import sqlite3
 import uuid
 from dataclasses import dataclass, asdict
 from typing import Optional, List, Dict, Tuple
 import requests
-from urllib.parse import urlparse
-from collections import deque
+from urllib.parse import urlparse, parse_qsl
+from collections import deque, OrderedDict, Counter
 import tempfile
 import io
+import csv
 import base64
 import time
 import threading
 import asyncio
+import contextvars
+import queue
+import copy
+import random
+import zlib
+from types import SimpleNamespace
+from contextlib import contextmanager, asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+import click
 
 # For NLP and AI processing
-from openai import OpenAI  # You'll need: pip install openai
+from openai import OpenAI, AsyncOpenAI  # You'll need: pip install openai
+from openai import APIConnectionError, APITimeoutError, RateLimitError, InternalServerError
+from openai.types.chat import ChatCompletion
 from textblob import TextBlob  # You'll need: pip install textblob
 
 # NEW: Text-to-Speech imports
@@ -39,6 +53,40 @@ except ImportError:
     print("⚠️  gTTS not installed. Will use pyttsx3 or OpenAI fallback.")
     GTTS_AVAILABLE = False
 
+# Optional Redis backend for state shared between worker processes
+try:
+    import redis  # You'll need: pip install redis (only for SHARED_STATE_BACKEND=redis)
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Optional exact token counting for prompt budgets
+try:
+    import tiktoken  # You'll need: pip install tiktoken (otherwise ~4 characters per token is assumed)
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Optional async Twilio client and WSGI bridge for the ASGI entry point (asgi_app)
+try:
+    from twilio.http.async_http_client import AsyncTwilioHttpClient  # You'll need: pip install aiohttp
+    ASYNC_TWILIO_AVAILABLE = True
+except ImportError:
+    ASYNC_TWILIO_AVAILABLE = False
+
+# Optional async HTTP client for Laravel calls made from the ASGI pipeline
+try:
+    import httpx  # You'll need: pip install httpx (otherwise async Laravel calls run on the worker pool)
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+try:
+    from asgiref.wsgi import WsgiToAsgi  # You'll need: pip install asgiref (to serve the other routes under ASGI)
+    ASGIREF_AVAILABLE = True
+except ImportError:
+    ASGIREF_AVAILABLE = False
+
 # Load environment variables
 load_dotenv()
 
@@ -59,12 +107,188 @@ TTS_LANGUAGE = os.getenv("TTS_LANGUAGE", "en")  # Language code
 TTS_VOICE_GENDER = os.getenv("TTS_VOICE_GENDER", "female")  # male/female
 TTS_MAX_LENGTH = int(os.getenv("TTS_MAX_LENGTH", "1000"))  # Max characters for TTS
 
+# Analytics read-only connection pool (dashboard routes never share the webhook's write connections)
+ANALYTICS_POOL_SIZE = int(os.getenv("ANALYTICS_POOL_SIZE", "4"))
+ANALYTICS_QUERY_BUDGET_MS = int(os.getenv("ANALYTICS_QUERY_BUDGET_MS", "2000"))  # Default per-route budget
+ANALYTICS_ROUTE_BUDGETS_MS = {
+    'reports': int(os.getenv("REPORTS_QUERY_BUDGET_MS", "1000")),
+    'dual_messaging_analytics': int(os.getenv("DUAL_MESSAGING_ANALYTICS_BUDGET_MS", "3000")),
+    'conversation_analytics': int(os.getenv("CONVERSATION_ANALYTICS_BUDGET_MS", "2000"))
+}
+
+# Reports API pagination
+REPORTS_PAGE_SIZE = int(os.getenv("REPORTS_PAGE_SIZE", "50"))
+REPORTS_MAX_PAGE_SIZE = int(os.getenv("REPORTS_MAX_PAGE_SIZE", "200"))
+REPORT_FILTER_COLUMNS = ['status', 'severity', 'incident_type', 'user_phone']  # Indexed and counted
+
+# Integer epoch-millisecond mirrors of the ISO timestamp columns (table -> {iso column: ms column})
+EPOCH_TIMESTAMP_COLUMNS = {
+    'reports': {'created_at': 'created_at_ms'},
+    'conversation_turns': {'timestamp': 'timestamp_ms'},
+    'conversation_threads': {'start_time': 'start_time_ms', 'last_activity': 'last_activity_ms'},
+    'tts_analytics': {'created_at': 'created_at_ms'},
+    'dual_messaging_analytics': {'created_at': 'created_at_ms'}
+}
+
+# State shared between worker processes (sqlite works on one host; redis across hosts)
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "sqlite").lower()  # sqlite | redis
+SHARED_STATE_REDIS_URL = os.getenv("SHARED_STATE_REDIS_URL", "redis://localhost:6379/0")
+SHARED_STATE_KEY_PREFIX = os.getenv("SHARED_STATE_KEY_PREFIX", "hsse:")
+TTS_AUDIO_DIR = os.getenv("TTS_AUDIO_DIR", os.path.join(tempfile.gettempdir(), "hsse_tts_audio"))  # Must be shared by all workers
+ACTIVE_THREAD_TTL_SECONDS = 2 * 3600  # Same window as the recent-thread lookup
+# How long a worker trusts its own phone -> active thread index before re-reading the shared pointer
+# (another worker may have started a newer thread); 0 trusts it for the whole window (single worker)
+ACTIVE_THREAD_INDEX_TTL_SECONDS = int(os.getenv("ACTIVE_THREAD_INDEX_TTL_SECONDS", "30"))
+ACTIVE_THREAD_INDEX_MAX_PHONES = int(os.getenv("ACTIVE_THREAD_INDEX_MAX_PHONES", "10000"))
+MESSAGE_DEDUPE_TTL_SECONDS = int(os.getenv("MESSAGE_DEDUPE_TTL_SECONDS", "86400"))
+
+# User session store (per-state TTLs; abandoned reporting sessions expire instead of lingering)
+REPORT_SESSION_TTL_SECONDS = int(os.getenv("REPORT_SESSION_TTL_SECONDS", "3600"))
+MENU_SESSION_TTL_SECONDS = int(os.getenv("MENU_SESSION_TTL_SECONDS", "1800"))
+SESSION_STATE_TTL_SECONDS = {
+    'collecting_report': REPORT_SESSION_TTL_SECONDS,
+    'waiting_media': REPORT_SESSION_TTL_SECONDS,
+    'waiting_location': REPORT_SESSION_TTL_SECONDS,
+    'confirming_report': REPORT_SESSION_TTL_SECONDS,
+    'menu_navigation': MENU_SESSION_TTL_SECONDS,
+    'faq_mode': MENU_SESSION_TTL_SECONDS
+}
+SESSION_DEFAULT_TTL_SECONDS = int(os.getenv("SESSION_DEFAULT_TTL_SECONDS", "86400"))
+SESSION_HOT_CACHE_SIZE = int(os.getenv("SESSION_HOT_CACHE_SIZE", "1000"))
+SESSION_EXPIRY_INTERVAL_SECONDS = int(os.getenv("SESSION_EXPIRY_INTERVAL_SECONDS", "300"))
+
+# In-memory conversation thread cache (bounded so worker memory stays flat)
+THREAD_MEMORY_MAX_THREADS = int(os.getenv("THREAD_MEMORY_MAX_THREADS", "500"))
+THREAD_MEMORY_IDLE_TTL_SECONDS = int(os.getenv("THREAD_MEMORY_IDLE_TTL_SECONDS", "7200"))  # Matches thread continuation window
+THREAD_MEMORY_MAX_BYTES = int(os.getenv("THREAD_MEMORY_MAX_BYTES", "0"))  # 0 disables the byte budget
+THREAD_REHYDRATE_TURNS = int(os.getenv("THREAD_REHYDRATE_TURNS", "20"))  # Turns reloaded from SQLite on a memory miss
+
+# Long-term memory consolidation (closed threads folded into per-user memory in the background)
+LONG_TERM_MEMORY_INTERVAL_SECONDS = int(os.getenv("LONG_TERM_MEMORY_INTERVAL_SECONDS", "600"))
+LONG_TERM_MEMORY_BATCH_SIZE = int(os.getenv("LONG_TERM_MEMORY_BATCH_SIZE", "50"))  # Threads per transaction
+INTERACTION_HISTORY_MAX = int(os.getenv("INTERACTION_HISTORY_MAX", "20"))  # Entries kept on a profile
+
+# Thread summaries (older turns compressed onto the thread row so prompts stay bounded)
+THREAD_SUMMARY_MODE = os.getenv("THREAD_SUMMARY_MODE", "extractive").lower()  # extractive | llm
+THREAD_SUMMARY_MIN_TURNS = int(os.getenv("THREAD_SUMMARY_MIN_TURNS", "10"))  # Threads shorter than this aren't summarized
+THREAD_SUMMARY_REFRESH_TURNS = int(os.getenv("THREAD_SUMMARY_REFRESH_TURNS", "5"))  # New turns before re-summarizing
+THREAD_SUMMARY_MAX_CHARS = int(os.getenv("THREAD_SUMMARY_MAX_CHARS", "600"))
+THREAD_SUMMARY_INTERVAL_SECONDS = int(os.getenv("THREAD_SUMMARY_INTERVAL_SECONDS", "120"))
+THREAD_SUMMARY_BATCH_SIZE = int(os.getenv("THREAD_SUMMARY_BATCH_SIZE", "20"))
+
+# Chat LLM calls: 'combined' gets intent, user info and reply from one structured call,
+# 'legacy' makes the three sequential calls (also the fallback when the combined call fails)
+LLM_MODE = os.getenv("LLM_MODE", "combined").lower()
+
+# Local intent classification (rules + naive Bayes fitted from conversation_turns history)
+LOCAL_INTENT_ENABLED = os.getenv("LOCAL_INTENT_ENABLED", "true").lower() == "true"
+LOCAL_INTENT_THRESHOLD = float(os.getenv("LOCAL_INTENT_THRESHOLD", "0.85"))  # Below this the LLM decides
+LOCAL_INTENT_MODEL_PATH = os.getenv("LOCAL_INTENT_MODEL_PATH", "intent_model.json")  # Written by `flask train-intent-model`
+LOCAL_INTENT_MIN_TRAINING_SAMPLES = int(os.getenv("LOCAL_INTENT_MIN_TRAINING_SAMPLES", "50"))
+LOCAL_INTENT_AUDIT_RATE = float(os.getenv("LOCAL_INTENT_AUDIT_RATE", "0.0"))  # Share of local hits also sent to the LLM
+
+# Similar-question response cache (local MinHash signatures, context-independent questions only)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.7"))  # Jaccard similarity of question terms
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+
+# Exact-match cache of intent / user-info LLM results, persisted in SQLite
+ANALYZER_CACHE_ENABLED = os.getenv("ANALYZER_CACHE_ENABLED", "true").lower() == "true"
+ANALYZER_CACHE_MAX_ENTRIES = int(os.getenv("ANALYZER_CACHE_MAX_ENTRIES", "5000"))  # Per worker and in the table
+
+# Skip user-info extraction when the message has no personal cues the profile could still use
+USER_INFO_GATE_ENABLED = os.getenv("USER_INFO_GATE_ENABLED", "true").lower() == "true"
+
+# Chat prompt construction: 'compact' enforces per-section token budgets, 'verbose' is the original prompt
+PROMPT_STYLE = os.getenv("PROMPT_STYLE", "compact").lower()
+PROMPT_SECTION_TOKEN_BUDGETS = {
+    'intent': int(os.getenv("PROMPT_INTENT_TOKENS", "60")),
+    'profile': int(os.getenv("PROMPT_PROFILE_TOKENS", "60")),
+    'conversation': int(os.getenv("PROMPT_CONVERSATION_TOKENS", "220"))
+}
+
+# Webhook handling: 'sync' replies in the TwiML response, 'async' acknowledges at once and
+# replies through the REST API from a worker pool
+WEBHOOK_MODE = os.getenv("WEBHOOK_MODE", "sync").lower()
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_VALIDATE_SIGNATURE = os.getenv("WEBHOOK_VALIDATE_SIGNATURE", "false").lower() == "true"
+INBOUND_MAX_ATTEMPTS = int(os.getenv("INBOUND_MAX_ATTEMPTS", "3"))
+INBOUND_PROCESSING_TIMEOUT_SECONDS = int(os.getenv("INBOUND_PROCESSING_TIMEOUT_SECONDS", "300"))  # Then a claim counts as abandoned
+INBOUND_SWEEP_INTERVAL_SECONDS = int(os.getenv("INBOUND_SWEEP_INTERVAL_SECONDS", "60"))  # How often abandoned claims are re-queued
+
+# ASGI entry point (uvicorn app:asgi_app): LLM, OpenAI TTS, Twilio and Laravel report submission
+# I/O is awaited, blocking steps (SQLite, local TTS engines, the rest of the flows) run on a small thread pool
+ASYNC_WORKER_THREADS = int(os.getenv("ASYNC_WORKER_THREADS", "8"))
+
+# OpenAI calls: per-call-site timeouts, jittered retries and a global concurrency limit
+OPENAI_CALL_TIMEOUTS = {
+    'intent': float(os.getenv("OPENAI_INTENT_TIMEOUT_SECONDS", "8")),
+    'user_info': float(os.getenv("OPENAI_USER_INFO_TIMEOUT_SECONDS", "8")),
+    'response': float(os.getenv("OPENAI_RESPONSE_TIMEOUT_SECONDS", "20")),
+    'combined': float(os.getenv("OPENAI_COMBINED_TIMEOUT_SECONDS", "25")),
+    'summary': float(os.getenv("OPENAI_SUMMARY_TIMEOUT_SECONDS", "30")),
+    'tts': float(os.getenv("OPENAI_TTS_TIMEOUT_SECONDS", "30"))
+}
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))  # Extra attempts after a transient failure
+OPENAI_RETRY_BASE_DELAY_SECONDS = float(os.getenv("OPENAI_RETRY_BASE_DELAY_SECONDS", "0.5"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))  # In-flight calls per worker process
+OPENAI_QUEUE_TIMEOUT_SECONDS = float(os.getenv("OPENAI_QUEUE_TIMEOUT_SECONDS", "10"))  # Max wait for a free slot
+OPENAI_HEDGE_AFTER_SECONDS = float(os.getenv("OPENAI_HEDGE_AFTER_SECONDS", "0"))  # 0 disables hedged requests
+OPENAI_HEDGED_CALL_SITES = ('response', 'combined')
+
+# Record/replay of OpenAI, Twilio and Laravel calls: 'live', 'record' (append to the fixture) or
+# 'replay' (answer from the fixture, no network); replay latency is 'recorded' or fixed milliseconds
+EXTERNAL_CALLS_MODE = os.getenv("EXTERNAL_CALLS_MODE", "live").lower()
+EXTERNAL_CALLS_FIXTURE = os.getenv("EXTERNAL_CALLS_FIXTURE", "fixtures/external_calls.jsonl")
+EXTERNAL_CALLS_REPLAY_LATENCY = os.getenv("EXTERNAL_CALLS_REPLAY_LATENCY", "0")
+
+# LLM call telemetry (llm_call_metrics table and /metrics/llm)
+LLM_TELEMETRY_BATCH_SIZE = int(os.getenv("LLM_TELEMETRY_BATCH_SIZE", "50"))  # Rows per SQLite write
+LLM_TELEMETRY_FLUSH_SECONDS = int(os.getenv("LLM_TELEMETRY_FLUSH_SECONDS", "30"))
+LLM_LATENCY_BUCKETS_MS = [100, 250, 500, 1000, 2000, 5000, 10000, 30000]
+# USD per million units: input/output tokens, or input characters for speech; LLM_MODEL_PRICES_JSON overrides
+LLM_MODEL_PRICES = {
+    'gpt-4o-mini': {'input': 0.15, 'output': 0.60},
+    'gpt-3.5-turbo': {'input': 0.50, 'output': 1.50},
+    'tts-1': {'characters': 15.0}
+}
+LLM_MODEL_PRICES.update(json.loads(os.getenv("LLM_MODEL_PRICES_JSON", "{}")))
+
+# Location defaults and spatial queries
+DEFAULT_LOCATION_LAT = 6.8013  # Georgetown, Guyana - used when a location can't be parsed
+DEFAULT_LOCATION_LONG = -58.1551
+SPATIAL_MAX_CANDIDATES = int(os.getenv("SPATIAL_MAX_CANDIDATES", "5000"))
+ANALYTICS_ROUTE_BUDGETS_MS['spatial'] = int(os.getenv("SPATIAL_QUERY_BUDGET_MS", "1500"))
+
+# Bulk export streaming
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "500"))  # Rows fetched per snapshot
+ANALYTICS_ROUTE_BUDGETS_MS['export'] = int(os.getenv("EXPORT_CHUNK_BUDGET_MS", "2000"))  # Per chunk
+
+# Full-text search
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+ANALYTICS_ROUTE_BUDGETS_MS['search'] = int(os.getenv("SEARCH_QUERY_BUDGET_MS", "1500"))
+
 # Initialize services
 twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+openai_client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)  # Retries are done by ResilientOpenAIClient
+async_openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)  # Used by the ASGI pipeline
 
 app = Flask(__name__)
 
+def _epoch_ms(moment: datetime.datetime = None) -> int:
+    """Milliseconds since the Unix epoch (naive datetimes are local time, like every stored ISO string)"""
+    return int((moment or datetime.datetime.now()).timestamp() * 1000)
+
+def _iso_to_epoch_ms(value) -> Optional[int]:
+    """Convert a stored local-time ISO timestamp to epoch milliseconds (None if unparseable)"""
+    if not value:
+        return None
+    try:
+        return _epoch_ms(datetime.datetime.fromisoformat(str(value)))
+    except ValueError:
+        return None
+
 # Data models (keeping all existing models)
 @dataclass
 class IncidentReport:
@@ -81,6 +305,7 @@ class IncidentReport:
     status: str
     ai_analysis: Dict
     created_at: str
+    location_approximate: bool = False  # True when coordinates are the default fallback
 
 @dataclass
 class UserProfile:
@@ -119,6 +344,7 @@ class ConversationTurn:
     # NEW: TTS metadata
     tts_audio_url: Optional[str] = None
     tts_generated: bool = False
+    intent_source: str = 'llm'  # llm | local_rules | local_model
 
 @dataclass
 class ConversationThread:
@@ -140,9 +366,11 @@ class ConversationThread:
 class EnhancedTextToSpeechManager:
     """Enhanced Text-to-Speech manager with dual messaging support"""
     
-    def __init__(self):
-        self.temp_dir = tempfile.mkdtemp()
-        self.audio_cache = {}  # Cache for frequently used phrases
+    def __init__(self, shared_state=None):
+        # One directory and one cache index for all workers, so any worker can serve any audio file
+        self.temp_dir = TTS_AUDIO_DIR
+        os.makedirs(self.temp_dir, exist_ok=True)
+        self.audio_cache = SharedAudioCache(shared_state, self.temp_dir) if shared_state else {}  # Cache for frequently used phrases
         self.performance_stats = {
             'total_generated': 0,
             'cache_hits': 0,
@@ -237,6 +465,42 @@ class EnhancedTextToSpeechManager:
             self.performance_stats['cache_hits'] += 1
             return self.audio_cache[cache_key]
         
+        clean_text = self._prepare_tts_text(text)
+        
+        # Try different TTS engines in order of preference
+        audio_file = self._generate_local_audio(clean_text, user_preferences)
+        
+        # 3. Try OpenAI TTS (premium option)
+        if not audio_file and OPENAI_API_KEY:
+            audio_file = self._generate_openai_tts(clean_text, user_preferences)
+        
+        return self._finish_generation(audio_file, start_time, cache_key)
+    
+    async def generate_tts_audio_async(self, text: str, user_preferences: Dict = None,
+                                       cache_key: str = None) -> Optional[str]:
+        """generate_tts_audio for coroutines: OpenAI TTS is awaited, the local engines run on the worker pool"""
+        
+        if not TTS_ENABLED:
+            return None
+        
+        start_time = time.time()
+        
+        if cache_key and cache_key in self.audio_cache:
+            self.performance_stats['cache_hits'] += 1
+            return self.audio_cache[cache_key]
+        
+        clean_text = self._prepare_tts_text(text)
+        
+        audio_file = None
+        if GTTS_AVAILABLE or self.pyttsx3_ready:
+            audio_file = await asyncio.to_thread(self._generate_local_audio, clean_text, user_preferences)
+        
+        if not audio_file and OPENAI_API_KEY:
+            audio_file = await self._generate_openai_tts_async(clean_text, user_preferences)
+        
+        return self._finish_generation(audio_file, start_time, cache_key)
+    
+    def _prepare_tts_text(self, text: str) -> str:
         # Clean and prepare text
         clean_text = self._clean_text_for_tts(text)
         
@@ -244,7 +508,10 @@ class EnhancedTextToSpeechManager:
         if len(clean_text) > TTS_MAX_LENGTH:
             clean_text = self._truncate_text_for_tts(clean_text)
         
-        # Try different TTS engines in order of preference
+        return clean_text
+    
+    def _generate_local_audio(self, clean_text: str, user_preferences: Dict = None) -> Optional[str]:
+        """gTTS, then pyttsx3; None if neither produced audio"""
         audio_file = None
         
         # 1. Try gTTS (Google Text-to-Speech) - best quality
@@ -255,10 +522,9 @@ class EnhancedTextToSpeechManager:
         if not audio_file and self.pyttsx3_ready:
             audio_file = self._generate_pyttsx3_audio(clean_text, user_preferences)
         
-        # 3. Try OpenAI TTS (premium option)
-        if not audio_file and OPENAI_API_KEY:
-            audio_file = self._generate_openai_tts(clean_text, user_preferences)
-        
+        return audio_file
+    
+    def _finish_generation(self, audio_file: Optional[str], start_time: float, cache_key: str = None) -> Optional[str]:
         # Update performance stats
         generation_time = (time.time() - start_time) * 1000
         self.performance_stats['generation_times'].append(generation_time)
@@ -292,6 +558,19 @@ class EnhancedTextToSpeechManager:
         
         return audio_file
     
+    async def generate_for_dual_messaging_async(self, text: str, user_preferences: Dict = None,
+                                                priority: str = 'normal') -> Optional[str]:
+        """generate_for_dual_messaging for coroutines"""
+        
+        clean_text = self._clean_text_for_dual_messaging(text)
+        
+        if priority == 'emergency' and self.pyttsx3_ready:
+            audio_file = await asyncio.to_thread(self._generate_pyttsx3_audio, clean_text, user_preferences)
+            if audio_file:
+                return audio_file
+        
+        return await self.generate_tts_audio_async(clean_text, user_preferences)
+    
     def _clean_text_for_tts(self, text: str) -> str:
         """Clean text for better TTS pronunciation"""
         
@@ -447,38 +726,58 @@ class EnhancedTextToSpeechManager:
     def _generate_openai_tts(self, text: str, user_preferences: Dict = None) -> Optional[str]:
         """Generate audio using OpenAI's TTS API"""
         try:
-            # Choose voice based on preferences
-            voice_preference = user_preferences.get('tts_voice_preference', TTS_VOICE_GENDER) if user_preferences else TTS_VOICE_GENDER
-            
-            voice_map = {
-                'female': 'nova',
-                'male': 'onyx',
-                'alloy': 'alloy',
-                'echo': 'echo',
-                'fable': 'fable',
-                'shimmer': 'shimmer'
-            }
-            
-            voice = voice_map.get(voice_preference.lower(), 'nova')
-            
-            response = openai_client.audio.speech.create(
+            response = resilient_openai.speech(
+                'tts',
                 model="tts-1",
-                voice=voice,
+                voice=self._openai_voice(user_preferences),
                 input=text
             )
+            return self._save_openai_audio(response)
             
-            # Create temporary file
-            audio_file = os.path.join(self.temp_dir, f"tts_{uuid.uuid4().hex}.mp3")
-            
-            with open(audio_file, 'wb') as f:
-                f.write(response.content)
-            
-            return audio_file
+        except Exception as e:
+            print(f"OpenAI TTS generation failed: {e}")
+            return None
+    
+    async def _generate_openai_tts_async(self, text: str, user_preferences: Dict = None) -> Optional[str]:
+        """_generate_openai_tts awaiting the AsyncOpenAI client"""
+        try:
+            response = await resilient_openai.speech_async(
+                'tts',
+                model="tts-1",
+                voice=self._openai_voice(user_preferences),
+                input=text
+            )
+            return self._save_openai_audio(response)
             
         except Exception as e:
             print(f"OpenAI TTS generation failed: {e}")
             return None
     
+    @staticmethod
+    def _openai_voice(user_preferences: Dict = None) -> str:
+        # Choose voice based on preferences
+        voice_preference = user_preferences.get('tts_voice_preference', TTS_VOICE_GENDER) if user_preferences else TTS_VOICE_GENDER
+        
+        voice_map = {
+            'female': 'nova',
+            'male': 'onyx',
+            'alloy': 'alloy',
+            'echo': 'echo',
+            'fable': 'fable',
+            'shimmer': 'shimmer'
+        }
+        
+        return voice_map.get(voice_preference.lower(), 'nova')
+    
+    def _save_openai_audio(self, response) -> str:
+        # Create temporary file
+        audio_file = os.path.join(self.temp_dir, f"tts_{uuid.uuid4().hex}.mp3")
+        
+        with open(audio_file, 'wb') as f:
+            f.write(response.content)
+        
+        return audio_file
+    
     def _generate_emergency_audio(self, text: str, user_preferences: Dict = None) -> Optional[str]:
         """Generate emergency audio with fastest available engine"""
         
@@ -552,6 +851,7 @@ class LaravelBackendClient:
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         }
+        self._async_client = None  # httpx.AsyncClient, created on the first async call
     
     def submit_report(self, report_data: Dict) -> Dict:
         """Submit incident report to Laravel backend"""
@@ -569,3764 +869,8861 @@ class LaravelBackendClient:
                 timeout=30
             )
             
-            print(f"Laravel response status: {response.status_code}")
-            print(f"Laravel response: {response.text}")
+            return self._report_result(response)
+                
+        except requests.exceptions.ConnectionError as e:
+            return self._report_connection_error(e)
+        except requests.exceptions.RequestException as e:
+            return self._report_request_error(e)
+    
+    async def submit_report_async(self, report_data: Dict) -> Dict:
+        """submit_report for coroutines, on httpx's async client (on the worker pool without httpx)"""
+        if not HTTPX_AVAILABLE:
+            return await asyncio.to_thread(self.submit_report, report_data)
+        try:
+            url = f"{self.base_url}/chatbot/reports"
+            print(f"Submitting report to Laravel: {url}")
+            
+            response = await self._get_async_client().post(url, json=report_data, headers=self.headers, timeout=30)
+            return self._report_result(response)
+            
+        except httpx.ConnectError as e:
+            return self._report_connection_error(e)
+        except httpx.HTTPError as e:
+            return self._report_request_error(e)
+    
+    def _report_result(self, response) -> Dict:
+        """submit_report outcome from a requests or httpx response"""
+        print(f"Laravel response status: {response.status_code}")
+        print(f"Laravel response: {response.text}")
+        
+        if response.status_code in [200, 201]:
+            return {
+                'success': True,
+                'data': response.json()
+            }
+        return {
+            'success': False,
+            'error': f'Backend error: {response.status_code}',
+            'details': response.text
+        }
+    
+    def _report_connection_error(self, error: Exception) -> Dict:
+        print(f"Connection error submitting to Laravel: {error}")
+        return {
+            'success': False,
+            'error': f'Connection error: Unable to connect to Laravel backend at {self.base_url}. Please check if the Laravel server is running.'
+        }
+    
+    @staticmethod
+    def _report_request_error(error: Exception) -> Dict:
+        print(f"Request error submitting to Laravel: {error}")
+        return {
+            'success': False,
+            'error': f'Request error: {str(error)}'
+        }
+    
+    def submit_media_files(self, report_id: str, media_files: List[Dict]) -> Dict:
+        """Submit media files for a report"""
+        try:
+            url = f"{self.base_url}/chatbot/reports/{report_id}/media"
+            
+            # For media files, we'll need to handle file uploads differently
+            # This endpoint expects multipart/form-data with actual files
+            files = []
+            
+            response = requests.post(
+                url,
+                data=self._media_form(media_files),
+                headers={'Authorization': f'Bearer {self.api_token}'},
+                timeout=30
+            )
+            
+            return self._media_result(response)
+            
+        except requests.exceptions.RequestException as e:
+            return {
+                'success': False,
+                'error': f'Media upload connection error: {str(e)}'
+            }
+    
+    async def submit_media_files_async(self, report_id: str, media_files: List[Dict]) -> Dict:
+        """submit_media_files for coroutines, on httpx's async client (on the worker pool without httpx)"""
+        if not HTTPX_AVAILABLE:
+            return await asyncio.to_thread(self.submit_media_files, report_id, media_files)
+        try:
+            response = await self._get_async_client().post(
+                f"{self.base_url}/chatbot/reports/{report_id}/media",
+                data=self._media_form(media_files),
+                headers={'Authorization': f'Bearer {self.api_token}'},
+                timeout=30
+            )
+            return self._media_result(response)
+            
+        except httpx.HTTPError as e:
+            return {
+                'success': False,
+                'error': f'Media upload connection error: {str(e)}'
+            }
+    
+    @staticmethod
+    def _media_form(media_files: List[Dict]) -> Dict:
+        data = {'uploaded_by': 'WhatsApp Bot'}
+        
+        # Note: In a real implementation, you'd need to download the media URLs
+        # and upload them as actual files. For now, we'll send the URLs.
+        for i, media in enumerate(media_files):
+            data[f'media_urls[{i}]'] = media['url']
+            data[f'media_types[{i}]'] = media['type']
+        return data
+    
+    @staticmethod
+    def _media_result(response) -> Dict:
+        return response.json() if response.status_code in [200, 201] else {
+            'success': False,
+            'error': f'Media upload error: {response.status_code}'
+        }
+    
+    def _get_async_client(self):
+        """Shared httpx.AsyncClient, created inside the running event loop so it pools connections there"""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient()
+        return self._async_client
+    
+    def test_connection(self) -> Dict:
+        """Test connection to Laravel backend"""
+        try:
+            url = f"{self.base_url}/health"  # Assuming Laravel has a health endpoint
+            
+            response = requests.get(
+                url,
+                headers=self.headers,
+                timeout=10
+            )
             
-            if response.status_code in [200, 201]:
+            if response.status_code == 200:
                 return {
                     'success': True,
-                    'data': response.json()
+                    'message': 'Laravel backend connection successful',
+                    'data': response.json() if response.content else None
                 }
             else:
                 return {
                     'success': False,
-                    'error': f'Backend error: {response.status_code}',
+                    'error': f'Laravel backend returned status {response.status_code}',
                     'details': response.text
                 }
                 
-        except requests.exceptions.ConnectionError as e:
-            print(f"Connection error submitting to Laravel: {e}")
+        except requests.exceptions.ConnectionError:
             return {
                 'success': False,
-                'error': f'Connection error: Unable to connect to Laravel backend at {self.base_url}. Please check if the Laravel server is running.'
+                'error': f'Cannot connect to Laravel backend at {self.base_url}. Please check if the server is running.'
             }
         except requests.exceptions.RequestException as e:
-            print(f"Request error submitting to Laravel: {e}")
             return {
                 'success': False,
                 'error': f'Request error: {str(e)}'
             }
     
-    def submit_media_files(self, report_id: str, media_files: List[Dict]) -> Dict:
-        """Submit media files for a report"""
+    def get_report_status(self, report_id: str) -> Dict:
+        """Get report status from Laravel backend"""
         try:
-            url = f"{self.base_url}/chatbot/reports/{report_id}/media"
-            
-            # For media files, we'll need to handle file uploads differently
-            # This endpoint expects multipart/form-data with actual files
-            files = []
-            data = {'uploaded_by': 'WhatsApp Bot'}
-            
-            # Note: In a real implementation, you'd need to download the media URLs
-            # and upload them as actual files. For now, we'll send the URLs.
-            for i, media in enumerate(media_files):
-                data[f'media_urls[{i}]'] = media['url']
-                data[f'media_types[{i}]'] = media['type']
+            url = f"{self.base_url}/chatbot/reports/{report_id}/status"
             
-            response = requests.post(
+            response = requests.get(
                 url,
-                data=data,
-                headers={'Authorization': f'Bearer {self.api_token}'},
-                timeout=30
+                headers=self.headers,
+                timeout=15
             )
             
-            return response
+            return response.json() if response.status_code == 200 else {
+                'success': False,
+                'error': f'Status check error: {response.status_code}'
+            }
+            
+        except requests.exceptions.RequestException as e:
+            return {
+                'success': False,
+                'error': f'Status check connection error: {str(e)}'
+            }
 
-class EnhancedHSSEChatbot:
-    """Enhanced chatbot with smart conversation tracking, menu system, Laravel integration, and dual TTS messaging"""
+class LocationParser:
+    """Parse location from user messages"""
     
-    def __init__(self):
-        self.db = DatabaseManager()
-        self.conversation_analyzer = ConversationAnalyzer()
-        
-        # Initialize Enhanced TTS Manager for dual messaging
-        self.tts_manager = EnhancedTextToSpeechManager()
+    @staticmethod
+    def extract_coordinates(message: str) -> Tuple[Optional[float], Optional[float]]:
+        """Extract coordinates from message"""
         
-        self.response_generator = SmartResponseGenerator(self.tts_manager)
-        self.location_parser = LocationParser()
+        # Look for coordinate patterns
+        coord_patterns = [
+            r'(-?\d+\.?\d*),\s*(-?\d+\.?\d*)',  # "6.8013, -58.1551"
+            r'lat[:\s]*(-?\d+\.?\d*)[,\s]*lon[g]?[:\s]*(-?\d+\.?\d*)',  # "lat: 6.8013, long: -58.1551"
+            r'(\d+\.?\d*)[°]?\s*[NS][,\s]*(\d+\.?\d*)[°]?\s*[EW]'  # "6.8013°N, 58.1551°W"
+        ]
         
-        # Laravel integration
-        self.laravel_client = LaravelBackendClient(LARAVEL_BASE_URL, LARAVEL_API_TOKEN)
+        for pattern in coord_patterns:
+            match = re.search(pattern, message, re.IGNORECASE)
+            if match:
+                try:
+                    lat = float(match.group(1))
+                    lng = float(match.group(2))
+                    
+                    # Validate coordinates (roughly for Guyana/Caribbean region)
+                    if -10 <= lat <= 15 and -70 <= lng <= -50:
+                        return lat, lng
+                except ValueError:
+                    continue
         
-        # Initialize conversation tracking
-        self.conversation_tracker = EnhancedConversationTracker(self.db)
-        self.conversation_manager = SmartConversationManager(
-            self.conversation_tracker, 
-            self.response_generator
+        return None, None
+    
+    @staticmethod
+    def request_location_sharing() -> str:
+        """Generate message requesting location sharing"""
+        return (
+            "📍 **I need your location to complete the report.**\n\n"
+            "Please share your location by:\n"
+            "🔸 Using WhatsApp's location sharing feature\n"
+            "🔸 Or typing coordinates like: `6.8013, -58.1551`\n"
+            "🔸 Or describing your location (I'll help find coordinates)\n\n"
+            "This helps emergency responders find you quickly! 🚨"
         )
-        
-        self.states = {
-            'CONVERSING': 'conversing',
-            'COLLECTING_REPORT': 'collecting_report',
-            'WAITING_MEDIA': 'waiting_media',
-            'WAITING_LOCATION': 'waiting_location',
-            'CONFIRMING_REPORT': 'confirming_report',
-            'MENU_NAVIGATION': 'menu_navigation',
-            'FAQ_MODE': 'faq_mode'
+
+class QueryBudgetExceeded(Exception):
+    """Raised when an analytics query runs past its route's time budget"""
+
+    def __init__(self, route: str, budget_ms: int):
+        super().__init__(f"Query for '{route}' exceeded its {budget_ms}ms budget")
+        self.route = route
+        self.budget_ms = budget_ms
+
+class AnalyticsReadPool:
+    """Pool of read-only SQLite connections for analytics and dashboard routes.
+
+    Connections are opened with mode=ro and PRAGMA query_only, and every checkout
+    runs inside a single read transaction so all queries of a route see one WAL
+    snapshot. A progress handler aborts statements that overrun the route budget,
+    so a heavy dashboard query can never hold up the webhook's write path.
+    """
+
+    def __init__(self, db_path: str = 'hsse_reports.db', size: int = ANALYTICS_POOL_SIZE):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._opened = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'checkouts': 0,
+            'budget_exceeded': 0,
+            'pool_waits': 0
         }
-        
-        # Menu system
-        self.menu_options = {
-            'REPORT': 'Report incidents with AI analysis',
-            'FAQ': 'Get safety information & policies', 
-            'EMERGENCY': 'Get emergency contacts',
-            'STATUS': 'Check system status',
-            'VOICE': 'Voice & dual messaging controls'
+
+    def _open_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True,
+                               check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA query_only = 1')
+        return conn
+
+    def _acquire(self, route: str, budget_ms: int) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return self._open_connection()
+                except Exception:
+                    self._opened -= 1
+                    raise
+
+        # Pool exhausted - wait for a connection, but never longer than the budget
+        self.stats['pool_waits'] += 1
+        try:
+            return self._idle.get(timeout=budget_ms / 1000)
+        except queue.Empty:
+            self.stats['budget_exceeded'] += 1
+            raise QueryBudgetExceeded(route, budget_ms)
+
+    def _release(self, conn: sqlite3.Connection, broken: bool = False):
+        if broken:
+            with self._lock:
+                self._opened -= 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def snapshot(self, route: str, budget_ms: int = None):
+        """Yield a cursor reading from one consistent snapshot within the route's budget"""
+
+        if budget_ms is None:
+            budget_ms = ANALYTICS_ROUTE_BUDGETS_MS.get(route, ANALYTICS_QUERY_BUDGET_MS)
+
+        deadline = time.monotonic() + budget_ms / 1000
+        conn = self._acquire(route, budget_ms)
+        self.stats['checkouts'] += 1
+        broken = False
+
+        # Abort any statement once the deadline passes (checked every 1000 VM steps)
+        conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, 1000)
+
+        try:
+            conn.execute('BEGIN')
+            yield conn.cursor()
+        except sqlite3.OperationalError as e:
+            if 'interrupted' in str(e):
+                self.stats['budget_exceeded'] += 1
+                raise QueryBudgetExceeded(route, budget_ms) from e
+            broken = True
+            raise
+        finally:
+            try:
+                conn.set_progress_handler(None, 0)
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+            except sqlite3.Error:
+                broken = True
+            self._release(conn, broken)
+
+    def get_stats(self) -> Dict:
+        """Get pool usage statistics"""
+        return {
+            'pool_size': self.size,
+            'open_connections': self._opened,
+            'idle_connections': self._idle.qsize(),
+            **self.stats
         }
-        
-        # FAQ categories and content
-        self.faq_categories = {
-            'PPE': 'Personal Protective Equipment',
-            'FIRE': 'Fire Safety & Prevention',
-            'CHEMICAL': 'Chemical Safety & Handling',
-            'ELECTRICAL': 'Electrical Safety',
-            'CONFINED': 'Confined Space Safety',
-            'ERGONOMICS': 'Workplace Ergonomics',
-            'TRAINING': 'Safety Training & Procedures'
+
+class SharedStateBackend:
+    """Base for key/value state shared by every worker process.
+
+    Workers keep their own in-memory caches (session hot tier, thread memory) and
+    use version counters here to notice writes made by other workers. Backend
+    errors are logged and counted, never raised, so a flaky shared store degrades
+    to per-worker behaviour instead of failing requests.
+    """
+
+    name = 'base'
+
+    def __init__(self):
+        self.stats = {
+            'operations': 0,
+            'errors': 0
         }
-        
-        # Start cleanup task for TTS files
-        self._start_cleanup_task()
-    
-    def _start_cleanup_task(self):
-        """Start background task to clean up old TTS files"""
-        def cleanup_worker():
+
+    def _safe(self, operation, default=None):
+        self.stats['operations'] += 1
+        try:
+            return operation()
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"Shared state ({self.name}) error: {e}")
+            return default
+
+    def get_version(self, key: str) -> int:
+        """Current value of a version counter (0 if never bumped)"""
+        value = self.get(key)
+        return int(value) if value else 0
+
+    def purge_expired(self) -> int:
+        return 0
+
+    def get_stats(self) -> Dict:
+        """Get backend statistics"""
+        return {'backend': self.name, **self.stats}
+
+class SQLiteSharedState(SharedStateBackend):
+    """Shared state in the app's SQLite database - the default, for workers on one host"""
+
+    name = 'sqlite'
+
+    def __init__(self, db_path: str = 'hsse_reports.db'):
+        super().__init__()
+        self.db_path = db_path
+        self._local = threading.local()
+
+        cursor = self._conn().cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS shared_state (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                expires_at_ms INTEGER
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS shared_state_hash (
+                name TEXT,
+                field TEXT,
+                value TEXT,
+                PRIMARY KEY (name, field)
+            )
+        ''')
+
+    def _conn(self) -> sqlite3.Connection:
+        # One autocommit connection per thread; these are single-row lookups on the hot path
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _expiry(ttl_seconds: Optional[int]) -> Optional[int]:
+        return _epoch_ms() + ttl_seconds * 1000 if ttl_seconds else None
+
+    def get(self, key: str) -> Optional[str]:
+        def operation():
+            row = self._conn().execute(
+                'SELECT value FROM shared_state WHERE key = ? AND (expires_at_ms IS NULL OR expires_at_ms > ?)',
+                (key, _epoch_ms())).fetchone()
+            return row[0] if row else None
+        return self._safe(operation)
+
+    def set(self, key: str, value: str, ttl_seconds: int = None):
+        self._safe(lambda: self._conn().execute('''
+            INSERT INTO shared_state (key, value, expires_at_ms) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at_ms = excluded.expires_at_ms
+        ''', (key, value, self._expiry(ttl_seconds))))
+
+    def add_if_absent(self, key: str, value: str, ttl_seconds: int = None) -> bool:
+        """Atomically set key unless a live value exists; True if this call set it"""
+        def operation():
+            cursor = self._conn().execute('''
+                INSERT INTO shared_state (key, value, expires_at_ms) VALUES (?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at_ms = excluded.expires_at_ms
+                WHERE shared_state.expires_at_ms IS NOT NULL AND shared_state.expires_at_ms <= ?
+            ''', (key, value, self._expiry(ttl_seconds), _epoch_ms()))
+            return cursor.rowcount > 0
+        return self._safe(operation, default=True)
+
+    def incr(self, key: str) -> int:
+        def operation():
+            row = self._conn().execute('''
+                INSERT INTO shared_state (key, value) VALUES (?, '1')
+                ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+                RETURNING value
+            ''', (key,)).fetchone()
+            return int(row[0])
+        return self._safe(operation, default=0)
+
+    def delete(self, key: str):
+        self._safe(lambda: self._conn().execute('DELETE FROM shared_state WHERE key = ?', (key,)))
+
+    def hget(self, name: str, field: str) -> Optional[str]:
+        def operation():
+            row = self._conn().execute('SELECT value FROM shared_state_hash WHERE name = ? AND field = ?',
+                                       (name, field)).fetchone()
+            return row[0] if row else None
+        return self._safe(operation)
+
+    def hset(self, name: str, field: str, value: str):
+        self._safe(lambda: self._conn().execute('''
+            INSERT INTO shared_state_hash (name, field, value) VALUES (?, ?, ?)
+            ON CONFLICT (name, field) DO UPDATE SET value = excluded.value
+        ''', (name, field, value)))
+
+    def hdel(self, name: str, field: str):
+        self._safe(lambda: self._conn().execute('DELETE FROM shared_state_hash WHERE name = ? AND field = ?',
+                                                (name, field)))
+
+    def hlen(self, name: str) -> int:
+        return self._safe(lambda: self._conn().execute('SELECT COUNT(*) FROM shared_state_hash WHERE name = ?',
+                                                       (name,)).fetchone()[0], default=0)
+
+    def purge_expired(self) -> int:
+        """Delete expired keys (reads already ignore them)"""
+        return self._safe(lambda: self._conn().execute('DELETE FROM shared_state WHERE expires_at_ms <= ?',
+                                                       (_epoch_ms(),)).rowcount, default=0)
+
+class RedisSharedState(SharedStateBackend):
+    """Shared state in Redis (or any Redis-protocol server) for workers spread over several hosts"""
+
+    name = 'redis'
+
+    def __init__(self, url: str = SHARED_STATE_REDIS_URL, prefix: str = SHARED_STATE_KEY_PREFIX):
+        super().__init__()
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, decode_responses=True, socket_timeout=2, socket_connect_timeout=2)
+        self.client.ping()
+
+    def get(self, key: str) -> Optional[str]:
+        return self._safe(lambda: self.client.get(self.prefix + key))
+
+    def set(self, key: str, value: str, ttl_seconds: int = None):
+        self._safe(lambda: self.client.set(self.prefix + key, value, ex=ttl_seconds))
+
+    def add_if_absent(self, key: str, value: str, ttl_seconds: int = None) -> bool:
+        """Atomically set key unless it exists (SET NX); True if this call set it"""
+        return self._safe(lambda: bool(self.client.set(self.prefix + key, value, nx=True, ex=ttl_seconds)),
+                          default=True)
+
+    def incr(self, key: str) -> int:
+        return self._safe(lambda: self.client.incr(self.prefix + key), default=0)
+
+    def delete(self, key: str):
+        self._safe(lambda: self.client.delete(self.prefix + key))
+
+    def hget(self, name: str, field: str) -> Optional[str]:
+        return self._safe(lambda: self.client.hget(self.prefix + name, field))
+
+    def hset(self, name: str, field: str, value: str):
+        self._safe(lambda: self.client.hset(self.prefix + name, field, value))
+
+    def hdel(self, name: str, field: str):
+        self._safe(lambda: self.client.hdel(self.prefix + name, field))
+
+    def hlen(self, name: str) -> int:
+        return self._safe(lambda: self.client.hlen(self.prefix + name), default=0)
+
+def create_shared_state() -> SharedStateBackend:
+    """Build the configured shared-state backend, falling back to SQLite"""
+    if SHARED_STATE_BACKEND == 'redis':
+        if not REDIS_AVAILABLE:
+            print("⚠️  redis package not installed. Shared state will use SQLite.")
+        else:
+            try:
+                backend = RedisSharedState()
+                print(f"✅ Shared state: Redis at {SHARED_STATE_REDIS_URL}")
+                return backend
+            except Exception as e:
+                print(f"⚠️  Redis shared state unavailable ({e}). Falling back to SQLite.")
+    return SQLiteSharedState()
+
+class SharedAudioCache:
+    """Index of cached TTS audio shared by all workers (cache key -> file in TTS_AUDIO_DIR).
+
+    Dict-like, like the per-process dict it replaces. Entries whose file has been
+    cleaned up read as missing, so the phrase is simply generated again.
+    """
+
+    HASH_NAME = 'tts_audio_cache'
+
+    def __init__(self, shared_state: SharedStateBackend, audio_dir: str):
+        self.shared_state = shared_state
+        self.audio_dir = audio_dir
+
+    def get(self, cache_key: str, default=None) -> Optional[str]:
+        filename = self.shared_state.hget(self.HASH_NAME, cache_key)
+        if filename:
+            path = os.path.join(self.audio_dir, filename)
+            if os.path.exists(path):
+                return path
+        return default
+
+    def __contains__(self, cache_key: str) -> bool:
+        return self.get(cache_key) is not None
+
+    def __getitem__(self, cache_key: str) -> str:
+        path = self.get(cache_key)
+        if path is None:
+            raise KeyError(cache_key)
+        return path
+
+    def __setitem__(self, cache_key: str, path: str):
+        self.shared_state.hset(self.HASH_NAME, cache_key, os.path.basename(path))
+
+    def __len__(self) -> int:
+        return self.shared_state.hlen(self.HASH_NAME)
+
+class SessionStore:
+    """User session store: in-memory hot tier in front of the durable user_sessions table.
+
+    Writes go through to SQLite so a restart loses nothing, while reads on the
+    hot path are served from memory. Every session carries an expiry derived from
+    its state, and partial updates (json_set / json_insert) change single fields
+    of the stored blob instead of re-serializing the whole session. With a shared
+    state backend, each write bumps a per-phone version so other workers drop
+    their stale hot copy.
+    """
+
+    def __init__(self, db_path: str = 'hsse_reports.db', hot_size: int = SESSION_HOT_CACHE_SIZE,
+                 shared_state: SharedStateBackend = None):
+        self.db_path = db_path
+        self.hot_size = max(0, hot_size)
+        self.shared_state = shared_state
+        self._hot = OrderedDict()  # phone -> (state, data, expires_at_ms, version)
+        self._lock = threading.Lock()
+        self.stats = {
+            'hot_hits': 0,
+            'hot_misses': 0,
+            'hot_stale': 0,
+            'partial_updates': 0,
+            'full_writes': 0,
+            'expired': 0
+        }
+
+    @staticmethod
+    def ttl_for_state(state: Optional[str]) -> int:
+        """TTL in seconds for a session in the given state"""
+        return SESSION_STATE_TTL_SECONDS.get(state, SESSION_DEFAULT_TTL_SECONDS)
+
+    def _expiry_for_state(self, state: Optional[str]) -> int:
+        return _epoch_ms() + self.ttl_for_state(state) * 1000
+
+    def _version(self, phone: str) -> int:
+        return self.shared_state.get_version(f'session_version:{phone}') if self.shared_state else 0
+
+    def _bump_version(self, phone: str) -> int:
+        return self.shared_state.incr(f'session_version:{phone}') if self.shared_state else 0
+
+    def _remember(self, phone: str, state: str, data: dict, expires_at_ms: int, version: int):
+        if not self.hot_size:
+            return
+        with self._lock:
+            self._hot[phone] = (state, data, expires_at_ms, version)
+            self._hot.move_to_end(phone)
+            while len(self._hot) > self.hot_size:
+                self._hot.popitem(last=False)
+
+    def _forget(self, phone: str):
+        with self._lock:
+            self._hot.pop(phone, None)
+
+    def get(self, phone: str) -> Tuple[Optional[str], dict]:
+        """Return (state, data) for a live session, or (None, {}) if missing or expired"""
+        now_ms = _epoch_ms()
+
+        with self._lock:
+            cached = self._hot.get(phone)
+            if cached:
+                self._hot.move_to_end(phone)
+        if cached:
+            state, data, expires_at_ms, version = cached
+            if version != self._version(phone):
+                # Another worker changed this session - reload it
+                self.stats['hot_stale'] += 1
+                self._forget(phone)
+            elif expires_at_ms <= now_ms:
+                # Only the local copy is known to be old; SQLite decides whether the session expired
+                self._forget(phone)
+            else:
+                self.stats['hot_hits'] += 1
+                # Callers mutate the returned dict, so never hand out the cached one
+                return state, copy.deepcopy(data)
+
+        self.stats['hot_misses'] += 1
+        version = self._version(phone)
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT state, data, expires_at_ms FROM user_sessions WHERE phone = ?', (phone,))
+        result = cursor.fetchone()
+        conn.close()
+
+        if not result:
+            return None, {}
+
+        state, raw_data, expires_at_ms = result
+        if expires_at_ms is not None and expires_at_ms <= now_ms:
+            self._delete_expired(phone, now_ms)
+            return None, {}
+
+        data = json.loads(raw_data) if raw_data else {}
+        self._remember(phone, state, data, expires_at_ms or self._expiry_for_state(state), version)
+        return state, copy.deepcopy(data)
+
+    def set(self, phone: str, state: str, data: dict):
+        """Replace a session and reset its expiry for the new state"""
+        expires_at_ms = self._expiry_for_state(state)
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO user_sessions (phone, state, data, last_activity, expires_at_ms)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (phone) DO UPDATE SET
+                state = excluded.state, data = excluded.data,
+                last_activity = excluded.last_activity, expires_at_ms = excluded.expires_at_ms
+        ''', (phone, state, json.dumps(data), datetime.datetime.now().isoformat(), expires_at_ms))
+        conn.commit()
+        conn.close()
+
+        self.stats['full_writes'] += 1
+        self._remember(phone, state, copy.deepcopy(data), expires_at_ms, self._bump_version(phone))
+
+    def _partial_update(self, phone: str, state: str, data_sql: str, params: list, apply_in_memory) -> bool:
+        """Apply a json_set/json_insert expression to the stored blob and mirror it in the hot tier.
+
+        Returns False when there is no live session to update; the caller should then
+        fall back to set() with the full data.
+        """
+        now_ms = _epoch_ms()
+        expires_at_ms = self._expiry_for_state(state)
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            UPDATE user_sessions
+            SET data = {data_sql}, state = ?, last_activity = ?, expires_at_ms = ?
+            WHERE phone = ? AND data IS NOT NULL AND (expires_at_ms IS NULL OR expires_at_ms > ?)
+        ''', params + [state, datetime.datetime.now().isoformat(), expires_at_ms, phone, now_ms])
+        updated = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+
+        if not updated:
+            self._forget(phone)
+            return False
+
+        self.stats['partial_updates'] += 1
+        version = self._bump_version(phone)
+        with self._lock:
+            cached = self._hot.get(phone)
+            if cached and (not self.shared_state or cached[3] == version - 1):
+                apply_in_memory(cached[1])
+                self._hot[phone] = (state, cached[1], expires_at_ms, version)
+            else:
+                # The hot copy missed another worker's write; reload on next read
+                self._hot.pop(phone, None)
+        return True
+
+    def update_fields(self, phone: str, state: str, fields: Dict[str, object]) -> bool:
+        """Set individual fields of a session by dotted path (e.g. 'report_data.location_lat')"""
+        if not fields:
+            return False
+
+        data_sql = 'json_set(data' + ', ?, json(?)' * len(fields) + ')'
+        params = []
+        for path, value in fields.items():
+            params.extend(['$.' + path, json.dumps(value)])
+
+        def apply_in_memory(data: dict):
+            for path, value in fields.items():
+                *parents, key = path.split('.')
+                target = data
+                for part in parents:
+                    target = target.setdefault(part, {})
+                target[key] = copy.deepcopy(value)
+
+        return self._partial_update(phone, state, data_sql, params, apply_in_memory)
+
+    def append_media(self, phone: str, state: str, media_files: List[Dict]) -> bool:
+        """Append media entries to report_data.media_files without rewriting the session"""
+        if not media_files:
+            return False
+
+        # Build the extended array from whatever is stored (or an empty one) in a single expression
+        array_sql = "COALESCE(json_extract(data, '$.report_data.media_files'), json('[]'))"
+        for _ in media_files:
+            array_sql = f"json_insert({array_sql}, '$[#]', json(?))"
+        data_sql = f"json_set(data, '$.report_data.media_files', {array_sql})"
+        params = [json.dumps(media_file) for media_file in media_files]
+
+        def apply_in_memory(data: dict):
+            report_data = data.setdefault('report_data', {})
+            report_data.setdefault('media_files', []).extend(copy.deepcopy(media_files))
+
+        return self._partial_update(phone, state, data_sql, params, apply_in_memory)
+
+    def delete(self, phone: str):
+        """Remove a session from both tiers"""
+        self._forget(phone)
+        self._bump_version(phone)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('DELETE FROM user_sessions WHERE phone = ?', (phone,))
+        conn.commit()
+        conn.close()
+
+    def _delete_expired(self, phone: str, now_ms: int):
+        """Delete a session only if it is still expired, so a concurrent refresh by another worker survives"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM user_sessions WHERE phone = ? AND expires_at_ms <= ?', (phone, now_ms))
+        removed = cursor.rowcount
+        conn.commit()
+        conn.close()
+
+        if removed:
+            self.stats['expired'] += 1
+            self._bump_version(phone)
+
+    def expire_sessions(self) -> int:
+        """Delete every session past its expiry; returns the number removed"""
+        now_ms = _epoch_ms()
+
+        with self._lock:
+            for phone in [phone for phone, entry in self._hot.items() if entry[2] <= now_ms]:
+                del self._hot[phone]
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM user_sessions WHERE expires_at_ms <= ?', (now_ms,))
+        removed = cursor.rowcount
+        conn.commit()
+        conn.close()
+
+        self.stats['expired'] += removed
+        return removed
+
+    def start_expiry_worker(self, interval_seconds: int = SESSION_EXPIRY_INTERVAL_SECONDS):
+        """Start background task to expire abandoned sessions"""
+        def expiry_worker():
             while True:
                 try:
-                    time.sleep(3600)  # Clean up every hour
-                    self.tts_manager.cleanup_old_files()
+                    time.sleep(interval_seconds)
+                    removed = self.expire_sessions()
+                    if removed:
+                        print(f"🧹 Expired {removed} stale user sessions")
                 except Exception as e:
-                    print(f"TTS cleanup error: {e}")
+                    print(f"Session expiry error: {e}")
+
+        expiry_thread = threading.Thread(target=expiry_worker, daemon=True)
+        expiry_thread.start()
+
+    def get_stats(self) -> Dict:
+        """Get session store statistics"""
+        return {
+            'hot_sessions': len(self._hot),
+            'hot_capacity': self.hot_size,
+            **self.stats
+        }
+
+class DatabaseManager:
+    def __init__(self):
+        self.init_db()
+        self.init_db_dual_messaging_support()
+        self.migrate_epoch_timestamps()
+        self.analytics_pool = AnalyticsReadPool()
+        self.shared_state = create_shared_state()
+        self.sessions = SessionStore(shared_state=self.shared_state)
+        self.sessions.start_expiry_worker()
+
+    def init_db(self):
+        conn = sqlite3.connect('hsse_reports.db')
+        cursor = conn.cursor()
         
-        cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
-        cleanup_thread.start()
-    
-    def process_message(self, from_number: str, message_body: str, media_urls: List[str] = None) -> Tuple[str, Optional[str]]:
-        """Enhanced message processing with smart conversation tracking, menu system, Laravel integration, and dual TTS messaging"""
+        # WAL lets analytics readers work from a snapshot without blocking webhook writes
+        cursor.execute('PRAGMA journal_mode=WAL')
         
-        # Emergency detection
-        emergency_keywords = ['fire', 'emergency', 'urgent', 'accident', 'injury', 'help', 'danger', 'critical']
-        if any(keyword in message_body.lower() for keyword in emergency_keywords):
-            return self._handle_immediate_emergency(from_number, message_body)
+        # Check if location columns exist and add them if missing
+        cursor.execute("PRAGMA table_info(reports)")
+        columns = [column[1] for column in cursor.fetchall()]
         
-        # Get user profile
-        user_profile = self.db.get_user_profile(from_number)
-        if not user_profile:
-            user_profile = UserProfile(
-                phone=from_number,
-                name=None,
-                role=None,
-                department=None,
-                preferred_language='en',
-                interaction_history=[],
-                safety_interests=[],
-                last_active=datetime.datetime.now().isoformat(),
-                tts_enabled=True,
-                tts_voice_preference='female',
-                tts_speed_preference=150,
-                dual_messaging_enabled=True,
-                voice_for_emergencies=True,
-                voice_for_long_messages=True,
-                voice_delay_seconds=2,
-                preferred_message_format='both'
+        # Original tables
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reports (
+                id TEXT PRIMARY KEY,
+                user_phone TEXT,
+                timestamp TEXT,
+                incident_type TEXT,
+                severity TEXT,
+                description TEXT,
+                location TEXT,
+                location_lat REAL,
+                location_long REAL,
+                media_urls TEXT,
+                status TEXT,
+                ai_analysis TEXT,
+                created_at TEXT,
+                laravel_report_id TEXT
             )
-            self.db.update_user_profile(user_profile)
-        
-        # Get current session state
-        current_state, session_data = self.db.get_user_session(from_number)
+        ''')
         
-        # Check for dual messaging commands first
-        dual_messaging_response = self._handle_dual_messaging_commands(from_number, message_body, user_profile)
-        if dual_messaging_response:
-            return dual_messaging_response
+        # Add missing columns if they don't exist
+        if 'location_lat' not in columns:
+            try:
+                cursor.execute('ALTER TABLE reports ADD COLUMN location_lat REAL')
+                print("Added location_lat column to reports table")
+            except sqlite3.OperationalError:
+                pass  # Column might already exist
         
-        # Check for menu commands
-        menu_response = self._handle_menu_commands(from_number, message_body, user_profile)
-        if menu_response:
-            return menu_response
+        if 'location_long' not in columns:
+            try:
+                cursor.execute('ALTER TABLE reports ADD COLUMN location_long REAL')
+                print("Added location_long column to reports table")
+            except sqlite3.OperationalError:
+                pass  # Column might already exist
         
-        # Handle Laravel-integrated reporting flow
-        if current_state in [self.states['COLLECTING_REPORT'], self.states['WAITING_MEDIA'], 
-                            self.states['WAITING_LOCATION'], self.states['CONFIRMING_REPORT']]:
-            return self._handle_laravel_incident_reporting(from_number, message_body, media_urls, 
-                                                         current_state, session_data, {})
+        if 'laravel_report_id' not in columns:
+            try:
+                cursor.execute('ALTER TABLE reports ADD COLUMN laravel_report_id TEXT')
+                print("Added laravel_report_id column to reports table")
+            except sqlite3.OperationalError:
+                pass  # Column might already exist
         
-        # Handle FAQ mode
-        if current_state == self.states['FAQ_MODE']:
-            return self._handle_faq_interaction(from_number, message_body, session_data, user_profile)
+        if 'location_approximate' not in columns:
+            try:
+                cursor.execute('ALTER TABLE reports ADD COLUMN location_approximate BOOLEAN DEFAULT 0')
+                # Older reports stored the Georgetown fallback without marking it
+                cursor.execute('''
+                    UPDATE reports SET location_approximate = 1
+                    WHERE location_lat = ? AND location_long = ? AND COALESCE(location, '') NOT LIKE 'Coordinates:%'
+                ''', (DEFAULT_LOCATION_LAT, DEFAULT_LOCATION_LONG))
+                print("Added location_approximate column to reports table")
+            except sqlite3.OperationalError:
+                pass  # Column might already exist
         
-        # Use smart conversation management for regular conversations
-        intent_analysis = self.conversation_analyzer.analyze_message_intent(message_body)
+        self._init_report_counters(cursor)
+        self._ensure_index_key(cursor, 'reports')
+        self._init_report_spatial_index(cursor)
         
-        # Handle specific intents
-        if intent_analysis.get('primary_intent') == 'emergency':
-            return self._handle_emergency(from_number, message_body, intent_analysis, user_profile)
-        elif intent_analysis.get('primary_intent') == 'report_incident':
-            return self._start_laravel_incident_reporting(from_number, intent_analysis, user_profile)
-        else:
-            # Check if this is a first interaction or user needs guidance
-            if self._should_show_menu(from_number, message_body, user_profile):
-                return self._show_main_menu(from_number, user_profile, message_body)
-            
-            # Use smart conversation manager for regular chat
-            response, conversation_metadata = self.conversation_manager.handle_smart_conversation(
-                from_number, message_body, intent_analysis, user_profile, media_urls
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_sessions (
+                phone TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT,
+                last_activity TEXT
             )
-            
-            # Get TTS URL from metadata
-            tts_audio_url = conversation_metadata.get('tts_audio_url')
-            
-            # Add menu hint for longer conversations
-            if len(response) < 800:
-                response += f"\n\n💡 *Tip: Type 'MENU' anytime for quick access to reports, FAQ, emergency contacts, and dual messaging settings!*"
-            
-            # Update user profile with new information
-            user_info = self.conversation_analyzer.extract_user_info(message_body)
-            if user_info:
-                self._update_user_profile(user_profile, user_info)
-            
-            return response, tts_audio_url
-    
-    def _handle_immediate_emergency(self, from_number: str, message: str) -> Tuple[str, Optional[str]]:
-        """Handle immediate emergency situations with instant response and emergency TTS"""
-        
-        # Get user name if available
-        user_profile = self.db.get_user_profile(from_number)
-        name = user_profile.name if user_profile and user_profile.name else "there"
+        ''')
         
-        message_lower = message.lower()
-        
-        # Fire emergency
-        if 'fire' in message_lower:
-            response = (f"🚨 **FIRE EMERGENCY - {name.upper()}!** 🚨\n\n"
-                       f"**IMMEDIATE ACTIONS:**\n"
-                       f"🔥 **CALL 912 RIGHT NOW** (Fire Service)\n"
-                       f"📞 **OR CALL 911** (Emergency Services)\n\n"
-                       f"**IF SAFE TO DO SO:**\n"
-                       f"🚨 Activate fire alarm\n"
-                       f"👥 Evacuate everyone\n"
-                       f"🚪 Close doors behind you\n"
-                       f"📍 Meet at assembly point\n\n"
-                       f"**GUYANA EMERGENCY CONTACTS:**\n"
-                       f"🚒 Fire Service: **912**\n"
-                       f"🚑 Ambulance: **913** \n"
-                       f"👮 Police: **911**\n"
-                       f"🏥 Georgetown Hospital: **225-5200**\n\n"
-                       f"Stay safe, {name}! Emergency audio alert will follow this text!")
-            
-            # Use pre-generated emergency audio
-            tts_audio_url = self.tts_manager.get_emergency_audio('fire')
-            
-        # Medical emergency
-        elif any(word in message_lower for word in ['injury', 'hurt', 'accident', 'medical']):
-            response = (f"🚨 **MEDICAL EMERGENCY - {name.upper()}!** 🚨\n\n"
-                       f"**CALL 913 IMMEDIATELY** (Ambulance)\n"
-                       f"**OR CALL 911** (Emergency Services)\n\n"
-                       f"**WHILE WAITING FOR HELP:**\n"
-                       f"🩺 Check if person is conscious\n"
-                       f"🫁 Check breathing\n"
-                       f"🩸 Control any bleeding\n"
-                       f"🚫 DO NOT move if spinal injury suspected\n\n"
-                       f"**GUYANA EMERGENCY CONTACTS:**\n"
-                       f"🚑 Ambulance: **913**\n"
-                       f"🏥 Georgetown Hospital: **225-5200**\n\n"
-                       f"Stay with the injured person, {name}! Audio emergency guide will follow!")
-            
-            tts_audio_url = self.tts_manager.get_emergency_audio('medical')
-        
-        # General emergency
-        else:
-            response = (f"🚨 **EMERGENCY DETECTED - {name.upper()}!** 🚨\n\n"
-                       f"**CALL 911 IMMEDIATELY!**\n\n"
-                       f"**GUYANA EMERGENCY SERVICES:**\n"
-                       f"🚨 General Emergency: **911**\n"
-                       f"🚒 Fire Service: **912**\n"
-                       f"🚑 Ambulance: **913**\n"
-                       f"👮 Police: **911**\n\n"
-                       f"Stay safe, {name}! Emergency voice alert is being sent!")
-            
-            tts_audio_url = self.tts_manager.get_emergency_audio('emergency')
+        cursor.execute("PRAGMA table_info(user_sessions)")
+        session_columns = [column[1] for column in cursor.fetchall()]
+        if 'expires_at_ms' not in session_columns:
+            try:
+                cursor.execute('ALTER TABLE user_sessions ADD COLUMN expires_at_ms INTEGER')
+                # Existing sessions expire relative to their last activity, like new ones
+                cursor.execute('SELECT phone, state, last_activity FROM user_sessions')
+                for phone, state, last_activity in cursor.fetchall():
+                    last_activity_ms = _iso_to_epoch_ms(last_activity) or _epoch_ms()
+                    cursor.execute('UPDATE user_sessions SET expires_at_ms = ? WHERE phone = ?',
+                                   (last_activity_ms + SessionStore.ttl_for_state(state) * 1000, phone))
+                print("Added expires_at_ms column to user_sessions table")
+            except sqlite3.OperationalError:
+                pass  # Column might already exist
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_sessions_expires ON user_sessions (expires_at_ms)')
         
-        return response, tts_audio_url
-    
-    def _handle_dual_messaging_commands(self, from_number: str, message: str, user_profile: UserProfile) -> Optional[Tuple[str, Optional[str]]]:
-        """Handle dual messaging control commands"""
+        # NEW: Enhanced user profiles with TTS preferences
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_profiles (
+                phone TEXT PRIMARY KEY,
+                name TEXT,
+                role TEXT,
+                department TEXT,
+                preferred_language TEXT,
+                interaction_history TEXT,
+                safety_interests TEXT,
+                last_active TEXT,
+                tts_enabled BOOLEAN DEFAULT 1,
+                tts_voice_preference TEXT DEFAULT 'female',
+                tts_speed_preference INTEGER DEFAULT 150
+            )
+        ''')
         
-        message_lower = message.lower().strip()
+        # Check and add TTS columns to user_profiles if missing
+        cursor.execute("PRAGMA table_info(user_profiles)")
+        profile_columns = [column[1] for column in cursor.fetchall()]
         
-        # Voice control commands
-        if any(cmd in message_lower for cmd in ['voice off', 'disable voice', 'no voice', 'text only']):
-            user_profile.tts_enabled = False
-            user_profile.preferred_message_format = 'text'
-            self.db.update_user_profile(user_profile)
-            
-            response = f"🔇 Voice messages disabled, {user_profile.name or 'there'}! You'll only receive text messages now.\n\nSay 'voice on' anytime to re-enable dual messaging (text + audio)."
-            return response, None  # No TTS for voice-off command
+        if 'tts_enabled' not in profile_columns:
+            try:
+                cursor.execute('ALTER TABLE user_profiles ADD COLUMN tts_enabled BOOLEAN DEFAULT 1')
+                print("Added tts_enabled column to user_profiles table")
+            except sqlite3.OperationalError:
+                pass
         
-        elif any(cmd in message_lower for cmd in ['voice on', 'enable voice', 'dual messaging', 'both messages']):
-            user_profile.tts_enabled = True
-            user_profile.preferred_message_format = 'both'
-            self.db.update_user_profile(user_profile)
-            
-            response = f"🎙️ Dual messaging enabled, {user_profile.name or 'there'}! You'll now receive both text and voice messages for better accessibility."
-            tts_audio_url = self.tts_manager.get_dual_messaging_audio('voice_enabled_dual')
-            return response, tts_audio_url
+        if 'tts_voice_preference' not in profile_columns:
+            try:
+                cursor.execute('ALTER TABLE user_profiles ADD COLUMN tts_voice_preference TEXT DEFAULT "female"')
+                print("Added tts_voice_preference column to user_profiles table")
+            except sqlite3.OperationalError:
+                pass
         
-        elif 'voice settings' in message_lower or message.upper().strip() == 'VOICE':
-            return self._show_enhanced_voice_settings(from_number, user_profile)
+        if 'tts_speed_preference' not in profile_columns:
+            try:
+                cursor.execute('ALTER TABLE user_profiles ADD COLUMN tts_speed_preference INTEGER DEFAULT 150')
+                print("Added tts_speed_preference column to user_profiles table")
+            except sqlite3.OperationalError:
+                pass
         
-        # Voice preference changes
-        elif 'voice fast' in message_lower:
-            user_profile.tts_speed_preference = min(250, user_profile.tts_speed_preference + 25)
-            self.db.update_user_profile(user_profile)
-            response = f"🎙️ Speech speed increased to {user_profile.tts_speed_preference} WPM. Try saying something to test!"
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response, {'tts_speed_preference': user_profile.tts_speed_preference})
-            return response, tts_audio_url
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_context (
+                phone TEXT PRIMARY KEY,
+                recent_topics TEXT,
+                conversation_style TEXT,
+                current_mood TEXT,
+                expertise_level TEXT,
+                last_updated TEXT
+            )
+        ''')
         
-        elif 'voice slow' in message_lower:
-            user_profile.tts_speed_preference = max(100, user_profile.tts_speed_preference - 25)
-            self.db.update_user_profile(user_profile)
-            response = f"🎙️ Speech speed decreased to {user_profile.tts_speed_preference} WPM. This message uses the new speed!"
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response, {'tts_speed_preference': user_profile.tts_speed_preference})
-            return response, tts_audio_url
+        # Enhanced conversation tracking tables with TTS metadata
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_turns (
+                id TEXT PRIMARY KEY,
+                phone TEXT,
+                thread_id TEXT,
+                user_message TEXT,
+                bot_response TEXT,
+                timestamp TEXT,
+                intent TEXT,
+                topics TEXT,
+                sentiment TEXT,
+                context_used TEXT,
+                response_quality_score REAL,
+                user_satisfaction_indicators TEXT,
+                turn_number INTEGER,
+                tts_audio_url TEXT,
+                tts_generated BOOLEAN DEFAULT 0
+            )
+        ''')
         
-        elif 'voice male' in message_lower:
-            user_profile.tts_voice_preference = 'male'
-            self.db.update_user_profile(user_profile)
-            response = f"🎙️ Voice changed to male. This message demonstrates the new voice!"
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response, {'tts_voice_preference': 'male'})
-            return response, tts_audio_url
+        # Check and add TTS columns to conversation_turns if missing
+        cursor.execute("PRAGMA table_info(conversation_turns)")
+        turn_columns = [column[1] for column in cursor.fetchall()]
         
-        elif 'voice female' in message_lower:
-            user_profile.tts_voice_preference = 'female'
-            self.db.update_user_profile(user_profile)
-            response = f"🎙️ Voice changed to female. Listen to this message with the new voice!"
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response, {'tts_voice_preference': 'female'})
-            return response, tts_audio_url
+        if 'tts_audio_url' not in turn_columns:
+            try:
+                cursor.execute('ALTER TABLE conversation_turns ADD COLUMN tts_audio_url TEXT')
+                print("Added tts_audio_url column to conversation_turns table")
+            except sqlite3.OperationalError:
+                pass
         
-        return None
-    
-    def _show_enhanced_voice_settings(self, from_number: str, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
-        """Show enhanced voice settings with dual messaging options"""
+        if 'tts_generated' not in turn_columns:
+            try:
+                cursor.execute('ALTER TABLE conversation_turns ADD COLUMN tts_generated BOOLEAN DEFAULT 0')
+                print("Added tts_generated column to conversation_turns table")
+            except sqlite3.OperationalError:
+                pass
         
-        name = user_profile.name or "there"
+        # Only LLM-labelled intents are used to train the local intent classifier
+        if 'intent_source' not in turn_columns:
+            try:
+                cursor.execute("ALTER TABLE conversation_turns ADD COLUMN intent_source TEXT DEFAULT 'llm'")
+                print("Added intent_source column to conversation_turns table")
+            except sqlite3.OperationalError:
+                pass
         
-        voice_menu = f"""🎙️ **Enhanced Dual Messaging Settings - {name}** 🎙️
-
-**Current Setup:**
-📱 Text Messages: Always enabled (instant delivery)
-🔊 Voice Messages: {'✅ Enabled' if user_profile.tts_enabled else '❌ Disabled'}
-🎵 Voice Type: {user_profile.tts_voice_preference.title()}
-⚡ Speech Speed: {user_profile.tts_speed_preference} WPM
-⏱️ Voice Delay: {getattr(user_profile, 'voice_delay_seconds', 2)} seconds after text
-
-**Quick Commands:**
-🔸 **"VOICE ON"** - Enable dual messaging (text + audio)
-🔸 **"VOICE OFF"** - Text messages only  
-🔸 **"VOICE FAST"** - Increase speech speed
-🔸 **"VOICE SLOW"** - Decrease speech speed
-🔸 **"VOICE MALE"** - Switch to male voice
-🔸 **"VOICE FEMALE"** - Switch to female voice
-
-**How Dual Messaging Works:**
-📤 Text message sent immediately (0-1 second)
-🎙️ Voice message follows shortly (2-3 seconds later)
-🚨 Emergency messages get priority audio delivery
-♿ Perfect for accessibility and hands-free operation
-
-💬 *This message demonstrates dual messaging - you received text first, then this audio version!*
-
-Type a voice command or 'MENU' to return to main menu."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_threads (
+                thread_id TEXT PRIMARY KEY,
+                phone TEXT,
+                start_time TEXT,
+                last_activity TEXT,
+                total_turns INTEGER,
+                conversation_summary TEXT,
+                key_topics_discussed TEXT,
+                user_goals_identified TEXT,
+                relationship_building_score REAL,
+                conversation_satisfaction_score REAL,
+                unresolved_issues TEXT,
+                follow_up_needed BOOLEAN,
+                conversation_type TEXT,
+                status TEXT DEFAULT 'active',
+                summary_turn_count INTEGER DEFAULT 0
+            )
+        ''')
         
-        # Always generate TTS for voice settings
-        tts_audio_url = self.tts_manager.generate_for_dual_messaging(voice_menu)
+        cursor.execute("PRAGMA table_info(conversation_threads)")
+        thread_columns = [column[1] for column in cursor.fetchall()]
+        if 'summary_turn_count' not in thread_columns:
+            try:
+                cursor.execute('ALTER TABLE conversation_threads ADD COLUMN summary_turn_count INTEGER DEFAULT 0')
+                print("Added summary_turn_count column to conversation_threads table")
+            except sqlite3.OperationalError:
+                pass  # Column might already exist
         
-        return voice_menu, tts_audio_url
-    
-    def _handle_menu_commands(self, from_number: str, message: str, user_profile: UserProfile) -> Optional[Tuple[str, Optional[str]]]:
-        """Handle menu-specific commands with TTS"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_patterns (
+                id TEXT PRIMARY KEY,
+                phone TEXT,
+                pattern_type TEXT,
+                pattern_data TEXT,
+                frequency INTEGER,
+                effectiveness_score REAL,
+                last_observed TEXT,
+                created_at TEXT
+            )
+        ''')
         
-        message_upper = message.upper().strip()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_long_term_memory (
+                phone TEXT PRIMARY KEY,
+                personality_profile TEXT,
+                communication_preferences TEXT,
+                expertise_areas TEXT,
+                learning_progress TEXT,
+                relationship_milestones TEXT,
+                important_context TEXT,
+                preferred_conversation_style TEXT,
+                trust_level REAL DEFAULT 0.5,
+                engagement_patterns TEXT,
+                last_updated TEXT
+            )
+        ''')
         
-        # Main menu trigger
-        if message_upper in ['MENU', 'HELP', 'OPTIONS', 'START']:
-            return self._show_main_menu(from_number, user_profile, message)
+        # NEW: Laravel integration table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS local_reports (
+                id TEXT PRIMARY KEY,
+                user_phone TEXT,
+                laravel_report_id TEXT,
+                status TEXT,
+                created_at TEXT
+            )
+        ''')
         
-        # Direct menu options
-        elif message_upper == 'REPORT':
-            return self._start_incident_reporting_from_menu(from_number, user_profile)
+        # NEW: TTS analytics table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tts_analytics (
+                id TEXT PRIMARY KEY,
+                phone TEXT,
+                message_length INTEGER,
+                tts_engine_used TEXT,
+                generation_time_ms INTEGER,
+                file_size_bytes INTEGER,
+                user_feedback TEXT,
+                created_at TEXT
+            )
+        ''')
         
-        elif message_upper == 'FAQ':
-            return self._show_faq_menu(from_number, user_profile)
+        for table in ['conversation_turns', 'reports']:
+            self._ensure_index_key(cursor, table)
+        self.fts_available = self._init_search_index(cursor)
         
-        elif message_upper == 'EMERGENCY':
-            return self._show_emergency_contacts(from_number, user_profile)
+        conn.commit()
+        conn.close()
+    
+    def _ensure_index_key(self, cursor, table: str):
+        """Give a TEXT-keyed table a stable INTEGER index_key for its virtual-table indexes.
         
-        elif message_upper == 'STATUS':
-            return self._show_system_status(from_number, user_profile)
+        VACUUM may renumber the implicit rowid of tables without an INTEGER PRIMARY KEY, which
+        would silently point FTS5/R*Tree entries at the wrong rows; an ordinary column survives it.
+        New rows get MAX(index_key) + 1 at insert time.
+        """
+        cursor.execute(f"PRAGMA table_info({table})")
+        if 'index_key' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN index_key INTEGER')
+            cursor.execute(f'UPDATE {table} SET index_key = rowid')
+            print(f"Added index_key column to {table} table")
         
-        # Back to menu from any state
-        elif message_upper in ['BACK', 'MAIN', 'HOME']:
-            self.db.update_user_session(from_number, self.states['CONVERSING'], {})
-            return self._show_main_menu(from_number, user_profile, "returning to main menu")
+        cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_index_key ON {table} (index_key)')
+    
+    def _drop_stale_index(self, cursor, index_table: str, triggers: List[str]):
+        """Drop a virtual-table index (and its triggers) created before it was keyed on index_key"""
+        
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (triggers[0],))
+        row = cursor.fetchone()
+        if row and 'new.index_key' not in row[0]:
+            for trigger in triggers:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            cursor.execute(f'DROP TABLE {index_table}')
+            print(f"Re-keying {index_table} on index_key")
+    
+    def _init_search_index(self, cursor) -> bool:
+        """Create FTS5 indexes over conversation turns and reports (keyed by index_key), kept in sync by triggers"""
         
-        return None
+        search_indexes = {
+            'conversation_turns': ['user_message', 'bot_response'],
+            'reports': ['description', 'location']
+        }
+        
+        try:
+            for table, columns in search_indexes.items():
+                fts_table = f'{table}_fts'
+                column_list = ', '.join(columns)
+                new_values = ', '.join(f'new.{column}' for column in columns)
+                old_values = ', '.join(f'old.{column}' for column in columns)
+                
+                self._drop_stale_index(cursor, fts_table,
+                                       [f'{fts_table}_insert', f'{fts_table}_delete', f'{fts_table}_update'])
+                
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts_table,))
+                index_exists = cursor.fetchone() is not None
+                
+                cursor.execute(f'''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                        {column_list}, content='{table}', content_rowid='index_key',
+                        tokenize='unicode61 remove_diacritics 2'
+                    )
+                ''')
+                
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table} BEGIN
+                        INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.index_key, {new_values});
+                    END
+                ''')
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table} BEGIN
+                        INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.index_key, {old_values});
+                    END
+                ''')
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE OF {column_list} ON {table} BEGIN
+                        INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.index_key, {old_values});
+                        INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.index_key, {new_values});
+                    END
+                ''')
+                
+                if not index_exists:
+                    # Index rows written before full-text search existed (or before it was keyed on index_key)
+                    cursor.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+                    print(f"Built full-text index {fts_table}")
+            
+            return True
+        
+        except sqlite3.OperationalError as e:
+            print(f"⚠️  SQLite FTS5 not available, /search disabled: {e}")
+            return False
     
-    def _show_main_menu(self, from_number: str, user_profile: UserProfile, context_message: str = "") -> Tuple[str, Optional[str]]:
-        """Display the main menu with personalized greeting and TTS"""
+    def _init_report_spatial_index(self, cursor):
+        """R*Tree over report coordinates (keyed by reports.index_key), kept in sync by triggers"""
         
-        name = user_profile.name or "there"
+        self._drop_stale_index(cursor, 'reports_rtree',
+                               ['reports_rtree_insert', 'reports_rtree_delete', 'reports_rtree_update'])
         
-        # Set menu navigation state
-        self.db.update_user_session(from_number, self.states['MENU_NAVIGATION'], {
-            'last_menu': 'main',
-            'timestamp': datetime.datetime.now().isoformat()
-        })
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'reports_rtree'")
+        index_exists = cursor.fetchone() is not None
         
-        # Personalized greeting based on context
-        if "returning" in context_message.lower():
-            greeting = f"Welcome back, {name}! 👋"
-        elif user_profile.name:
-            greeting = f"Hi {name}! 😊 How can I help you today?"
-        else:
-            greeting = f"Hello there! 👋 I'm ARIA, your AI safety assistant."
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS reports_rtree USING rtree(
+                id, min_lat, max_lat, min_long, max_long
+            )
+        ''')
         
-        menu = f"""{greeting}
-
-🛡️ **ARIA Safety Assistant Menu** 🛡️
-
-Choose an option by typing the keyword:
-
-🔸 **REPORT** - Report incidents with AI analysis (sends to Laravel dashboard!)
-🔸 **FAQ** - Get safety information & policies  
-🔸 **EMERGENCY** - Get emergency contacts
-🔸 **STATUS** - Check system status
-🔸 **VOICE** - Dual messaging & voice controls 🎙️
-
-💬 *You can also just ask me anything about workplace safety naturally - I understand regular conversation too!*
-
-🚀 *NEW: Dual messaging active! You get both text (immediate) and voice (2 sec later) for optimal accessibility!*
-📊 *Reports automatically sent to Laravel safety dashboard with AI analysis!*
-
-What would you like to do?"""
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS reports_rtree_insert AFTER INSERT ON reports
+            WHEN new.location_lat IS NOT NULL AND new.location_long IS NOT NULL BEGIN
+                INSERT OR REPLACE INTO reports_rtree VALUES
+                    (new.index_key, new.location_lat, new.location_lat, new.location_long, new.location_long);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS reports_rtree_delete AFTER DELETE ON reports BEGIN
+                DELETE FROM reports_rtree WHERE id = old.index_key;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS reports_rtree_update AFTER UPDATE OF location_lat, location_long ON reports BEGIN
+                DELETE FROM reports_rtree WHERE id = old.index_key;
+                INSERT INTO reports_rtree
+                    SELECT new.index_key, new.location_lat, new.location_lat, new.location_long, new.location_long
+                    WHERE new.location_lat IS NOT NULL AND new.location_long IS NOT NULL;
+            END
+        ''')
         
-        # Generate TTS
-        tts_audio_url = None
-        if user_profile.tts_enabled and TTS_ENABLED:
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(menu, cache_key='menu_dual')
+        if not index_exists:
+            cursor.execute('''
+                INSERT INTO reports_rtree
+                SELECT index_key, location_lat, location_lat, location_long, location_long FROM reports
+                WHERE location_lat IS NOT NULL AND location_long IS NOT NULL
+            ''')
+    
+    def _init_report_counters(self, cursor):
+        """Maintain per-dimension report counts with triggers so totals never need a scan"""
         
-        return menu, tts_audio_url
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'report_counters'")
+        counters_exist = cursor.fetchone() is not None
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS report_counters (
+                dimension TEXT,
+                value TEXT,
+                count INTEGER DEFAULT 0,
+                PRIMARY KEY (dimension, value)
+            )
+        ''')
+        
+        if not counters_exist:
+            # Backfill from existing reports once, before the triggers take over
+            cursor.execute("INSERT INTO report_counters (dimension, value, count) SELECT 'all', '', COUNT(*) FROM reports")
+            for column in REPORT_FILTER_COLUMNS:
+                cursor.execute(f'''
+                    INSERT INTO report_counters (dimension, value, count)
+                    SELECT '{column}', COALESCE({column}, ''), COUNT(*) FROM reports GROUP BY COALESCE({column}, '')
+                ''')
+        
+        def bump(dimension: str, value_sql: str, delta: int) -> str:
+            return (f"INSERT INTO report_counters (dimension, value, count) "
+                    f"VALUES ('{dimension}', {value_sql}, {delta}) "
+                    f"ON CONFLICT (dimension, value) DO UPDATE SET count = count + ({delta});")
+        
+        insert_body = bump('all', "''", 1) + ''.join(
+            bump(column, f"COALESCE(NEW.{column}, '')", 1) for column in REPORT_FILTER_COLUMNS)
+        delete_body = bump('all', "''", -1) + ''.join(
+            bump(column, f"COALESCE(OLD.{column}, '')", -1) for column in REPORT_FILTER_COLUMNS)
+        update_body = ''.join(
+            bump(column, f"COALESCE(OLD.{column}, '')", -1) + bump(column, f"COALESCE(NEW.{column}, '')", 1)
+            for column in REPORT_FILTER_COLUMNS)
+        
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS reports_counters_insert AFTER INSERT ON reports BEGIN {insert_body} END')
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS reports_counters_delete AFTER DELETE ON reports BEGIN {delete_body} END')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS reports_counters_update
+            AFTER UPDATE OF {', '.join(REPORT_FILTER_COLUMNS)} ON reports
+            BEGIN {update_body} END
+        ''')
     
-    def _start_incident_reporting_from_menu(self, from_number: str, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
-        """Start incident reporting from menu with TTS"""
+    def init_db_dual_messaging_support(self):
+        """Add dual messaging support to existing database"""
+        conn = sqlite3.connect('hsse_reports.db')
+        cursor = conn.cursor()
         
-        name = user_profile.name or "there"
+        # Check and add dual messaging columns to user_profiles
+        cursor.execute("PRAGMA table_info(user_profiles)")
+        profile_columns = [column[1] for column in cursor.fetchall()]
         
-        # Initialize Laravel reporting session
-        session_data = {
-            'step': 'media',
-            'report_data': {
-                'reporter_name': user_profile.name or 'WhatsApp User',
-                'reporter_contact': from_number,
-                'source': 'whatsapp_chatbot',
-                'report_type': 'incident',
-                'industry': 'General'
-            },
-            'started_at': datetime.datetime.now().isoformat()
+        dual_messaging_columns = {
+            'dual_messaging_enabled': 'BOOLEAN DEFAULT 1',
+            'voice_for_emergencies': 'BOOLEAN DEFAULT 1', 
+            'voice_for_long_messages': 'BOOLEAN DEFAULT 1',
+            'voice_delay_seconds': 'INTEGER DEFAULT 2',
+            'preferred_message_format': 'TEXT DEFAULT "both"'
         }
         
-        self.db.update_user_session(from_number, self.states['WAITING_MEDIA'], session_data)
-        
-        response = f"""🛡️ **Incident Report - {name}** 🛡️
-
-I'll help you quickly report this incident to our Laravel safety dashboard. The process is simple:
-
-**📸 STEP 1: Send photos or videos**
-Send me photos/videos of the incident scene, damage, or any relevant evidence.
-
-**📍 STEP 2: Share your location**  
-Share your location so responders can find you.
-
-**Let's start - please send your photos/videos now! 📱**
-
-*Tip: You can send multiple photos one after another*
-
-Your report will be automatically analyzed by AI and sent to the safety team through our Laravel dashboard! 🚀
-
-Both text and voice guidance will help you through each step."""
+        for column_name, column_def in dual_messaging_columns.items():
+            if column_name not in profile_columns:
+                try:
+                    cursor.execute(f'ALTER TABLE user_profiles ADD COLUMN {column_name} {column_def}')
+                    print(f"Added {column_name} column to user_profiles table")
+                except sqlite3.OperationalError:
+                    pass  # Column might already exist
         
-        # Generate TTS
-        tts_audio_url = None
-        if user_profile.tts_enabled and TTS_ENABLED:
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
+        # Create dual messaging analytics table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS dual_messaging_analytics (
+                id TEXT PRIMARY KEY,
+                phone TEXT,
+                message_id TEXT,
+                text_sent BOOLEAN DEFAULT 0,
+                voice_sent BOOLEAN DEFAULT 0,
+                text_delivery_time_ms INTEGER,
+                voice_delivery_time_ms INTEGER,
+                user_interaction_type TEXT,
+                message_length INTEGER,
+                created_at TEXT
+            )
+        ''')
         
-        return response, tts_audio_url
+        conn.commit()
+        conn.close()
+        print("✅ Dual messaging database support added")
     
-    def _show_emergency_contacts(self, from_number: str, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
-        """Show emergency contacts with TTS"""
-        
-        name = user_profile.name or "there"
+    def migrate_epoch_timestamps(self):
+        """Add integer epoch-millisecond columns next to the ISO timestamps, backfill and index them.
         
-        contacts = f"""🚨 **Emergency Contacts - {name}** 🚨
-
-**GUYANA EMERGENCY SERVICES:**
-🚨 General Emergency: **911**
-🚒 Fire Service: **912**
-🚑 Ambulance: **913**
-👮 Police: **911**
-🏥 Georgetown Hospital: **225-5200**
-
-**WORKPLACE EMERGENCY:**
-📞 Safety Officer: [Contact your safety team]
-🏢 Security: [Your company security]
-🚨 Emergency Assembly Point: [Your designated area]
-
-**IMPORTANT:**
-- Call 911 for life-threatening emergencies
-- Use specific numbers (912/913) for fire/medical
-- Report to dashboard after emergency response
-- This contact list is available in both text and audio
-
-Stay safe, {name}! 🛡️
-
-Type 'MENU' to return to main menu."""
+        ISO strings are local time while SQLite's datetime('now') is UTC, so window queries on the
+        strings were both unindexed and off by the UTC offset. All time windows now use these columns.
+        """
+        conn = sqlite3.connect('hsse_reports.db')
+        conn.create_function('iso_to_epoch_ms', 1, _iso_to_epoch_ms, deterministic=True)
+        cursor = conn.cursor()
         
-        # Generate TTS
-        tts_audio_url = None
-        if user_profile.tts_enabled and TTS_ENABLED:
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(contacts, cache_key='emergency_contacts')
+        for table, columns in EPOCH_TIMESTAMP_COLUMNS.items():
+            cursor.execute(f"PRAGMA table_info({table})")
+            existing_columns = [column[1] for column in cursor.fetchall()]
+            
+            for iso_column, ms_column in columns.items():
+                if ms_column not in existing_columns:
+                    try:
+                        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {ms_column} INTEGER')
+                        print(f"Added {ms_column} column to {table} table")
+                    except sqlite3.OperationalError:
+                        pass  # Column might already exist
+                
+                cursor.execute(f'''
+                    UPDATE {table} SET {ms_column} = iso_to_epoch_ms({iso_column})
+                    WHERE {ms_column} IS NULL AND {iso_column} IS NOT NULL
+                ''')
+                if cursor.rowcount > 0:
+                    print(f"Backfilled {ms_column} for {cursor.rowcount} {table} rows")
+        
+        # Per-phone windows and keyset orders (time + primary key)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversation_turns_phone_ts ON conversation_turns (phone, timestamp_ms)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversation_turns_ts_id ON conversation_turns (timestamp_ms, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversation_turns_thread_ts ON conversation_turns (thread_id, timestamp_ms)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversation_threads_phone_activity ON conversation_threads (phone, last_activity_ms)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversation_threads_start_id ON conversation_threads (start_time_ms, thread_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversation_threads_status_activity ON conversation_threads (status, last_activity_ms)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tts_analytics_created ON tts_analytics (created_at_ms)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tts_analytics_phone_created ON tts_analytics (phone, created_at_ms)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_dual_messaging_analytics_created ON dual_messaging_analytics (created_at_ms)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_dual_messaging_analytics_phone_created ON dual_messaging_analytics (phone, created_at_ms)')
+        
+        # Paginated /reports: newest first, keyset on created_at_ms + id
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_reports_created_ms ON reports (created_at_ms, id)')
+        for column in REPORT_FILTER_COLUMNS:
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_reports_{column}_created_ms ON reports ({column}, created_at_ms, id)')
+        
+        # String-keyed indexes superseded by the epoch ones
+        for index_name in ['idx_reports_created', 'idx_conversation_turns_timestamp', 'idx_conversation_threads_start'] + \
+                          [f'idx_reports_{column}_created' for column in REPORT_FILTER_COLUMNS]:
+            cursor.execute(f'DROP INDEX IF EXISTS {index_name}')
         
-        return contacts, tts_audio_url
+        conn.commit()
+        conn.close()
     
-    def _show_system_status(self, from_number: str, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
-        """Show system status with TTS"""
+    def save_report(self, report: IncidentReport):
+        conn = sqlite3.connect('hsse_reports.db')
+        cursor = conn.cursor()
         
-        # Test Laravel connection
-        laravel_status = "🟢 Connected" 
-        try:
-            test_result = self.laravel_client.test_connection()
-            if not test_result.get('success'):
-                laravel_status = "🔴 Connection Issues"
-        except:
-            laravel_status = "🔴 Offline"
-        
-        # TTS system status
-        tts_engines = []
-        if TTS_AVAILABLE and self.tts_manager.pyttsx3_ready:
-            tts_engines.append("pyttsx3")
-        if GTTS_AVAILABLE:
-            tts_engines.append("gTTS")
-        if OPENAI_API_KEY:
-            tts_engines.append("OpenAI")
+        # Upsert rather than INSERT OR REPLACE so the report triggers see an UPDATE, not a silent delete
+        cursor.execute('''
+            INSERT INTO reports 
+            (id, user_phone, timestamp, incident_type, severity, description, location, 
+             location_lat, location_long, media_urls, status, ai_analysis, created_at, laravel_report_id,
+             location_approximate, created_at_ms, index_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+                    (SELECT COALESCE(MAX(index_key), 0) + 1 FROM reports))
+            ON CONFLICT (id) DO UPDATE SET
+                user_phone = excluded.user_phone, timestamp = excluded.timestamp,
+                incident_type = excluded.incident_type, severity = excluded.severity,
+                description = excluded.description, location = excluded.location,
+                location_lat = excluded.location_lat, location_long = excluded.location_long,
+                media_urls = excluded.media_urls, status = excluded.status,
+                ai_analysis = excluded.ai_analysis, created_at = excluded.created_at,
+                laravel_report_id = excluded.laravel_report_id,
+                location_approximate = excluded.location_approximate,
+                created_at_ms = excluded.created_at_ms
+        ''', (
+            report.id, report.user_phone, report.timestamp, report.incident_type,
+            report.severity, report.description, report.location,
+            report.location_lat, report.location_long,
+            json.dumps(report.media_urls), report.status,
+            json.dumps(report.ai_analysis), report.created_at,
+            report.ai_analysis.get('laravel_report_id'),  # Store Laravel ID
+            report.location_approximate,
+            _iso_to_epoch_ms(report.created_at)
+        ))
         
-        status = f"""📊 **System Status** 📊
-
-**Core Systems:**
-🤖 AI Chatbot: 🟢 Online
-🗄️ Database: 🟢 Connected
-📱 WhatsApp: 🟢 Active
-🚀 Laravel Dashboard: {laravel_status}
-
-**Dual Messaging System:**
-📱 Text Delivery: 🟢 Instant
-🎙️ Voice System: {'🟢 Active' if TTS_ENABLED else '🔴 Disabled'}
-🔧 TTS Engines: {', '.join(tts_engines) if tts_engines else 'None available'}
-💾 Audio Cache: {len(self.tts_manager.audio_cache)} pre-generated phrases
-
-**Your Settings:**
-📢 Dual Messaging: {'🟢 Enabled' if user_profile.tts_enabled else '🔴 Text Only'}
-🎵 Voice: {user_profile.tts_voice_preference.title()}
-⚡ Speed: {user_profile.tts_speed_preference} WPM
-
-**Features Active:**
-✅ Smart Conversation Tracking
-✅ Emergency Detection & Response
-✅ Laravel Dashboard Integration
-✅ Incident Reporting with AI Analysis
-✅ Dual Text+Voice Messaging
-✅ Voice Accessibility Features
-✅ Multi-engine TTS Fallback
-
-All systems operational! 🛡️
-
-Type 'MENU' to return to main menu."""
+        conn.commit()
+        conn.close()
+    
+    def save_local_report(self, local_id: str, phone: str, laravel_report_id: str):
+        conn = sqlite3.connect('hsse_reports.db')
+        cursor = conn.cursor()
         
-        # Generate TTS
-        tts_audio_url = None
-        if user_profile.tts_enabled and TTS_ENABLED:
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(status)
+        cursor.execute('''
+            INSERT OR REPLACE INTO local_reports 
+            (id, user_phone, laravel_report_id, status, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (local_id, phone, laravel_report_id, 'submitted', datetime.datetime.now().isoformat()))
         
-        return status, tts_audio_url
+        conn.commit()
+        conn.close()
     
-    def _show_faq_menu(self, from_number: str, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
-        """Show FAQ menu with TTS"""
-        
-        name = user_profile.name or "there"
+    def get_user_session(self, phone: str):
+        return self.sessions.get(phone)
+    
+    def update_user_session(self, phone: str, state: str, data: dict):
+        self.sessions.set(phone, state, data)
+    
+    def get_user_profile(self, phone: str) -> Optional[UserProfile]:
+        conn = sqlite3.connect('hsse_reports.db')
+        cursor = conn.cursor()
         
-        self.db.update_user_session(from_number, self.states['FAQ_MODE'], {
-            'faq_category': None,
-            'timestamp': datetime.datetime.now().isoformat()
-        })
+        cursor.execute('SELECT * FROM user_profiles WHERE phone = ?', (phone,))
+        result = cursor.fetchone()
+        conn.close()
         
-        faq_menu = f"""❓ **Safety FAQ - {name}** ❓
-
-Choose a category by typing the keyword:
-
-🦺 **PPE** - Personal Protective Equipment
-🔥 **FIRE** - Fire Safety & Prevention
-🧪 **CHEMICAL** - Chemical Safety & Handling
-⚡ **ELECTRICAL** - Electrical Safety
-🚪 **CONFINED** - Confined Space Safety
-💺 **ERGONOMICS** - Workplace Ergonomics
-📚 **TRAINING** - Safety Training & Procedures
-
-💬 *You can also ask me any safety question naturally - I understand regular conversation and will provide detailed answers!*
-
-🎙️ *All FAQ responses include both text and voice for accessibility*
-
-Type a category keyword or ask any safety question!
-
-Type 'MENU' to return to main menu."""
+        if result:
+            # Handle both old and new profile formats
+            profile = UserProfile(
+                phone=result[0],
+                name=result[1],
+                role=result[2],
+                department=result[3],
+                preferred_language=result[4] or 'en',
+                interaction_history=json.loads(result[5]) if result[5] else [],
+                safety_interests=json.loads(result[6]) if result[6] else [],
+                last_active=result[7],
+                # TTS preferences
+                tts_enabled=bool(result[8]) if len(result) > 8 else True,
+                tts_voice_preference=result[9] if len(result) > 9 else 'female',
+                tts_speed_preference=result[10] if len(result) > 10 else 150,
+                # Dual messaging preferences
+                dual_messaging_enabled=bool(result[11]) if len(result) > 11 else True,
+                voice_for_emergencies=bool(result[12]) if len(result) > 12 else True,
+                voice_for_long_messages=bool(result[13]) if len(result) > 13 else True,
+                voice_delay_seconds=result[14] if len(result) > 14 else 2,
+                preferred_message_format=result[15] if len(result) > 15 else 'both'
+            )
+            return profile
+        return None
+    
+    def update_user_profile(self, profile: UserProfile):
+        conn = sqlite3.connect('hsse_reports.db')
+        cursor = conn.cursor()
         
-        # Generate TTS
-        tts_audio_url = None
-        if user_profile.tts_enabled and TTS_ENABLED:
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(faq_menu)
+        # interaction_history is owned by the long-term memory consolidator once the profile exists,
+        # so a profile loaded before a consolidation run can't overwrite what it appended
+        cursor.execute('''
+            INSERT INTO user_profiles 
+            (phone, name, role, department, preferred_language, interaction_history, 
+             safety_interests, last_active, tts_enabled, tts_voice_preference, tts_speed_preference,
+             dual_messaging_enabled, voice_for_emergencies, voice_for_long_messages, 
+             voice_delay_seconds, preferred_message_format)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (phone) DO UPDATE SET
+                name = excluded.name, role = excluded.role, department = excluded.department,
+                preferred_language = excluded.preferred_language, safety_interests = excluded.safety_interests,
+                last_active = excluded.last_active, tts_enabled = excluded.tts_enabled,
+                tts_voice_preference = excluded.tts_voice_preference,
+                tts_speed_preference = excluded.tts_speed_preference,
+                dual_messaging_enabled = excluded.dual_messaging_enabled,
+                voice_for_emergencies = excluded.voice_for_emergencies,
+                voice_for_long_messages = excluded.voice_for_long_messages,
+                voice_delay_seconds = excluded.voice_delay_seconds,
+                preferred_message_format = excluded.preferred_message_format
+        ''', (
+            profile.phone, profile.name, profile.role, profile.department,
+            profile.preferred_language, json.dumps(profile.interaction_history),
+            json.dumps(profile.safety_interests), profile.last_active,
+            profile.tts_enabled, profile.tts_voice_preference, profile.tts_speed_preference,
+            getattr(profile, 'dual_messaging_enabled', True),
+            getattr(profile, 'voice_for_emergencies', True),
+            getattr(profile, 'voice_for_long_messages', True),
+            getattr(profile, 'voice_delay_seconds', 2),
+            getattr(profile, 'preferred_message_format', 'both')
+        ))
         
-        return faq_menu, tts_audio_url
+        conn.commit()
+        conn.close()
     
-    def _handle_faq_interaction(self, from_number: str, message: str, session_data: dict, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
-        """Handle FAQ interactions with TTS"""
+    def get_conversation_context(self, phone: str) -> Dict:
+        conn = sqlite3.connect('hsse_reports.db')
+        cursor = conn.cursor()
         
-        message_upper = message.upper().strip()
+        cursor.execute('SELECT * FROM conversation_context WHERE phone = ?', (phone,))
+        result = cursor.fetchone()
+        conn.close()
         
-        # Check for FAQ categories
-        if message_upper in self.faq_categories:
-            category_name = self.faq_categories[message_upper]
-            
-            # Generate category-specific FAQ response
-            faq_response = self._generate_faq_response(message_upper, category_name, user_profile)
-            
-            # Generate TTS
-            tts_audio_url = None
-            if user_profile.tts_enabled and TTS_ENABLED:
-                tts_audio_url = self.tts_manager.generate_for_dual_messaging(faq_response)
-            
-            return faq_response, tts_audio_url
+        if result:
+            return {
+                'recent_topics': json.loads(result[1]) if result[1] else [],
+                'conversation_style': result[2] or 'professional',
+                'current_mood': result[3] or 'neutral',
+                'expertise_level': result[4] or 'beginner',
+                'last_updated': result[5]
+            }
+        return {
+            'recent_topics': [],
+            'conversation_style': 'professional',
+            'current_mood': 'neutral',
+            'expertise_level': 'beginner',
+            'last_updated': datetime.datetime.now().isoformat()
+        }
+    
+    def update_conversation_context(self, phone: str, context: Dict):
+        conn = sqlite3.connect('hsse_reports.db')
+        cursor = conn.cursor()
         
-        # Handle natural questions
-        else:
-            # Exit FAQ mode and handle as regular conversation
-            self.db.update_user_session(from_number, self.states['CONVERSING'], {})
-            
-            # Process as regular conversation with FAQ context
-            intent_analysis = self.conversation_analyzer.analyze_message_intent(message)
-            
-            response, conversation_metadata = self.conversation_manager.handle_smart_conversation(
-                from_number, message, intent_analysis, user_profile
-            )
-            
-            response += "\n\nType 'FAQ' to return to FAQ menu or 'MENU' for main menu."
-            
-            return response, conversation_metadata.get('tts_audio_url')
+        cursor.execute('''
+            INSERT OR REPLACE INTO conversation_context 
+            (phone, recent_topics, conversation_style, current_mood, expertise_level, last_updated)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            phone,
+            json.dumps(context.get('recent_topics', [])),
+            context.get('conversation_style', 'professional'),
+            context.get('current_mood', 'neutral'),
+            context.get('expertise_level', 'beginner'),
+            datetime.datetime.now().isoformat()
+        ))
+        
+        conn.commit()
+        conn.close()
     
-    def _generate_faq_response(self, category: str, category_name: str, user_profile: UserProfile) -> str:
-        """Generate FAQ response for a specific category"""
+    # TTS analytics methods
+    def save_tts_analytics(self, phone: str, message_length: int, engine_used: str, 
+                          generation_time_ms: int, file_size_bytes: int):
+        """Save TTS analytics data"""
+        now = datetime.datetime.now()
+        conn = sqlite3.connect('hsse_reports.db')
+        cursor = conn.cursor()
         
-        name = user_profile.name or "there"
+        cursor.execute('''
+            INSERT INTO tts_analytics 
+            (id, phone, message_length, tts_engine_used, generation_time_ms, 
+             file_size_bytes, created_at, created_at_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            uuid.uuid4().hex, phone, message_length, engine_used,
+            generation_time_ms, file_size_bytes, now.isoformat(), _epoch_ms(now)
+        ))
         
-        faq_responses = {
-            'PPE': f"""🦺 **Personal Protective Equipment - {name}** 🦺
-
-**Essential PPE for Guyana Workplaces:**
-👷 Hard hats for construction & industrial sites
-🥽 Safety glasses/goggles for eye protection
-👂 Hearing protection in noisy environments
-🧤 Cut-resistant gloves for handling materials
-👢 Steel-toed boots for foot protection
-🦺 High-visibility vests for outdoor work
-
-**PPE Inspection:**
-🔍 Check equipment before each use
-🚫 Replace damaged or worn PPE immediately
-📋 Follow manufacturer guidelines
-🧼 Keep PPE clean and properly stored
+        conn.commit()
+        conn.close()
+    
+    def save_dual_messaging_analytics(self, phone: str, message_data: Dict):
+        """Save dual messaging analytics"""
+        now = datetime.datetime.now()
+        conn = sqlite3.connect('hsse_reports.db')
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO dual_messaging_analytics 
+            (id, phone, message_id, text_sent, voice_sent, text_delivery_time_ms, 
+             voice_delivery_time_ms, user_interaction_type, message_length, created_at, created_at_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            uuid.uuid4().hex, phone, message_data.get('message_id'),
+            message_data.get('text_sent', False), message_data.get('voice_sent', False),
+            message_data.get('text_delivery_time_ms', 0), message_data.get('voice_delivery_time_ms', 0),
+            message_data.get('interaction_type', 'casual'), message_data.get('message_length', 0),
+            now.isoformat(), _epoch_ms(now)
+        ))
+        
+        conn.commit()
+        conn.close()
 
-**Tropical Climate Considerations:**
-🌡️ Choose breathable materials when possible
-💧 Stay hydrated when wearing full PPE
-🧴 Use anti-fog treatments for goggles
-🧽 Clean PPE regularly to prevent bacteria
+class ConversationAggregates:
+    """Running aggregates over a thread's in-memory turn window.
 
-**Legal Requirements:**
-📜 Employers must provide appropriate PPE
-⚖️ Workers must use PPE as required
-📚 Training required for specialized equipment
+    Each turn's contribution (topics, goal, question, engagement points...) is added
+    when the turn is appended and subtracted when the window drops it, so building
+    a conversation context costs the same at turn 20 as at turn 1.
+    """
 
-Need specific PPE guidance for your workplace? Just ask!""",
-            
-            'FIRE': f"""🔥 **Fire Safety & Prevention - {name}** 🔥
+    SENTIMENT_WINDOW = 3
+    QUESTION_WINDOW = 3
+    POSITIVE_SENTIMENTS = ['happy', 'excited']
+    NEGATIVE_SENTIMENTS = ['sad', 'frustrated', 'angry']
 
-**Guyana Fire Emergency Numbers:**
-🚒 Fire Service: **912**
-🚨 Emergency Services: **911**
+    def __init__(self):
+        self.turn_count = 0
+        self.message_length_sum = 0
+        self.question_count = 0
+        self.engagement_sum = 0.0
+        self.personal_info_count = 0
+        self.topic_counts = Counter()
+        self.goal_counts = Counter()
+        self.recent_sentiments = deque(maxlen=self.SENTIMENT_WINDOW)
+        self.recent_questions = deque(maxlen=self.QUESTION_WINDOW)  # (turn id, question text)
+        self.last_turn = None
 
-**Fire Prevention:**
-🚭 No smoking in designated areas
-⚡ Maintain electrical systems properly
-🧴 Store flammable materials safely
-🚪 Keep fire exits clear at all times
-🔥 Hot work permits for welding/cutting
+    @staticmethod
+    def _is_question(turn: ConversationTurn) -> bool:
+        return '?' in turn.user_message
 
-**Fire Response Steps:**
-1️⃣ Sound the alarm immediately
-2️⃣ Call 912 (Fire Service)
-3️⃣ Evacuate using nearest safe exit
-4️⃣ Meet at designated assembly point
-5️⃣ Do NOT re-enter until cleared
+    @staticmethod
+    def _engagement_points(turn: ConversationTurn) -> float:
+        points = 0.0
+        if len(turn.user_message) > 50:
+            points += 0.2
+        if '?' in turn.user_message:
+            points += 0.1
+        if turn.response_quality_score > 0.7:
+            points += 0.1
+        return points
 
-**Fire Extinguisher Types:**
-💧 Water: Paper, wood, fabric fires
-🧯 Foam: Flammable liquid fires
-❄️ CO2: Electrical fires
-🧪 Dry Chemical: Multi-purpose
+    @staticmethod
+    def _has_personal_info(turn: ConversationTurn) -> bool:
+        message_lower = turn.user_message.lower()
+        return 'my name' in message_lower or 'i work' in message_lower
 
-**Tropical Considerations:**
-🌧️ Extra fire risk during dry seasons
-🌱 Vegetation management around buildings
-💧 Ensure water supply for fire fighting
+    @staticmethod
+    def _goal_for_turn(turn: ConversationTurn) -> Optional[str]:
+        if turn.intent == 'report_incident':
+            return 'Report safety incident'
+        elif 'learn' in turn.user_message.lower():
+            return 'Safety learning'
+        elif '?' in turn.user_message:
+            return 'Get information'
+        return None
 
-Remember: GET OUT, STAY OUT, and let professionals handle it!""",
-            
-            'CHEMICAL': f"""🧪 **Chemical Safety & Handling - {name}** 🧪
+    def _apply(self, turn: ConversationTurn, sign: int):
+        self.turn_count += sign
+        self.message_length_sum += sign * len(turn.user_message)
+        self.question_count += sign * self._is_question(turn)
+        self.engagement_sum += sign * self._engagement_points(turn)
+        self.personal_info_count += sign * self._has_personal_info(turn)
+        goal = self._goal_for_turn(turn)
+        for counts, keys in [(self.topic_counts, set(turn.topics)), (self.goal_counts, [goal] if goal else [])]:
+            for key in keys:
+                counts[key] += sign
+                if counts[key] <= 0:
+                    del counts[key]  # Only keys still present in the window are reported
+
+    def add(self, turn: ConversationTurn, evicted: ConversationTurn = None):
+        """Fold a newly appended turn in, and the turn the window dropped (if any) out"""
+        if evicted is not None:
+            self._apply(evicted, -1)
+            if self.recent_questions and self.recent_questions[0][0] == evicted.id:
+                self.recent_questions.popleft()
+
+        self._apply(turn, 1)
+        self.recent_sentiments.append(turn.sentiment)
+        if self._is_question(turn):
+            self.recent_questions.append((turn.id, turn.user_message[:100]))
+        self.last_turn = turn
+
+    def summary(self) -> str:
+        if not self.turn_count:
+            return "No conversation yet."
+        topics = list(self.topic_counts)
+        return f"Discussed: {', '.join(topics[:5])}" if topics else "General conversation"
 
-**Before Working with Chemicals:**
-📋 Read Safety Data Sheets (SDS)
-🦺 Wear appropriate PPE
-🌬️ Ensure adequate ventilation
-🚿 Know location of emergency wash stations
+    def sentiment_trend(self) -> str:
+        if not self.turn_count:
+            return "neutral"
+        positive_count = sum(1 for s in self.recent_sentiments if s in self.POSITIVE_SENTIMENTS)
+        negative_count = sum(1 for s in self.recent_sentiments if s in self.NEGATIVE_SENTIMENTS)
+        if positive_count > negative_count:
+            return "improving"
+        elif negative_count > positive_count:
+            return "declining"
+        return "stable"
 
-**Storage Requirements:**
-❄️ Temperature-controlled storage
-🚫 Separate incompatible chemicals
-🏷️ Proper labeling and dating
-🔒 Secure storage away from unauthorized access
+    def flow(self) -> Dict:
+        return {
+            'total_turns': self.turn_count,
+            'avg_message_length': self.message_length_sum / max(self.turn_count, 1),
+            'question_ratio': self.question_count / max(self.turn_count, 1)
+        }
 
-**Spill Response:**
-⚠️ Alert others and evacuate if necessary
-🧤 Use appropriate PPE for cleanup
-🧽 Follow spill kit procedures
-📞 Report all spills to supervision
+    def engagement_level(self) -> float:
+        if not self.turn_count:
+            return 0.5
+        return min(1.0, self.engagement_sum / self.turn_count)
 
-**Tropical Climate Challenges:**
-🌡️ Heat can increase chemical reactivity
-💧 Humidity affects some chemical properties
-🏢 Ensure climate-controlled storage
-🌀 Hurricane/storm preparedness for chemicals
+    def relationship_opportunities(self) -> List[str]:
+        opportunities = []
+        # Ask about their role if they haven't told us anything personal yet
+        if not self.personal_info_count and self.turn_count > 2:
+            opportunities.append('ask_about_role')
+        return opportunities
 
-**Emergency Contacts:**
-☣️ Chemical Emergency: **911**
-🏥 Poison Control: Contact local hospital
-📞 Company Emergency: [Your safety officer]
+    def smart_follow_ups(self) -> List[str]:
+        if not self.last_turn:
+            return ["How can I help you with workplace safety today?"]
 
-**Disposal:**
-♻️ Follow proper disposal procedures
-🚫 Never pour chemicals down drains
-📋 Keep disposal records
-🌍 Consider environmental impact
+        follow_ups = []
+        if self.last_turn.intent == 'question':
+            follow_ups.append("Do you have any other questions about this topic?")
+        elif 'ppe' in self.last_turn.topics:
+            follow_ups.append("Would you like to know about PPE inspection schedules?")
 
-Always err on the side of caution with chemicals!""",
-            
-            'ELECTRICAL': f"""⚡ **Electrical Safety - {name}** ⚡
+        if not follow_ups:
+            follow_ups = ["What else can I help you with today?"]
+        return follow_ups[:3]
 
-**Electrical Hazards in Guyana:**
-🌧️ Wet conditions increase shock risk
-⛈️ Lightning strikes during storms
-🌡️ Heat affecting electrical equipment
-🐭 Rodents damaging wiring
+    def to_context(self) -> Dict:
+        """The aggregate part of get_conversation_context"""
+        return {
+            'conversation_summary': self.summary(),
+            'topics_discussed': list(self.topic_counts),
+            'user_sentiment_trend': self.sentiment_trend(),
+            'conversation_flow': self.flow(),
+            'user_engagement_level': self.engagement_level(),
+            'unresolved_questions': [question for _, question in self.recent_questions],
+            'relationship_building_opportunities': self.relationship_opportunities(),
+            'conversation_goals': list(self.goal_counts),
+            'suggested_follow_ups': self.smart_follow_ups()
+        }
 
-**Safe Work Practices:**
-🔌 De-energize before working on equipment
-🔒 Lockout/Tagout procedures
-👷 Only qualified electricians do electrical work
-🧤 Use insulated tools and PPE
+class BoundedThreadMemory:
+    """LRU cache of per-thread conversation memory bounded by count, idle time and (optionally) bytes.
+
+    Behaves like the dict it replaces (in, [], get, pop, len). Reads refresh recency,
+    idle entries are dropped lazily on access and writes, and every eviction is
+    counted by reason. Evicted threads are still in the database, so losing one
+    only costs the in-memory context of a conversation that went quiet.
+    """
+
+    def __init__(self, max_threads: int = THREAD_MEMORY_MAX_THREADS,
+                 idle_ttl_seconds: int = THREAD_MEMORY_IDLE_TTL_SECONDS,
+                 max_bytes: int = THREAD_MEMORY_MAX_BYTES):
+        self.max_threads = max(1, max_threads)
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # thread_id -> [value, last_access, estimated_bytes]
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evicted_capacity': 0,
+            'evicted_idle': 0,
+            'evicted_bytes': 0
+        }
 
-**Extension Cord Safety:**
-✅ Inspect before each use
-🚫 Don't run through doorways
-💧 Keep away from water
-⚡ Match cord rating to equipment load
+    def _evict_oldest(self, reason: str):
+        _, entry = self._entries.popitem(last=False)
+        self._total_bytes -= entry[2]
+        self.stats[f'evicted_{reason}'] += 1
+
+    def _enforce_limits(self):
+        """Drop idle entries, then the least recently used ones until within count and byte limits"""
+        if self.idle_ttl_seconds > 0:
+            cutoff = time.monotonic() - self.idle_ttl_seconds
+            while self._entries and next(iter(self._entries.values()))[1] < cutoff:
+                self._evict_oldest('idle')
+
+        while len(self._entries) > self.max_threads:
+            self._evict_oldest('capacity')
+
+        # The most recently used thread always stays, even if it alone exceeds the budget
+        if self.max_bytes > 0:
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                self._evict_oldest('bytes')
+
+    def __contains__(self, thread_id: str) -> bool:
+        return self.get(thread_id, count=False) is not None
+
+    def get(self, thread_id: str, default=None, count: bool = True):
+        with self._lock:
+            self._enforce_limits()
+            entry = self._entries.get(thread_id)
+            if entry is None:
+                if count:
+                    self.stats['misses'] += 1
+                return default
+            entry[1] = time.monotonic()
+            self._entries.move_to_end(thread_id)
+            if count:
+                self.stats['hits'] += 1
+            return entry[0]
+
+    def __getitem__(self, thread_id: str):
+        value = self.get(thread_id)
+        if value is None:
+            raise KeyError(thread_id)
+        return value
+
+    def __setitem__(self, thread_id: str, value):
+        with self._lock:
+            previous = self._entries.pop(thread_id, None)
+            if previous:
+                self._total_bytes -= previous[2]
+            self._entries[thread_id] = [value, time.monotonic(), 0]
+            self._enforce_limits()
+
+    def pop(self, thread_id: str, default=None):
+        with self._lock:
+            entry = self._entries.pop(thread_id, None)
+            if entry is None:
+                return default
+            self._total_bytes -= entry[2]
+            return entry[0]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def resize(self, thread_id: str, estimated_bytes: int):
+        """Record a new size estimate for an entry (after turns were added) and apply the byte budget"""
+        with self._lock:
+            entry = self._entries.get(thread_id)
+            if entry is None:
+                return
+            self._total_bytes += estimated_bytes - entry[2]
+            entry[1] = time.monotonic()
+            entry[2] = estimated_bytes
+            self._entries.move_to_end(thread_id)
+            self._enforce_limits()
+
+    def get_stats(self) -> Dict:
+        """Get cache size and eviction statistics"""
+        with self._lock:
+            return {
+                'threads': len(self._entries),
+                'max_threads': self.max_threads,
+                'estimated_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'idle_ttl_seconds': self.idle_ttl_seconds,
+                **self.stats
+            }
 
-**Ground Fault Protection:**
-🔌 Use GFCI outlets near water
-🧪 Test GFCI devices monthly
-🌧️ Extra important in humid climates
-⚡ Install surge protection
+class InboundMessageQueue:
+    """Durable queue and worker pool for WEBHOOK_MODE=async.
+
+    The webhook only inserts the message into inbound_messages and returns; workers
+    generate the reply and send it through the Twilio REST API. Messages from one
+    phone always go to the same worker so they are answered in order. The reply is
+    stored before it is sent, and a failed send is retried by the same worker after
+    a growing delay - without reprocessing the message, and before that phone's
+    later messages, while other phones on that worker keep being answered. Rows left queued by a previous run are picked up when the pool starts,
+    and a sweeper re-queues rows abandoned mid-processing (e.g. by a worker process
+    that died) every INBOUND_SWEEP_INTERVAL_SECONDS. Every claim counts as an attempt,
+    so a message that keeps killing its worker is marked failed after
+    INBOUND_MAX_ATTEMPTS. Latency is measured from webhook receipt to the REST send.
+    """
+
+    LATENCY_SAMPLE_SIZE = 500
+    RETRY_DELAY_SECONDS = 5
+
+    def __init__(self, chatbot, db_path: str = 'hsse_reports.db', workers: int = WEBHOOK_WORKERS):
+        self.chatbot = chatbot
+        self.db_path = db_path
+        self.queues = [queue.Queue() for _ in range(max(1, workers))]
+        self.delayed = [{} for _ in self.queues]  # Per worker: phone -> [retry_at_ms, pending message ids]
+        self.latencies_ms = deque(maxlen=self.LATENCY_SAMPLE_SIZE)
+        self._lock = threading.Lock()
+        self.started = False
+        self.stats = {
+            'enqueued': 0,
+            'sent': 0,
+            'failed': 0,
+            'retries': 0,
+            'recovered': 0
+        }
 
-**Storm Safety:**
-⛈️ Unplug equipment during storms
-💡 Have backup lighting ready
-📱 Charge devices before outages
-🌳 Stay away from downed power lines
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS inbound_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                message_sid TEXT UNIQUE,
+                from_number TEXT,
+                body TEXT,
+                media_urls TEXT,
+                base_url TEXT,
+                status TEXT DEFAULT 'queued',
+                attempts INTEGER DEFAULT 0,
+                reply_text TEXT,
+                tts_audio_url TEXT,
+                reply_sid TEXT,
+                error TEXT,
+                received_at_ms INTEGER,
+                started_at_ms INTEGER,
+                sent_at_ms INTEGER
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_inbound_messages_status ON inbound_messages (status, received_at_ms)')
+        conn.commit()
+        conn.close()
 
-**Emergency Response:**
-⚡ Electrical Emergency: **911**
-🏥 Electrical shock: Call ambulance (913)
-🔥 Electrical fire: Call fire service (912)
+    def _queue_for(self, from_number: str) -> queue.Queue:
+        return self.queues[zlib.crc32(from_number.encode('utf-8')) % len(self.queues)]
 
-**Power Outage Procedures:**
-📋 Follow emergency lighting protocols
-🔋 Use battery-powered equipment only
-🚫 Don't use candles or open flames
-📞 Report outages to utility company
+    def enqueue(self, message_sid: Optional[str], from_number: str, body: str,
+                media_urls: List[str], base_url: str) -> Optional[int]:
+        """Persist an inbound message and hand it to a worker"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO inbound_messages
+            (message_sid, from_number, body, media_urls, base_url, status, received_at_ms)
+            VALUES (?, ?, ?, ?, ?, 'queued', ?)
+        ''', (message_sid, from_number, body, json.dumps(media_urls), base_url, _epoch_ms()))
+        message_id = cursor.lastrowid if cursor.rowcount else None
+        conn.commit()
+        conn.close()
 
-Remember: When in doubt, turn it off and call an electrician!""",
-            
-            'CONFINED': f"""🚪 **Confined Space Safety - {name}** 🚪
+        if message_id:
+            self._queue_for(from_number).put((message_id, from_number))
+            with self._lock:
+                self.stats['enqueued'] += 1
+        return message_id
 
-**What is a Confined Space?**
-🏗️ Tanks, vessels, silos
-🕳️ Manholes, pits, tunnels
-🏢 Storage bins, vaults
-⛽ Fuel tanks, sewers
+    def start(self):
+        """Start the workers and the sweeper, and re-queue messages a previous run didn't finish"""
+        if self.started:
+            return
+        self.started = True
+        for worker_queue, delayed in zip(self.queues, self.delayed):
+            worker_thread = threading.Thread(target=self._worker, args=(worker_queue, delayed), daemon=True)
+            worker_thread.start()
 
-**Permit Required Spaces:**
-📋 Entry permit system mandatory
-👥 Attendant required outside
-📡 Continuous monitoring required
-🚨 Emergency rescue plan needed
+        recovered = self.requeue_unfinished(include_queued=True)
+        if recovered:
+            print(f"📥 Re-queued {recovered} unfinished inbound messages")
 
-**Atmospheric Hazards:**
-💨 Oxygen deficiency/enrichment
-☠️ Toxic gases (H2S, CO, etc.)
-💥 Flammable vapors
-🌪️ Engulfment hazards
+        def sweeper():
+            while True:
+                time.sleep(INBOUND_SWEEP_INTERVAL_SECONDS)
+                try:
+                    abandoned = self.requeue_unfinished()
+                    if abandoned:
+                        print(f"📥 Re-queued {abandoned} abandoned inbound messages")
+                except Exception as e:
+                    print(f"Inbound message sweeper error: {e}")
 
-**Testing Requirements:**
-🔬 Test atmosphere before entry
-📊 Continuous monitoring during work
-⚡ Test for oxygen, toxics, flammables
-📈 Document all readings
+        threading.Thread(target=sweeper, daemon=True).start()
 
-**Tropical Considerations:**
-🌡️ Heat stress in confined spaces
-💧 Humidity affecting equipment
-🐍 Wildlife hazards in some spaces
-🌧️ Water accumulation risks
+    def requeue_unfinished(self, include_queued: bool = False) -> int:
+        """Hand claims older than INBOUND_PROCESSING_TIMEOUT_SECONDS (and queued rows, at startup) back to the workers"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, from_number FROM inbound_messages
+            WHERE (status = 'queued' AND ?) OR (status = 'processing' AND started_at_ms < ?)
+            ORDER BY received_at_ms
+        ''', (include_queued, _epoch_ms() - INBOUND_PROCESSING_TIMEOUT_SECONDS * 1000))
+        pending = cursor.fetchall()
+        conn.close()
+        for message_id, from_number in pending:
+            self._queue_for(from_number).put((message_id, from_number))
+        with self._lock:
+            self.stats['recovered'] += len(pending)
+        return len(pending)
+
+    def _claim(self, message_id: int) -> Optional[tuple]:
+        """Mark a message as processing; None if another worker or process already has it or it is out of attempts"""
+        now_ms = _epoch_ms()
+        claimable = "id = ? AND (status = 'queued' OR (status = 'processing' AND started_at_ms < ?))"
+        claim_params = (message_id, now_ms - INBOUND_PROCESSING_TIMEOUT_SECONDS * 1000, INBOUND_MAX_ATTEMPTS)
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            UPDATE inbound_messages SET status = 'processing', attempts = attempts + 1, started_at_ms = ?
+            WHERE {claimable} AND attempts < ?
+        ''', (now_ms, *claim_params))
+        claimed = cursor.rowcount
+        row = None
+        given_up = 0
+        if claimed:
+            cursor.execute('''
+                SELECT from_number, body, media_urls, base_url, attempts, reply_text, tts_audio_url, received_at_ms
+                FROM inbound_messages WHERE id = ?
+            ''', (message_id,))
+            row = cursor.fetchone()
+        else:
+            # Every earlier claim died mid-processing (crash, hang, deploy kill) - stop picking it up
+            cursor.execute(f'''
+                UPDATE inbound_messages SET status = 'failed', error = ?
+                WHERE {claimable} AND attempts >= ?
+            ''', (f'Abandoned after {INBOUND_MAX_ATTEMPTS} attempts', *claim_params))
+            given_up = cursor.rowcount
+        conn.commit()
+        conn.close()
 
-**Entry Procedures:**
-1️⃣ Obtain entry permit
-2️⃣ Test atmosphere
-3️⃣ Ventilate space
-4️⃣ Position attendant
-5️⃣ Enter with proper PPE
-6️⃣ Maintain communication
+        if given_up:
+            print(f"❌ Giving up on inbound message {message_id} after {INBOUND_MAX_ATTEMPTS} attempts")
+            with self._lock:
+                self.stats['failed'] += 1
+        return row
 
-**Emergency Response:**
-🚨 Confined Space Emergency: **911**
-👷 Never enter to rescue without proper equipment
-📞 Alert emergency services immediately
+    def _update(self, message_id: int, **fields):
+        assignments = ', '.join(f"{column} = ?" for column in fields)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(f'UPDATE inbound_messages SET {assignments} WHERE id = ?', (*fields.values(), message_id))
+        conn.commit()
+        conn.close()
 
-Never take shortcuts with confined space safety!""",
-            
-            'ERGONOMICS': f"""💺 **Workplace Ergonomics - {name}** 💺
+    def _worker(self, worker_queue: queue.Queue, delayed: Dict[str, list]):
+        """Process this shard's messages in arrival order per phone.
 
-**Common Ergonomic Issues:**
-🖥️ Computer workstation setup
-📦 Manual lifting and handling
-🏭 Repetitive motion tasks
-🚶 Prolonged standing/sitting
+        A phone whose send failed is parked in `delayed` as [retry_at_ms, deque of message ids,
+        failed one first]; its later messages queue up behind the retry while other phones
+        on the shard carry on.
+        """
+        while True:
+            timeout = None
+            if delayed:
+                timeout = max(0, min(retry_at_ms for retry_at_ms, _ in delayed.values()) - _epoch_ms()) / 1000
+            try:
+                message_id, from_number = worker_queue.get(timeout=timeout)
+            except queue.Empty:
+                pass
+            else:
+                try:
+                    if from_number in delayed:
+                        delayed[from_number][1].append(message_id)
+                    else:
+                        self._run_in_order(from_number, deque([message_id]), delayed)
+                finally:
+                    worker_queue.task_done()
+
+            now_ms = _epoch_ms()
+            for from_number in [phone for phone, (retry_at_ms, _) in delayed.items() if retry_at_ms <= now_ms]:
+                self._run_in_order(from_number, delayed.pop(from_number)[1], delayed)
+
+    def _run_in_order(self, from_number: str, pending: deque, delayed: Dict[str, list]):
+        """Process a phone's pending messages until one of them has to wait for a retry"""
+        while pending:
+            message_id = pending[0]
+            try:
+                retry_at_ms = self._process(message_id)
+            except Exception as e:
+                print(f"Inbound message worker error: {e}")
+                retry_at_ms = None
+            if retry_at_ms:
+                delayed[from_number] = [retry_at_ms, pending]
+                return
+            pending.popleft()
+
+    def _process(self, message_id: int) -> Optional[int]:
+        """Claim, answer and send one message; returns when to retry it if the send failed"""
+        row = self._claim(message_id)
+        if not row:
+            return None
+        from_number, body, media_urls, base_url, attempts, reply_text, tts_audio_url, received_at_ms = row
 
-**Workstation Setup:**
-👀 Monitor at eye level
-⌨️ Keyboard and mouse at elbow height
-🪑 Feet flat on floor or footrest
-💡 Adequate lighting to reduce eye strain
+        # Generate once; retries only resend the stored reply
+        if reply_text is None:
+            reply_text, tts_audio_url = _generate_reply(from_number, body or '', json.loads(media_urls or '[]'))
+            self._update(message_id, reply_text=reply_text, tts_audio_url=tts_audio_url)
 
-**Safe Lifting Techniques:**
-🦵 Lift with your legs, not your back
-📦 Keep load close to your body
-🔄 Avoid twisting while lifting
-👥 Get help for heavy items
+        try:
+            message = twilio_client.messages.create(
+                body=reply_text,
+                from_=TWILIO_WHATSAPP_NUMBER,
+                to=from_number
+            )
+        except Exception as e:
+            print(f"❌ Error sending reply for inbound message {message_id}: {e}")
+            if attempts >= INBOUND_MAX_ATTEMPTS:
+                self._update(message_id, status='failed', error=str(e))
+                with self._lock:
+                    self.stats['failed'] += 1
+                return None
+            # Queued again so a restart would pick it up; this worker retries it before the phone's later messages
+            self._update(message_id, status='queued', error=str(e))
+            with self._lock:
+                self.stats['retries'] += 1
+            return _epoch_ms() + self.RETRY_DELAY_SECONDS * attempts * 1000
+
+        sent_at_ms = _epoch_ms()
+        self._update(message_id, status='sent', reply_sid=message.sid, sent_at_ms=sent_at_ms, error=None)
+        with self._lock:
+            self.stats['sent'] += 1
+            self.latencies_ms.append(sent_at_ms - received_at_ms)
+        print(f"📤 Reply sent out of band in {sent_at_ms - received_at_ms} ms: {reply_text[:100]}...")
+
+        _schedule_voice_message(from_number, reply_text, tts_audio_url, base_url)
+        return None
 
-**Tropical Climate Factors:**
-🌡️ Heat stress affects physical capability
-💧 Stay hydrated during physical work
-🌀 Fan placement for air circulation
-❄️ Air conditioning for comfort
+    def get_stats(self) -> Dict:
+        """Queue depth, outcomes and receipt-to-send latency"""
+        with self._lock:
+            latencies = sorted(self.latencies_ms)
+            stats = dict(self.stats)
+        return {
+            **stats,
+            'mode': WEBHOOK_MODE,
+            'workers': len(self.queues),
+            'queue_depth': sum(worker_queue.qsize() for worker_queue in self.queues),
+            'waiting_for_retry': sum(len(pending) for delayed in self.delayed for _, pending in list(delayed.values())),
+            'avg_latency_ms': round(sum(latencies) / len(latencies), 1) if latencies else None,
+            'p95_latency_ms': latencies[int(len(latencies) * 0.95) - 1] if latencies else None
+        }
 
-**Repetitive Strain Prevention:**
-⏰ Take regular breaks
-🤸 Stretch exercises
-🔄 Rotate tasks when possible
-🛠️ Use ergonomic tools
+class LongTermMemoryConsolidator:
+    """Background job folding closed conversation threads into per-user long-term memory.
+
+    A thread is closed once it is past the 2 hour continuation window. Batches of
+    closed threads are claimed in one write transaction (so several workers never
+    fold the same thread twice), their turns are summarized, and the results are
+    merged into user_long_term_memory and appended to the profile's
+    interaction_history. The per-message path then only reads that small record.
+    """
+
+    EXPERTISE_AREAS_MAX = 10
+    TRUST_SMOOTHING = 0.1  # Weight of the newest thread in the trust level moving average
+
+    def __init__(self, db_path: str = 'hsse_reports.db', batch_size: int = LONG_TERM_MEMORY_BATCH_SIZE):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.stats = {
+            'runs': 0,
+            'threads_consolidated': 0,
+            'turns_consolidated': 0,
+            'users_updated': 0,
+            'last_run_at': None
+        }
 
-**Warning Signs:**
-⚠️ Pain or stiffness
-🤲 Numbness or tingling
-💪 Muscle fatigue
-🦴 Joint soreness
+    def consolidate_batch(self) -> int:
+        """Consolidate up to batch_size closed threads; returns how many were folded in"""
+        closed_before_ms = _epoch_ms() - ACTIVE_THREAD_TTL_SECONDS * 1000
 
-**Solutions:**
-🪑 Adjustable furniture
-🛠️ Ergonomic tools
-📚 Training programs
-🏥 Early intervention
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT thread_id, phone, start_time, conversation_type
+                FROM conversation_threads
+                WHERE status = 'active' AND last_activity_ms < ?
+                ORDER BY last_activity_ms
+                LIMIT ?
+            ''', (closed_before_ms, self.batch_size))
+            threads = cursor.fetchall()
+            if not threads:
+                conn.rollback()
+                return 0
+
+            thread_ids = [thread[0] for thread in threads]
+            placeholders = ', '.join('?' * len(thread_ids))
+            cursor.execute(f'''
+                SELECT thread_id, user_message, intent, topics, sentiment, response_quality_score
+                FROM conversation_turns
+                WHERE thread_id IN ({placeholders})
+            ''', thread_ids)
+            turns_by_thread = {}
+            for row in cursor.fetchall():
+                turns_by_thread.setdefault(row[0], []).append(row)
+
+            users = {}
+            for thread_id, phone, start_time, conversation_type in threads:
+                turns = turns_by_thread.get(thread_id, [])
+                summary = self._summarize_thread(turns)
+                users.setdefault(phone, []).append((thread_id, start_time, conversation_type, summary))
+
+                cursor.execute('''
+                    UPDATE conversation_threads
+                    SET status = 'consolidated', key_topics_discussed = ?, conversation_satisfaction_score = ?
+                    WHERE thread_id = ?
+                ''', (json.dumps(summary['top_topics']), summary['avg_quality'], thread_id))
+                self.stats['turns_consolidated'] += len(turns)
+
+            for phone, phone_threads in users.items():
+                self._merge_into_long_term_memory(cursor, phone, [summary for *_, summary in phone_threads])
+                self._append_interaction_history(cursor, phone, phone_threads)
 
-Report ergonomic concerns early - prevention is better than treatment!""",
-            
-            'TRAINING': f"""📚 **Safety Training & Procedures - {name}** 📚
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
 
-**Required Training Programs:**
-🆔 New employee orientation
-🦺 PPE training and fit testing
-🔥 Fire safety and evacuation
-🩺 First aid and CPR
-🧪 Chemical safety (if applicable)
+        self.stats['threads_consolidated'] += len(threads)
+        self.stats['users_updated'] += len(users)
+        return len(threads)
+
+    def run_pending(self) -> int:
+        """Consolidate batches until no closed threads are left"""
+        total = 0
+        while True:
+            consolidated = self.consolidate_batch()
+            total += consolidated
+            if consolidated < self.batch_size:
+                break
+        self.stats['runs'] += 1
+        self.stats['last_run_at'] = datetime.datetime.now().isoformat()
+        return total
 
-**Guyana-Specific Training:**
-🌀 Hurricane/tropical storm procedures
-🐍 Local wildlife safety awareness
-🌡️ Heat stress prevention
-🌧️ Wet weather safety protocols
+    @staticmethod
+    def _summarize_thread(turns: List[tuple]) -> Dict:
+        topic_counts = Counter()
+        sentiments = Counter()
+        message_length = 0
+        questions = 0
+        quality_sum = 0.0
+        for _, user_message, intent, topics, sentiment, quality in turns:
+            topic_counts.update(json.loads(topics) if topics else [])
+            sentiments[sentiment or 'neutral'] += 1
+            message_length += len(user_message or '')
+            questions += '?' in (user_message or '')
+            quality_sum += quality if quality is not None else 0.5
+
+        turn_count = len(turns)
+        return {
+            'turns': turn_count,
+            'topic_counts': dict(topic_counts),
+            'top_topics': [topic for topic, _ in topic_counts.most_common(3)],
+            'sentiments': dict(sentiments),
+            'message_length': message_length,
+            'questions': questions,
+            'avg_quality': round(quality_sum / turn_count, 3) if turn_count else 0.5
+        }
 
-**Training Documentation:**
-📋 Keep training records current
-✅ Track certification expiration dates
-📝 Document refresher training
-🏆 Recognize safety achievements
+    def _merge_into_long_term_memory(self, cursor, phone: str, summaries: List[Dict]):
+        cursor.execute('''
+            SELECT expertise_areas, trust_level, engagement_patterns
+            FROM user_long_term_memory WHERE phone = ?
+        ''', (phone,))
+        result = cursor.fetchone()
 
-**Competency Assessment:**
-✅ Practical demonstrations
-📝 Written assessments
-👥 Peer observations
-📊 Regular evaluations
+        trust_level = result[1] if result and result[1] is not None else 0.5
+        patterns = json.loads(result[2]) if result and result[2] else {}
+        topic_counts = Counter(patterns.get('topic_counts', {}))
+        sentiments = Counter(patterns.get('sentiments', {}))
+        threads = patterns.get('threads', 0)
+        turns = patterns.get('turns', 0)
+        message_length = patterns.get('message_length', 0)
+        questions = patterns.get('questions', 0)
+
+        for summary in summaries:
+            topic_counts.update(summary['topic_counts'])
+            sentiments.update(summary['sentiments'])
+            threads += 1
+            turns += summary['turns']
+            message_length += summary['message_length']
+            questions += summary['questions']
+            if summary['turns']:
+                trust_level += self.TRUST_SMOOTHING * (summary['avg_quality'] - trust_level)
+
+        patterns = {
+            'threads': threads,
+            'turns': turns,
+            'message_length': message_length,
+            'questions': questions,
+            'avg_message_length': round(message_length / max(turns, 1), 1),
+            'question_ratio': round(questions / max(turns, 1), 3),
+            'topic_counts': dict(topic_counts),
+            'sentiments': dict(sentiments)
+        }
+        expertise_areas = [topic for topic, _ in topic_counts.most_common(self.EXPERTISE_AREAS_MAX)]
 
-**Training Methods:**
-🎓 Classroom instruction
-🎮 Interactive simulations
-👷 Hands-on practice
-📱 Online modules
-🎥 Video demonstrations
+        cursor.execute('''
+            INSERT INTO user_long_term_memory
+            (phone, expertise_areas, preferred_conversation_style, trust_level, engagement_patterns, last_updated)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (phone) DO UPDATE SET
+                expertise_areas = excluded.expertise_areas,
+                preferred_conversation_style = excluded.preferred_conversation_style,
+                trust_level = excluded.trust_level,
+                engagement_patterns = excluded.engagement_patterns,
+                last_updated = excluded.last_updated
+        ''', (phone, json.dumps(expertise_areas), self._preferred_style(patterns),
+              round(min(1.0, max(0.0, trust_level)), 3), json.dumps(patterns),
+              datetime.datetime.now().isoformat()))
 
-**Refresher Training:**
-📅 Annual safety updates
-🔄 Incident-based training
-🆕 New procedure training
-🏆 Continuous improvement
+    @staticmethod
+    def _preferred_style(patterns: Dict) -> str:
+        sentiments = patterns['sentiments']
+        upbeat = sum(sentiments.get(sentiment, 0) for sentiment in ConversationAggregates.POSITIVE_SENTIMENTS)
+        if patterns['avg_message_length'] > 120:
+            return 'detailed'
+        if upbeat > patterns['turns'] / 2:
+            return 'friendly'
+        return 'professional'
+
+    def _append_interaction_history(self, cursor, phone: str, phone_threads: List[tuple]):
+        cursor.execute('SELECT interaction_history FROM user_profiles WHERE phone = ?', (phone,))
+        result = cursor.fetchone()
+        if not result:
+            return
 
-**Training Resources:**
-📚 Safety manuals
-🎥 Training videos
-🌐 Online courses
-👨‍🏫 External trainers
-🏢 Internal expertise
+        history = json.loads(result[0]) if result[0] else []
+        for thread_id, start_time, conversation_type, summary in phone_threads:
+            history.append({
+                'thread_id': thread_id,
+                'date': start_time,
+                'conversation_type': conversation_type,
+                'turns': summary['turns'],
+                'topics': summary['top_topics']
+            })
+        cursor.execute('UPDATE user_profiles SET interaction_history = ? WHERE phone = ?',
+                       (json.dumps(history[-INTERACTION_HISTORY_MAX:]), phone))
 
-**Record Keeping:**
-📁 Individual training files
-📊 Training matrices
-📅 Schedule tracking
-✅ Compliance monitoring
+    def start(self, interval_seconds: int = LONG_TERM_MEMORY_INTERVAL_SECONDS):
+        """Start background task to consolidate closed threads"""
+        def consolidation_worker():
+            while True:
+                try:
+                    time.sleep(interval_seconds)
+                    consolidated = self.run_pending()
+                    if consolidated:
+                        print(f"🧠 Consolidated {consolidated} closed threads into long-term memory")
+                except Exception as e:
+                    print(f"Long-term memory consolidation error: {e}")
+
+        consolidation_thread = threading.Thread(target=consolidation_worker, daemon=True)
+        consolidation_thread.start()
+
+    def get_stats(self) -> Dict:
+        """Get consolidation statistics"""
+        return dict(self.stats)
+
+class ThreadSummarizer:
+    """Background job compressing long conversation threads into a short stored summary.
+
+    Once a thread passes THREAD_SUMMARY_MIN_TURNS, its turns are summarized onto
+    conversation_threads.conversation_summary and refreshed every
+    THREAD_SUMMARY_REFRESH_TURNS turns (summary_turn_count records how many turns
+    the summary covers). The prompt carries this summary instead of the history,
+    so its size no longer depends on how long the conversation has run.
+
+    Modes: 'extractive' picks the most representative user messages locally;
+    'llm' folds the new turns into the previous summary with one small completion
+    and falls back to extractive if the call fails.
+    """
+
+    KEY_POINTS = 3
+    KEY_POINT_MAX_CHARS = 160
+    STOP_WORDS = {
+        'the', 'and', 'for', 'are', 'but', 'not', 'you', 'your', 'with', 'this', 'that', 'have',
+        'what', 'how', 'can', 'about', 'there', 'they', 'was', 'were', 'will', 'would', 'should',
+        'could', 'from', 'our', 'who', 'when', 'where', 'which', 'does', 'did', 'been', 'any',
+        'all', 'its', 'just', 'also', 'then', 'than', 'them', 'some', 'need', 'know', 'please',
+        'thanks', 'thank', 'hello', 'hi', 'hey', 'yes', 'okay', 'get', 'got', 'like', 'want'
+    }
 
-Invest in training - it's the foundation of workplace safety!"""
-        }
-        
-        return faq_responses.get(category, f"Information about {category_name} is being updated. Please contact your safety officer for specific guidance.")
-    
-    # Laravel incident reporting methods
-    def _start_laravel_incident_reporting(self, from_number: str, intent_analysis: Dict, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
-        """Start Laravel-integrated incident reporting with TTS"""
-        
-        name = user_profile.name or "there"
-        
-        # Initialize Laravel reporting session
-        session_data = {
-            'step': 'media',
-            'report_data': {
-                'reporter_name': user_profile.name or 'WhatsApp User',
-                'reporter_contact': from_number,
-                'source': 'whatsapp_chatbot',
-                'report_type': 'incident',
-                'industry': 'General'
-            },
-            'started_at': datetime.datetime.now().isoformat()
+    def __init__(self, shared_state: SharedStateBackend, mode: str = THREAD_SUMMARY_MODE,
+                 db_path: str = 'hsse_reports.db'):
+        self.shared_state = shared_state
+        self.mode = mode if mode in ('extractive', 'llm') else 'extractive'
+        self.db_path = db_path
+        self.stats = {
+            'summaries_written': 0,
+            'extractive_summaries': 0,
+            'llm_summaries': 0,
+            'llm_failures': 0,
+            'last_run_at': None
         }
-        
-        self.db.update_user_session(from_number, self.states['WAITING_MEDIA'], session_data)
-        
-        response = f"""🛡️ **Incident Report - {name}** 🛡️
 
-I'll help you quickly report this incident to our Laravel safety dashboard with dual messaging support.
+    def summarize_pending(self, batch_size: int = THREAD_SUMMARY_BATCH_SIZE) -> int:
+        """Summarize active threads that have outgrown their stored summary; returns how many"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        cursor = conn.cursor()
+        try:
+            # Only threads still inside the continuation window can reach the prompt again
+            cursor.execute('''
+                SELECT thread_id, total_turns, COALESCE(summary_turn_count, 0), conversation_summary
+                FROM conversation_threads
+                WHERE status = 'active' AND last_activity_ms > ?
+                  AND total_turns >= ? AND total_turns - COALESCE(summary_turn_count, 0) >= ?
+                LIMIT ?
+            ''', (_epoch_ms() - ACTIVE_THREAD_TTL_SECONDS * 1000, THREAD_SUMMARY_MIN_TURNS,
+                  THREAD_SUMMARY_REFRESH_TURNS, batch_size))
+            threads = cursor.fetchall()
+
+            summarized = 0
+            for thread_id, total_turns, summary_turn_count, previous_summary in threads:
+                summary = self._summarize_thread(cursor, thread_id, summary_turn_count, total_turns,
+                                                 previous_summary or '')
+                # Another worker may have summarized the same turns meanwhile; first writer wins
+                cursor.execute('''
+                    UPDATE conversation_threads SET conversation_summary = ?, summary_turn_count = ?
+                    WHERE thread_id = ? AND COALESCE(summary_turn_count, 0) = ?
+                ''', (summary, total_turns, thread_id, summary_turn_count))
+                conn.commit()
+                if cursor.rowcount:
+                    # Workers holding the thread in memory reload it with the new summary
+                    self.shared_state.incr(f'thread_version:{thread_id}')
+                    summarized += 1
+        finally:
+            conn.close()
 
-**📸 STEP 1: Send photos or videos**
-Send me photos/videos of the incident scene, damage, or any relevant evidence.
+        self.stats['summaries_written'] += summarized
+        self.stats['last_run_at'] = datetime.datetime.now().isoformat()
+        return summarized
 
-**📍 STEP 2: Share your location**  
-Share your location so responders can find you.
+    def _summarize_thread(self, cursor, thread_id: str, summary_turn_count: int, total_turns: int,
+                          previous_summary: str) -> str:
+        if self.mode == 'llm':
+            try:
+                new_turns = self._load_turns(cursor, thread_id, summary_turn_count, total_turns)
+                summary = self._llm_summary(previous_summary, new_turns)
+                self.stats['llm_summaries'] += 1
+                return summary
+            except Exception as e:
+                self.stats['llm_failures'] += 1
+                print(f"Thread summary LLM error, using extractive summary: {e}")
 
-**Let's start - please send your photos/videos now! 📱**
+        self.stats['extractive_summaries'] += 1
+        return self._extractive_summary(self._load_turns(cursor, thread_id, 0, total_turns))
 
-*Tip: You can send multiple photos one after another*
+    @staticmethod
+    def _load_turns(cursor, thread_id: str, after_turn: int, upto_turn: int) -> List[tuple]:
+        cursor.execute('''
+            SELECT user_message, bot_response, topics
+            FROM conversation_turns
+            WHERE thread_id = ? AND turn_number > ? AND turn_number <= ?
+            ORDER BY timestamp_ms
+        ''', (thread_id, after_turn, upto_turn))
+        return cursor.fetchall()
+
+    def _extractive_summary(self, turns: List[tuple]) -> str:
+        """Topics plus the user messages whose words recur most across the thread"""
+        topic_counts = Counter()
+        word_counts = Counter()
+        candidates = []
+        for user_message, _, topics in turns:
+            topic_counts.update(json.loads(topics) if topics else [])
+            for sentence in re.split(r'(?<=[.!?])\s+', (user_message or '').strip()):
+                words = [word for word in re.findall(r"[a-z']+", sentence.lower())
+                         if len(word) > 2 and word not in self.STOP_WORDS]
+                if words:
+                    word_counts.update(set(words))
+                    candidates.append((len(candidates), sentence, words))
+
+        scored = sorted(candidates, key=lambda item: sum(word_counts[word] for word in item[2]) / len(item[2]),
+                        reverse=True)
+        chosen = []
+        for position, sentence, words in scored:
+            # Skip restatements of a point already picked
+            word_set = set(words)
+            if any(len(word_set & other) / len(word_set | other) > 0.6 for _, _, other in chosen):
+                continue
+            chosen.append((position, sentence, word_set))
+            if len(chosen) == self.KEY_POINTS:
+                break
+        key_points = [sentence[:self.KEY_POINT_MAX_CHARS] for _, sentence, _ in sorted(chosen)]
 
-Your report will be:
-🤖 Automatically analyzed by AI
-📊 Sent to the Laravel safety dashboard
-🎙️ Confirmed with both text and voice messages
+        parts = []
+        if topic_counts:
+            parts.append(f"Topics: {', '.join(topic for topic, _ in topic_counts.most_common(5))}.")
+        if key_points:
+            parts.append(f"User raised: {' | '.join(key_points)}")
+        return ' '.join(parts)[:THREAD_SUMMARY_MAX_CHARS]
 
-Both visual and audio guidance will help you through each step."""
-        
-        # Generate TTS
-        tts_audio_url = None
-        if user_profile.tts_enabled and TTS_ENABLED:
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
-        
-        return response, tts_audio_url
+    @staticmethod
+    def _llm_summary(previous_summary: str, turns: List[tuple]) -> str:
+        transcript = '\n'.join(f"User: {(user_message or '')[:300]}\nARIA: {(bot_response or '')[:300]}"
+                               for user_message, bot_response, _ in turns)
+        prompt = f"""
+        Update the running summary of this HSSE safety conversation with the new exchanges.
+        Keep the user's goals, safety concerns, open questions and advice already given.
+        Reply with the summary only, at most {THREAD_SUMMARY_MAX_CHARS} characters.
+        
+        CURRENT SUMMARY: {previous_summary or 'None yet'}
+        
+        NEW EXCHANGES:
+        {transcript}
+        """
+
+        response = resilient_openai.chat_completion(
+            'summary',
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=200,
+            temperature=0.2
+        )
+        return response.choices[0].message.content.strip()[:THREAD_SUMMARY_MAX_CHARS]
+
+    def start(self, interval_seconds: int = THREAD_SUMMARY_INTERVAL_SECONDS):
+        """Start background task to summarize long threads"""
+        def summary_worker():
+            while True:
+                try:
+                    time.sleep(interval_seconds)
+                    self.summarize_pending()
+                except Exception as e:
+                    print(f"Thread summary error: {e}")
+
+        summary_thread = threading.Thread(target=summary_worker, daemon=True)
+        summary_thread.start()
+
+    def get_stats(self) -> Dict:
+        """Get summarizer statistics"""
+        return {'mode': self.mode, **self.stats}
+
+class EnhancedConversationTracker:
+    """Advanced conversation tracking with memory and continuity"""
     
-    def _handle_laravel_incident_reporting(self, from_number: str, message: str, media_urls: List[str],
-                                         current_state: str, session_data: dict, intent_analysis: Dict) -> Tuple[str, Optional[str]]:
-        """Handle Laravel-integrated incident reporting flow with TTS"""
-        
-        user_profile = self.db.get_user_profile(from_number)
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self.shared_state = db_manager.shared_state
+        self.active_threads = OrderedDict()  # phone -> (active thread pointer, cached_at) - checked before shared state/SQLite
+        self._active_threads_lock = threading.Lock()
+        self.conversation_memory = BoundedThreadMemory()  # In-memory cache for active conversations
+        self.max_memory_turns = 20  # Keep last 20 turns in memory
+        self.memory_stats = {
+            'memory_hits': 0,
+            'stale_reloads': 0,
+            'rehydrations': 0,
+            'rehydrated_turns': 0,
+            'new_threads': 0,
+            'active_index_hits': 0,
+            'active_index_misses': 0
+        }
         
-        if current_state == self.states['WAITING_MEDIA']:
-            response, tts_audio_url = self._handle_media_submission_laravel(from_number, message, media_urls, session_data, user_profile)
-        elif current_state == self.states['WAITING_LOCATION']:
-            response, tts_audio_url = self._handle_location_submission_laravel(from_number, message, session_data, user_profile)
-        elif current_state == self.states['CONFIRMING_REPORT']:
-            response, tts_audio_url = self._handle_report_confirmation_laravel(from_number, message, session_data, user_profile)
-        else:
-            response = "I'm having trouble with the reporting process. Let me reset this for you. Type 'REPORT' to start a new incident report."
-            tts_audio_url = None
-            if user_profile and user_profile.tts_enabled and TTS_ENABLED:
-                tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
+    def start_conversation_thread(self, phone: str, initial_message: str, 
+                                conversation_type: str = 'casual') -> str:
+        """Start a new conversation thread or continue existing one"""
         
-        return response, tts_audio_url
-    
-    def _handle_media_submission_laravel(self, from_number: str, message: str, 
-                                       media_urls: List[str], session_data: dict, 
-                                       user_profile: UserProfile) -> Tuple[str, Optional[str]]:
-        """Handle media file submission for Laravel with TTS"""
+        # Check if there's a recent active thread (within last 2 hours)
+        recent_thread = self._get_recent_active_thread(phone)
         
-        if not media_urls:
-            response = (
-                "📸 **I need photos or videos to complete your report.**\n\n"
-                "Please send:\n"
-                "🔸 Photos of the incident scene\n"
-                "🔸 Videos showing what happened\n"
-                "🔸 Images of any damage or injuries (if safe to take)\n\n"
-                "📱 Just attach them to your next message!\n\n"
-                "🎙️ Voice guidance: After you send the photos, I'll guide you through sharing your location."
-            )
+        if recent_thread and self._should_continue_thread(recent_thread, initial_message):
+            # Continue existing thread
+            thread_id = recent_thread['thread_id']
+            conversation_type = recent_thread.get('conversation_type') or conversation_type
+            self._update_thread_activity(thread_id)
+            is_new_thread = False
         else:
-            # Save media URLs to session
-            if 'media_files' not in session_data['report_data']:
-                session_data['report_data']['media_files'] = []
-            
-            for url in media_urls:
-                session_data['report_data']['media_files'].append({
-                    'url': url,
-                    'type': 'image' if any(ext in url.lower() for ext in ['.jpg', '.jpeg', '.png']) else 'video',
-                    'uploaded_at': datetime.datetime.now().isoformat()
-                })
-            
-            # Move to location step
-            self.db.update_user_session(from_number, self.states['WAITING_LOCATION'], session_data)
-            
-            response = (
-                f"✅ **Excellent! I received {len(media_urls)} file(s).**\n\n"
-                "📍 **STEP 2: Share your location**\n\n"
-                "Please share your location by:\n"
-                "🔸 Using WhatsApp's location sharing button\n"
-                "🔸 Or typing coordinates like: `6.8013, -58.1551`\n"
-                "🔸 Or describe where you are (I'll help find coordinates)\n\n"
-                "This helps emergency responders reach you quickly! 🚨\n\n"
-                "🎙️ You'll receive both text confirmation and voice guidance for the next step."
-            )
+            # Start new thread
+            thread_id = f"{phone.replace('whatsapp:', '')}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            self._create_new_thread(phone, thread_id, conversation_type)
+            is_new_thread = True
         
-        # Generate TTS
-        tts_audio_url = None
-        if user_profile and user_profile.tts_enabled and TTS_ENABLED:
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
+        self._set_active_thread(phone, thread_id, conversation_type, datetime.datetime.now().isoformat())
         
-        return response, tts_audio_url
+        # Initialize in-memory conversation for this thread (a new thread has no history to load)
+        self._get_thread_memory(thread_id, phone, load_history=not is_new_thread)
+        
+        return thread_id
     
-    def _handle_location_submission_laravel(self, from_number: str, message: str, 
-                                          session_data: dict, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
-        """Handle location submission for Laravel with TTS"""
+    def _get_thread_memory(self, thread_id: str, phone: str, load_history: bool = True) -> Dict:
+        """Return a thread's in-memory conversation, rehydrating it from SQLite on a miss.
         
-        # Try to extract coordinates
-        lat, lng = self.location_parser.extract_coordinates(message)
+        After a restart, a worker recycle or a request landing on another worker the
+        thread is not in memory yet; its last turns are reloaded with one indexed query
+        so the prompt keeps its history. The shared thread version tells us when
+        another worker has added turns since we loaded ours.
+        """
+        version = self.shared_state.get_version(f'thread_version:{thread_id}')
+        
+        memory_context = self.conversation_memory.get(thread_id)
+        if memory_context is not None:
+            if memory_context['version'] == version:
+                self.memory_stats['memory_hits'] += 1
+                return memory_context
+            self.memory_stats['stale_reloads'] += 1
+            self.conversation_memory.pop(thread_id)
+            load_history = True
+        
+        memory_context = {
+            'version': version,
+            'turns': deque(maxlen=self.max_memory_turns),
+            'aggregates': ConversationAggregates(),
+            'context': self._load_conversation_context(thread_id) if load_history else {},
+            'user_state': self._load_user_state(phone)
+        }
         
-        if lat and lng:
-            # Save coordinates
-            session_data['report_data']['location_lat'] = lat
-            session_data['report_data']['location_long'] = lng
-            session_data['report_data']['location_description'] = f"Coordinates: {lat}, {lng}"
+        if load_history:
+            history = self._load_recent_turns(thread_id, min(THREAD_REHYDRATE_TURNS, self.max_memory_turns))
+            for turn in history:
+                self._append_to_memory(memory_context, turn)
+            self.memory_stats['rehydrations'] += 1
+            self.memory_stats['rehydrated_turns'] += len(history)
         else:
-            # Use the message as location description
-            session_data['report_data']['location_description'] = message
-            # Set default coordinates for Georgetown, Guyana
-            session_data['report_data']['location_lat'] = 6.8013
-            session_data['report_data']['location_long'] = -58.1551
+            self.memory_stats['new_threads'] += 1
         
-        # Move to confirmation
-        self.db.update_user_session(from_number, self.states['CONFIRMING_REPORT'], session_data)
+        self.conversation_memory[thread_id] = memory_context
+        self.conversation_memory.resize(thread_id, self._estimate_memory_bytes(memory_context))
+        return memory_context
+    
+    def _append_to_memory(self, memory_context: Dict, turn: ConversationTurn):
+        """Append a turn to the in-memory window, keeping the aggregates in step"""
+        turns = memory_context['turns']
+        evicted = turns[0] if len(turns) == turns.maxlen else None
+        turns.append(turn)
+        self._update_memory_context(memory_context, turn, evicted)
+    
+    def track_conversation_turn(self, phone: str, thread_id: str, user_message: str, 
+                              bot_response: str, intent_analysis: Dict, 
+                              context_used: Dict, tts_audio_url: str = None) -> str:
+        """Track a complete conversation turn with rich metadata and TTS"""
         
-        # Show confirmation
-        report_data = session_data['report_data']
-        media_count = len(report_data.get('media_files', []))
-        location = report_data.get('location_description', 'Location provided')
+        turn_id = f"{thread_id}_turn_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
         
-        response = f"""📋 **Report Ready for Laravel Dashboard Submission**
-
-**📸 Media:** {media_count} file(s) attached
-**📍 Location:** {location}
-**⏰ Time:** {datetime.datetime.now().strftime('%B %d, %Y at %I:%M %p')}
-**🚀 Destination:** Laravel Safety Dashboard
-**🤖 AI Analysis:** Will be automatically generated
-
-**Reply with:**
-✅ **"SUBMIT"** - to submit this report to the dashboard
-❌ **"CANCEL"** - to cancel and start over
-
-Your report will be automatically analyzed by AI and immediately sent to the safety team dashboard! 🛡️
-
-🎙️ Both text and voice confirmations will be provided after submission."""
-        
-        # Generate TTS
-        tts_audio_url = None
-        if user_profile and user_profile.tts_enabled and TTS_ENABLED:
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
-        
-        return response, tts_audio_url
-    
-    def _handle_report_confirmation_laravel(self, from_number: str, message: str, 
-                                          session_data: dict, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
-        """Handle report confirmation for Laravel submission with TTS"""
-        
-        message_upper = message.upper().strip()
-        
-        if message_upper == "CANCEL":
-            self.db.update_user_session(from_number, self.states['CONVERSING'], {})
-            response = "❌ Report cancelled. Type 'REPORT' anytime to start a new incident report.\n\n🎙️ This cancellation is confirmed in both text and voice."
-        elif message_upper == "SUBMIT":
-            response, tts_audio_url = self._submit_report_to_laravel(from_number, session_data, user_profile)
-            return response, tts_audio_url
-        else:
-            response = (
-                "Please respond with:\n"
-                "✅ **SUBMIT** - to submit your report to the Laravel dashboard\n"
-                "❌ **CANCEL** - to cancel this report\n\n"
-                "🎙️ Voice guidance: Your choice will be confirmed in both text and audio."
-            )
+        # Analyze this turn
+        turn_analysis = self._analyze_conversation_turn(
+            user_message, bot_response, intent_analysis, context_used
+        )
         
-        # Generate TTS
-        tts_audio_url = None
-        if user_profile and user_profile.tts_enabled and TTS_ENABLED:
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
+        # Create conversation turn object
+        turn = ConversationTurn(
+            id=turn_id,
+            user_message=user_message,
+            bot_response=bot_response,
+            timestamp=datetime.datetime.now().isoformat(),
+            intent=intent_analysis.get('primary_intent', 'unknown'),
+            topics=intent_analysis.get('key_topics', []),
+            sentiment=intent_analysis.get('emotional_tone', 'neutral'),
+            context_used=self._compact_context(context_used),
+            response_quality_score=turn_analysis['quality_score'],
+            user_satisfaction_indicators=turn_analysis['satisfaction_indicators'],
+            tts_audio_url=tts_audio_url,
+            tts_generated=bool(tts_audio_url),
+            intent_source=intent_analysis.get('intent_source', 'llm')
+        )
         
-        return response, tts_audio_url
-    
-    def _submit_report_to_laravel(self, from_number: str, session_data: dict, 
-                                user_profile: UserProfile) -> Tuple[str, Optional[str]]:
-        """Submit report to Laravel backend with enhanced data and TTS"""
+        # Store in memory
+        memory_context = self._get_thread_memory(thread_id, phone)
+        self._append_to_memory(memory_context, turn)
+        self.conversation_memory.resize(thread_id, self._estimate_memory_bytes(memory_context))
         
-        try:
-            report_data = session_data['report_data']
-            
-            # Enhance report data with AI analysis and Laravel-compatible format
-            enhanced_data = self._enhance_report_for_laravel(report_data)
-            
-            # Submit to Laravel
-            result = self.laravel_client.submit_report(enhanced_data)
-            
-            if result.get('success'):
-                # Save local reference
-                local_id = uuid.uuid4().hex
-                laravel_report_id = result.get('data', {}).get('id')
-                
-                if laravel_report_id:
-                    self.db.save_local_report(local_id, from_number, str(laravel_report_id))
-                
-                # Also save to local database with Laravel ID
-                incident_report = IncidentReport(
-                    id=local_id,
-                    user_phone=from_number,
-                    timestamp=enhanced_data.get('date_of_incident', datetime.datetime.now().isoformat()),
-                    incident_type=enhanced_data.get('incident_type', 'other'),
-                    severity=enhanced_data.get('severity', 'medium'),
-                    description=enhanced_data.get('description', ''),
-                    location=enhanced_data.get('location_description', ''),
-                    location_lat=enhanced_data.get('location_lat'),
-                    location_long=enhanced_data.get('location_long'),
-                    media_urls=enhanced_data.get('media_files', []),
-                    status='submitted_to_laravel',
-                    ai_analysis={'laravel_report_id': laravel_report_id, 'submission_result': result},
-                    created_at=datetime.datetime.now().isoformat()
-                )
-                
-                self.db.save_report(incident_report)
-                
-                # Try to submit media files if any
-                media_files = enhanced_data.get('media_files', [])
-                if media_files and laravel_report_id:
-                    media_result = self.laravel_client.submit_media_files(str(laravel_report_id), media_files)
-                    if not media_result.get('success'):
-                        print(f"Media upload warning: {media_result.get('error')}")
-                
-                # Clear session
-                self.db.update_user_session(from_number, self.states['CONVERSING'], {})
-                
-                response = f"""✅ **REPORT SUBMITTED TO LARAVEL DASHBOARD!** ✅
-
-**🆔 Dashboard Report ID:** {laravel_report_id or local_id[:8].upper()}
-**🚀 Status:** Successfully sent to Laravel safety dashboard
-**⚡ Priority:** {enhanced_data.get('severity', 'Medium')}
-**📊 AI Analysis:** Completed and included
-**🎙️ Confirmation:** Both text and voice notifications sent
-
-**What happens next:**
-🔍 Safety team will review your report on the Laravel dashboard
-📞 Someone may contact you for more details
-📊 Your report helps improve workplace safety analytics
-🚨 Emergency responses will be coordinated through the system
-
-**Laravel Dashboard Features:**
-📈 Real-time incident tracking
-🗺️ Location mapping with your coordinates
-📸 Media files attached and accessible
-🤖 AI-powered risk assessment included
-🎙️ Accessibility features for all users
-
-**Thank you for keeping everyone safe!** 🛡️💪
-
-Need to report something else? Just send me photos and location!
-Type 'MENU' for other options or ask me any safety questions."""
-                
-            else:
-                error_msg = result.get('error', 'Unknown error')
-                # Still save locally as backup
-                self._save_local_backup_report(from_number, session_data, error_msg)
-                
-                response = f"""⚠️ **Laravel Dashboard Submission Issue** ⚠️
-
-There was a problem submitting to the Laravel dashboard: {error_msg}
-
-**✅ Don't worry - your report has been saved locally as backup!**
-
-**Next steps:**
-🔄 Please try again in a moment
-📞 Or contact safety directly: [Your safety contact]
-💾 Your report data is safely stored and can be re-submitted
-
-**Emergency contacts:**
-📞 Emergency: 911
-📞 Safety Team: [Your safety team contact]
-
-Would you like me to try submitting again? Just type 'SUBMIT' once more.
-
-🎙️ This error notification is provided in both text and voice for your convenience."""
+        # Store in database
+        self._save_conversation_turn(turn, thread_id)
         
-        except Exception as e:
-            print(f"Error submitting report to Laravel: {e}")
-            # Save local backup
-            self._save_local_backup_report(from_number, session_data, str(e))
-            
-            response = (
-                "❌ **Technical Error**\n\n"
-                "Sorry, I'm having technical difficulties connecting to the Laravel dashboard. "
-                "Your report has been saved locally as backup.\n\n"
-                "**Please try again in a moment or contact safety directly:**\n"
-                "📞 Emergency: 911\n"
-                "📞 Safety Team: [Your safety contact]\n\n"
-                "💾 Your report data is safe and will be submitted when the connection is restored.\n\n"
-                "🎙️ This technical update is provided in both text and voice formats."
-            )
+        # Update thread metadata
+        self._update_conversation_thread(thread_id, turn)
         
-        # Generate TTS
-        tts_audio_url = None
-        if user_profile and user_profile.tts_enabled and TTS_ENABLED:
-            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
+        # Tell other workers the thread moved on; if we skipped a version, reload next time
+        version = self.shared_state.incr(f'thread_version:{thread_id}')
+        if memory_context['version'] == version - 1:
+            memory_context['version'] = version
+        self._touch_active_thread(phone, thread_id, turn.timestamp)
         
-        return response, tts_audio_url
+        return turn_id
     
-    # Utility methods
-    def _enhance_report_for_laravel(self, report_data: dict) -> dict:
-        """Enhance report with AI analysis and Laravel-compatible format"""
+    def get_conversation_context(self, phone: str, thread_id: str = None) -> Dict:
+        """Get rich conversation context for generating smart responses"""
         
-        enhanced = report_data.copy()
+        if not thread_id:
+            thread_id = self._get_current_thread_id(phone)
         
-        # Add required Laravel fields
-        enhanced.update({
-            'report_type': 'incident',
-            'date_of_incident': datetime.datetime.now().strftime('%Y-%m-%d'),
-            'time_of_incident': datetime.datetime.now().strftime('%H:%M:%S'),
-            'severity': self._analyze_severity_from_data(enhanced),
-            'incident_type': self._detect_incident_type(enhanced),
-            'status': 'submitted',
-            'industry': enhanced.get('industry', 'General'),
-            'description': self._generate_ai_description(enhanced),
-            'ai_analysis': self._generate_ai_analysis(enhanced),
-            'submitted_via': 'whatsapp_chatbot_dual_messaging',
-            'submission_timestamp': datetime.datetime.now().isoformat()
-        })
+        if not thread_id:
+            return self._create_default_context(phone)
         
-        return enhanced
-    
-    def _analyze_severity_from_data(self, report_data: dict) -> str:
-        """Analyze severity based on available data"""
+        # Get from memory, rehydrating from the database if this worker hasn't seen the thread
+        memory_context = self._get_thread_memory(thread_id, phone)
+        turns = memory_context['turns']
+        context = {
+            'recent_turns': [turns[i] for i in range(max(len(turns) - 5, 0), len(turns))],  # Last 5 turns
+            **memory_context['aggregates'].to_context(),
+            'thread_summary': memory_context['context'].get('stored_summary', ''),
+            'user_state': memory_context['user_state']
+        }
         
-        # Simple severity analysis based on media count and urgency indicators
-        media_count = len(report_data.get('media_files', []))
+        # Add long-term memory
+        context['long_term_memory'] = self._get_user_long_term_memory(phone)
         
-        if media_count >= 3:
-            return 'high'
-        elif media_count >= 1:
-            return 'medium'
-        else:
-            return 'low'
+        return context
     
-    def _detect_incident_type(self, report_data: dict) -> str:
-        """Detect incident type from available data"""
-        
-        # Simple incident type detection
-        location_desc = report_data.get('location_description', '').lower()
-        
-        if any(word in location_desc for word in ['office', 'desk', 'computer']):
-            return 'workplace_injury'
-        elif any(word in location_desc for word in ['machine', 'equipment', 'tool']):
-            return 'equipment_failure'
-        elif any(word in location_desc for word in ['chemical', 'spill', 'leak']):
-            return 'chemical_incident'
-        else:
-            return 'other'
+    # Helper methods implementation
+    def _remember_active_thread(self, phone: str, pointer: Dict):
+        """Record a phone's active thread in this worker's index"""
+        with self._active_threads_lock:
+            self.active_threads[phone] = (pointer, time.monotonic())
+            self.active_threads.move_to_end(phone)
+            while len(self.active_threads) > ACTIVE_THREAD_INDEX_MAX_PHONES:
+                self.active_threads.popitem(last=False)
     
-    def _generate_ai_description(self, report_data: dict) -> str:
-        """Generate AI-enhanced description"""
-        
-        media_count = len(report_data.get('media_files', []))
-        location = report_data.get('location_description', 'Location not specified')
-        
-        description = f"Incident reported via WhatsApp chatbot with dual messaging support. {media_count} media file(s) submitted. "
-        description += f"Location: {location}. "
-        description += f"Reported by: {report_data.get('reporter_name', 'Anonymous')}. "
-        description += f"Submission time: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}. "
-        description += f"User received both text and voice confirmations for accessibility."
+    def _lookup_active_thread(self, phone: str) -> Optional[Dict]:
+        """This worker's view of the phone's active thread, if still fresh and within the 2 hour window"""
+        with self._active_threads_lock:
+            entry = self.active_threads.get(phone)
+        if not entry:
+            return None
         
-        return description
+        pointer, cached_at = entry
+        is_stale = ACTIVE_THREAD_INDEX_TTL_SECONDS > 0 and time.monotonic() - cached_at > ACTIVE_THREAD_INDEX_TTL_SECONDS
+        is_expired = (_iso_to_epoch_ms(pointer['last_activity']) or 0) <= _epoch_ms() - ACTIVE_THREAD_TTL_SECONDS * 1000
+        if is_stale or is_expired:
+            with self._active_threads_lock:
+                self.active_threads.pop(phone, None)
+            return None
+        return pointer
     
-    def _generate_ai_analysis(self, report_data: dict) -> str:
-        """Generate AI analysis summary"""
-        
-        analysis = {
-            'source': 'WhatsApp Chatbot with Dual Messaging',
-            'media_analysis': f"{len(report_data.get('media_files', []))} files submitted",
-            'location_analysis': 'GPS coordinates provided' if report_data.get('location_lat') else 'Location description provided',
-            'urgency_assessment': 'Standard reporting flow followed',
-            'ai_confidence': 'High - complete data submitted',
-            'accessibility_features': 'Dual messaging (text + voice) used for user guidance',
-            'recommendation': 'Review media files and coordinate appropriate response',
-            'submission_method': 'Enhanced WhatsApp integration with Laravel dashboard'
+    def _set_active_thread(self, phone: str, thread_id: str, conversation_type: str, last_activity: str):
+        """Publish the phone's active thread to this worker's index and every other worker"""
+        pointer = {
+            'thread_id': thread_id,
+            'phone': phone,
+            'last_activity': last_activity,
+            'conversation_type': conversation_type
         }
-        
-        return json.dumps(analysis)
+        self._remember_active_thread(phone, pointer)
+        self.shared_state.set(f'active_thread:{phone}', json.dumps(pointer), ttl_seconds=ACTIVE_THREAD_TTL_SECONDS)
     
-    def _save_local_backup_report(self, from_number: str, session_data: dict, error_reason: str):
-        """Save report locally as backup when Laravel submission fails"""
+    def _touch_active_thread(self, phone: str, thread_id: str, last_activity: str):
+        pointer = self._lookup_active_thread(phone) or self._get_active_thread_pointer(phone)
+        if pointer and pointer['thread_id'] == thread_id:
+            self._set_active_thread(phone, thread_id, pointer.get('conversation_type'), last_activity)
+    
+    def _get_active_thread_pointer(self, phone: str) -> Optional[Dict]:
+        value = self.shared_state.get(f'active_thread:{phone}')
+        return json.loads(value) if value else None
+    
+    def _get_recent_active_thread(self, phone: str) -> Optional[Dict]:
+        # Hot path: a dict lookup in this worker's index
+        pointer = self._lookup_active_thread(phone)
+        if pointer:
+            self.memory_stats['active_index_hits'] += 1
+            return pointer
+        self.memory_stats['active_index_misses'] += 1
+        
+        # The shared pointer expires with the 2 hour window, so a hit is always recent
+        pointer = self._get_active_thread_pointer(phone)
+        if pointer:
+            self._remember_active_thread(phone, pointer)
+            return pointer
         
         try:
-            report_data = session_data['report_data']
+            conn = sqlite3.connect('hsse_reports.db')
+            cursor = conn.cursor()
             
-            backup_report = IncidentReport(
-                id=uuid.uuid4().hex,
-                user_phone=from_number,
-                timestamp=datetime.datetime.now().isoformat(),
-                incident_type='backup_pending_laravel',
-                severity='medium',
-                description=f"BACKUP REPORT - Laravel submission failed: {error_reason}. Submitted via dual messaging system.",
-                location=report_data.get('location_description', ''),
-                location_lat=report_data.get('location_lat'),
-                location_long=report_data.get('location_long'),
-                media_urls=report_data.get('media_files', []),
-                status='backup_pending_submission',
-                ai_analysis={'error_reason': error_reason, 'requires_manual_submission': True, 'dual_messaging_used': True},
-                created_at=datetime.datetime.now().isoformat()
-            )
+            cursor.execute('''
+                SELECT * FROM conversation_threads 
+                WHERE phone = ? AND last_activity_ms > ?
+                ORDER BY last_activity_ms DESC 
+                LIMIT 1
+            ''', (phone, _epoch_ms() - 2 * 3600 * 1000))
             
-            self.db.save_report(backup_report)
-            print(f"Backup report saved: {backup_report.id}")
+            result = cursor.fetchone()
+            conn.close()
             
-        except Exception as e:
-            print(f"Error saving backup report: {e}")
+            if result:
+                thread = {
+                    'thread_id': result[0],
+                    'phone': result[1],
+                    'start_time': result[2],
+                    'last_activity': result[3],
+                    'total_turns': result[4],
+                    'conversation_type': result[12] if len(result) > 12 else 'casual',
+                    'status': result[13] if len(result) > 13 else 'active'
+                }
+                self._remember_active_thread(phone, thread)
+                return thread
+            return None
+        except Exception as e:
+            print(f"Error getting recent thread: {e}")
+            return None
     
-    def _should_show_menu(self, from_number: str, message: str, user_profile: UserProfile) -> bool:
-        """Determine if we should show the menu to the user"""
-        
-        # Show menu for first-time users
-        if not user_profile.name and len(user_profile.interaction_history) == 0:
-            return True
-        
-        # Show menu for simple greetings
-        simple_greetings = ['hi', 'hello', 'hey', 'start', 'begin']
-        if message.lower().strip() in simple_greetings:
-            return True
-        
-        # Show menu if user seems lost
-        confused_messages = ['what can you do', 'help me', 'i need help', 'what are my options']
-        if any(phrase in message.lower() for phrase in confused_messages):
-            return True
+    def _should_continue_thread(self, recent_thread: Dict, new_message: str) -> bool:
+        try:
+            last_activity = datetime.datetime.fromisoformat(recent_thread['last_activity'])
+            time_diff = datetime.datetime.now() - last_activity
+            
+            # Continue if less than 30 minutes
+            if time_diff.total_seconds() < 1800:  # 30 minutes
+                return True
+            
+            # Message references previous conversation
+            reference_words = ['also', 'and', 'additionally', 'furthermore', 'moreover']
+            if any(word in new_message.lower() for word in reference_words):
+                return True
+            
+            # Less than 2 hours and not a greeting
+            greeting_words = ['hi', 'hello', 'hey', 'good morning', 'good afternoon']
+            if (time_diff.total_seconds() < 7200 and  # 2 hours
+                not any(word in new_message.lower() for word in greeting_words)):
+                return True
+        except:
+            pass
         
         return False
     
-    def _update_user_profile(self, user_profile: UserProfile, user_info: Dict):
-        """Update user profile with extracted information including TTS and dual messaging preferences"""
+    def _create_new_thread(self, phone: str, thread_id: str, conversation_type: str):
+        try:
+            now = datetime.datetime.now()
+            conn = sqlite3.connect('hsse_reports.db')
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO conversation_threads 
+                (thread_id, phone, start_time, last_activity, total_turns, conversation_summary,
+                 key_topics_discussed, user_goals_identified, relationship_building_score,
+                 conversation_satisfaction_score, unresolved_issues, follow_up_needed,
+                 conversation_type, status, start_time_ms, last_activity_ms)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                thread_id, phone, now.isoformat(),
+                now.isoformat(), 0, '',
+                json.dumps([]), json.dumps([]), 0.5, 0.5,
+                json.dumps([]), False, conversation_type, 'active',
+                _epoch_ms(now), _epoch_ms(now)
+            ))
+            
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error creating new thread: {e}")
+    
+    def _update_thread_activity(self, thread_id: str):
+        try:
+            now = datetime.datetime.now()
+            conn = sqlite3.connect('hsse_reports.db')
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE conversation_threads 
+                SET last_activity = ?, last_activity_ms = ?
+                WHERE thread_id = ?
+            ''', (now.isoformat(), _epoch_ms(now), thread_id))
+            
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error updating thread activity: {e}")
+    
+    def _analyze_conversation_turn(self, user_message: str, bot_response: str, 
+                                 intent_analysis: Dict, context_used: Dict) -> Dict:
+        analysis = {
+            'quality_score': 0.5,
+            'satisfaction_indicators': [],
+            'engagement_signals': [],
+            'confusion_signals': [],
+            'relationship_signals': []
+        }
         
-        if user_info.get('name') and not user_profile.name:
-            user_profile.name = user_info['name']
+        user_lower = user_message.lower()
         
-        if user_info.get('role') and not user_profile.role:
-            user_profile.role = user_info['role']
+        # Positive satisfaction indicators
+        positive_words = ['thanks', 'helpful', 'great', 'perfect', 'exactly', 'awesome', 'good']
+        if any(word in user_lower for word in positive_words):
+            analysis['satisfaction_indicators'].append('positive_feedback')
+            analysis['quality_score'] += 0.2
         
-        if user_info.get('department') and not user_profile.department:
-            user_profile.department = user_info['department']
+        # Engagement signals
+        if '?' in user_message:
+            analysis['engagement_signals'].append('asking_questions')
+            analysis['quality_score'] += 0.1
         
-        if user_info.get('interests'):
-            user_profile.safety_interests.extend(user_info['interests'])
-            user_profile.safety_interests = list(set(user_profile.safety_interests))
+        if len(user_message) > 50:
+            analysis['engagement_signals'].append('detailed_response')
+            analysis['quality_score'] += 0.1
         
-        # Update TTS preferences if mentioned
-        tts_prefs = user_info.get('tts_preferences', {})
-        if tts_prefs.get('voice'):
-            user_profile.tts_voice_preference = tts_prefs['voice']
-        if tts_prefs.get('speed'):
-            if tts_prefs['speed'] == 'fast':
-                user_profile.tts_speed_preference = 200
-            elif tts_prefs['speed'] == 'slow':
-                user_profile.tts_speed_preference = 120
+        # Keep score between 0 and 1
+        analysis['quality_score'] = max(0, min(1, analysis['quality_score']))
         
-        user_profile.last_active = datetime.datetime.now().isoformat()
-        self.db.update_user_profile(user_profile)
-
-# Initialize the enhanced chatbot with Laravel integration and dual TTS messaging
-hsse_bot = EnhancedHSSEChatbot()
-
-# ENHANCED WHATSAPP HANDLER WITH DUAL MESSAGING
-@app.route("/whatsapp", methods=['POST'])
-def whatsapp():
-    """Enhanced WhatsApp webhook handler with dual text+voice messaging"""
-    
-    # Get message data
-    incoming_msg = request.values.get('Body', '').strip()
-    from_number = request.values.get('From', '')
-    
-    # Get media URLs if any
-    num_media = int(request.values.get('NumMedia', 0))
-    media_urls = []
-    for i in range(num_media):
-        media_url = request.values.get(f'MediaUrl{i}')
-        if media_url:
-            media_urls.append(media_url)
-    
-    print(f"=== INCOMING MESSAGE ===")
-    print(f"From: {from_number}")
-    print(f"Message: '{incoming_msg}'")
-    print(f"Media files: {len(media_urls)}")
+        return analysis
     
-    # Process with enhanced AI chatbot
-    try:
-        response_result = hsse_bot.process_message(from_number, incoming_msg, media_urls)
-        
-        if isinstance(response_result, tuple):
-            response_text, tts_audio_url = response_result
-        else:
-            response_text = response_result
-            tts_audio_url = None
+    def _save_conversation_turn(self, turn: ConversationTurn, thread_id: str):
+        try:
+            conn = sqlite3.connect('hsse_reports.db')
+            cursor = conn.cursor()
             
-    except Exception as e:
-        print(f"Error processing message: {e}")
-        response_text = ("🤖 Hi there! I'm ARIA, your safety assistant with dual messaging (text + voice)! "
-                        "I'm here to help with all your workplace safety questions and incident reporting! "
-                        "How can I assist you today? 😊")
-        tts_audio_url = None
+            # Get turn number
+            cursor.execute('SELECT COUNT(*) FROM conversation_turns WHERE thread_id = ?', (thread_id,))
+            turn_number = cursor.fetchone()[0] + 1
+            
+            cursor.execute('''
+                INSERT INTO conversation_turns 
+                (id, phone, thread_id, user_message, bot_response, timestamp, intent, topics, 
+                 sentiment, context_used, response_quality_score, user_satisfaction_indicators, 
+                 turn_number, tts_audio_url, tts_generated, timestamp_ms, intent_source, index_key)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+                        (SELECT COALESCE(MAX(index_key), 0) + 1 FROM conversation_turns))
+            ''', (
+                turn.id, 
+                thread_id.split('_')[0],  # Extract phone from thread_id
+                thread_id,
+                turn.user_message,
+                turn.bot_response,
+                turn.timestamp,
+                turn.intent,
+                json.dumps(turn.topics),
+                turn.sentiment,
+                json.dumps(turn.context_used),
+                turn.response_quality_score,
+                json.dumps(turn.user_satisfaction_indicators),
+                turn_number,
+                turn.tts_audio_url,
+                turn.tts_generated,
+                _iso_to_epoch_ms(turn.timestamp),
+                turn.intent_source
+            ))
+            
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error saving conversation turn: {e}")
     
-    # Get user profile for dual messaging preferences
-    user_profile = hsse_bot.db.get_user_profile(from_number)
+    def _update_conversation_thread(self, thread_id: str, turn: ConversationTurn):
+        try:
+            conn = sqlite3.connect('hsse_reports.db')
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE conversation_threads 
+                SET last_activity = ?, last_activity_ms = ?, total_turns = total_turns + 1
+                WHERE thread_id = ?
+            ''', (turn.timestamp, _iso_to_epoch_ms(turn.timestamp), thread_id))
+            
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error updating conversation thread: {e}")
     
-    # STEP 1: ALWAYS send text message first (immediate response)
-    resp = MessagingResponse()
-    text_msg = resp.message()
-    text_msg.body(response_text)
+    # Additional helper methods
+    def _create_default_context(self, phone: str) -> Dict:
+        return {
+            'recent_turns': [],
+            'conversation_summary': 'New conversation',
+            'thread_summary': '',
+            'topics_discussed': [],
+            'user_sentiment_trend': 'neutral',
+            'conversation_flow': {'total_turns': 0},
+            'user_engagement_level': 0.5,
+            'unresolved_questions': [],
+            'relationship_building_opportunities': [],
+            'user_state': {},
+            'conversation_goals': [],
+            'suggested_follow_ups': ["How can I help you with workplace safety today?"]
+        }
     
-    # STEP 2: Schedule voice message if TTS is enabled and available
-    if (tts_audio_url and 
-        os.path.exists(tts_audio_url) and
-        user_profile and 
-        user_profile.tts_enabled and
-        TTS_ENABLED):
-        
-        def send_voice_message_delayed():
-            """Send voice message as separate Twilio API call after brief delay"""
+    def _get_user_long_term_memory(self, phone: str) -> Dict:
+        try:
+            conn = sqlite3.connect('hsse_reports.db')
+            cursor = conn.cursor()
             
-            # Get delay from user preferences
-            delay = getattr(user_profile, 'voice_delay_seconds', 2)
-            time.sleep(delay)
+            cursor.execute('SELECT * FROM user_long_term_memory WHERE phone = ?', (phone,))
+            result = cursor.fetchone()
+            conn.close()
             
-            try:
-                audio_filename = os.path.basename(tts_audio_url)
-                audio_url = f"{request.url_root}tts-audio/{audio_filename}"
-                
-                # Send voice message
-                voice_message = twilio_client.messages.create(
-                    media_url=[audio_url],
-                    from_=TWILIO_WHATSAPP_NUMBER,
-                    to=from_number,
-                    body="🎙️ Audio version"
-                )
-                
-                print(f"✅ Voice message sent successfully: {voice_message.sid}")
-                
-                # Update dual messaging analytics
-                file_size = os.path.getsize(tts_audio_url) if os.path.exists(tts_audio_url) else 0
-                hsse_bot.db.save_dual_messaging_analytics(from_number, {
-                    'message_id': voice_message.sid,
-                    'text_sent': True,
-                    'voice_sent': True,
-                    'text_delivery_time_ms': 500,  # Approximate
-                    'voice_delivery_time_ms': delay * 1000,
-                    'interaction_type': 'dual_messaging',
-                    'message_length': len(response_text)
-                })
-                
-                # Update TTS analytics
-                hsse_bot.db.save_tts_analytics(
-                    from_number, len(response_text), 'dual_messaging', 0, file_size
-                )
-                
-            except Exception as voice_error:
-                print(f"❌ Error sending voice message: {voice_error}")
-                
-                # Send fallback notification
-                try:
-                    fallback_message = twilio_client.messages.create(
-                        body="🎙️ (Voice message generated but couldn't be delivered. Say 'voice off' to disable audio features.)",
-                        from_=TWILIO_WHATSAPP_NUMBER,
-                        to=from_number
-                    )
-                except:
-                    pass  # If fallback also fails, just log it
-        
-        # Start voice message in background thread
-        voice_thread = threading.Thread(target=send_voice_message_delayed)
-        voice_thread.daemon = True
-        voice_thread.start()
-        
-        print(f"🎙️ Voice message scheduled for delivery in {getattr(user_profile, 'voice_delay_seconds', 2)} seconds")
-    
-    print(f"📤 Text message sent immediately: {response_text[:100]}...")
-    
-    return Response(str(resp), mimetype="application/xml")
-
-# TTS Audio serving endpoint
-@app.route("/tts-audio/<filename>", methods=['GET'])
-def serve_tts_audio(filename):
-    """Serve TTS audio files"""
-    try:
-        audio_path = os.path.join(hsse_bot.tts_manager.temp_dir, filename)
-        
-        if os.path.exists(audio_path):
-            return send_file(
-                audio_path,
-                mimetype='audio/mpeg' if filename.endswith('.mp3') else 'audio/wav',
-                as_attachment=False
-            )
-        else:
-            return jsonify({'error': 'Audio file not found'}), 404
-            
-    except Exception as e:
-        print(f"Error serving TTS audio: {e}")
-        return jsonify({'error': 'Error serving audio file'}), 500
-
-# DUAL MESSAGING API ENDPOINTS
-
-@app.route("/dual-messaging/preferences/<phone>", methods=['GET', 'PUT'])
-def dual_messaging_preferences(phone):
-    """Get or update dual messaging preferences"""
-    
-    try:
-        user_profile = hsse_bot.db.get_user_profile(phone)
-        
-        if not user_profile:
-            return jsonify({'error': 'User not found'}), 404
-        
-        if request.method == 'GET':
-            return jsonify({
-                'phone': phone,
-                'dual_messaging_settings': {
-                    'dual_messaging_enabled': getattr(user_profile, 'dual_messaging_enabled', True),
-                    'voice_for_emergencies': getattr(user_profile, 'voice_for_emergencies', True),
-                    'voice_for_long_messages': getattr(user_profile, 'voice_for_long_messages', True),
-                    'voice_delay_seconds': getattr(user_profile, 'voice_delay_seconds', 2),
-                    'preferred_message_format': getattr(user_profile, 'preferred_message_format', 'both')
-                },
-                'tts_settings': {
-                    'tts_enabled': user_profile.tts_enabled,
-                    'tts_voice_preference': user_profile.tts_voice_preference,
-                    'tts_speed_preference': user_profile.tts_speed_preference
+            if result:
+                return {
+                    'trust_level': result[8] or 0.5,
+                    'preferred_style': result[7] or 'professional',
+                    'expertise_areas': json.loads(result[3]) if result[3] else []
                 }
-            })
+        except Exception as e:
+            print(f"Error getting long term memory: {e}")
         
-        elif request.method == 'PUT':
-            data = request.json
-            
-            # Update dual messaging preferences
-            if 'dual_messaging_enabled' in data:
-                user_profile.dual_messaging_enabled = bool(data['dual_messaging_enabled'])
-            if 'voice_for_emergencies' in data:
-                user_profile.voice_for_emergencies = bool(data['voice_for_emergencies'])
-            if 'voice_for_long_messages' in data:
-                user_profile.voice_for_long_messages = bool(data['voice_for_long_messages'])
-            if 'voice_delay_seconds' in data:
-                user_profile.voice_delay_seconds = int(data['voice_delay_seconds'])
-            if 'preferred_message_format' in data:
-                user_profile.preferred_message_format = data['preferred_message_format']
-            
-            # Update TTS settings
-            if 'tts_enabled' in data:
-                user_profile.tts_enabled = bool(data['tts_enabled'])
-            if 'tts_voice_preference' in data:
-                user_profile.tts_voice_preference = data['tts_voice_preference']
-            if 'tts_speed_preference' in data:
-                user_profile.tts_speed_preference = int(data['tts_speed_preference'])
+        return {'trust_level': 0.5, 'preferred_style': 'professional', 'expertise_areas': []}
+    
+    def _load_conversation_context(self, thread_id: str) -> Dict:
+        try:
+            conn = sqlite3.connect('hsse_reports.db')
+            cursor = conn.cursor()
             
-            # Save updated profile
-            hsse_bot.db.update_user_profile(user_profile)
+            cursor.execute('''
+                SELECT conversation_type, start_time, total_turns, conversation_summary
+                FROM conversation_threads WHERE thread_id = ?
+            ''', (thread_id,))
+            result = cursor.fetchone()
+            conn.close()
             
-            return jsonify({
-                'success': True,
-                'message': 'Dual messaging preferences updated successfully',
-                'updated_preferences': {
-                    'dual_messaging_enabled': getattr(user_profile, 'dual_messaging_enabled', True),
-                    'voice_for_emergencies': getattr(user_profile, 'voice_for_emergencies', True),
-                    'voice_for_long_messages': getattr(user_profile, 'voice_for_long_messages', True),
-                    'voice_delay_seconds': getattr(user_profile, 'voice_delay_seconds', 2),
-                    'preferred_message_format': getattr(user_profile, 'preferred_message_format', 'both'),
-                    'tts_enabled': user_profile.tts_enabled
+            if result:
+                return {
+                    'conversation_type': result[0],
+                    'start_time': result[1],
+                    'total_turns': result[2] or 0,
+                    'stored_summary': result[3] or ''
                 }
-            })
+        except Exception as e:
+            print(f"Error loading conversation context: {e}")
+        
+        return {}
+    
+    def _load_recent_turns(self, thread_id: str, limit: int) -> List[ConversationTurn]:
+        """Load a thread's last turns (oldest first) for rehydrating its memory"""
+        try:
+            conn = sqlite3.connect('hsse_reports.db')
+            cursor = conn.cursor()
             
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route("/dual-messaging/test/<phone>", methods=['POST'])
-def test_dual_messaging(phone):
-    """Test dual messaging with a specific user"""
+            cursor.execute('''
+                SELECT id, user_message, bot_response, timestamp, intent, topics, sentiment,
+                       context_used, response_quality_score, user_satisfaction_indicators,
+                       tts_audio_url, tts_generated
+                FROM conversation_turns
+                WHERE thread_id = ?
+                ORDER BY timestamp_ms DESC
+                LIMIT ?
+            ''', (thread_id, limit))
+            rows = cursor.fetchall()
+            conn.close()
+        except Exception as e:
+            print(f"Error loading conversation turns: {e}")
+            return []
+        
+        return [ConversationTurn(
+            id=row[0],
+            user_message=row[1] or '',
+            bot_response=row[2] or '',
+            timestamp=row[3],
+            intent=row[4] or 'unknown',
+            topics=json.loads(row[5]) if row[5] else [],
+            sentiment=row[6] or 'neutral',
+            context_used=json.loads(row[7]) if row[7] else {},
+            response_quality_score=row[8] if row[8] is not None else 0.5,
+            user_satisfaction_indicators=json.loads(row[9]) if row[9] else [],
+            tts_audio_url=row[10],
+            tts_generated=bool(row[11])
+        ) for row in reversed(rows)]
     
-    try:
-        data = request.json
-        test_message = data.get('message', 'This is a test of dual messaging - you should receive both text and voice!')
-        
-        # Process test message
-        response_text, tts_audio_url = hsse_bot.process_message(f"whatsapp:{phone}", test_message)
+    @staticmethod
+    def _compact_context(context: Dict) -> Dict:
+        """Reduce a conversation context to what a stored turn needs.
         
-        results = {
-            'text_sent': False,
-            'voice_sent': False,
-            'response_text': response_text,
-            'tts_audio_url': tts_audio_url
+        The context holds the previous ConversationTurn objects, which in turn hold
+        their own contexts - keeping it as-is chains every turn to its predecessors
+        and made context_used unserializable. Recent turns are kept by id instead,
+        and the thread summary already lives on the thread row.
+        """
+        compact = {key: value for key, value in (context or {}).items()
+                   if key not in ('recent_turns', 'thread_summary')}
+        compact['recent_turn_ids'] = [getattr(turn, 'id', turn) for turn in (context or {}).get('recent_turns', [])]
+        return compact
+    
+    @staticmethod
+    def _estimate_memory_bytes(memory_context: Dict) -> int:
+        """Rough size of a thread's in-memory turns, for the memory byte budget"""
+        total = 0
+        for turn in memory_context['turns']:
+            total += len(turn.user_message or '') + len(turn.bot_response or '')
+            total += len(json.dumps(turn.context_used, default=str))
+        return total
+    
+    def _load_user_state(self, phone: str) -> Dict:
+        # Served from the session store's hot tier in the common case
+        state, _ = self.db.get_user_session(phone)
+        return {'session_state': state} if state else {}
+    
+    def _get_current_thread_id(self, phone: str) -> Optional[str]:
+        recent_thread = self._get_recent_active_thread(phone)
+        return recent_thread['thread_id'] if recent_thread else None
+    
+    def _update_memory_context(self, memory_context: Dict, turn: ConversationTurn,
+                               evicted: ConversationTurn = None):
+        # Update in-memory context aggregates in O(1)
+        memory_context['aggregates'].add(turn, evicted)
+    
+    def get_memory_stats(self) -> Dict:
+        """Memory hit / rehydration counters plus the thread cache's own stats"""
+        return {**self.memory_stats, **self.conversation_memory.get_stats()}
+
+class ExternalCallReplayMiss(Exception):
+    """Replay mode found no recorded call for an operation"""
+    pass
+
+class ReplayedCallError(Exception):
+    """An external call that failed while recording, failing again on replay (non-OpenAI errors)"""
+    pass
+
+class ExternalCallRecorder:
+    """Record/replay layer for the OpenAI, Twilio and Laravel clients.
+
+    EXTERNAL_CALLS_MODE=record passes calls through and appends each request and
+    its response (or error) to the JSONL fixture file. EXTERNAL_CALLS_MODE=replay
+    never touches the network: a call gets the recording with the same request, or
+    failing that the next recording of the same operation in recorded order, so a
+    flow still replays when prompts pick up timestamps. Recordings are reused
+    cyclically, which lets one recorded conversation drive a load test.
+    EXTERNAL_CALLS_REPLAY_LATENCY is 'recorded' (sleep as long as the real call
+    took) or a fixed number of milliseconds.
+    """
+
+    IGNORED_REQUEST_KEYS = {'timeout'}  # Differs per attempt, never changes the answer
+    # Recorded OpenAI failures come back as these types so ResilientOpenAIClient retries them as it did live
+    OPENAI_ERROR_TYPES = {error_class.__name__: error_class for error_class in
+                          (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)}
+
+    def __init__(self, mode: str = EXTERNAL_CALLS_MODE, fixture_path: str = EXTERNAL_CALLS_FIXTURE,
+                 replay_latency: str = EXTERNAL_CALLS_REPLAY_LATENCY):
+        self.mode = mode if mode in ['live', 'record', 'replay'] else 'live'
+        self.fixture_path = fixture_path
+        self.replay_latency = replay_latency
+        self.replay_latency_ms = None if replay_latency == 'recorded' else float(replay_latency or 0)
+        self._lock = threading.Lock()
+        self.by_request = {}  # (operation, request key) -> deque of recordings
+        self.by_operation = {}  # operation -> recordings in recorded order
+        self.cursors = Counter()  # operation -> next sequential recording
+        self.stats = {'recorded': 0, 'replayed_exact': 0, 'replayed_sequential': 0, 'misses': 0}
+        self.serializers = {
+            'openai.chat.completions.create': (lambda response: response.model_dump(mode='json'),
+                                               lambda data: ChatCompletion.model_validate(data)),
+            'openai.audio.speech.create': (lambda response: {'content': base64.b64encode(response.content).decode()},
+                                           lambda data: SimpleNamespace(content=base64.b64decode(data['content']))),
+            'twilio.messages.create': (lambda message: {'sid': message.sid, 'status': getattr(message, 'status', None)},
+                                       lambda data: SimpleNamespace(**data))
         }
-        
-        # Send text message
+        if self.mode == 'replay':
+            self._load()
+        if self.mode != 'live':
+            print(f"🎞️  External calls in {self.mode} mode ({self.fixture_path})")
+
+    def _load(self):
         try:
-            text_message = twilio_client.messages.create(
-                body=f"📧 TEST DUAL MESSAGING:\n{response_text}",
-                from_=TWILIO_WHATSAPP_NUMBER,
-                to=f"whatsapp:{phone}"
-            )
-            results['text_sent'] = True
-            results['text_message_sid'] = text_message.sid
-            
+            with open(self.fixture_path) as fixture:
+                recordings = [json.loads(line) for line in fixture if line.strip()]
+        except (OSError, ValueError) as e:
+            print(f"Error loading external call fixtures: {e}")
+            return
+        for recording in recordings:
+            self.by_request.setdefault((recording['operation'], recording['request_key']), deque()).append(recording)
+            self.by_operation.setdefault(recording['operation'], []).append(recording)
+
+    @classmethod
+    def request_key(cls, args: tuple, kwargs: Dict) -> str:
+        request_data = {'args': list(args), 'kwargs': {key: value for key, value in kwargs.items()
+                                                       if key not in cls.IGNORED_REQUEST_KEYS}}
+        canonical = json.dumps(request_data, sort_keys=True, default=str)
+        return uuid.uuid5(uuid.NAMESPACE_OID, canonical).hex
+
+    def instrument(self, target, operation: str, method_name: str = 'create'):
+        """Route target.method_name through record/replay (no-op in live mode)"""
+        if self.mode == 'live':
+            return
+        call_live = getattr(target, method_name)
+
+        def recorded_call(*args, **kwargs):
+            if self.mode == 'replay':
+                recording = self._next_recording(operation, args, kwargs)
+                time.sleep(self._replay_delay_ms(recording) / 1000)
+                return self._replay_result(operation, recording)
+            recording, started = self._start_recording(operation, args, kwargs)
+            try:
+                result = call_live(*args, **kwargs)
+            except Exception as e:
+                self._finish_recording(operation, recording, started, error=e)
+                raise
+            self._finish_recording(operation, recording, started, result=result)
+            return result
+
+        setattr(target, method_name, recorded_call)
+
+    def instrument_async(self, target, operation: str, method_name: str):
+        """instrument() for a coroutine method; shares fixtures with the sync operation of the same name"""
+        if self.mode == 'live':
+            return
+        call_live = getattr(target, method_name)
+
+        async def recorded_call(*args, **kwargs):
+            if self.mode == 'replay':
+                recording = self._next_recording(operation, args, kwargs)
+                await asyncio.sleep(self._replay_delay_ms(recording) / 1000)
+                return self._replay_result(operation, recording)
+            recording, started = self._start_recording(operation, args, kwargs)
+            try:
+                result = await call_live(*args, **kwargs)
+            except Exception as e:
+                self._finish_recording(operation, recording, started, error=e)
+                raise
+            self._finish_recording(operation, recording, started, result=result)
+            return result
+
+        setattr(target, method_name, recorded_call)
+
+    def _start_recording(self, operation: str, args: tuple, kwargs: Dict) -> Tuple[Dict, float]:
+        recording = {
+            'operation': operation,
+            'request_key': self.request_key(args, kwargs),
+            'request': json.loads(json.dumps({'args': list(args), 'kwargs': kwargs}, default=str)),
+            'recorded_at_ms': _epoch_ms()
+        }
+        return recording, time.perf_counter()
+
+    def _finish_recording(self, operation: str, recording: Dict, started: float, result=None,
+                          error: Exception = None):
+        recording['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        try:
+            if error is not None:
+                headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+                recording['error'] = {'type': type(error).__name__, 'message': str(error),
+                                      'status_code': getattr(error, 'status_code', None),
+                                      'retry_after': headers.get('retry-after')}
+            else:
+                recording['response'] = self.serializers.get(operation, (lambda value: value, None))[0](result)
+            line = json.dumps(recording, default=str)
         except Exception as e:
-            results['text_error'] = str(e)
-        
-        # Send voice message if available
-        if tts_audio_url and os.path.exists(tts_audio_url):
+            print(f"Error serializing {operation} call for the fixture: {e}")
+            return
+        with self._lock:
             try:
-                audio_filename = os.path.basename(tts_audio_url)
-                audio_url = f"{request.url_root}tts-audio/{audio_filename}"
-                
-                voice_message = twilio_client.messages.create(
-                    media_url=[audio_url],
-                    from_=TWILIO_WHATSAPP_NUMBER,
-                    to=f"whatsapp:{phone}",
-                    body="🎙️ TEST: Audio version of the above message"
+                os.makedirs(os.path.dirname(self.fixture_path) or '.', exist_ok=True)
+                with open(self.fixture_path, 'a') as fixture:
+                    fixture.write(line + '\n')
+                self.stats['recorded'] += 1
+            except OSError as e:
+                print(f"Error writing external call fixture: {e}")
+
+    def _next_recording(self, operation: str, args: tuple, kwargs: Dict) -> Dict:
+        with self._lock:
+            matches = self.by_request.get((operation, self.request_key(args, kwargs)))
+            if matches:
+                recording = matches[0]
+                matches.rotate(-1)
+                self.stats['replayed_exact'] += 1
+                return recording
+            if self.by_operation.get(operation):
+                recordings = self.by_operation[operation]
+                recording = recordings[self.cursors[operation] % len(recordings)]
+                self.cursors[operation] += 1
+                self.stats['replayed_sequential'] += 1
+                return recording
+            self.stats['misses'] += 1
+        raise ExternalCallReplayMiss(f"No recorded {operation} call in {self.fixture_path}")
+
+    def _replay_delay_ms(self, recording: Dict) -> float:
+        delay_ms = recording.get('duration_ms', 0) if self.replay_latency_ms is None else self.replay_latency_ms
+        return max(0.0, delay_ms)
+
+    def _replay_result(self, operation: str, recording: Dict):
+        if 'error' in recording:
+            raise self._replayed_error(operation, recording['error'])
+        deserialize = self.serializers.get(operation, (None, lambda data: copy.deepcopy(data)))[1]
+        return deserialize(recording['response'])
+
+    def _replayed_error(self, operation: str, error: Dict) -> Exception:
+        """The recorded failure as the matching openai exception, else ReplayedCallError"""
+        error_type, status_code = error['type'], error.get('status_code')
+        error_class = self.OPENAI_ERROR_TYPES.get(error_type)
+        if error_class is None and operation.startswith('openai.'):
+            if status_code == 429:
+                error_class = RateLimitError
+            elif status_code and status_code >= 500:
+                error_class = InternalServerError
+            elif 'timeout' in error_type.lower():
+                error_class = APITimeoutError
+            elif 'connect' in error_type.lower():
+                error_class = APIConnectionError
+        if error_class is None:
+            return ReplayedCallError(f"{error_type}: {error['message']}")
+
+        # The constructors want the HTTP client's request/response objects, which a replay
+        # doesn't have; set the attributes callers read (status, Retry-After) directly
+        replayed = error_class.__new__(error_class)
+        Exception.__init__(replayed, error['message'])
+        replayed.message = error['message']
+        replayed.body = None
+        replayed.request = None
+        replayed.status_code = status_code
+        replayed.response = SimpleNamespace(
+            status_code=status_code,
+            headers={'retry-after': error['retry_after']} if error.get('retry_after') else {}
+        )
+        return replayed
+
+    def get_stats(self) -> Dict:
+        """Recording / replay counters"""
+        with self._lock:
+            return {
+                **self.stats,
+                'mode': self.mode,
+                'fixture_path': self.fixture_path if self.mode != 'live' else None,
+                'replay_latency': self.replay_latency if self.mode == 'replay' else None,
+                'recorded_operations': {operation: len(recordings) for operation, recordings in self.by_operation.items()}
+            }
+
+external_calls = ExternalCallRecorder()
+external_calls.instrument(openai_client.chat.completions, 'openai.chat.completions.create')
+external_calls.instrument(openai_client.audio.speech, 'openai.audio.speech.create')
+external_calls.instrument(twilio_client.messages, 'twilio.messages.create')
+external_calls.instrument_async(async_openai_client.chat.completions, 'openai.chat.completions.create', 'create')
+external_calls.instrument_async(async_openai_client.audio.speech, 'openai.audio.speech.create', 'create')
+
+class LLMTelemetry:
+    """Per-call OpenAI telemetry: wall time, tokens, model and estimated cost.
+
+    Every attempt made through ResilientOpenAIClient is recorded. This process keeps
+    running aggregates and a latency histogram per (call site, model); the raw rows
+    are buffered and written to llm_call_metrics in batches, by size or by the
+    background flusher, so the table covers every worker process.
+    """
+
+    def __init__(self, db_path: str = 'hsse_reports.db', batch_size: int = LLM_TELEMETRY_BATCH_SIZE):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.pending = []
+        self.aggregates = {}  # (call_site, model) -> totals and histogram
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Keeps batches in order when size and timer flushes race
+        self.stats = {'recorded': 0, 'flushed': 0, 'flush_errors': 0, 'dropped': 0}
+        self._create_table()
+
+    def _create_table(self):
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS llm_call_metrics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    call_site TEXT,
+                    model TEXT,
+                    started_at_ms INTEGER,
+                    wall_ms REAL,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    input_characters INTEGER,
+                    cost_usd REAL,
+                    success INTEGER,
+                    error_type TEXT
                 )
-                results['voice_sent'] = True
-                results['voice_message_sid'] = voice_message.sid
-                results['audio_url'] = audio_url
-                
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_call_metrics_started ON llm_call_metrics (started_at_ms)')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error creating llm_call_metrics table: {e}")
+
+    @staticmethod
+    def estimate_cost(model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+                      input_characters: int = 0) -> Optional[float]:
+        """USD cost from LLM_MODEL_PRICES (longest matching model prefix); None for unknown models"""
+        matches = [name for name in LLM_MODEL_PRICES if (model or '').startswith(name)]
+        if not matches:
+            return None
+        prices = LLM_MODEL_PRICES[max(matches, key=len)]
+        cost = (prompt_tokens * prices.get('input', 0) + completion_tokens * prices.get('output', 0)
+                + input_characters * prices.get('characters', 0)) / 1_000_000
+        return round(cost, 8)
+
+    def record(self, call_site: str, model: str, started_at_ms: int, wall_ms: float, response=None,
+               input_characters: int = 0, error: Exception = None):
+        """Record one OpenAI request attempt"""
+        model = model or 'unknown'
+        usage = getattr(response, 'usage', None)
+        prompt_tokens = (getattr(usage, 'prompt_tokens', 0) or 0) if usage else 0
+        completion_tokens = (getattr(usage, 'completion_tokens', 0) or 0) if usage else 0
+        cost = self.estimate_cost(model, prompt_tokens, completion_tokens, input_characters) if error is None else 0.0
+        row = (call_site, model, started_at_ms, round(wall_ms, 1), prompt_tokens, completion_tokens,
+               input_characters, cost, 0 if error else 1, type(error).__name__ if error else None)
+
+        with self._lock:
+            aggregate = self.aggregates.setdefault((call_site, model), {
+                'calls': 0, 'errors': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                'input_characters': 0, 'cost_usd': 0.0, 'total_wall_ms': 0.0,
+                'histogram': [0] * (len(LLM_LATENCY_BUCKETS_MS) + 1)  # Last bucket is overflow
+            })
+            aggregate['calls'] += 1
+            aggregate['errors'] += 1 if error else 0
+            aggregate['prompt_tokens'] += prompt_tokens
+            aggregate['completion_tokens'] += completion_tokens
+            aggregate['input_characters'] += input_characters
+            aggregate['cost_usd'] += cost or 0.0
+            aggregate['total_wall_ms'] += wall_ms
+            bucket = next((i for i, bound in enumerate(LLM_LATENCY_BUCKETS_MS) if wall_ms <= bound),
+                          len(LLM_LATENCY_BUCKETS_MS))
+            aggregate['histogram'][bucket] += 1
+            self.stats['recorded'] += 1
+            self.pending.append(row)
+            flush_now = len(self.pending) >= self.batch_size
+
+        if flush_now:
+            self.flush()
+
+    @staticmethod
+    def histogram(counts: List[int]) -> List[Dict]:
+        """Bucket counts as [{'le_ms': upper bound, 'count'}], the last bucket unbounded (le_ms None)"""
+        return [{'le_ms': bound, 'count': count} for bound, count in zip(LLM_LATENCY_BUCKETS_MS + [None], counts)]
+
+    def flush(self) -> int:
+        """Write buffered rows to llm_call_metrics; returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self.pending = self.pending, []
+            if not rows:
+                return 0
+            try:
+                conn = sqlite3.connect(self.db_path, timeout=5)
+                conn.executemany('''
+                    INSERT INTO llm_call_metrics
+                    (call_site, model, started_at_ms, wall_ms, prompt_tokens, completion_tokens,
+                     input_characters, cost_usd, success, error_type)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                conn.commit()
+                conn.close()
             except Exception as e:
-                results['voice_error'] = str(e)
-        
-        return jsonify(results)
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+                print(f"Error flushing LLM telemetry: {e}")
+                with self._lock:
+                    # Retry with the next flush, keeping at most ten batches
+                    backlog = rows + self.pending
+                    self.stats['flush_errors'] += 1
+                    self.stats['dropped'] += max(0, len(backlog) - self.batch_size * 10)
+                    self.pending = backlog[-self.batch_size * 10:]
+                return 0
+            with self._lock:
+                self.stats['flushed'] += len(rows)
+            return len(rows)
+
+    def start(self, interval_seconds: int = LLM_TELEMETRY_FLUSH_SECONDS):
+        """Start background task writing buffered telemetry"""
+        def flush_worker():
+            while True:
+                try:
+                    time.sleep(interval_seconds)
+                    self.flush()
+                except Exception as e:
+                    print(f"LLM telemetry flush error: {e}")
+
+        flush_thread = threading.Thread(target=flush_worker, daemon=True)
+        flush_thread.start()
+
+    def get_stats(self) -> Dict:
+        """This process's per call site / model aggregates with latency histograms"""
+        with self._lock:
+            call_sites = {}
+            for (call_site, model), aggregate in self.aggregates.items():
+                calls = aggregate['calls'] or 1
+                call_sites.setdefault(call_site, {})[model] = {
+                    **{key: value for key, value in aggregate.items() if key != 'histogram'},
+                    'cost_usd': round(aggregate['cost_usd'], 6),
+                    'total_wall_ms': round(aggregate['total_wall_ms'], 1),
+                    'avg_wall_ms': round(aggregate['total_wall_ms'] / calls, 1),
+                    'latency_histogram': self.histogram(aggregate['histogram'])
+                }
+            return {**self.stats, 'pending': len(self.pending), 'call_sites': call_sites}
+
+llm_telemetry = LLMTelemetry()
+
+class OpenAIQueueTimeout(Exception):
+    """No OpenAI concurrency slot became free within OPENAI_QUEUE_TIMEOUT_SECONDS"""
+    pass
+
+class ResilientOpenAIClient:
+    """Wrapper every OpenAI call goes through.
+
+    Each call gets its call site's timeout, and transient failures (timeouts,
+    connection errors, 429s, 5xx) are retried with full-jitter exponential backoff.
+    A semaphore bounds in-flight calls so a traffic spike queues here instead of
+    fanning out to the API. Reply calls can be hedged: if the first attempt is still
+    running after OPENAI_HEDGE_AFTER_SECONDS, a duplicate is sent and the first
+    answer wins. The *_async methods apply the same policy with the AsyncOpenAI
+    client; their slots are an asyncio.Semaphore of the same size, so waiting
+    coroutines are woken by the event loop instead of blocking it.
+    """
+
+    RETRYABLE_ERRORS = (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)
+    LATENCY_SAMPLES = 500  # Recent latencies kept per call site
+
+    def __init__(self, client: OpenAI, max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+                 telemetry: LLMTelemetry = None, async_client: AsyncOpenAI = None):
+        self.client = client
+        self.async_client = async_client
+        self.telemetry = telemetry
+        self.max_concurrency = max(1, max_concurrency)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._async_slots = None  # asyncio.Semaphore, bound to the event loop it was created in
+        self._async_slots_loop = None
+        self._lock = threading.Lock()
+        self._hedge_pool = None  # Created on the first hedged call
+        self.queue_stats = {
+            'in_flight': 0, 'max_in_flight': 0, 'waiting': 0, 'max_waiting': 0,
+            'acquired': 0, 'total_wait_ms': 0.0, 'max_wait_ms': 0.0, 'queue_timeouts': 0
+        }
+        self.site_stats = {}
+
+    def chat_completion(self, call_site: str, **kwargs):
+        """chat.completions.create under the call site's timeout, retry and hedging policy"""
+        operation = self.client.chat.completions.create
+        if OPENAI_HEDGE_AFTER_SECONDS > 0 and call_site in OPENAI_HEDGED_CALL_SITES:
+            return self._hedged_call(call_site, operation, kwargs)
+        return self._call(call_site, operation, kwargs)
+
+    def speech(self, call_site: str, **kwargs):
+        """audio.speech.create under the call site's timeout and retry policy"""
+        return self._call(call_site, self.client.audio.speech.create, kwargs)
+
+    async def chat_completion_async(self, call_site: str, **kwargs):
+        """chat_completion for coroutines, awaiting the AsyncOpenAI client"""
+        operation = self.async_client.chat.completions.create
+        if OPENAI_HEDGE_AFTER_SECONDS > 0 and call_site in OPENAI_HEDGED_CALL_SITES:
+            return await self._hedged_call_async(call_site, operation, kwargs)
+        return await self._call_async(call_site, operation, kwargs)
+
+    async def speech_async(self, call_site: str, **kwargs):
+        """speech for coroutines, awaiting the AsyncOpenAI client"""
+        return await self._call_async(call_site, self.async_client.audio.speech.create, kwargs)
+
+    @contextmanager
+    def _slot(self):
+        """Hold one concurrency slot, waiting at most OPENAI_QUEUE_TIMEOUT_SECONDS for it"""
+        started = self._start_waiting()
+        acquired = self._slots.acquire(timeout=OPENAI_QUEUE_TIMEOUT_SECONDS)
+        self._stop_waiting(started, acquired)
+        try:
+            yield
+        finally:
+            self._release_slot()
+
+    @asynccontextmanager
+    async def _async_slot(self):
+        """_slot for coroutines"""
+        slots = self._loop_slots()
+        started = self._start_waiting()
+        try:
+            await asyncio.wait_for(slots.acquire(), OPENAI_QUEUE_TIMEOUT_SECONDS)
+            acquired = True
+        except asyncio.TimeoutError:
+            acquired = False
+        except asyncio.CancelledError:
+            with self._lock:
+                self.queue_stats['waiting'] -= 1
+            raise
+        self._stop_waiting(started, acquired)
+        try:
+            yield
+        finally:
+            self._release_slot(slots)
+
+    def _loop_slots(self) -> asyncio.Semaphore:
+        """The running event loop's semaphore (a new loop, e.g. in tests, gets a fresh one)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._async_slots_loop is not loop:
+                self._async_slots = asyncio.Semaphore(self.max_concurrency)
+                self._async_slots_loop = loop
+            return self._async_slots
+
+    def _start_waiting(self) -> float:
+        with self._lock:
+            self.queue_stats['waiting'] += 1
+            self.queue_stats['max_waiting'] = max(self.queue_stats['max_waiting'], self.queue_stats['waiting'])
+        return time.perf_counter()
+
+    def _stop_waiting(self, started: float, acquired: bool):
+        """Account for the wait; raises OpenAIQueueTimeout if no slot was acquired"""
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.queue_stats['waiting'] -= 1
+            if acquired:
+                self.queue_stats['acquired'] += 1
+                self.queue_stats['in_flight'] += 1
+                self.queue_stats['max_in_flight'] = max(self.queue_stats['max_in_flight'], self.queue_stats['in_flight'])
+                self.queue_stats['total_wait_ms'] += wait_ms
+                self.queue_stats['max_wait_ms'] = max(self.queue_stats['max_wait_ms'], wait_ms)
+            else:
+                self.queue_stats['queue_timeouts'] += 1
+        if not acquired:
+            raise OpenAIQueueTimeout(f"No free OpenAI slot after {wait_ms:.0f} ms "
+                                     f"({self.max_concurrency} calls in flight)")
+
+    def _release_slot(self, slots=None):
+        with self._lock:
+            self.queue_stats['in_flight'] -= 1
+        (self._slots if slots is None else slots).release()
+
+    def _has_spare_slot(self) -> bool:
+        """Only hedge into spare capacity - a duplicate must never queue behind other users' calls"""
+        with self._lock:
+            return self.queue_stats['waiting'] == 0 and self.queue_stats['in_flight'] < self.max_concurrency
+
+    def _call(self, call_site: str, operation, kwargs: Dict, max_retries: int = None):
+        timeout = OPENAI_CALL_TIMEOUTS.get(call_site, OPENAI_CALL_TIMEOUTS['response'])
+        max_retries = OPENAI_MAX_RETRIES if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            started = started_at_ms = None
+            try:
+                with self._slot():
+                    started = time.perf_counter()
+                    started_at_ms = _epoch_ms()
+                    response = operation(timeout=timeout, **kwargs)
+            except self.RETRYABLE_ERRORS as e:
+                self._record(call_site, 'timeouts' if isinstance(e, APITimeoutError) else 'errors', started)
+                self._record_telemetry(call_site, kwargs, started, started_at_ms, error=e)
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                delay = self._retry_delay(attempt, e)
+                self._record(call_site, 'retries')
+                print(f"⚠️  OpenAI {call_site} call failed ({type(e).__name__}), retry {attempt}/{max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            except OpenAIQueueTimeout:
+                self._record(call_site, 'queue_timeouts')
+                raise
+            except Exception as e:
+                self._record(call_site, 'errors', started)
+                self._record_telemetry(call_site, kwargs, started, started_at_ms, error=e)
+                raise
+            self._record(call_site, 'calls', started)
+            self._record_telemetry(call_site, kwargs, started, started_at_ms, response=response)
+            return response
 
-@app.route("/dual-messaging/analytics", methods=['GET'])
-def dual_messaging_analytics():
-    """Get analytics for dual messaging usage"""
-    
-    try:
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
-        
-        # Overall dual messaging stats
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_messages,
-                SUM(CASE WHEN tts_generated = 1 THEN 1 ELSE 0 END) as voice_messages,
-                AVG(response_quality_score) as avg_quality
-            FROM conversation_turns 
-            WHERE timestamp > datetime('now', '-7 days')
-        ''')
-        
-        overall_stats = cursor.fetchone()
-        
-        # User adoption of dual messaging
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_users,
-                SUM(CASE WHEN tts_enabled = 1 THEN 1 ELSE 0 END) as dual_messaging_users
-            FROM user_profiles
-        ''')
-        
-        adoption_stats = cursor.fetchone()
-        
-        # Dual messaging specific analytics
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as dual_messaging_sessions,
-                AVG(voice_delivery_time_ms) as avg_voice_delay,
-                AVG(message_length) as avg_message_length
-            FROM dual_messaging_analytics 
-            WHERE created_at > datetime('now', '-7 days')
-        ''')
-        
-        dual_stats = cursor.fetchone()
-        
-        # TTS performance for dual messaging
-        cursor.execute('''
-            SELECT 
-                AVG(generation_time_ms) as avg_generation_time,
-                AVG(file_size_bytes) as avg_file_size,
-                COUNT(*) as total_tts_requests
-            FROM tts_analytics 
-            WHERE created_at > datetime('now', '-7 days')
-        ''')
-        
-        performance_stats = cursor.fetchone()
-        
-        conn.close()
-        
-        voice_adoption_rate = (overall_stats[1] or 0) / max(overall_stats[0], 1) * 100
-        user_adoption_rate = (adoption_stats[1] or 0) / max(adoption_stats[0], 1) * 100
-        
-        return jsonify({
-            'summary': {
-                'total_messages_7d': overall_stats[0] or 0,
-                'voice_messages_7d': overall_stats[1] or 0,
-                'voice_adoption_rate_percent': round(voice_adoption_rate, 2),
-                'avg_conversation_quality': round(overall_stats[2] or 0, 2)
-            },
-            'user_adoption': {
-                'total_users': adoption_stats[0] or 0,
-                'dual_messaging_users': adoption_stats[1] or 0,
-                'user_adoption_rate_percent': round(user_adoption_rate, 2)
-            },
-            'dual_messaging_performance': {
-                'dual_messaging_sessions_7d': dual_stats[0] or 0,
-                'avg_voice_delay_ms': round(dual_stats[1] or 0, 2),
-                'avg_message_length': round(dual_stats[2] or 0, 2)
-            },
-            'tts_performance': {
-                'avg_tts_generation_time_ms': round(performance_stats[0] or 0, 2),
-                'avg_audio_file_size_bytes': round(performance_stats[1] or 0, 2),
-                'total_tts_requests_7d': performance_stats[2] or 0
-            },
-            'dual_messaging_status': 'active',
-            'features': [
-                'Text message sent immediately (0-1 second)',
-                'Voice message sent with configurable delay (1-5 seconds)',
-                'User-configurable preferences for both messaging types',
-                'Emergency priority audio delivery',
-                'Accessibility optimized for visual impairments',
-                'Multi-engine TTS fallback for reliability',
-                'Comprehensive analytics and monitoring',
-                'Laravel dashboard integration with dual confirmations'
-            ]
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    async def _call_async(self, call_site: str, operation, kwargs: Dict, max_retries: int = None):
+        timeout = OPENAI_CALL_TIMEOUTS.get(call_site, OPENAI_CALL_TIMEOUTS['response'])
+        max_retries = OPENAI_MAX_RETRIES if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            started = started_at_ms = None
+            try:
+                async with self._async_slot():
+                    started = time.perf_counter()
+                    started_at_ms = _epoch_ms()
+                    response = await operation(timeout=timeout, **kwargs)
+            except self.RETRYABLE_ERRORS as e:
+                self._record(call_site, 'timeouts' if isinstance(e, APITimeoutError) else 'errors', started)
+                self._record_telemetry(call_site, kwargs, started, started_at_ms, error=e)
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                delay = self._retry_delay(attempt, e)
+                self._record(call_site, 'retries')
+                print(f"⚠️  OpenAI {call_site} call failed ({type(e).__name__}), retry {attempt}/{max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            except OpenAIQueueTimeout:
+                self._record(call_site, 'queue_timeouts')
+                raise
+            except Exception as e:
+                self._record(call_site, 'errors', started)
+                self._record_telemetry(call_site, kwargs, started, started_at_ms, error=e)
+                raise
+            self._record(call_site, 'calls', started)
+            self._record_telemetry(call_site, kwargs, started, started_at_ms, response=response)
+            return response
 
-# EXISTING ENDPOINTS (Enhanced)
+    def _record_telemetry(self, call_site: str, kwargs: Dict, started: Optional[float], started_at_ms: int,
+                          response=None, error: Exception = None):
+        if self.telemetry is None or started is None:  # No request was sent while still queued
+            return
+        input_text = kwargs.get('input')
+        self.telemetry.record(call_site, kwargs.get('model'), started_at_ms, (time.perf_counter() - started) * 1000,
+                              response=response, input_characters=len(input_text) if isinstance(input_text, str) else 0,
+                              error=error)
 
-@app.route("/tts/generate", methods=['POST'])
-def generate_tts():
-    """API endpoint to generate TTS audio for dual messaging"""
-    try:
-        data = request.json
-        text = data.get('text', '')
-        phone = data.get('phone', '')
-        priority = data.get('priority', 'normal')
-        
-        if not text:
-            return jsonify({'error': 'Text is required'}), 400
-        
-        # Get user preferences
-        user_profile = hsse_bot.db.get_user_profile(phone) if phone else None
-        user_preferences = {}
-        
-        if user_profile:
-            user_preferences = {
-                'tts_voice_preference': user_profile.tts_voice_preference,
-                'tts_speed_preference': user_profile.tts_speed_preference,
-                'language': user_profile.preferred_language
-            }
-        
-        # Generate TTS with dual messaging optimization
-        start_time = datetime.datetime.now()
-        audio_file = hsse_bot.tts_manager.generate_for_dual_messaging(text, user_preferences, priority)
-        generation_time = (datetime.datetime.now() - start_time).total_seconds() * 1000
-        
-        if audio_file:
-            # Get file info
-            file_size = os.path.getsize(audio_file) if os.path.exists(audio_file) else 0
-            audio_url = f"{request.url_root}tts-audio/{os.path.basename(audio_file)}"
-            
-            # Save analytics if phone provided
-            if phone:
-                hsse_bot.db.save_tts_analytics(
-                    phone, len(text), 'dual_messaging_api', int(generation_time), file_size
-                )
-            
-            return jsonify({
-                'success': True,
-                'audio_url': audio_url,
-                'file_size_bytes': file_size,
-                'generation_time_ms': int(generation_time),
-                'text_length': len(text),
-                'optimized_for': 'dual_messaging'
+    @staticmethod
+    def _retry_delay(attempt: int, error: Exception) -> float:
+        """Full jitter over an exponential ceiling, but never sooner than a 429's Retry-After"""
+        delay = random.uniform(0, OPENAI_RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        try:
+            delay = max(delay, float(headers.get('retry-after', 0)))
+        except (TypeError, ValueError):
+            pass
+        return delay
+
+    def _hedged_call(self, call_site: str, operation, kwargs: Dict):
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=self.max_concurrency * 2,
+                                                      thread_name_prefix='openai-hedge')
+        primary = self._hedge_pool.submit(self._call, call_site, operation, kwargs)
+        try:
+            return primary.result(timeout=OPENAI_HEDGE_AFTER_SECONDS)
+        except FutureTimeoutError:
+            pass
+        if not self._has_spare_slot():
+            return primary.result()
+
+        self._record(call_site, 'hedges')
+        hedge = self._hedge_pool.submit(self._call, call_site, operation, kwargs, 0)
+        done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        winner = next(iter(done))
+        loser = hedge if winner is primary else primary
+        if winner.exception() is not None:
+            return loser.result()  # The slower request may still succeed
+        if winner is hedge:
+            self._record(call_site, 'hedge_wins')
+        return winner.result()
+
+    async def _hedged_call_async(self, call_site: str, operation, kwargs: Dict):
+        primary = asyncio.ensure_future(self._call_async(call_site, operation, kwargs))
+        done, _ = await asyncio.wait([primary], timeout=OPENAI_HEDGE_AFTER_SECONDS)
+        if done or not self._has_spare_slot():
+            return await primary
+
+        self._record(call_site, 'hedges')
+        hedge = asyncio.ensure_future(self._call_async(call_site, operation, kwargs, 0))
+        done, _ = await asyncio.wait([primary, hedge], return_when=asyncio.FIRST_COMPLETED)
+        winner = primary if primary in done and primary.exception() is None else next(iter(done))
+        loser = hedge if winner is primary else primary
+        if winner.exception() is not None:
+            return await loser  # The slower request may still succeed
+        loser.cancel()  # Unlike a thread, a coroutine can give its slot back straight away
+        if winner is hedge:
+            self._record(call_site, 'hedge_wins')
+        return winner.result()
+
+    def _record(self, call_site: str, outcome: str, started: float = None):
+        with self._lock:
+            site = self.site_stats.setdefault(call_site, {
+                'calls': 0, 'errors': 0, 'timeouts': 0, 'retries': 0, 'queue_timeouts': 0,
+                'hedges': 0, 'hedge_wins': 0, 'latencies_ms': deque(maxlen=self.LATENCY_SAMPLES)
             })
+            site[outcome] += 1
+            if started is not None and outcome == 'calls':
+                site['latencies_ms'].append((time.perf_counter() - started) * 1000)
+
+    def get_stats(self) -> Dict:
+        """Concurrency/queueing totals and per-call-site outcomes and latency"""
+        with self._lock:
+            queue_stats = dict(self.queue_stats)
+            sites = {}
+            for call_site, site in self.site_stats.items():
+                latencies = sorted(site['latencies_ms'])
+                sites[call_site] = {
+                    **{key: value for key, value in site.items() if key != 'latencies_ms'},
+                    'timeout_seconds': OPENAI_CALL_TIMEOUTS.get(call_site),
+                    'avg_latency_ms': round(sum(latencies) / len(latencies), 1) if latencies else None,
+                    'p95_latency_ms': round(latencies[int(len(latencies) * 0.95) - 1], 1) if latencies else None
+                }
+        acquired = queue_stats['acquired'] or 1
+        return {
+            **queue_stats,
+            'max_concurrency': self.max_concurrency,
+            'total_wait_ms': round(queue_stats['total_wait_ms'], 1),
+            'max_wait_ms': round(queue_stats['max_wait_ms'], 1),
+            'avg_wait_ms': round(queue_stats['total_wait_ms'] / acquired, 2),
+            'hedge_after_seconds': OPENAI_HEDGE_AFTER_SECONDS or None,
+            'call_sites': sites
+        }
+
+resilient_openai = ResilientOpenAIClient(openai_client, telemetry=llm_telemetry, async_client=async_openai_client)
+
+class LLMUsageMeter:
+    """End-to-end latency and token cost of answering chat messages, per LLM mode.
+
+    measure() wraps the handling of one message; every completion made inside it
+    (on the same thread, or in the same asyncio task and the threads it hands work
+    to) reports its token usage through record().
+    """
+
+    def __init__(self):
+        self._usage = contextvars.ContextVar('llm_usage', default=None)
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    @contextmanager
+    def measure(self, mode: str):
+        usage = {'mode': mode, 'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        token = self._usage.set(usage)
+        started = time.perf_counter()
+        try:
+            yield usage
+        finally:
+            self._usage.reset(token)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                mode_stats = self.stats.setdefault(usage['mode'], {
+                    'messages': 0, 'llm_calls': 0, 'prompt_tokens': 0,
+                    'completion_tokens': 0, 'total_latency_ms': 0.0
+                })
+                mode_stats['messages'] += 1
+                mode_stats['llm_calls'] += usage['calls']
+                mode_stats['prompt_tokens'] += usage['prompt_tokens']
+                mode_stats['completion_tokens'] += usage['completion_tokens']
+                mode_stats['total_latency_ms'] += elapsed_ms
+
+    def record(self, response):
+        """Count a completion's tokens towards the message being measured in this context"""
+        usage = self._usage.get()
+        if usage is None:
+            return
+        usage['calls'] += 1
+        tokens = getattr(response, 'usage', None)
+        if tokens:
+            usage['prompt_tokens'] += getattr(tokens, 'prompt_tokens', 0) or 0
+            usage['completion_tokens'] += getattr(tokens, 'completion_tokens', 0) or 0
+
+    def get_stats(self) -> Dict:
+        """Per-mode totals with per-message averages"""
+        with self._lock:
+            stats = {}
+            for mode, mode_stats in self.stats.items():
+                messages = mode_stats['messages'] or 1
+                stats[mode] = {
+                    **mode_stats,
+                    'total_latency_ms': round(mode_stats['total_latency_ms'], 1),
+                    'avg_latency_ms': round(mode_stats['total_latency_ms'] / messages, 1),
+                    'avg_llm_calls': round(mode_stats['llm_calls'] / messages, 2),
+                    'avg_tokens': round((mode_stats['prompt_tokens'] + mode_stats['completion_tokens']) / messages, 1)
+                }
+            return {'active_mode': LLM_MODE, 'modes': stats}
+
+llm_usage_meter = LLMUsageMeter()
+
+class LocalIntentClassifier:
+    """Fast local intent classification in front of the LLM.
+
+    Two stages: a token trie of fixed phrases ("thanks", "ok", "what is ...")
+    and a multinomial naive Bayes model fitted offline from the LLM-labelled
+    intents in conversation_turns (`flask train-intent-model`). Both return the
+    same intent dict as the LLM with a confidence score; callers use it above
+    LOCAL_INTENT_THRESHOLD and ask the LLM otherwise. Messages mentioning a
+    hazard or urgency ("what is this gas smell in the pump room") are always
+    left to the LLM, however confident the local guess. When the LLM does answer,
+    its intent is compared with the local guess for the agreement rate.
+    """
+
+    INTENTS = ['greeting', 'question', 'report_incident', 'emergency', 'complaint', 'compliment',
+               'casual_chat', 'request_help', 'location_sharing', 'other']
+    RESPONSE_STYLES = {
+        'question': 'informative',
+        'report_incident': 'empathetic',
+        'complaint': 'empathetic',
+        'request_help': 'reassuring',
+        'emergency': 'direct'
+    }
+    # (phrase, intent, confidence, whole message only)
+    RULES = [
+        ('hi', 'greeting', 0.95, True), ('hello', 'greeting', 0.95, True), ('hey', 'greeting', 0.95, True),
+        ('hi aria', 'greeting', 0.95, True), ('hello aria', 'greeting', 0.95, True),
+        ('good morning', 'greeting', 0.95, True), ('good afternoon', 'greeting', 0.95, True),
+        ('good evening', 'greeting', 0.95, True),
+        ('thanks', 'compliment', 0.95, True), ('thank you', 'compliment', 0.95, True),
+        ('thanks a lot', 'compliment', 0.95, True), ('thank you so much', 'compliment', 0.95, True),
+        ('much appreciated', 'compliment', 0.95, True), ('cheers', 'compliment', 0.9, True),
+        ('great', 'compliment', 0.9, True), ('awesome', 'compliment', 0.9, True), ('perfect', 'compliment', 0.9, True),
+        ('ok', 'casual_chat', 0.9, True), ('okay', 'casual_chat', 0.9, True), ('ok thanks', 'casual_chat', 0.9, True),
+        ('got it', 'casual_chat', 0.9, True), ('cool', 'casual_chat', 0.9, True), ('alright', 'casual_chat', 0.9, True),
+        ('noted', 'casual_chat', 0.9, True), ('sure', 'casual_chat', 0.9, True),
+        ('what is', 'question', 0.88, False), ('what are', 'question', 0.88, False),
+        ("what's", 'question', 0.88, False), ('how do i', 'question', 0.88, False),
+        ('how do you', 'question', 0.88, False), ('how to', 'question', 0.88, False),
+        ('how can i', 'question', 0.88, False), ('why is', 'question', 0.86, False),
+        ('why do', 'question', 0.86, False), ('when should', 'question', 0.86, False),
+        ('where can i', 'question', 0.86, False), ('can you explain', 'question', 0.88, False),
+        ('i want to report', 'report_incident', 0.9, False), ('i need to report', 'report_incident', 0.9, False),
+        ('report an incident', 'report_incident', 0.9, False), ('report a hazard', 'report_incident', 0.9, False)
+    ]
+    MAX_RULE_TOKENS = 15  # Longer messages carry too much nuance for a phrase rule
+    # Signs the "question" may be a live emergency; the local guess then stays below the threshold
+    HAZARD_WORDS = {
+        'gas', 'smell', 'smells', 'smelling', 'smoke', 'smoking', 'fumes', 'burning', 'fire', 'flames', 'spark',
+        'sparks', 'sparking', 'leak', 'leaking', 'spill', 'spilled', 'spilt', 'explosion', 'exploded', 'blast',
+        'h2s', 'toxic', 'alarm', 'evacuate', 'emergency', 'urgent', 'danger', 'dangerous', 'unsafe',
+        'injured', 'injury', 'hurt', 'bleeding', 'unconscious', 'collapsed', 'fainted', 'dizzy', 'shock',
+        'electrocuted', 'trapped', 'fell', 'falling', 'crack', 'cracked', 'help', 'accident'
+    }
+    HAZARD_PHRASES = ['carbon monoxide', 'chest pain', "can't breathe", 'cannot breathe', 'not breathing']
+    MAX_MODEL_TOKENS = 30
+    TOPIC_KEYWORDS = {
+        'ppe': ['ppe', 'helmet', 'hard hat', 'gloves', 'goggles', 'harness', 'respirator', 'boots', 'vest'],
+        'fire safety': ['fire', 'extinguisher', 'smoke', 'evacuation', 'alarm'],
+        'chemical safety': ['chemical', 'chemicals', 'msds', 'sds', 'spill', 'flammable', 'toxic'],
+        'electrical safety': ['electrical', 'electric', 'lockout', 'tagout', 'loto', 'wiring', 'voltage'],
+        'confined spaces': ['confined', 'tank', 'manhole'],
+        'ergonomics': ['ergonomic', 'ergonomics', 'lifting', 'posture', 'manual handling'],
+        'working at height': ['ladder', 'scaffold', 'scaffolding', 'height', 'fall'],
+        'first aid': ['first aid', 'cpr', 'injury', 'bleeding'],
+        'training': ['training', 'induction', 'certification', 'course']
+    }
+
+    def __init__(self, model_path: str = LOCAL_INTENT_MODEL_PATH, enabled: bool = LOCAL_INTENT_ENABLED,
+                 threshold: float = LOCAL_INTENT_THRESHOLD):
+        self.model_path = model_path
+        self.enabled = enabled
+        self.threshold = threshold
+        self.rule_trie = self._build_trie(self.RULES)
+        self.model = self._load_model()
+        self._lock = threading.Lock()
+        self.stats = {
+            'classified': 0,
+            'rule_hits': 0,
+            'model_hits': 0,
+            'llm_fallbacks': 0,
+            'audited': 0,
+            'compared': 0,
+            'agreed': 0
+        }
+
+    @staticmethod
+    def _tokenize(message: str) -> List[str]:
+        return re.findall(r"[a-z0-9']+", message.lower())
+
+    @staticmethod
+    def _features(tokens: List[str]) -> List[str]:
+        return tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+
+    @staticmethod
+    def _build_trie(rules: List[tuple]) -> Dict:
+        trie = {}
+        for phrase, intent, confidence, whole_message in rules:
+            node = trie
+            for token in LocalIntentClassifier._tokenize(phrase):
+                node = node.setdefault(token, {})
+            node['$'] = (intent, confidence, whole_message)
+        return trie
+
+    def _match_rules(self, tokens: List[str]) -> Optional[tuple]:
+        """Longest phrase rule matching the start of the message"""
+        node, match = self.rule_trie, None
+        for position, token in enumerate(tokens):
+            node = node.get(token)
+            if node is None:
+                break
+            rule = node.get('$')
+            if rule and (not rule[2] or position == len(tokens) - 1):
+                match = rule
+        return match
+
+    def _load_model(self) -> Optional[Dict]:
+        try:
+            if os.path.exists(self.model_path):
+                with open(self.model_path) as model_file:
+                    model = json.load(model_file)
+                model['vocabulary'] = set(model['vocabulary'])
+                print(f"🧭 Loaded local intent model ({model['samples']} samples, {len(model['class_counts'])} intents)")
+                return model
+        except Exception as e:
+            print(f"Error loading local intent model: {e}")
+        return None
+
+    def _predict_model(self, tokens: List[str]) -> Optional[tuple]:
+        """(intent, posterior) from the naive Bayes model, or None when it can't judge the message"""
+        model = self.model
+        if not model or len(tokens) > self.MAX_MODEL_TOKENS:
+            return None
+        features = self._features(tokens)
+        if not any(feature in model['vocabulary'] for feature in features):
+            return None
+
+        vocabulary_size = len(model['vocabulary'])
+        total_samples = sum(model['class_counts'].values())
+        log_scores = {}
+        for intent, class_count in model['class_counts'].items():
+            feature_counts = model['feature_counts'][intent]
+            denominator = model['feature_totals'][intent] + vocabulary_size
+            score = math.log(class_count / total_samples)
+            for feature in features:
+                score += math.log((feature_counts.get(feature, 0) + 1) / denominator)
+            log_scores[intent] = score
+
+        best_score = max(log_scores.values())
+        normalizer = sum(math.exp(score - best_score) for score in log_scores.values())
+        intent = max(log_scores, key=log_scores.get)
+        return intent, 1.0 / normalizer
+
+    def _key_topics(self, message: str, tokens: List[str]) -> List[str]:
+        token_set = set(tokens)
+        message_lower = message.lower()
+        return [topic for topic, keywords in self.TOPIC_KEYWORDS.items()
+                if any((keyword in message_lower) if ' ' in keyword else (keyword in token_set) for keyword in keywords)]
+
+    def _mentions_hazard(self, message: str, tokens: List[str]) -> bool:
+        message_lower = message.lower()
+        return (not self.HAZARD_WORDS.isdisjoint(tokens)
+                or any(phrase in message_lower for phrase in self.HAZARD_PHRASES))
+
+    def classify(self, message: str) -> Optional[Dict]:
+        """Local intent dict in the LLM's format, or None if neither stage has an opinion"""
+        if not self.enabled:
+            return None
+        tokens = self._tokenize(message)
+        if not tokens:
+            return None
+
+        rule = self._match_rules(tokens) if len(tokens) <= self.MAX_RULE_TOKENS else None
+        if rule:
+            intent, confidence, source = rule[0], rule[1], 'local_rules'
         else:
-            return jsonify({'error': 'Failed to generate TTS audio'}), 500
-            
-    except Exception as e:
-        print(f"TTS generation API error: {e}")
-        return jsonify({'error': str(e)}), 500
+            prediction = self._predict_model(tokens)
+            if not prediction:
+                return None
+            (intent, confidence), source = prediction, 'local_model'
 
-# Laravel webhook endpoints (Enhanced)
-@app.route("/webhook/status-update", methods=['POST'])
-def receive_status_update():
-    """Receive status updates from Laravel backend with dual messaging"""
-    try:
-        data = request.json
-        report_id = data.get('report_id')
-        status = data.get('status')
-        phone_number = data.get('phone_number')
-        
-        if phone_number and status:
-            # Get user profile for dual messaging preferences
-            user_profile = hsse_bot.db.get_user_profile(phone_number)
-            
-            # Send status update to user via WhatsApp
-            message_body = f"""📊 **Laravel Dashboard Report Update**
+        if self._mentions_hazard(message, tokens):
+            confidence = min(confidence, self.threshold - 0.05)
 
-🆔 Report ID: {report_id}
-📋 New Status: {status}
-🚀 Updated on Laravel Dashboard
+        key_topics = self._key_topics(message, tokens)
+        return {
+            "primary_intent": intent,
+            "secondary_intents": [],
+            "urgency_level": "medium" if intent in ('report_incident', 'complaint') else "low",
+            "emotional_tone": "happy" if intent == 'compliment' else "neutral",
+            "conversation_style": "casual",
+            "expertise_level": "intermediate",
+            "safety_related": bool(key_topics) or intent == 'report_incident',
+            "needs_human_response": False,
+            "key_topics": key_topics,
+            "response_style_needed": self.RESPONSE_STYLES.get(intent, 'simple'),
+            "follow_up_questions": [],
+            "tts_suitable": True,
+            "confidence_score": round(confidence, 3),
+            "intent_source": source
+        }
 
-Your safety report has been reviewed and updated. Thank you for helping keep everyone safe! 🛡️
+    def use_local(self, local_intent: Optional[Dict]) -> bool:
+        """Whether a local classification is confident enough to skip the LLM"""
+        with self._lock:
+            self.stats['classified'] += 1
+            if local_intent and local_intent['confidence_score'] >= self.threshold:
+                if LOCAL_INTENT_AUDIT_RATE > 0 and random.random() < LOCAL_INTENT_AUDIT_RATE:
+                    self.stats['audited'] += 1  # Let the LLM answer too so agreement covers confident hits
+                    return False
+                self.stats['rule_hits' if local_intent['intent_source'] == 'local_rules' else 'model_hits'] += 1
+                return True
+            self.stats['llm_fallbacks'] += 1
+            return False
 
-Type 'MENU' to access more safety features or ask me anything!
+    def record_comparison(self, local_intent: Optional[Dict], llm_intent: Dict):
+        """Compare a local guess with the LLM's intent for the agreement rate"""
+        if not local_intent or not isinstance(llm_intent, dict):
+            return
+        with self._lock:
+            self.stats['compared'] += 1
+            if local_intent['primary_intent'] == llm_intent.get('primary_intent'):
+                self.stats['agreed'] += 1
+
+    def train(self, db_path: str = 'hsse_reports.db') -> Dict:
+        """Fit the naive Bayes model from LLM-labelled conversation turns and save it"""
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT user_message, intent FROM conversation_turns
+            WHERE user_message IS NOT NULL AND intent IS NOT NULL
+              AND COALESCE(intent_source, 'llm') = 'llm'
+        ''')
+        rows = cursor.fetchall()
+        conn.close()
 
-🎙️ This update is provided in both text and voice for your convenience."""
+        class_counts = Counter()
+        feature_counts = {}
+        for user_message, intent in rows:
+            if intent not in self.INTENTS:
+                continue
+            tokens = self._tokenize(user_message)
+            if not tokens:
+                continue
+            class_counts[intent] += 1
+            feature_counts.setdefault(intent, Counter()).update(self._features(tokens))
+
+        samples = sum(class_counts.values())
+        if samples < LOCAL_INTENT_MIN_TRAINING_SAMPLES or len(class_counts) < 2:
+            return {'trained': False, 'samples': samples, 'intents': len(class_counts)}
+
+        vocabulary = sorted(set().union(*feature_counts.values()))
+        model = {
+            'trained_at': datetime.datetime.now().isoformat(),
+            'samples': samples,
+            'class_counts': dict(class_counts),
+            'feature_counts': {intent: dict(counts) for intent, counts in feature_counts.items()},
+            'feature_totals': {intent: sum(counts.values()) for intent, counts in feature_counts.items()},
+            'vocabulary': vocabulary
+        }
+        with open(self.model_path, 'w') as model_file:
+            json.dump(model, model_file)
+        self.model = {**model, 'vocabulary': set(vocabulary)}
+        return {'trained': True, 'samples': samples, 'intents': len(class_counts), 'vocabulary': len(vocabulary)}
+
+    def get_stats(self) -> Dict:
+        """Hit rate and LLM agreement"""
+        with self._lock:
+            stats = dict(self.stats)
+        local_hits = stats['rule_hits'] + stats['model_hits']
+        return {
+            **stats,
+            'enabled': self.enabled,
+            'threshold': self.threshold,
+            'model_loaded': self.model is not None,
+            'model_samples': self.model['samples'] if self.model else 0,
+            'hit_rate': round(local_hits / stats['classified'], 3) if stats['classified'] else 0.0,
+            'agreement_rate': round(stats['agreed'] / stats['compared'], 3) if stats['compared'] else None
+        }
+
+local_intent_classifier = LocalIntentClassifier()
+
+class AnalyzerResultCache:
+    """Bounded LRU cache of analyzer LLM results keyed by normalized message text.
+
+    analyze_message_intent and extract_user_info depend only on the message, so
+    repeats like "hi" or "ok thanks" reuse the stored result. Entries are written
+    through to the analyzer_cache table and the most recently used ones are loaded
+    at startup; hit counts and recency are flushed in batches.
+    """
+
+    MAX_MESSAGE_LENGTH = 500  # Long messages rarely repeat word for word
+    FLUSH_EVERY_HITS = 100
+
+    def __init__(self, db_path: str = 'hsse_reports.db', max_entries: int = ANALYZER_CACHE_MAX_ENTRIES,
+                 enabled: bool = ANALYZER_CACHE_ENABLED):
+        self.db_path = db_path
+        self.max_entries = max(1, max_entries)
+        self.enabled = enabled
+        self.entries = OrderedDict()  # (kind, message key) -> {'result', 'hits', 'last_used_ms'}
+        self.pending = set()  # Keys whose hits / recency aren't in SQLite yet
+        self._lock = threading.Lock()
+        self.stats = {'loaded': 0, 'evictions': 0}
+        self.kind_stats = {}
+        if self.enabled:
+            self._load()
+
+    def _load(self):
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS analyzer_cache (
+                    kind TEXT,
+                    message_key TEXT,
+                    result TEXT,
+                    hits INTEGER DEFAULT 0,
+                    created_at_ms INTEGER,
+                    last_used_ms INTEGER,
+                    PRIMARY KEY (kind, message_key)
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_analyzer_cache_last_used ON analyzer_cache (last_used_ms)')
+            cursor.execute('''
+                SELECT kind, message_key, result, hits, last_used_ms FROM analyzer_cache
+                ORDER BY last_used_ms DESC LIMIT ?
+            ''', (self.max_entries,))
+            rows = cursor.fetchall()
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error loading analyzer cache: {e}")
+            return
+
+        for kind, message_key, result, hits, last_used_ms in reversed(rows):
+            self.entries[(kind, message_key)] = {'result': result, 'hits': hits or 0, 'last_used_ms': last_used_ms}
+        self.stats['loaded'] = len(rows)
+
+    @classmethod
+    def normalize(cls, message: str) -> Optional[str]:
+        """Lowercase, collapse whitespace and repeated end punctuation ("OK  thanks!!" -> "ok thanks!")"""
+        key = re.sub(r'\s+', ' ', (message or '').strip().lower())
+        key = re.sub(r'([!?.])\1+$', r'\1', key)
+        return key if key and len(key) <= cls.MAX_MESSAGE_LENGTH else None
+
+    def _count(self, kind: str, outcome: str):
+        kind_stats = self.kind_stats.setdefault(kind, {'hits': 0, 'misses': 0, 'stores': 0})
+        kind_stats[outcome] += 1
+
+    def get(self, kind: str, message: str) -> Optional[Dict]:
+        """Cached result for this message, as a fresh copy"""
+        if not self.enabled:
+            return None
+        message_key = self.normalize(message)
+        if message_key is None:
+            return None
+
+        with self._lock:
+            entry = self.entries.get((kind, message_key))
+            if entry is None:
+                self._count(kind, 'misses')
+                return None
+            self.entries.move_to_end((kind, message_key))
+            entry['hits'] += 1
+            entry['last_used_ms'] = _epoch_ms()
+            self.pending.add((kind, message_key))
+            self._count(kind, 'hits')
+            flush_now = len(self.pending) >= self.FLUSH_EVERY_HITS
+            result = entry['result']
+
+        if flush_now:
+            self.flush()
+        return json.loads(result)
+
+    def put(self, kind: str, message: str, result: Dict):
+        """Store an LLM result and write it through to SQLite"""
+        if not self.enabled or not isinstance(result, dict):
+            return
+        message_key = self.normalize(message)
+        if message_key is None:
+            return
+
+        now_ms = _epoch_ms()
+        result_json = json.dumps(result)
+        with self._lock:
+            self.entries[(kind, message_key)] = {'result': result_json, 'hits': 0, 'last_used_ms': now_ms}
+            self.entries.move_to_end((kind, message_key))
+            self._count(kind, 'stores')
+            while len(self.entries) > self.max_entries:
+                evicted_key, _ = self.entries.popitem(last=False)
+                self.pending.discard(evicted_key)
+                self.stats['evictions'] += 1
+
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute('''
+                INSERT INTO analyzer_cache (kind, message_key, result, hits, created_at_ms, last_used_ms)
+                VALUES (?, ?, ?, 0, ?, ?)
+                ON CONFLICT (kind, message_key) DO UPDATE SET
+                    result = excluded.result, last_used_ms = excluded.last_used_ms
+            ''', (kind, message_key, result_json, now_ms, now_ms))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error saving analyzer cache entry: {e}")
+
+    def flush(self):
+        """Write pending hit counts / recency and trim the table to the size cap"""
+        if not self.enabled:
+            return
+        with self._lock:
+            updates = [(entry['hits'], entry['last_used_ms'], kind, message_key)
+                       for kind, message_key in self.pending
+                       for entry in [self.entries.get((kind, message_key))] if entry]
+            self.pending.clear()
+
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            cursor = conn.cursor()
+            cursor.executemany('''
+                UPDATE analyzer_cache SET hits = ?, last_used_ms = ? WHERE kind = ? AND message_key = ?
+            ''', updates)
+            cursor.execute('''
+                DELETE FROM analyzer_cache WHERE rowid IN (
+                    SELECT rowid FROM analyzer_cache ORDER BY last_used_ms DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error flushing analyzer cache: {e}")
+
+    def get_stats(self) -> Dict:
+        """Per-analyzer hit/miss counters and cache size"""
+        with self._lock:
+            kinds = {}
+            for kind, kind_stats in self.kind_stats.items():
+                lookups = kind_stats['hits'] + kind_stats['misses']
+                kinds[kind] = {**kind_stats,
+                               'hit_rate': round(kind_stats['hits'] / lookups, 3) if lookups else 0.0}
+            return {
+                **self.stats,
+                'enabled': self.enabled,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'analyzers': kinds
+            }
+
+analyzer_cache = AnalyzerResultCache()
+
+class ConversationAnalyzer:
+    """Advanced conversation analysis and context understanding"""
+    
+    @staticmethod
+    def detect_tts_command(message: str) -> Optional[Dict]:
+        """Recognize voice on/off commands without calling the LLM"""
+        message_lower = message.lower()
+        if any(phrase in message_lower for phrase in ['voice off', 'no voice', 'no audio', 'disable voice']):
+            return {
+                "primary_intent": "tts_control",
+                "secondary_intents": ["disable_tts"],
+                "urgency_level": "low",
+                "emotional_tone": "neutral",
+                "conversation_style": "functional",
+                "tts_command": "disable",
+                "confidence_score": 0.9
+            }
+        
+        if any(phrase in message_lower for phrase in ['voice on', 'enable voice', 'enable audio', 'turn on voice']):
+            return {
+                "primary_intent": "tts_control", 
+                "secondary_intents": ["enable_tts"],
+                "urgency_level": "low",
+                "emotional_tone": "neutral",
+                "conversation_style": "functional",
+                "tts_command": "enable",
+                "confidence_score": 0.9
+            }
+        
+        return None
+    
+    @staticmethod
+    def analyze_message_intent(message: str, context: Dict = None) -> Dict:
+        """Analyze message intent with deep understanding"""
+        try:
+            local_intent, intent_analysis = ConversationAnalyzer._intent_without_llm(message)
+            if intent_analysis:
+                return intent_analysis
             
-            # Send text message
-            text_message = twilio_client.messages.create(
-                body=message_body,
-                from_=TWILIO_WHATSAPP_NUMBER,
-                to=phone_number
-            )
+            response = resilient_openai.chat_completion('intent', **ConversationAnalyzer._intent_request(message))
+            return ConversationAnalyzer._parse_intent_response(message, local_intent, response)
             
-            # Generate and send TTS if user has dual messaging enabled
-            if user_profile and user_profile.tts_enabled and TTS_ENABLED:
-                try:
-                    tts_audio_url = hsse_bot.tts_manager.generate_for_dual_messaging(message_body)
-                    
-                    if tts_audio_url and os.path.exists(tts_audio_url):
-                        audio_filename = os.path.basename(tts_audio_url)
-                        audio_url = f"{request.url_root}tts-audio/{audio_filename}"
-                        
-                        voice_message = twilio_client.messages.create(
-                            media_url=[audio_url],
-                            from_=TWILIO_WHATSAPP_NUMBER,
-                            to=phone_number,
-                            body="🎙️ Audio update from Laravel dashboard"
-                        )
-                        
-                        print(f"✅ Dual messaging status update sent: text {text_message.sid}, voice {voice_message.sid}")
-                    
-                except Exception as e:
-                    print(f"Error sending voice status update: {e}")
+        except Exception as e:
+            print(f"Intent analysis error: {e}")
+            return ConversationAnalyzer._fallback_intent(message)
+    
+    @staticmethod
+    async def analyze_message_intent_async(message: str, context: Dict = None) -> Dict:
+        """analyze_message_intent awaiting the AsyncOpenAI client; the cache and local model run on the worker pool"""
+        try:
+            local_intent, intent_analysis = await asyncio.to_thread(ConversationAnalyzer._intent_without_llm, message)
+            if intent_analysis:
+                return intent_analysis
             
-        return jsonify({'success': True})
-    except Exception as e:
-        print(f"Error handling status update: {e}")
-        return jsonify({'success': False, 'error': str(e)})
-
-@app.route("/test-laravel", methods=['GET'])
-def test_laravel_connection():
-    """Test connection to Laravel backend with dual messaging capabilities"""
-    try:
-        # First test basic connection
-        connection_test = hsse_bot.laravel_client.test_connection()
-        
-        if not connection_test.get('success'):
-            return jsonify({
-                'error': 'Laravel connection failed',
-                'details': connection_test,
-                'chatbot_status': 'Ready but Laravel backend unavailable',
-                'suggestion': 'Please check if Laravel server is running and LARAVEL_BASE_URL is correct'
-            })
+            response = await resilient_openai.chat_completion_async('intent', **ConversationAnalyzer._intent_request(message))
+            return await asyncio.to_thread(ConversationAnalyzer._parse_intent_response, message, local_intent, response)
+            
+        except Exception as e:
+            print(f"Intent analysis error: {e}")
+            return ConversationAnalyzer._fallback_intent(message)
+    
+    @staticmethod
+    def _intent_without_llm(message: str) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """(local intent, answer) - the answer is set when no LLM call is needed"""
+        # Check for TTS control commands
+        tts_command = ConversationAnalyzer.detect_tts_command(message)
+        if tts_command:
+            return None, tts_command
+        
+        # Confident local classifications skip the LLM entirely
+        local_intent = local_intent_classifier.classify(message)
+        if local_intent_classifier.use_local(local_intent):
+            return local_intent, local_intent
+        
+        return local_intent, analyzer_cache.get('intent', message)
+    
+    @staticmethod
+    def _intent_request(message: str) -> Dict:
+        # Use OpenAI for intent analysis
+        prompt = f"""
+            Analyze this message and determine the user's intent, mood, and context needs.
+            
+            Message: "{message}"
+            
+            Provide analysis in JSON format:
+            {{
+                "primary_intent": "greeting|question|report_incident|emergency|complaint|compliment|casual_chat|request_help|location_sharing|tts_control|other",
+                "secondary_intents": ["list", "of", "secondary", "intents"],
+                "urgency_level": "low|medium|high|critical",
+                "emotional_tone": "happy|sad|frustrated|angry|worried|excited|neutral|confused",
+                "conversation_style": "casual|professional|urgent|friendly|formal",
+                "expertise_level": "beginner|intermediate|expert",
+                "safety_related": true/false,
+                "needs_human_response": true/false,
+                "key_topics": ["topic1", "topic2"],
+                "response_style_needed": "empathetic|informative|reassuring|direct|detailed|simple",
+                "follow_up_questions": ["suggested", "questions", "to", "ask"],
+                "tts_suitable": true/false,
+                "confidence_score": 0.5
+            }}
+            """
         
-        # Test data submission if connection works
-        test_data = {
-            'report_type': 'test',
-            'description': 'Test connection from enhanced chatbot with dual messaging (text + voice)',
-            'date_of_incident': datetime.datetime.now().strftime('%Y-%m-%d'),
-            'time_of_incident': datetime.datetime.now().strftime('%H:%M:%S'),
-            'reporter_name': 'Test User',
-            'reporter_contact': 'whatsapp:+1234567890',
-            'severity': 'low',
-            'source': 'whatsapp_chatbot_dual_messaging',
-            'industry': 'Testing',
-            'incident_type': 'test',
-            'status': 'test',
-            'ai_analysis': '{"test": "Automated test from dual messaging chatbot system"}',
-            'submitted_via': 'whatsapp_chatbot_dual_messaging',
-            'submission_timestamp': datetime.datetime.now().isoformat()
+        return {
+            'model': "gpt-3.5-turbo",
+            'messages': [{"role": "user", "content": prompt}],
+            'max_tokens': 400,
+            'temperature': 0.2
         }
+    
+    @staticmethod
+    def _parse_intent_response(message: str, local_intent: Optional[Dict], response) -> Dict:
+        llm_usage_meter.record(response)
         
-        submission_test = hsse_bot.laravel_client.submit_report(test_data)
-        
-        return jsonify({
-            'connection_test': connection_test,
-            'submission_test': submission_test,
-            'chatbot_status': 'Enhanced chatbot with Laravel integration and dual messaging ready',
-            'laravel_base_url': LARAVEL_BASE_URL,
-            'dual_messaging_status': {
-                'text_delivery': 'immediate',
-                'voice_delivery': 'delayed_configurable',
-                'tts_enabled': TTS_ENABLED,
-                'engines_available': {
-                    'pyttsx3': TTS_AVAILABLE and hsse_bot.tts_manager.pyttsx3_ready,
-                    'gtts': GTTS_AVAILABLE,
-                    'openai': bool(OPENAI_API_KEY)
-                }
-            },
-            'features': [
-                'Smart Conversation Tracking',
-                'Laravel Dashboard Integration', 
-                'AI-Enhanced Incident Reporting',
-                'Real-time Status Updates',
-                'Emergency Detection & Response',
-                'Multi-media Support',
-                'DUAL TEXT+VOICE MESSAGING',
-                'Immediate text delivery (0-1 second)',
-                'Delayed voice delivery (2-3 seconds)',
-                'Voice Accessibility Features',
-                'Multi-engine TTS Fallback',
-                'Emergency Audio Alerts',
-                'User-configurable Voice Settings',
-                'Comprehensive Dual Messaging Analytics'
-            ]
-        })
-    except Exception as e:
-        return jsonify({
-            'error': str(e),
-            'chatbot_status': 'Error during Laravel integration test',
-            'suggestion': 'Check Laravel server status and configuration'
-        })
-
-# Enhanced analytics endpoints
-@app.route("/conversation-analytics/<phone>", methods=['GET'])
-def get_conversation_analytics(phone):
-    """Get conversation analytics including dual messaging usage"""
-    try:
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
-        
-        # Get recent conversation data
-        cursor.execute('''
-            SELECT COUNT(*) as total_turns,
-                   AVG(response_quality_score) as avg_quality,
-                   COUNT(DISTINCT thread_id) as total_conversations,
-                   SUM(CASE WHEN tts_generated = 1 THEN 1 ELSE 0 END) as tts_responses
-            FROM conversation_turns 
-            WHERE phone = ? AND timestamp > datetime('now', '-7 days')
-        ''', (phone,))
-        
-        stats = cursor.fetchone()
-        
-        # Dual messaging specific stats
-        cursor.execute('''
-            SELECT COUNT(*) as dual_sessions,
-                   AVG(voice_delivery_time_ms) as avg_voice_delay
-            FROM dual_messaging_analytics 
-            WHERE phone = ? AND created_at > datetime('now', '-7 days')
-        ''', (phone,))
-        
-        dual_stats = cursor.fetchone()
-        
-        # Laravel integration stats
-        cursor.execute('''
-            SELECT COUNT(*) as laravel_reports
-            FROM local_reports 
-            WHERE user_phone = ? AND status = 'submitted'
-        ''', (phone,))
-        
-        laravel_stats = cursor.fetchone()
-        
-        # TTS usage stats
-        cursor.execute('''
-            SELECT COUNT(*) as tts_requests,
-                   AVG(generation_time_ms) as avg_generation_time,
-                   AVG(file_size_bytes) as avg_file_size
-            FROM tts_analytics 
-            WHERE phone = ? AND created_at > datetime('now', '-7 days')
-        ''', (phone,))
-        
-        tts_stats = cursor.fetchone()
-        
-        conn.close()
+        intent_analysis = json.loads(response.choices[0].message.content)
+        local_intent_classifier.record_comparison(local_intent, intent_analysis)
+        analyzer_cache.put('intent', message, intent_analysis)
+        return intent_analysis
+    
+    @staticmethod
+    def _fallback_intent(message: str) -> Dict:
+        # Enhanced fallback analysis
+        message_lower = message.lower()
         
-        return jsonify({
-            'total_turns': stats[0] or 0,
-            'avg_quality_score': round(stats[1] or 0, 2),
-            'total_conversations': stats[2] or 0,
-            'tts_responses_generated': stats[3] or 0,
-            'dual_messaging_sessions': dual_stats[0] or 0,
-            'avg_voice_delay_ms': round(dual_stats[1] or 0, 2),
-            'laravel_reports_submitted': laravel_stats[0] or 0,
-            'tts_usage': {
-                'total_requests': tts_stats[0] or 0,
-                'avg_generation_time_ms': round(tts_stats[1] or 0, 2),
-                'avg_file_size_bytes': round(tts_stats[2] or 0, 2)
-            },
-            'dual_messaging_efficiency': round((dual_stats[0] or 0) / max(stats[0], 1) * 100, 2)
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)})
-
-@app.route("/reports", methods=['GET'])
-def get_reports():
-    """API endpoint to view all reports (for dashboard)"""
-    try:
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
+        # Emergency detection fallback
+        if any(word in message_lower for word in ['fire', 'emergency', 'urgent', 'help', 'accident', 'injury', 'danger']):
+            return {
+                "primary_intent": "emergency",
+                "urgency_level": "critical",
+                "emotional_tone": "urgent",
+                "safety_related": True,
+                "response_style_needed": "emergency",
+                "tts_suitable": True,
+                "confidence_score": 0.9,
+                "key_topics": ["emergency"]
+            }
         
-        cursor.execute('SELECT * FROM reports ORDER BY created_at DESC')
-        reports = cursor.fetchall()
-        conn.close()
+        # Incident reporting detection
+        elif any(word in message_lower for word in ['report', 'incident', 'happened', 'problem']):
+            return {
+                "primary_intent": "report_incident",
+                "urgency_level": "medium",
+                "safety_related": True,
+                "response_style_needed": "empathetic",
+                "tts_suitable": True,
+                "confidence_score": 0.7,
+                "key_topics": ["incident"]
+            }
         
-        return jsonify([{
-            'id': r[0], 'user_phone': r[1], 'timestamp': r[2],
-            'incident_type': r[3], 'severity': r[4], 'description': r[5],
-            'location': r[6], 'location_lat': r[7], 'location_long': r[8],
-            'status': r[10], 'created_at': r[12], 'laravel_report_id': r[13]
-        } for r in reports])
-    except Exception as e:
-        return jsonify({'error': str(e)})
+        return {
+            "primary_intent": "question" if "?" in message else "casual_chat",
+            "urgency_level": "low",
+            "emotional_tone": "neutral",
+            "safety_related": any(word in message_lower for word in ['safety', 'accident', 'injury', 'hazard', 'incident']),
+            "response_style_needed": "empathetic",
+            "tts_suitable": True,
+            "confidence_score": 0.3,
+            "key_topics": []
+        }
 
-@app.route("/health", methods=['GET'])
-def health_check():
-    """Health check endpoint with Laravel integration status and dual messaging capabilities"""
+    @staticmethod
+    def extract_user_info(message: str) -> Dict:
+        """Extract user information from natural conversation"""
+        try:
+            cached_info = analyzer_cache.get('user_info', message)
+            if cached_info is not None:
+                return cached_info
+            
+            response = resilient_openai.chat_completion('user_info', **ConversationAnalyzer._user_info_request(message))
+            return ConversationAnalyzer._parse_user_info_response(message, response)
+            
+        except Exception as e:
+            print(f"User info extraction error: {e}")
+            return {}
     
-    # Test Laravel connection
-    try:
-        test_result = hsse_bot.laravel_client.get_report_status('test')
-        laravel_status = "connected" if test_result.get('success') != False else "connection_issues"
-    except:
-        laravel_status = "offline"
+    @staticmethod
+    async def extract_user_info_async(message: str) -> Dict:
+        """extract_user_info awaiting the AsyncOpenAI client"""
+        try:
+            cached_info = await asyncio.to_thread(analyzer_cache.get, 'user_info', message)
+            if cached_info is not None:
+                return cached_info
+            
+            response = await resilient_openai.chat_completion_async('user_info', **ConversationAnalyzer._user_info_request(message))
+            return await asyncio.to_thread(ConversationAnalyzer._parse_user_info_response, message, response)
+            
+        except Exception as e:
+            print(f"User info extraction error: {e}")
+            return {}
     
-    # Dual messaging system status
-    dual_messaging_status = {
-        'text_delivery': 'immediate_via_twiml',
-        'voice_delivery': 'delayed_via_api',
-        'tts_enabled': TTS_ENABLED,
-        'engines': {
-            'pyttsx3': TTS_AVAILABLE and hsse_bot.tts_manager.pyttsx3_ready,
-            'gtts': GTTS_AVAILABLE,
-            'openai_tts': bool(OPENAI_API_KEY)
-        },
-        'cache_size': len(hsse_bot.tts_manager.audio_cache),
-        'temp_files_count': len([f for f in os.listdir(hsse_bot.tts_manager.temp_dir) if f.startswith('tts_')]),
-        'performance_stats': hsse_bot.tts_manager.get_performance_stats()
-    }
+    @staticmethod
+    def _user_info_request(message: str) -> Dict:
+        prompt = f"""
+            Extract any personal or professional information mentioned in this message:
+            
+            Message: "{message}"
+            
+            Return JSON with any information found:
+            {{
+                "name": "if mentioned",
+                "role": "job title if mentioned", 
+                "department": "work department if mentioned",
+                "experience_level": "years or level if mentioned",
+                "location": "work location if mentioned",
+                "interests": ["safety", "topics", "mentioned"],
+                "concerns": ["specific", "safety", "concerns"],
+                "tts_preferences": {{"voice": "male/female if mentioned", "speed": "fast/slow if mentioned"}}
+            }}
+            
+            Only include fields where information was actually mentioned. Return empty object if nothing found.
+            """
+        
+        return {
+            'model': "gpt-3.5-turbo",
+            'messages': [{"role": "user", "content": prompt}],
+            'max_tokens': 200,
+            'temperature': 0.1
+        }
     
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.datetime.now().isoformat(),
-        'laravel_integration': laravel_status,
-        'dual_messaging_system': dual_messaging_status,
-        'features': [
-            'Smart Conversation Tracking',
-            'Long-term Memory & Relationship Building',
-            'Conversation Thread Continuity', 
-            'Turn-by-turn Quality Analysis',
-            'User Satisfaction Monitoring',
-            'Conversation Pattern Learning',
-            'Smart Follow-up Suggestions',
-            'Engagement Level Tracking',
-            'Conversation Analytics & Insights',
-            'Laravel Dashboard Integration',
-            'AI-Enhanced Incident Reporting',
-            'Real-time Status Updates',
-            'Emergency Detection & Response',
-            'Media File Processing',
-            'Location Services Integration',
-            '🎙️ DUAL TEXT+VOICE MESSAGING',
-            '📱 Immediate text delivery (TwiML)',
-            '🎙️ Delayed voice delivery (Twilio API)',
-            'Multi-engine TTS Fallback',
-            'Voice Accessibility Features',
-            'Emergency Audio Alerts',
-            'Personalized Voice Settings',
-            'Comprehensive Dual Messaging Analytics'
+    @staticmethod
+    def _parse_user_info_response(message: str, response) -> Dict:
+        llm_usage_meter.record(response)
+        
+        user_info = json.loads(response.choices[0].message.content)
+        analyzer_cache.put('user_info', message, user_info)
+        return user_info
+
+class UserInfoExtractionGate:
+    """Local pre-filter deciding whether extract_user_info is worth an LLM call.
+
+    The extraction can only learn something when the message carries a personal
+    cue ("my name is", "I work in", "as a welder", "speak slower", ...) for a
+    field the profile doesn't already have: name, role and department are only
+    ever filled once, while interests and voice preferences keep updating. Cues
+    are deliberately broad - a false positive costs one LLM call, a miss loses
+    profile information.
+    """
+
+    ROLE_WORDS = {
+        'engineer', 'technician', 'supervisor', 'manager', 'operator', 'officer', 'inspector',
+        'foreman', 'electrician', 'welder', 'mechanic', 'driver', 'contractor', 'coordinator',
+        'advisor', 'adviser', 'nurse', 'apprentice', 'trainee', 'intern', 'superintendent',
+        'fitter', 'rigger', 'scaffolder', 'labourer', 'laborer', 'chemist', 'analyst', 'planner',
+        'storekeeper', 'guard', 'medic', 'pilot', 'crane', 'lead'
+    }
+    FIRST_PERSON_WORDS = {'i', "i'm", 'im', 'me', 'my', 'myself'}
+    CUE_PATTERNS = {
+        'identity': [
+            r"\bmy name(?:'s| is)\b", r"\b(?:call me|i am called|i'm called|name's)\b",
+            r"\b(?:[Ii] am|[Ii]'m|[Tt]his is) [A-Z][a-z]+\b"  # Matched case-sensitively
+        ],
+        'work': [
+            r"\bi (?:work|am working|'m working|have worked) (?:in|at|for|as|on|with)\b",
+            r"\b(?:my|our) (?:role|job|position|title|department|dept|team|unit|crew|site|shift)\b",
+            r"\bi(?:'m| am) (?:a|an|the) (?:new |senior |junior |lead |head )?\w+",
+            r"\b\d+\s*(?:years?|yrs)\b.*\b(?:experience|working|in the (?:field|industry|job))\b",
+            r"\bi(?:'m| am) (?:based|located|stationed|posted) (?:in|at|on)\b"
+        ],
+        'voice': [
+            r"\b(?:male|female|man's|woman's|deeper|different|another) voice\b",
+            r"\b(?:speak|talk|read)\w* (?:faster|slower|more slowly|more quickly|quicker)\b",
+            r"\b(?:voice|audio|speech)\b.*\b(?:fast|slow|speed|male|female)\b",
+            r"\b(?:too|so) (?:fast|slow)\b"
+        ],
+        'interests': [
+            r"\bi(?:'m| am) (?:interested|curious) (?:in|about)\b",
+            r"\bi (?:care|want to (?:learn|know more)|'d like to learn|would like to learn) about\b",
+            r"\bi(?:'m| am) (?:worried|concerned) about\b",
+            r"\bmy (?:main |biggest )?(?:concern|worry|worries|interest)s?\b"
         ]
-    })
+    }
 
-if __name__ == "__main__":
-    print("🚀 Starting Enhanced AI-Powered HSSE Chatbot with Dual Text+Voice Messaging...")
-    print("🧠 All existing features enabled PLUS:")
-    print()
-    print("🎙️ DUAL MESSAGING FEATURES:")
-    print("✅ Text message sent immediately (0-1 second)")
-    print("✅ Voice message sent with configurable delay (2-3 seconds later)")
-    print("✅ Emergency messages get instant voice alerts")
-    print("✅ User-configurable messaging preferences")
-    print("✅ Smart delay timing for optimal user experience")
-    print("✅ Pre-generated emergency audio for instant delivery")
-    print("✅ Comprehensive dual messaging analytics")
-    print("✅ Voice control commands for easy management")
-    print("✅ Laravel dashboard integration with dual confirmations")
-    print()
-    print("🎯 HOW DUAL MESSAGING WORKS:")
-    print("  1. User sends message to chatbot")
-    print("  2. Bot processes and generates intelligent response")
-    print("  3. TEXT: Sent immediately via TwiML response (instant)")
-    print("  4. TTS: Audio generated in background using best engine")
-    print("  5. VOICE: Sent via Twilio API after configurable delay")
-    print("  6. User receives BOTH text AND voice for optimal accessibility")
-    print()
-    print("🎯 USER EXPERIENCE:")
-    print("  • Text arrives instantly for immediate reading")
-    print("  • Voice follows shortly for hands-free listening")
-    print("  • Emergency situations get priority voice delivery")
-    print("  • Users can customize voice preferences and timing")
-    print("  • Perfect accessibility for users with visual impairments")
-    print("  • Users can disable voice with simple commands")
-    print()
-    print("🔧 DUAL MESSAGING ENDPOINTS:")
-    print("  • /dual-messaging/preferences/<phone> - Manage dual messaging settings")
-    print("  • /dual-messaging/test/<phone> - Test dual messaging with a user")
-    print("  • /dual-messaging/analytics - Get dual messaging usage statistics")
-    print("  • /tts-audio/<filename> - Serve TTS audio files")
-    print("  • /tts/generate - Generate TTS audio via API")
-    print()
-    print("💬 VOICE COMMANDS FOR USERS:")
-    print("  • 'voice off' - Disable voice messages (text only)")
-    print("  • 'voice on' - Enable dual messaging (text + voice)")
-    print("  • 'both messages' - Enable text + voice")
-    print("  • 'text only' - Text messages only")
-    print("  • 'voice fast' - Increase speech speed") 
-    print("  • 'voice slow' - Decrease speech speed")
-    print("  • 'voice male' - Switch to male voice")
-    print("  • 'voice female' - Switch to female voice")
-    print("  • 'voice settings' - Show voice control panel")
-    print()
-    print("📊 ANALYTICS & MONITORING:")
-    print("  • Dual messaging usage statistics")
-    print("  • Voice adoption rates and user preferences")
-    print("  • TTS performance metrics and optimization")
-    print("  • Emergency response effectiveness")
-    print("  • User accessibility improvements")
-    print()
-    
-    # Initialize enhanced TTS manager for dual messaging
-    if TTS_ENABLED:
-        print("🎙️ Initializing Enhanced TTS System for Dual Messaging...")
-        print("✅ Enhanced TTS system ready for dual messaging!")
-        print("✅ Database updated with dual messaging support!")
-        print("✅ Pre-generated emergency audio phrases ready!")
-        print("✅ Multi-engine TTS fallback configured!")
-        
-        # Test TTS system on startup
-        print("🎙️ Testing TTS engines...")
-        if TTS_AVAILABLE and hsse_bot.tts_manager.pyttsx3_ready:
-            print("✅ pyttsx3 engine available (fastest for emergencies)")
-        else:
-            print("⚠️  pyttsx3 not available")
-            
-        if GTTS_AVAILABLE:
-            print("✅ Google TTS (gTTS) available (high quality)")
+    def __init__(self, enabled: bool = USER_INFO_GATE_ENABLED):
+        self.enabled = enabled
+        self.patterns = {
+            cue: [re.compile(pattern) if cue == 'identity' and '[A-Z]' in pattern
+                  else re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+            for cue, patterns in self.CUE_PATTERNS.items()
+        }
+        self._lock = threading.Lock()
+        self.stats = {'executed': 0, 'skipped_no_cues': 0, 'skipped_profile_complete': 0}
+        self.cue_counts = Counter()
+
+    def detect_cues(self, message: str) -> List[str]:
+        """Kinds of personal information the message appears to mention"""
+        cues = [cue for cue, patterns in self.patterns.items()
+                if any(pattern.search(message) for pattern in patterns)]
+        if 'work' not in cues:
+            words = set(re.findall(r"[a-z']+", message.lower()))
+            as_a = re.search(r"\bas (?:a|an|the) ", message, re.IGNORECASE)
+            if words & self.ROLE_WORDS and (words & self.FIRST_PERSON_WORDS or as_a):
+                cues.append('work')
+        return cues
+
+    def should_extract(self, message: str, user_profile: UserProfile = None) -> bool:
+        """True when extract_user_info could learn something from the message; counts the decision"""
+        if not self.enabled:
+            return True
+        cues = self.detect_cues(message)
+        learnable = [cue for cue in cues if not self._profile_has(user_profile, cue)]
+        with self._lock:
+            self.cue_counts.update(cues)
+            if learnable:
+                self.stats['executed'] += 1
+            elif cues:
+                self.stats['skipped_profile_complete'] += 1
+            else:
+                self.stats['skipped_no_cues'] += 1
+        return bool(learnable)
+
+    @staticmethod
+    def _profile_has(user_profile: Optional[UserProfile], cue: str) -> bool:
+        if not user_profile:
+            return False
+        if cue == 'identity':
+            return bool(user_profile.name)
+        if cue == 'work':
+            return bool(user_profile.role and user_profile.department)
+        return False  # Interests and voice preferences are updated on every mention
+
+    def get_stats(self) -> Dict:
+        """Executed vs skipped extractions and how often each cue fired"""
+        with self._lock:
+            stats = dict(self.stats)
+            cue_counts = dict(self.cue_counts)
+        decisions = sum(stats.values())
+        return {
+            **stats,
+            'enabled': self.enabled,
+            'skip_rate': round((decisions - stats['executed']) / decisions, 3) if decisions else None,
+            'cues': cue_counts
+        }
+
+user_info_gate = UserInfoExtractionGate()
+
+class SimilarResponseCache:
+    """Reuse replies to near-identical, context-independent safety questions.
+
+    Questions are reduced to their content terms ("what PPE do I need for welding"
+    and "welding ppe?" both become {ppe, weld}). A MinHash signature of those terms
+    is split into LSH bands, so a lookup only compares against entries sharing a
+    band; a candidate is served when the exact Jaccard similarity of the terms
+    reaches RESPONSE_CACHE_THRESHOLD. Entries expire after RESPONSE_CACHE_TTL_SECONDS
+    and are evicted least-recently-used. Urgent, emotional, personal or
+    conversation-dependent messages always bypass the cache.
+    """
+
+    NUM_PERMUTATIONS = 64
+    BANDS = 16  # 4 rows per band: pairs above ~0.5 similarity almost always share a band
+    HASH_PRIME = (1 << 61) - 1
+    NAME_PLACEHOLDER = '{{user_name}}'
+    CACHEABLE_INTENTS = ['question', 'request_help']
+    BYPASS_TONES = ['sad', 'frustrated', 'angry', 'worried', 'confused']
+    # Words that tie a question to the conversation or to the user's own situation
+    CONTEXT_WORDS = {
+        'it', 'this', 'that', 'these', 'those', 'they', 'them', 'he', 'she', 'his', 'her',
+        'earlier', 'before', 'previous', 'again', 'also', 'above', 'else', 'more',
+        'my', 'our', 'we', "i'm", 'me', 'today', 'yesterday', 'now'
+    }
+    QUESTION_WORDS = {'what', 'which', 'how', 'why', 'when', 'where', 'who', 'do', 'does', 'is', 'are',
+                      'need', 'needed', 'require', 'required', 'should', 'can', 'a', 'an', 'of', 'to', 'in', 'on',
+                      'at', 'i', 'or', 'be', 'use'}
+    MAX_QUESTION_TOKENS = 25
+
+    def __init__(self, enabled: bool = RESPONSE_CACHE_ENABLED, threshold: float = RESPONSE_CACHE_THRESHOLD,
+                 ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        hash_rng = random.Random(7)  # Fixed seed keeps signatures comparable across restarts
+        self.hash_params = [(hash_rng.randrange(1, self.HASH_PRIME), hash_rng.randrange(0, self.HASH_PRIME))
+                            for _ in range(self.NUM_PERMUTATIONS)]
+        self.rows_per_band = self.NUM_PERMUTATIONS // self.BANDS
+        self.entries = OrderedDict()  # entry_id -> entry, least recently used first
+        self.buckets = {}  # (band, band hashes) -> set of entry ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'lookups': 0,
+            'hits': 0,
+            'misses': 0,
+            'bypassed': 0,
+            'stores': 0,
+            'expired': 0,
+            'evictions': 0
+        }
+
+    def _terms(self, message: str) -> Optional[frozenset]:
+        """Content terms of a question, or None if the message can't be answered out of context"""
+        tokens = re.findall(r"[a-z0-9']+", message.lower())
+        if not tokens or len(tokens) > self.MAX_QUESTION_TOKENS or self.CONTEXT_WORDS.intersection(tokens):
+            return None
+        terms = set()
+        for token in tokens:
+            if token in self.QUESTION_WORDS or token in ThreadSummarizer.STOP_WORDS:
+                continue
+            token = token[:-2] if token.endswith("'s") else token
+            if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+                token = token[:-1]
+            if len(token) > 4 and token.endswith('ing'):
+                token = token[:-3]
+            terms.add(token)
+        return frozenset(terms) if len(terms) >= 2 else None
+
+    def is_cacheable(self, intent_analysis: Dict) -> bool:
+        return (intent_analysis.get('primary_intent') in self.CACHEABLE_INTENTS
+                and intent_analysis.get('urgency_level') not in ['high', 'critical']
+                and intent_analysis.get('emotional_tone') not in self.BYPASS_TONES
+                and not intent_analysis.get('needs_human_response'))
+
+    def _signature(self, terms: frozenset) -> tuple:
+        hashes = [zlib.crc32(term.encode('utf-8')) for term in terms]
+        return tuple(min((a * value + b) % self.HASH_PRIME for value in hashes) for a, b in self.hash_params)
+
+    def _bands(self, signature: tuple) -> List[tuple]:
+        rows = self.rows_per_band
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(self.BANDS)]
+
+    def _remove(self, entry_id: int):
+        entry = self.entries.pop(entry_id)
+        for band_key in self._bands(entry['signature']):
+            bucket = self.buckets.get(band_key)
+            if bucket:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.buckets[band_key]
+
+    def lookup(self, message: str, intent_analysis: Dict, user_profile: Optional[UserProfile]) -> Optional[str]:
+        """Cached reply for a similar question, personalized for this user"""
+        if not self.enabled:
+            return None
+        terms = self._terms(message) if self.is_cacheable(intent_analysis) else None
+        with self._lock:
+            self.stats['lookups'] += 1
+            if terms is None:
+                self.stats['bypassed'] += 1
+                return None
+
+            candidates = set()
+            for band_key in self._bands(self._signature(terms)):
+                candidates.update(self.buckets.get(band_key, ()))
+
+            now = time.monotonic()
+            best, best_similarity = None, 0.0
+            for entry_id in candidates:
+                entry = self.entries[entry_id]
+                if now - entry['created_at'] > self.ttl_seconds:
+                    self._remove(entry_id)
+                    self.stats['expired'] += 1
+                    continue
+                similarity = len(terms & entry['terms']) / len(terms | entry['terms'])
+                if similarity > best_similarity:
+                    best, best_similarity = entry_id, similarity
+
+            if best is None or best_similarity < self.threshold:
+                self.stats['misses'] += 1
+                return None
+
+            entry = self.entries[best]
+            entry['hits'] += 1
+            self.entries.move_to_end(best)
+            self.stats['hits'] += 1
+            response = entry['response']
+
+        name = user_profile.name if user_profile and user_profile.name else 'there'
+        return response.replace(self.NAME_PLACEHOLDER, name)
+
+    @staticmethod
+    def has_personal_context(user_profile: Optional[UserProfile], conversation_context: Optional[Dict]) -> bool:
+        """True if the reply prompt carried the asker's profile or conversation history"""
+        if user_profile and (user_profile.role or user_profile.department
+                             or user_profile.safety_interests or user_profile.interaction_history):
+            return True
+        context = conversation_context or {}
+        long_term_memory = context.get('long_term_memory') or {}
+        return bool(context.get('thread_summary') or context.get('topics_discussed')
+                    or context.get('unresolved_questions') or context.get('suggested_follow_ups')
+                    or long_term_memory.get('preferred_style') not in (None, 'professional')  # 'professional' is the default
+                    or long_term_memory.get('expertise_areas'))
+
+    def store(self, message: str, intent_analysis: Dict, response: str, user_profile: Optional[UserProfile],
+              conversation_context: Optional[Dict] = None):
+        """Remember a generated reply if the question and the prompt behind it are context-independent"""
+        if not self.enabled or not response or not self.is_cacheable(intent_analysis):
+            return
+        # A reply tailored to one user's role, interests or history must not be served to others
+        if self.has_personal_context(user_profile, conversation_context):
+            return
+        terms = self._terms(message)
+        if terms is None:
+            return
+
+        # Replies greet the asker by name; keep a placeholder so other users get their own.
+        # Whole words only, so "Al" doesn't turn "Always" into "{{user_name}}ways"
+        if user_profile and user_profile.name and len(user_profile.name) > 1:
+            response = re.sub(rf'\b{re.escape(user_profile.name)}\b', self.NAME_PLACEHOLDER, response)
+
+        signature = self._signature(terms)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self.entries[entry_id] = {
+                'question': message[:200],
+                'terms': terms,
+                'signature': signature,
+                'response': response,
+                'created_at': time.monotonic(),
+                'hits': 0
+            }
+            for band_key in self._bands(signature):
+                self.buckets.setdefault(band_key, set()).add(entry_id)
+            self.stats['stores'] += 1
+
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.stats['evictions'] += 1
+
+    def get_stats(self) -> Dict:
+        """Hit counts overall and for the most reused entries"""
+        with self._lock:
+            top_entries = sorted(self.entries.values(), key=lambda entry: entry['hits'], reverse=True)[:5]
+            answered = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'enabled': self.enabled,
+                'entries': len(self.entries),
+                'hit_rate': round(self.stats['hits'] / answered, 3) if answered else 0.0,
+                'top_entries': [{'question': entry['question'], 'hits': entry['hits']}
+                                for entry in top_entries if entry['hits']]
+            }
+
+class CompactPromptBuilder:
+    """Token-budgeted prompts for the chat model.
+
+    The standing instructions live once in a short system prompt; the per-message
+    context is four small sections (message, intent, user, conversation) holding
+    only fields the reply depends on, serialized as key=value pairs. The intent,
+    user and conversation sections are truncated to PROMPT_SECTION_TOKEN_BUDGETS;
+    the user's message is always sent whole. Tokens are counted locally (tiktoken when
+    installed, ~4 characters per token otherwise) and recorded per call.
+    """
+
+    SYSTEM_PROMPT = (
+        "You are ARIA (AI Risk Intelligence Assistant), an HSSE (Health, Safety, Security, Environment) "
+        "expert chatting with workers on WhatsApp.\n"
+        "- Warm, empathetic and conversational, never robotic; match the user's tone, energy and expertise "
+        "and build on the conversation so far.\n"
+        "- Expert in international safety standards, incident analysis, risk assessment and emergency response, "
+        "specializing in Guyana/Caribbean workplaces: users are in Georgetown, Guyana, so consider local "
+        "regulations, the tropical climate and local emergency services.\n"
+        "- Safety first: practical, actionable guidance; escalate to emergency services or experts when needed; "
+        "never advise anything that increases risk; include emergency information for any safety concern.\n"
+        "- Replies are also read aloud: clear simple language, short paragraphs, a few emojis, no complex formatting.\n"
+        "- Concise but thorough for the urgency and complexity; ask a helpful follow-up question when useful."
+    )
+    INTENT_FIELDS = [
+        ('primary_intent', 'intent'), ('urgency_level', 'urgency'), ('emotional_tone', 'tone'),
+        ('response_style_needed', 'style'), ('expertise_level', 'expertise'),
+        ('key_topics', 'topics'), ('safety_related', 'safety')
+    ]
+    COMBINED_OUTPUT_FORMAT = (
+        'Reply with one JSON object: {"intent": {"primary_intent": greeting|question|report_incident|emergency|'
+        'complaint|compliment|casual_chat|request_help|location_sharing|tts_control|other, "secondary_intents": [], '
+        '"urgency_level": low|medium|high|critical, "emotional_tone": happy|sad|frustrated|angry|worried|excited|'
+        'neutral|confused, "conversation_style": casual|professional|urgent|friendly|formal, "expertise_level": '
+        'beginner|intermediate|expert, "safety_related": bool, "needs_human_response": bool, "key_topics": [], '
+        '"response_style_needed": empathetic|informative|reassuring|direct|detailed|simple, "follow_up_questions": [], '
+        '"tts_suitable": bool, "confidence_score": 0-1}, "user_info": {only what the user said about themselves: '
+        'name, role, department, experience_level, location, interests [], concerns [], tts_preferences '
+        '{voice, speed}; {} if nothing}, "reply": "your WhatsApp reply"}'
+    )
+
+    def __init__(self, budgets: Dict = None):
+        self.budgets = budgets or PROMPT_SECTION_TOKEN_BUDGETS
+        self.encoding = None
+        if TIKTOKEN_AVAILABLE:
+            try:
+                self.encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o-mini's tokenizer
+            except Exception as e:
+                print(f"tiktoken encoding unavailable, estimating tokens: {e}")
+        self._lock = threading.Lock()
+        self.stats = {'truncated_sections': 0, 'calls': {}}
+
+    def count_tokens(self, text: str) -> int:
+        if self.encoding:
+            return len(self.encoding.encode(text))
+        return (len(text) + 3) // 4
+
+    def _fit(self, text: str, budget: int) -> str:
+        """Truncate a section to its token budget"""
+        if self.count_tokens(text) <= budget:
+            return text
+        with self._lock:
+            self.stats['truncated_sections'] += 1
+        if self.encoding:
+            return self.encoding.decode(self.encoding.encode(text)[:max(budget - 1, 0)]) + '…'
+        return text[:max(budget - 1, 0) * 4] + '…'
+
+    @staticmethod
+    def _pairs(pairs: List[tuple]) -> str:
+        """key=value; ... for the values that are set"""
+        parts = []
+        for key, value in pairs:
+            if isinstance(value, (list, tuple)):
+                value = ','.join(str(item) for item in value)
+            elif isinstance(value, bool):
+                value = 'yes' if value else 'no'
+            if value not in (None, ''):
+                parts.append(f"{key}={value}")
+        return '; '.join(parts)
+
+    def context_prompt(self, message: str, intent_analysis: Optional[Dict],
+                       user_profile: Optional[UserProfile], conversation_context: Dict) -> str:
+        if intent_analysis is None:
+            intent = 'classify it yourself (see the output format)'
         else:
-            print("⚠️  gTTS not available")
-            
-        if OPENAI_API_KEY:
-            print("✅ OpenAI TTS available (premium quality)")
+            intent = self._pairs([(label, intent_analysis.get(field)) for field, label in self.INTENT_FIELDS])
+
+        if user_profile:
+            profile = self._pairs([
+                ('name', user_profile.name), ('role', user_profile.role), ('dept', user_profile.department),
+                ('interests', user_profile.safety_interests[:5]),
+                ('past_conversations', len(user_profile.interaction_history) or None),
+                ('voice_replies', user_profile.tts_enabled)
+            ]) or 'no details yet'
         else:
-            print("⚠️  OpenAI TTS not available (no API key)")
-            
-        print("🎙️ TTS system ready with multi-engine fallback support!")
-    else:
-        print("🔇 TTS system disabled - dual messaging will use text only")
-    
-    print()
-    print("🌟 READY FOR DUAL TEXT+VOICE MESSAGING!")
-    print("🌟 Users will now receive both text and voice messages for optimal accessibility!")
-    print("🌟 Laravel dashboard integration with dual confirmations!")
-    print("🌟 Emergency situations get priority audio delivery!")
-    print("🌟 Complete accessibility support for all users!")
-    
-    app.run(debug=True, port=5000).json() if response.status_code in [200, 201] else {
-                'success': False,
-                'error': f'Media upload error: {response.status_code}'
-            }
-            
-        except requests.exceptions.RequestException as e:
+            profile = 'new user'
+
+        long_term_memory = conversation_context.get('long_term_memory') or {}
+        conversation = self._pairs([
+            ('recent_topics', conversation_context.get('topics_discussed', [])[:8]),
+            ('engagement', conversation_context.get('user_engagement_level')),
+            ('open_questions', [question[:80] for question in conversation_context.get('unresolved_questions', [])[:2]]),
+            ('follow_ups', conversation_context.get('suggested_follow_ups', [])[:2]),
+            ('preferred_style', long_term_memory.get('preferred_style')),
+            ('expertise', long_term_memory.get('expertise_areas', [])[:5])
+        ])
+        # The thread summary gets whatever the conversation budget has left
+        summary = conversation_context.get('thread_summary')
+        if summary:
+            summary_budget = max(self.budgets['conversation'] - self.count_tokens(conversation) - 4, 20)
+            conversation = self._pairs([('earlier', self._fit(summary, summary_budget))]) + (
+                f"; {conversation}" if conversation else '')
+        conversation = conversation or 'new conversation'
+
+        return '\n'.join([
+            f'MESSAGE: "{message}"',
+            f"INTENT: {self._fit(intent, self.budgets['intent'])}",
+            f"USER: {self._fit(profile, self.budgets['profile'])}",
+            f"CONVERSATION: {self._fit(conversation, self.budgets['conversation'])}"
+        ])
+
+    def record(self, kind: str, *prompt_parts: str) -> int:
+        """Count a call's prompt tokens before it is sent"""
+        tokens = sum(self.count_tokens(part) for part in prompt_parts)
+        with self._lock:
+            call_stats = self.stats['calls'].setdefault(kind, {'calls': 0, 'prompt_tokens': 0, 'max_prompt_tokens': 0})
+            call_stats['calls'] += 1
+            call_stats['prompt_tokens'] += tokens
+            call_stats['max_prompt_tokens'] = max(call_stats['max_prompt_tokens'], tokens)
+        return tokens
+
+    def get_stats(self) -> Dict:
+        """Prompt token counts per call kind"""
+        with self._lock:
             return {
-                'success': False,
-                'error': f'Media upload connection error: {str(e)}'
+                'style': PROMPT_STYLE,
+                'token_counter': 'tiktoken' if self.encoding else 'estimate',
+                'truncated_sections': self.stats['truncated_sections'],
+                'calls': {kind: {**call_stats, 'avg_prompt_tokens': round(call_stats['prompt_tokens'] / call_stats['calls'], 1)}
+                          for kind, call_stats in self.stats['calls'].items()}
             }
+
+class SmartResponseGenerator:
+    """Generate contextually appropriate and conversational responses with TTS support"""
     
-    def test_connection(self) -> Dict:
-        """Test connection to Laravel backend"""
+    def __init__(self, tts_manager):
+        self.tts_manager = tts_manager
+        self.response_cache = SimilarResponseCache()
+        self.prompt_builder = CompactPromptBuilder()
+        self.personality_traits = {
+            "helpful": True,
+            "empathetic": True,
+            "professional": True,
+            "safety_focused": True,
+            "conversational": True,
+            "adaptive": True
+        }
+    
+    def generate_contextual_response(self, message: str, intent_analysis: Dict, 
+                                   user_profile: Optional[UserProfile], 
+                                   conversation_context: Dict) -> Tuple[str, Optional[str]]:
+        """Generate intelligent, contextual responses with optional TTS"""
+        
         try:
-            url = f"{self.base_url}/health"  # Assuming Laravel has a health endpoint
+            # Repeat safety questions are answered from the similarity cache
+            cached_response = self.response_cache.lookup(message, intent_analysis, user_profile)
+            if cached_response:
+                return self.finalize_response(cached_response, intent_analysis, user_profile)
             
-            response = requests.get(
-                url,
-                headers=self.headers,
-                timeout=10
+            response = resilient_openai.chat_completion(
+                'response', **self._response_request(message, intent_analysis, user_profile, conversation_context)
             )
+            llm_usage_meter.record(response)
             
-            if response.status_code == 200:
-                return {
-                    'success': True,
-                    'message': 'Laravel backend connection successful',
-                    'data': response.json() if response.content else None
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': f'Laravel backend returned status {response.status_code}',
-                    'details': response.text
-                }
-                
-        except requests.exceptions.ConnectionError:
-            return {
-                'success': False,
-                'error': f'Cannot connect to Laravel backend at {self.base_url}. Please check if the server is running.'
-            }
-        except requests.exceptions.RequestException as e:
-            return {
-                'success': False,
-                'error': f'Request error: {str(e)}'
-            }
+            generated_response = response.choices[0].message.content
+            self.response_cache.store(message, intent_analysis, generated_response, user_profile, conversation_context)
+            
+            return self.finalize_response(generated_response, intent_analysis, user_profile)
+            
+        except Exception as e:
+            print(f"Smart response generation error: {e}")
+            fallback_response = self._generate_fallback_response(intent_analysis, user_profile)
+            
+            # Generate TTS for fallback if needed
+            tts_audio_url = None
+            if (user_profile and user_profile.tts_enabled and TTS_ENABLED):
+                tts_audio_url = self.tts_manager.generate_for_dual_messaging(fallback_response)
+            
+            return fallback_response, tts_audio_url
     
-    def get_report_status(self, report_id: str) -> Dict:
-        """Get report status from Laravel backend"""
+    async def generate_contextual_response_async(self, message: str, intent_analysis: Dict,
+                                                 user_profile: Optional[UserProfile],
+                                                 conversation_context: Dict) -> Tuple[str, Optional[str]]:
+        """generate_contextual_response awaiting the AsyncOpenAI client"""
+        
         try:
-            url = f"{self.base_url}/chatbot/reports/{report_id}/status"
+            cached_response = self.response_cache.lookup(message, intent_analysis, user_profile)
+            if cached_response:
+                return await self.finalize_response_async(cached_response, intent_analysis, user_profile)
             
-            response = requests.get(
-                url,
-                headers=self.headers,
-                timeout=15
+            response = await resilient_openai.chat_completion_async(
+                'response', **self._response_request(message, intent_analysis, user_profile, conversation_context)
             )
+            llm_usage_meter.record(response)
             
-            return response.json() if response.status_code == 200 else {
-                'success': False,
-                'error': f'Status check error: {response.status_code}'
-            }
+            generated_response = response.choices[0].message.content
+            self.response_cache.store(message, intent_analysis, generated_response, user_profile, conversation_context)
             
-        except requests.exceptions.RequestException as e:
-            return {
-                'success': False,
-                'error': f'Status check connection error: {str(e)}'
-            }
-
-class LocationParser:
-    """Parse location from user messages"""
+            return await self.finalize_response_async(generated_response, intent_analysis, user_profile)
+            
+        except Exception as e:
+            print(f"Smart response generation error: {e}")
+            fallback_response = self._generate_fallback_response(intent_analysis, user_profile)
+            
+            tts_audio_url = None
+            if (user_profile and user_profile.tts_enabled and TTS_ENABLED):
+                tts_audio_url = await self.tts_manager.generate_for_dual_messaging_async(fallback_response)
+            
+            return fallback_response, tts_audio_url
     
-    @staticmethod
-    def extract_coordinates(message: str) -> Tuple[Optional[float], Optional[float]]:
-        """Extract coordinates from message"""
-        
-        # Look for coordinate patterns
-        coord_patterns = [
-            r'(-?\d+\.?\d*),\s*(-?\d+\.?\d*)',  # "6.8013, -58.1551"
-            r'lat[:\s]*(-?\d+\.?\d*)[,\s]*lon[g]?[:\s]*(-?\d+\.?\d*)',  # "lat: 6.8013, long: -58.1551"
-            r'(\d+\.?\d*)[°]?\s*[NS][,\s]*(\d+\.?\d*)[°]?\s*[EW]'  # "6.8013°N, 58.1551°W"
-        ]
+    def _response_request(self, message: str, intent_analysis: Dict, user_profile: Optional[UserProfile],
+                          conversation_context: Dict) -> Dict:
+        """Chat completion kwargs for the reply call"""
+        # Build comprehensive context for AI
+        context_prompt = self._build_context_prompt(
+            message, intent_analysis, user_profile, conversation_context
+        )
+        system_prompt = self._get_system_prompt()
+        self.prompt_builder.record('response', system_prompt, context_prompt)
         
-        for pattern in coord_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
-            if match:
-                try:
-                    lat = float(match.group(1))
-                    lng = float(match.group(2))
-                    
-                    # Validate coordinates (roughly for Guyana/Caribbean region)
-                    if -10 <= lat <= 15 and -70 <= lng <= -50:
-                        return lat, lng
-                except ValueError:
-                    continue
+        return {
+            'model': "gpt-4o-mini",  # Use the available model
+            'messages': [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": context_prompt}
+            ],
+            'max_tokens': 600,
+            'temperature': 0.7
+        }
+    
+    def generate_combined_response(self, message: str, user_profile: Optional[UserProfile],
+                                   conversation_context: Dict, local_intent: Dict = None) -> Optional[Dict]:
+        """Classify the message, extract user info and write the reply in one structured call.
         
-        return None, None
+        Returns {'intent', 'user_info', 'reply'}, or None if the call or its output
+        failed so the caller can fall back to the separate legacy calls. A confident
+        local intent lets repeat questions be answered from the response cache instead.
+        """
+        try:
+            cached_result, request_kwargs = self._prepare_combined_request(
+                message, user_profile, conversation_context, local_intent
+            )
+            if cached_result:
+                return cached_result
+            response = resilient_openai.chat_completion('combined', **request_kwargs)
+            return self._parse_combined_response(message, user_profile, conversation_context, response)
+            
+        except Exception as e:
+            print(f"Combined response error, falling back to separate calls: {e}")
+            return None
     
-    @staticmethod
-    def request_location_sharing() -> str:
-        """Generate message requesting location sharing"""
-        return (
-            "📍 **I need your location to complete the report.**\n\n"
-            "Please share your location by:\n"
-            "🔸 Using WhatsApp's location sharing feature\n"
-            "🔸 Or typing coordinates like: `6.8013, -58.1551`\n"
-            "🔸 Or describing your location (I'll help find coordinates)\n\n"
-            "This helps emergency responders find you quickly! 🚨"
-        )
-
-class DatabaseManager:
-    def __init__(self):
-        self.init_db()
-        self.init_db_dual_messaging_support()
+    async def generate_combined_response_async(self, message: str, user_profile: Optional[UserProfile],
+                                               conversation_context: Dict, local_intent: Dict = None) -> Optional[Dict]:
+        """generate_combined_response awaiting the AsyncOpenAI client"""
+        try:
+            cached_result, request_kwargs = self._prepare_combined_request(
+                message, user_profile, conversation_context, local_intent
+            )
+            if cached_result:
+                return cached_result
+            response = await resilient_openai.chat_completion_async('combined', **request_kwargs)
+            return self._parse_combined_response(message, user_profile, conversation_context, response)
+            
+        except Exception as e:
+            print(f"Combined response error, falling back to separate calls: {e}")
+            return None
     
-    def init_db(self):
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
+    def _prepare_combined_request(self, message: str, user_profile: Optional[UserProfile],
+                                  conversation_context: Dict, local_intent: Dict = None) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """(cached result, None) for a response cache hit, otherwise (None, chat completion kwargs)"""
+        if local_intent and local_intent['confidence_score'] >= LOCAL_INTENT_THRESHOLD:
+            cached_response = self.response_cache.lookup(message, local_intent, user_profile)
+            if cached_response:
+                return {'intent': local_intent, 'user_info': {}, 'reply': cached_response}, None
+        
+        context_prompt = self._build_context_prompt(message, None, user_profile, conversation_context)
+        context_prompt += '\n' + self._combined_output_format()
+        system_prompt = self._get_system_prompt()
+        self.prompt_builder.record('combined', system_prompt, context_prompt)
+        
+        return None, {
+            'model': "gpt-4o-mini",
+            'messages': [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": context_prompt}
+            ],
+            'response_format': {"type": "json_object"},
+            'max_tokens': 1000,
+            'temperature': 0.5
+        }
+    
+    def _parse_combined_response(self, message: str, user_profile: Optional[UserProfile],
+                                 conversation_context: Dict, response) -> Dict:
+        """Validate the structured reply (raises ValueError) and cache generic answers"""
+        llm_usage_meter.record(response)
+        
+        result = json.loads(response.choices[0].message.content)
+        intent = result.get('intent')
+        reply = result.get('reply')
+        if not isinstance(intent, dict) or not intent.get('primary_intent') or not isinstance(reply, str) or not reply.strip():
+            raise ValueError("combined response is missing intent or reply")
+        
+        user_info = result.get('user_info')
+        if not user_info:  # Messages telling us about the user aren't generic questions
+            self.response_cache.store(message, intent, reply.strip(), user_profile, conversation_context)
+        return {
+            'intent': intent,
+            'user_info': user_info if isinstance(user_info, dict) else {},
+            'reply': reply.strip()
+        }
+    
+    def finalize_response(self, generated_response: str, intent_analysis: Dict,
+                          user_profile: Optional[UserProfile]) -> Tuple[str, Optional[str]]:
+        """Post-process a generated reply and attach TTS audio when the user wants it"""
         
-        # Check if location columns exist and add them if missing
-        cursor.execute("PRAGMA table_info(reports)")
-        columns = [column[1] for column in cursor.fetchall()]
+        # Post-process response for consistency and safety
+        processed_response = self._post_process_response(generated_response, intent_analysis)
         
-        # Original tables
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reports (
-                id TEXT PRIMARY KEY,
-                user_phone TEXT,
-                timestamp TEXT,
-                incident_type TEXT,
-                severity TEXT,
-                description TEXT,
-                location TEXT,
-                location_lat REAL,
-                location_long REAL,
-                media_urls TEXT,
-                status TEXT,
-                ai_analysis TEXT,
-                created_at TEXT,
-                laravel_report_id TEXT
-            )
-        ''')
+        # Generate TTS if enabled and suitable
+        tts_audio_url = None
+        audio_request = self._audio_request(intent_analysis, user_profile)
+        if audio_request:
+            user_preferences, priority, tts_audio_url = audio_request
+            
+            # Generate TTS for regular responses
+            if not tts_audio_url:
+                tts_audio_url = self.tts_manager.generate_for_dual_messaging(
+                    processed_response, 
+                    user_preferences,
+                    priority=priority
+                )
         
-        # Add missing columns if they don't exist
-        if 'location_lat' not in columns:
-            try:
-                cursor.execute('ALTER TABLE reports ADD COLUMN location_lat REAL')
-                print("Added location_lat column to reports table")
-            except sqlite3.OperationalError:
-                pass  # Column might already exist
+        return processed_response, tts_audio_url
+    
+    async def finalize_response_async(self, generated_response: str, intent_analysis: Dict,
+                                      user_profile: Optional[UserProfile]) -> Tuple[str, Optional[str]]:
+        """finalize_response awaiting the OpenAI TTS call"""
         
-        if 'location_long' not in columns:
-            try:
-                cursor.execute('ALTER TABLE reports ADD COLUMN location_long REAL')
-                print("Added location_long column to reports table")
-            except sqlite3.OperationalError:
-                pass  # Column might already exist
+        processed_response = self._post_process_response(generated_response, intent_analysis)
         
-        if 'laravel_report_id' not in columns:
-            try:
-                cursor.execute('ALTER TABLE reports ADD COLUMN laravel_report_id TEXT')
-                print("Added laravel_report_id column to reports table")
-            except sqlite3.OperationalError:
-                pass  # Column might already exist
+        tts_audio_url = None
+        audio_request = self._audio_request(intent_analysis, user_profile)
+        if audio_request:
+            user_preferences, priority, tts_audio_url = audio_request
+            if not tts_audio_url:
+                tts_audio_url = await self.tts_manager.generate_for_dual_messaging_async(
+                    processed_response, user_preferences, priority=priority
+                )
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_sessions (
-                phone TEXT PRIMARY KEY,
-                state TEXT,
-                data TEXT,
-                last_activity TEXT
-            )
-        ''')
+        return processed_response, tts_audio_url
+    
+    def _audio_request(self, intent_analysis: Dict,
+                       user_profile: Optional[UserProfile]) -> Optional[Tuple[Dict, str, Optional[str]]]:
+        """(TTS preferences, priority, cached emergency audio) when the reply gets voice, otherwise None"""
+        if not (user_profile and user_profile.tts_enabled and 
+                intent_analysis.get('tts_suitable', True) and
+                TTS_ENABLED):
+            return None
         
-        # NEW: Enhanced user profiles with TTS preferences
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_profiles (
-                phone TEXT PRIMARY KEY,
-                name TEXT,
-                role TEXT,
-                department TEXT,
-                preferred_language TEXT,
-                interaction_history TEXT,
-                safety_interests TEXT,
-                last_active TEXT,
-                tts_enabled BOOLEAN DEFAULT 1,
-                tts_voice_preference TEXT DEFAULT 'female',
-                tts_speed_preference INTEGER DEFAULT 150
-            )
-        ''')
+        user_preferences = {
+            'tts_voice_preference': user_profile.tts_voice_preference,
+            'tts_speed_preference': user_profile.tts_speed_preference,
+            'language': user_profile.preferred_language
+        }
         
-        # Check and add TTS columns to user_profiles if missing
-        cursor.execute("PRAGMA table_info(user_profiles)")
-        profile_columns = [column[1] for column in cursor.fetchall()]
+        # Check for emergency audio cache first
+        cached_audio = None
+        urgent = intent_analysis.get('urgency_level') in ['high', 'critical']
+        if urgent:
+            emergency_type = intent_analysis.get('primary_intent', 'emergency')
+            cached_audio = self.tts_manager.get_emergency_audio(emergency_type)
         
-        if 'tts_enabled' not in profile_columns:
-            try:
-                cursor.execute('ALTER TABLE user_profiles ADD COLUMN tts_enabled BOOLEAN DEFAULT 1')
-                print("Added tts_enabled column to user_profiles table")
-            except sqlite3.OperationalError:
-                pass
+        return user_preferences, 'emergency' if urgent else 'normal', cached_audio
+    
+    def _combined_output_format(self) -> str:
+        """JSON layout the combined call must answer in"""
+        if PROMPT_STYLE == 'compact':
+            return CompactPromptBuilder.COMBINED_OUTPUT_FORMAT
+        return """
+        OUTPUT FORMAT - reply with a single JSON object only:
+        {
+            "intent": {
+                "primary_intent": "greeting|question|report_incident|emergency|complaint|compliment|casual_chat|request_help|location_sharing|tts_control|other",
+                "secondary_intents": ["list", "of", "secondary", "intents"],
+                "urgency_level": "low|medium|high|critical",
+                "emotional_tone": "happy|sad|frustrated|angry|worried|excited|neutral|confused",
+                "conversation_style": "casual|professional|urgent|friendly|formal",
+                "expertise_level": "beginner|intermediate|expert",
+                "safety_related": true/false,
+                "needs_human_response": true/false,
+                "key_topics": ["topic1", "topic2"],
+                "response_style_needed": "empathetic|informative|reassuring|direct|detailed|simple",
+                "follow_up_questions": ["suggested", "questions", "to", "ask"],
+                "tts_suitable": true/false,
+                "confidence_score": 0.5
+            },
+            "user_info": {
+                "name": "if mentioned",
+                "role": "job title if mentioned",
+                "department": "work department if mentioned",
+                "experience_level": "years or level if mentioned",
+                "location": "work location if mentioned",
+                "interests": ["safety", "topics", "mentioned"],
+                "concerns": ["specific", "safety", "concerns"],
+                "tts_preferences": {"voice": "male/female if mentioned", "speed": "fast/slow if mentioned"}
+            },
+            "reply": "your WhatsApp response to the user"
+        }
+        In user_info only include fields the user actually mentioned; use an empty object if nothing was.
+        """
+    
+    def _get_system_prompt(self) -> str:
+        """Define the AI assistant's personality and capabilities"""
+        if PROMPT_STYLE == 'compact':
+            return CompactPromptBuilder.SYSTEM_PROMPT
+        return """
+        You are ARIA (AI Risk Intelligence Assistant), a highly advanced HSSE (Health, Safety, Security, Environment) expert with these qualities:
+
+        PERSONALITY:
+        - Warm, empathetic, and genuinely caring about people's safety
+        - Conversational and natural, not robotic or overly formal
+        - Intelligent and knowledgeable, but explains things clearly
+        - Adapts communication style to match the user's needs and expertise level
+        - Remembers context and builds on previous conversations
+        - Uses appropriate emojis and formatting for WhatsApp
+        - Supports accessibility features including voice responses
+
+        EXPERTISE:
+        - 20+ years equivalent HSSE experience across all industries
+        - Deep knowledge of international safety standards and local regulations
+        - Specializes in Guyana/Caribbean workplace safety and climate considerations
+        - Expert in incident analysis, risk assessment, and emergency response
+        - Up-to-date with latest safety technologies and best practices
+
+        CONVERSATION STYLE:
+        - Respond naturally like a human expert would in a WhatsApp chat
+        - Match the user's energy and communication style appropriately
+        - Use conversational phrases, contractions, and natural flow
+        - Ask follow-up questions when helpful
+        - Show genuine interest in the user's situation and well-being
+        - Provide practical, actionable advice
+        - Balance being thorough with being concise based on the situation
+        - Design responses that work well for both text and voice (TTS)
+
+        ACCESSIBILITY FEATURES:
+        - Create responses suitable for text-to-speech conversion
+        - Use clear, simple language when users prefer audio
+        - Avoid complex formatting when TTS is enabled
+        - Provide audio-friendly emergency instructions
+
+        SAFETY PRIORITIES:
+        - Always prioritize immediate safety and emergency response
+        - Provide clear, actionable guidance
+        - Escalate to human experts or emergency services when needed
+        - Never provide advice that could increase risk
+        - Consider environmental and cultural factors (especially tropical/Caribbean context)
+
+        RESPONSE FORMAT:
+        - Use WhatsApp-friendly formatting (emojis, short paragraphs)
+        - Structure information clearly but naturally
+        - Include relevant contact information when appropriate
+        - End with helpful follow-up suggestions when relevant
+        - Make responses accessible for users who rely on voice features
+        """
+    
+    def _build_context_prompt(self, message: str, intent_analysis: Dict, 
+                            user_profile: Optional[UserProfile], 
+                            conversation_context: Dict) -> str:
+        """Build comprehensive context for response generation"""
         
-        if 'tts_voice_preference' not in profile_columns:
-            try:
-                cursor.execute('ALTER TABLE user_profiles ADD COLUMN tts_voice_preference TEXT DEFAULT "female"')
-                print("Added tts_voice_preference column to user_profiles table")
-            except sqlite3.OperationalError:
-                pass
+        if PROMPT_STYLE == 'compact':
+            return self.prompt_builder.context_prompt(message, intent_analysis, user_profile, conversation_context)
         
-        if 'tts_speed_preference' not in profile_columns:
-            try:
-                cursor.execute('ALTER TABLE user_profiles ADD COLUMN tts_speed_preference INTEGER DEFAULT 150')
-                print("Added tts_speed_preference column to user_profiles table")
-            except sqlite3.OperationalError:
-                pass
+        context = f"""
+        USER MESSAGE: "{message}"
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS conversation_context (
-                phone TEXT PRIMARY KEY,
-                recent_topics TEXT,
-                conversation_style TEXT,
-                current_mood TEXT,
-                expertise_level TEXT,
-                last_updated TEXT
-            )
-        ''')
+        INTENT ANALYSIS:
+        {json.dumps(intent_analysis, indent=2) if intent_analysis is not None else 'Not analyzed yet - classify the message as part of your answer'}
         
-        # Enhanced conversation tracking tables with TTS metadata
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS conversation_turns (
-                id TEXT PRIMARY KEY,
-                phone TEXT,
-                thread_id TEXT,
-                user_message TEXT,
-                bot_response TEXT,
-                timestamp TEXT,
-                intent TEXT,
-                topics TEXT,
-                sentiment TEXT,
-                context_used TEXT,
-                response_quality_score REAL,
-                user_satisfaction_indicators TEXT,
-                turn_number INTEGER,
-                tts_audio_url TEXT,
-                tts_generated BOOLEAN DEFAULT 0
-            )
-        ''')
-        
-        # Check and add TTS columns to conversation_turns if missing
-        cursor.execute("PRAGMA table_info(conversation_turns)")
-        turn_columns = [column[1] for column in cursor.fetchall()]
+        USER PROFILE:
+        """
         
-        if 'tts_audio_url' not in turn_columns:
-            try:
-                cursor.execute('ALTER TABLE conversation_turns ADD COLUMN tts_audio_url TEXT')
-                print("Added tts_audio_url column to conversation_turns table")
-            except sqlite3.OperationalError:
-                pass
+        if user_profile:
+            context += f"""
+        - Name: {user_profile.name or 'Not provided'}
+        - Role: {user_profile.role or 'Not specified'}
+        - Department: {user_profile.department or 'Not specified'}
+        - Previous interests: {', '.join(user_profile.safety_interests) if user_profile.safety_interests else 'None recorded'}
+        - Interaction history: {len(user_profile.interaction_history)} previous conversations
+        - TTS enabled: {user_profile.tts_enabled}
+        - Voice preference: {user_profile.tts_voice_preference}
+        - Speech speed: {user_profile.tts_speed_preference} WPM
+        - Dual messaging: {getattr(user_profile, 'dual_messaging_enabled', True)}
+        """
+        else:
+            context += "- New user, no previous profile information"
         
-        if 'tts_generated' not in turn_columns:
-            try:
-                cursor.execute('ALTER TABLE conversation_turns ADD COLUMN tts_generated BOOLEAN DEFAULT 0')
-                print("Added tts_generated column to conversation_turns table")
-            except sqlite3.OperationalError:
-                pass
+        context += f"""
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS conversation_threads (
-                thread_id TEXT PRIMARY KEY,
-                phone TEXT,
-                start_time TEXT,
-                last_activity TEXT,
-                total_turns INTEGER,
-                conversation_summary TEXT,
-                key_topics_discussed TEXT,
-                user_goals_identified TEXT,
-                relationship_building_score REAL,
-                conversation_satisfaction_score REAL,
-                unresolved_issues TEXT,
-                follow_up_needed BOOLEAN,
-                conversation_type TEXT,
-                status TEXT DEFAULT 'active'
-            )
-        ''')
+        CONVERSATION CONTEXT:
+        - Earlier in this conversation: {conversation_context.get('thread_summary') or 'Nothing yet'}
+        - Recent topics: {', '.join(conversation_context.get('topics_discussed', []))}
+        - Communication style: {conversation_context.get('conversation_summary', 'New conversation')}
+        - User engagement: {conversation_context.get('user_engagement_level', 0.5)}
+        - Suggested follow-ups: {', '.join(conversation_context.get('suggested_follow_ups', []))}
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS conversation_patterns (
-                id TEXT PRIMARY KEY,
-                phone TEXT,
-                pattern_type TEXT,
-                pattern_data TEXT,
-                frequency INTEGER,
-                effectiveness_score REAL,
-                last_observed TEXT,
-                created_at TEXT
-            )
-        ''')
+        LOCATION CONTEXT:
+        - User is in Georgetown, Guyana (tropical climate, developing industrial sector)
+        - Consider local regulations, climate challenges, and emergency services
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_long_term_memory (
-                phone TEXT PRIMARY KEY,
-                personality_profile TEXT,
-                communication_preferences TEXT,
-                expertise_areas TEXT,
-                learning_progress TEXT,
-                relationship_milestones TEXT,
-                important_context TEXT,
-                preferred_conversation_style TEXT,
-                trust_level REAL DEFAULT 0.5,
-                engagement_patterns TEXT,
-                last_updated TEXT
-            )
-        ''')
+        ACCESSIBILITY REQUIREMENTS:
+        - TTS suitable: {(intent_analysis or {}).get('tts_suitable', True)}
+        - User prefers audio: {user_profile.tts_enabled if user_profile else 'Unknown'}
+        - Dual messaging active: User receives both text and voice messages
         
-        # NEW: Laravel integration table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS local_reports (
-                id TEXT PRIMARY KEY,
-                user_phone TEXT,
-                laravel_report_id TEXT,
-                status TEXT,
-                created_at TEXT
-            )
-        ''')
+        RESPONSE REQUIREMENTS:
+        1. Respond naturally and conversationally as ARIA
+        2. Match the user's communication style and emotional tone
+        3. Provide helpful, accurate HSSE information when relevant
+        4. Ask appropriate follow-up questions to be more helpful
+        5. Use WhatsApp-appropriate formatting (emojis, paragraphs)
+        6. Show genuine interest and care for the user's safety and well-being
+        7. Be concise but thorough based on the urgency and complexity of the query
+        8. Include relevant emergency information if there's any safety concern
+        9. Design response to work well with both text and voice delivery
+        10. Use clear, simple language for accessibility
         
-        # NEW: TTS analytics table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tts_analytics (
-                id TEXT PRIMARY KEY,
-                phone TEXT,
-                message_length INTEGER,
-                tts_engine_used TEXT,
-                generation_time_ms INTEGER,
-                file_size_bytes INTEGER,
-                user_feedback TEXT,
-                created_at TEXT
-            )
-        ''')
+        Generate a response that feels natural, helpful, and appropriately matches the context.
+        """
         
-        conn.commit()
-        conn.close()
+        return context
     
-    def init_db_dual_messaging_support(self):
-        """Add dual messaging support to existing database"""
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
+    def _post_process_response(self, response: str, intent_analysis: Dict) -> str:
+        """Post-process response for consistency and safety"""
         
-        # Check and add dual messaging columns to user_profiles
-        cursor.execute("PRAGMA table_info(user_profiles)")
-        profile_columns = [column[1] for column in cursor.fetchall()]
+        # Add emergency info for high urgency situations
+        if intent_analysis.get('urgency_level') in ['high', 'critical']:
+            if 'emergency' not in response.lower() and 'call' not in response.lower():
+                response += "\n\n🚨 *Emergency? Call 911 immediately!*"
         
-        dual_messaging_columns = {
-            'dual_messaging_enabled': 'BOOLEAN DEFAULT 1',
-            'voice_for_emergencies': 'BOOLEAN DEFAULT 1', 
-            'voice_for_long_messages': 'BOOLEAN DEFAULT 1',
-            'voice_delay_seconds': 'INTEGER DEFAULT 2',
-            'preferred_message_format': 'TEXT DEFAULT "both"'
-        }
+        # Add helpful endings based on intent
+        if intent_analysis.get('primary_intent') == 'question' and '?' not in response:
+            response += "\n\nAnything else you'd like to know about this? 😊"
         
-        for column_name, column_def in dual_messaging_columns.items():
-            if column_name not in profile_columns:
-                try:
-                    cursor.execute(f'ALTER TABLE user_profiles ADD COLUMN {column_name} {column_def}')
-                    print(f"Added {column_name} column to user_profiles table")
-                except sqlite3.OperationalError:
-                    pass  # Column might already exist
+        # Add dual messaging info for new users
+        if intent_analysis.get('primary_intent') == 'greeting':
+            response += "\n\n🎙️ *Dual messaging active! You'll receive both text and voice messages for better accessibility. Say 'voice off' to disable audio.*"
         
-        # Create dual messaging analytics table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS dual_messaging_analytics (
-                id TEXT PRIMARY KEY,
-                phone TEXT,
-                message_id TEXT,
-                text_sent BOOLEAN DEFAULT 0,
-                voice_sent BOOLEAN DEFAULT 0,
-                text_delivery_time_ms INTEGER,
-                voice_delivery_time_ms INTEGER,
-                user_interaction_type TEXT,
-                message_length INTEGER,
-                created_at TEXT
-            )
-        ''')
+        # Ensure response isn't too long for WhatsApp
+        if len(response) > 1500:
+            response = response[:1400] + "...\n\nWould you like me to continue with more details?"
         
-        conn.commit()
-        conn.close()
-        print("✅ Dual messaging database support added")
+        return response
     
-    def save_report(self, report: IncidentReport):
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
+    def _generate_fallback_response(self, intent_analysis: Dict, 
+                                  user_profile: Optional[UserProfile]) -> str:
+        """Generate fallback response when AI fails"""
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO reports 
-            (id, user_phone, timestamp, incident_type, severity, description, location, 
-             location_lat, location_long, media_urls, status, ai_analysis, created_at, laravel_report_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            report.id, report.user_phone, report.timestamp, report.incident_type,
-            report.severity, report.description, report.location,
-            report.location_lat, report.location_long,
-            json.dumps(report.media_urls), report.status,
-            json.dumps(report.ai_analysis), report.created_at,
-            report.ai_analysis.get('laravel_report_id')  # Store Laravel ID
-        ))
+        name = user_profile.name if user_profile and user_profile.name else "there"
         
-        conn.commit()
-        conn.close()
+        if intent_analysis.get('urgency_level') in ['high', 'critical']:
+            return (f"Hi {name}! I'm having some technical difficulties right now, "
+                   f"but I can see this might be urgent. 🚨\n\n"
+                   f"For emergencies: Call 911\n"
+                   f"For workplace safety: Contact your safety officer\n\n"
+                   f"I'll be back online shortly to help you properly!")
+        
+        return (f"Hey {name}! 👋 I'm ARIA, your safety assistant with dual messaging. "
+               f"I'm here to help with all your workplace safety questions! "
+               f"How can I assist you today? 😊")
+
+class SmartConversationManager:
+    """Manages smart conversation flow with enhanced memory, continuity, and TTS"""
     
-    def save_local_report(self, local_id: str, phone: str, laravel_report_id: str):
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
+    def __init__(self, conversation_tracker, response_generator):
+        self.tracker = conversation_tracker
+        self.response_generator = response_generator
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO local_reports 
-            (id, user_phone, laravel_report_id, status, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (local_id, phone, laravel_report_id, 'submitted', datetime.datetime.now().isoformat()))
+    def handle_smart_conversation(self, phone: str, message: str, intent_analysis: Dict,
+                                user_profile, media_urls: List[str] = None,
+                                precomputed_response: str = None) -> Tuple[str, Dict]:
+        """Handle conversation with enhanced intelligence, memory, and TTS.
         
-        conn.commit()
-        conn.close()
-    
-    def get_user_session(self, phone: str):
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
+        precomputed_response is the reply already written by the combined LLM call;
+        without it the reply is generated here.
+        """
         
-        cursor.execute('SELECT state, data FROM user_sessions WHERE phone = ?', (phone,))
-        result = cursor.fetchone()
-        conn.close()
+        # Handle TTS control commands
+        if intent_analysis.get('primary_intent') == 'tts_control':
+            return self._handle_tts_control(phone, intent_analysis, user_profile)
         
-        if result:
-            return result[0], json.loads(result[1]) if result[1] else {}
-        return None, {}
-    
-    def update_user_session(self, phone: str, state: str, data: dict):
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
+        # Start or continue conversation thread
+        conversation_type = self._determine_conversation_type(intent_analysis, message)
+        thread_id = self.tracker.start_conversation_thread(phone, message, conversation_type)
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO user_sessions (phone, state, data, last_activity)
-            VALUES (?, ?, ?, ?)
-        ''', (phone, state, json.dumps(data), datetime.datetime.now().isoformat()))
+        # Get rich conversation context
+        conversation_context = self.tracker.get_conversation_context(phone, thread_id)
         
-        conn.commit()
-        conn.close()
-    
-    def get_user_profile(self, phone: str) -> Optional[UserProfile]:
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM user_profiles WHERE phone = ?', (phone,))
-        result = cursor.fetchone()
-        conn.close()
+        # Enhance intent analysis with conversation memory
+        enhanced_intent = self._enhance_intent_with_memory(intent_analysis, conversation_context)
         
-        if result:
-            # Handle both old and new profile formats
-            profile = UserProfile(
-                phone=result[0],
-                name=result[1],
-                role=result[2],
-                department=result[3],
-                preferred_language=result[4] or 'en',
-                interaction_history=json.loads(result[5]) if result[5] else [],
-                safety_interests=json.loads(result[6]) if result[6] else [],
-                last_active=result[7],
-                # TTS preferences
-                tts_enabled=bool(result[8]) if len(result) > 8 else True,
-                tts_voice_preference=result[9] if len(result) > 9 else 'female',
-                tts_speed_preference=result[10] if len(result) > 10 else 150,
-                # Dual messaging preferences
-                dual_messaging_enabled=bool(result[11]) if len(result) > 11 else True,
-                voice_for_emergencies=bool(result[12]) if len(result) > 12 else True,
-                voice_for_long_messages=bool(result[13]) if len(result) > 13 else True,
-                voice_delay_seconds=result[14] if len(result) > 14 else 2,
-                preferred_message_format=result[15] if len(result) > 15 else 'both'
+        # Generate contextually aware response with optional TTS
+        if precomputed_response:
+            response, tts_audio_url = self.response_generator.finalize_response(
+                precomputed_response, enhanced_intent, user_profile
+            )
+        else:
+            response, tts_audio_url = self.response_generator.generate_contextual_response(
+                message, enhanced_intent, user_profile, conversation_context
             )
-            return profile
-        return None
-    
-    def update_user_profile(self, profile: UserProfile):
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO user_profiles 
-            (phone, name, role, department, preferred_language, interaction_history, 
-             safety_interests, last_active, tts_enabled, tts_voice_preference, tts_speed_preference,
-             dual_messaging_enabled, voice_for_emergencies, voice_for_long_messages, 
-             voice_delay_seconds, preferred_message_format)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            profile.phone, profile.name, profile.role, profile.department,
-            profile.preferred_language, json.dumps(profile.interaction_history),
-            json.dumps(profile.safety_interests), profile.last_active,
-            profile.tts_enabled, profile.tts_voice_preference, profile.tts_speed_preference,
-            getattr(profile, 'dual_messaging_enabled', True),
-            getattr(profile, 'voice_for_emergencies', True),
-            getattr(profile, 'voice_for_long_messages', True),
-            getattr(profile, 'voice_delay_seconds', 2),
-            getattr(profile, 'preferred_message_format', 'both')
-        ))
+        # Enhance response with conversation continuity
+        enhanced_response = self._enhance_response_with_continuity(
+            response, conversation_context, enhanced_intent
+        )
         
-        conn.commit()
-        conn.close()
+        # Track this conversation turn with TTS info
+        turn_id = self.tracker.track_conversation_turn(
+            phone, thread_id, message, enhanced_response, enhanced_intent, 
+            conversation_context, tts_audio_url
+        )
+        
+        return enhanced_response, self._conversation_metadata(
+            thread_id, turn_id, conversation_type, conversation_context, tts_audio_url, user_profile
+        )
     
-    def get_conversation_context(self, phone: str) -> Dict:
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
+    async def handle_smart_conversation_async(self, phone: str, message: str, intent_analysis: Dict,
+                                              user_profile, media_urls: List[str] = None,
+                                              precomputed_response: str = None) -> Tuple[str, Dict]:
+        """handle_smart_conversation awaiting the reply and TTS calls; thread tracking runs on the worker pool"""
         
-        cursor.execute('SELECT * FROM conversation_context WHERE phone = ?', (phone,))
-        result = cursor.fetchone()
-        conn.close()
+        if intent_analysis.get('primary_intent') == 'tts_control':
+            return self._handle_tts_control(phone, intent_analysis, user_profile)
         
-        if result:
-            return {
-                'recent_topics': json.loads(result[1]) if result[1] else [],
-                'conversation_style': result[2] or 'professional',
-                'current_mood': result[3] or 'neutral',
-                'expertise_level': result[4] or 'beginner',
-                'last_updated': result[5]
-            }
+        conversation_type = self._determine_conversation_type(intent_analysis, message)
+        thread_id = await asyncio.to_thread(self.tracker.start_conversation_thread, phone, message, conversation_type)
+        conversation_context = await asyncio.to_thread(self.tracker.get_conversation_context, phone, thread_id)
+        enhanced_intent = self._enhance_intent_with_memory(intent_analysis, conversation_context)
+        
+        if precomputed_response:
+            response, tts_audio_url = await self.response_generator.finalize_response_async(
+                precomputed_response, enhanced_intent, user_profile
+            )
+        else:
+            response, tts_audio_url = await self.response_generator.generate_contextual_response_async(
+                message, enhanced_intent, user_profile, conversation_context
+            )
+        
+        enhanced_response = self._enhance_response_with_continuity(
+            response, conversation_context, enhanced_intent
+        )
+        turn_id = await asyncio.to_thread(
+            self.tracker.track_conversation_turn, phone, thread_id, message, enhanced_response,
+            enhanced_intent, conversation_context, tts_audio_url
+        )
+        
+        return enhanced_response, self._conversation_metadata(
+            thread_id, turn_id, conversation_type, conversation_context, tts_audio_url, user_profile
+        )
+    
+    @staticmethod
+    def _conversation_metadata(thread_id: str, turn_id: str, conversation_type: str, conversation_context: Dict,
+                               tts_audio_url: Optional[str], user_profile) -> Dict:
         return {
-            'recent_topics': [],
-            'conversation_style': 'professional',
-            'current_mood': 'neutral',
-            'expertise_level': 'beginner',
-            'last_updated': datetime.datetime.now().isoformat()
+            'thread_id': thread_id,
+            'turn_id': turn_id,
+            'conversation_type': conversation_type,
+            'context_used': conversation_context,
+            'follow_up_suggestions': conversation_context.get('suggested_follow_ups', []),
+            'tts_audio_url': tts_audio_url,
+            'tts_enabled': user_profile.tts_enabled if user_profile else False
         }
     
-    def update_conversation_context(self, phone: str, context: Dict):
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO conversation_context 
-            (phone, recent_topics, conversation_style, current_mood, expertise_level, last_updated)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            phone,
-            json.dumps(context.get('recent_topics', [])),
-            context.get('conversation_style', 'professional'),
-            context.get('current_mood', 'neutral'),
-            context.get('expertise_level', 'beginner'),
-            datetime.datetime.now().isoformat()
-        ))
+    def _handle_tts_control(self, phone: str, intent_analysis: Dict, 
+                           user_profile: UserProfile) -> Tuple[str, Dict]:
+        """Handle TTS control commands"""
         
-        conn.commit()
-        conn.close()
-    
-    # TTS analytics methods
-    def save_tts_analytics(self, phone: str, message_length: int, engine_used: str, 
-                          generation_time_ms: int, file_size_bytes: int):
-        """Save TTS analytics data"""
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
+        tts_command = intent_analysis.get('tts_command', '')
+        name = user_profile.name or "there"
         
-        cursor.execute('''
-            INSERT INTO tts_analytics 
-            (id, phone, message_length, tts_engine_used, generation_time_ms, 
-             file_size_bytes, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            uuid.uuid4().hex, phone, message_length, engine_used,
-            generation_time_ms, file_size_bytes, datetime.datetime.now().isoformat()
-        ))
+        if tts_command == 'disable':
+            user_profile.tts_enabled = False
+            user_profile.preferred_message_format = 'text'
+            
+            response = f"🔇 Voice messages disabled, {name}! You'll only receive text messages now. Say 'voice on' anytime to re-enable dual messaging."
+            
+        elif tts_command == 'enable':
+            user_profile.tts_enabled = True
+            user_profile.preferred_message_format = 'both'
+            
+            response = f"🎙️ Dual messaging enabled, {name}! You'll now receive both text and voice messages for better accessibility."
+            
+        else:
+            response = f"🎙️ Voice Controls:\n• Say 'voice on' to enable dual messaging\n• Say 'voice off' to disable audio\n• Current status: {'Dual messaging enabled' if user_profile.tts_enabled else 'Text only'}"
         
-        conn.commit()
-        conn.close()
+        return response, {
+            'tts_control_handled': True,
+            'new_tts_status': user_profile.tts_enabled,
+            'tts_audio_url': None  # Don't generate TTS for TTS control commands
+        }
     
-    def save_dual_messaging_analytics(self, phone: str, message_data: Dict):
-        """Save dual messaging analytics"""
-        conn = sqlite3.connect('hsse_reports.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO dual_messaging_analytics 
-            (id, phone, message_id, text_sent, voice_sent, text_delivery_time_ms, 
-             voice_delivery_time_ms, user_interaction_type, message_length, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            uuid.uuid4().hex, phone, message_data.get('message_id'),
-            message_data.get('text_sent', False), message_data.get('voice_sent', False),
-            message_data.get('text_delivery_time_ms', 0), message_data.get('voice_delivery_time_ms', 0),
-            message_data.get('interaction_type', 'casual'), message_data.get('message_length', 0),
-            datetime.datetime.now().isoformat()
-        ))
+    def _determine_conversation_type(self, intent_analysis: Dict, message: str) -> str:
+        """Determine the type of conversation"""
+        intent = intent_analysis.get('primary_intent', 'casual')
+        urgency = intent_analysis.get('urgency_level', 'low')
         
-        conn.commit()
-        conn.close()
-
-class EnhancedConversationTracker:
-    """Advanced conversation tracking with memory and continuity"""
+        if intent == 'emergency' or urgency == 'critical':
+            return 'emergency'
+        elif intent == 'report_incident':
+            return 'incident_reporting'
+        elif any(word in message.lower() for word in ['training', 'learn', 'course']):
+            return 'training'
+        elif any(word in message.lower() for word in ['policy', 'procedure', 'regulation']):
+            return 'procedural'
+        else:
+            return 'casual'
     
-    def __init__(self, db_manager):
-        self.db = db_manager
-        self.conversation_memory = {}  # In-memory cache for active conversations
-        self.max_memory_turns = 20  # Keep last 20 turns in memory
-        
-    def start_conversation_thread(self, phone: str, initial_message: str, 
-                                conversation_type: str = 'casual') -> str:
-        """Start a new conversation thread or continue existing one"""
+    def _enhance_intent_with_memory(self, intent_analysis: Dict, conversation_context: Dict) -> Dict:
+        """Enhance intent analysis with conversation memory"""
+        enhanced = intent_analysis.copy()
         
-        # Check if there's a recent active thread (within last 2 hours)
-        recent_thread = self._get_recent_active_thread(phone)
+        # Add context from recent turns
+        recent_topics = conversation_context.get('topics_discussed', [])
+        if recent_topics:
+            enhanced['contextual_topics'] = recent_topics
         
-        if recent_thread and self._should_continue_thread(recent_thread, initial_message):
-            # Continue existing thread
-            thread_id = recent_thread['thread_id']
-            self._update_thread_activity(thread_id)
-        else:
-            # Start new thread
-            thread_id = f"{phone.replace('whatsapp:', '')}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            self._create_new_thread(phone, thread_id, conversation_type)
+        # Add conversation flow awareness
+        conversation_flow = conversation_context.get('conversation_flow', {})
+        enhanced['conversation_flow'] = conversation_flow
         
-        # Initialize in-memory conversation for this thread
-        if thread_id not in self.conversation_memory:
-            self.conversation_memory[thread_id] = {
-                'turns': deque(maxlen=self.max_memory_turns),
-                'context': self._load_conversation_context(thread_id),
-                'user_state': self._load_user_state(phone)
-            }
+        # Add relationship context
+        relationship_score = conversation_context.get('long_term_memory', {}).get('trust_level', 0.5)
+        enhanced['relationship_level'] = relationship_score
         
-        return thread_id
+        return enhanced
     
-    def track_conversation_turn(self, phone: str, thread_id: str, user_message: str, 
-                              bot_response: str, intent_analysis: Dict, 
-                              context_used: Dict, tts_audio_url: str = None) -> str:
-        """Track a complete conversation turn with rich metadata and TTS"""
+    def _enhance_response_with_continuity(self, response: str, conversation_context: Dict, 
+                                        enhanced_intent: Dict) -> str:
+        """Enhance response with conversation continuity and smart follow-ups"""
         
-        turn_id = f"{thread_id}_turn_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        # Add conversational continuity
+        recent_turns = conversation_context.get('recent_turns', [])
+        if recent_turns and len(recent_turns) > 1:
+            # Reference previous conversation if relevant
+            last_topics = recent_turns[-1].topics if hasattr(recent_turns[-1], 'topics') else []
+            current_topics = enhanced_intent.get('key_topics', [])
+            
+            if any(topic in current_topics for topic in last_topics):
+                response = f"Building on what we discussed earlier, {response}"
         
-        # Analyze this turn
-        turn_analysis = self._analyze_conversation_turn(
-            user_message, bot_response, intent_analysis, context_used
-        )
-        
-        # Create conversation turn object
-        turn = ConversationTurn(
-            id=turn_id,
-            user_message=user_message,
-            bot_response=bot_response,
-            timestamp=datetime.datetime.now().isoformat(),
-            intent=intent_analysis.get('primary_intent', 'unknown'),
-            topics=intent_analysis.get('key_topics', []),
-            sentiment=intent_analysis.get('emotional_tone', 'neutral'),
-            context_used=context_used,
-            response_quality_score=turn_analysis['quality_score'],
-            user_satisfaction_indicators=turn_analysis['satisfaction_indicators'],
-            tts_audio_url=tts_audio_url,
-            tts_generated=bool(tts_audio_url)
-        )
+        # Add smart follow-ups based on context
+        unresolved_questions = conversation_context.get('unresolved_questions', [])
+        if unresolved_questions and len(response) < 800:
+            response += f"\n\nBy the way, did I fully answer your earlier question about {unresolved_questions[0][:50]}...?"
         
-        # Store in memory
-        if thread_id in self.conversation_memory:
-            self.conversation_memory[thread_id]['turns'].append(turn)
-            self._update_memory_context(thread_id, turn)
+        return response
+
+
+class EnhancedHSSEChatbot:
+    """Enhanced chatbot with smart conversation tracking, menu system, Laravel integration, and dual TTS messaging"""
+    
+    def __init__(self):
+        self.db = DatabaseManager()
+        self.conversation_analyzer = ConversationAnalyzer()
         
-        # Store in database
-        self._save_conversation_turn(turn, thread_id)
+        # Initialize Enhanced TTS Manager for dual messaging
+        self.tts_manager = EnhancedTextToSpeechManager(self.db.shared_state)
         
-        # Update thread metadata
-        self._update_conversation_thread(thread_id, turn)
+        self.response_generator = SmartResponseGenerator(self.tts_manager)
+        self.location_parser = LocationParser()
         
-        return turn_id
-    
-    def get_conversation_context(self, phone: str, thread_id: str = None) -> Dict:
-        """Get rich conversation context for generating smart responses"""
+        # Laravel integration
+        self.laravel_client = LaravelBackendClient(LARAVEL_BASE_URL, LARAVEL_API_TOKEN)
+        for method_name in ['submit_report', 'submit_media_files', 'test_connection', 'get_report_status']:
+            external_calls.instrument(self.laravel_client, f'laravel.{method_name}', method_name)
+        for method_name in ['submit_report', 'submit_media_files'] if HTTPX_AVAILABLE else []:  # Else they call the sync ones
+            external_calls.instrument_async(self.laravel_client, f'laravel.{method_name}', f'{method_name}_async')
         
-        if not thread_id:
-            thread_id = self._get_current_thread_id(phone)
+        # Initialize conversation tracking
+        self.conversation_tracker = EnhancedConversationTracker(self.db)
+        self.memory_consolidator = LongTermMemoryConsolidator()
+        self.memory_consolidator.start()
+        self.thread_summarizer = ThreadSummarizer(self.db.shared_state)
+        self.thread_summarizer.start()
+        llm_telemetry.start()
+        self.inbound_queue = InboundMessageQueue(self)
+        if WEBHOOK_MODE == 'async':
+            self.inbound_queue.start()
+        self.conversation_manager = SmartConversationManager(
+            self.conversation_tracker, 
+            self.response_generator
+        )
         
-        if not thread_id:
-            return self._create_default_context(phone)
+        self.states = {
+            'CONVERSING': 'conversing',
+            'COLLECTING_REPORT': 'collecting_report',
+            'WAITING_MEDIA': 'waiting_media',
+            'WAITING_LOCATION': 'waiting_location',
+            'CONFIRMING_REPORT': 'confirming_report',
+            'MENU_NAVIGATION': 'menu_navigation',
+            'FAQ_MODE': 'faq_mode'
+        }
         
-        # Get from memory if available
-        if thread_id in self.conversation_memory:
-            memory_context = self.conversation_memory[thread_id]
-            
-            context = {
-                'recent_turns': list(memory_context['turns'])[-5:],  # Last 5 turns
-                'conversation_summary': self._generate_conversation_summary(memory_context['turns']),
-                'topics_discussed': self._extract_topics_from_turns(memory_context['turns']),
-                'user_sentiment_trend': self._analyze_sentiment_trend(memory_context['turns']),
-                'conversation_flow': self._analyze_conversation_flow(memory_context['turns']),
-                'user_engagement_level': self._calculate_engagement_level(memory_context['turns']),
-                'unresolved_questions': self._identify_unresolved_questions(memory_context['turns']),
-                'relationship_building_opportunities': self._identify_relationship_opportunities(memory_context['turns']),
-                'user_state': memory_context['user_state'],
-                'conversation_goals': self._identify_conversation_goals(memory_context['turns']),
-                'suggested_follow_ups': self._generate_smart_follow_ups(memory_context['turns'])
-            }
-        else:
-            # Load from database or create default
-            context = self._create_default_context(phone)
+        # Menu system
+        self.menu_options = {
+            'REPORT': 'Report incidents with AI analysis',
+            'FAQ': 'Get safety information & policies', 
+            'EMERGENCY': 'Get emergency contacts',
+            'STATUS': 'Check system status',
+            'VOICE': 'Voice & dual messaging controls'
+        }
         
-        # Add long-term memory
-        context['long_term_memory'] = self._get_user_long_term_memory(phone)
+        # FAQ categories and content
+        self.faq_categories = {
+            'PPE': 'Personal Protective Equipment',
+            'FIRE': 'Fire Safety & Prevention',
+            'CHEMICAL': 'Chemical Safety & Handling',
+            'ELECTRICAL': 'Electrical Safety',
+            'CONFINED': 'Confined Space Safety',
+            'ERGONOMICS': 'Workplace Ergonomics',
+            'TRAINING': 'Safety Training & Procedures'
+        }
         
-        return context
-    
-    # Helper methods implementation
-    def _get_recent_active_thread(self, phone: str) -> Optional[Dict]:
-        try:
-            conn = sqlite3.connect('hsse_reports.db')
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT * FROM conversation_threads 
-                WHERE phone = ? AND last_activity > datetime('now', '-2 hours')
-                ORDER BY last_activity DESC 
-                LIMIT 1
-            ''', (phone,))
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            if result:
-                return {
-                    'thread_id': result[0],
-                    'phone': result[1],
-                    'start_time': result[2],
-                    'last_activity': result[3],
-                    'total_turns': result[4],
-                    'conversation_type': result[12] if len(result) > 12 else 'casual',
-                    'status': result[13] if len(result) > 13 else 'active'
-                }
-            return None
-        except Exception as e:
-            print(f"Error getting recent thread: {e}")
-            return None
+        # Start cleanup task for TTS files
+        self._start_cleanup_task()
     
-    def _should_continue_thread(self, recent_thread: Dict, new_message: str) -> bool:
-        try:
-            last_activity = datetime.datetime.fromisoformat(recent_thread['last_activity'])
-            time_diff = datetime.datetime.now() - last_activity
-            
-            # Continue if less than 30 minutes
-            if time_diff.total_seconds() < 1800:  # 30 minutes
-                return True
-            
-            # Message references previous conversation
-            reference_words = ['also', 'and', 'additionally', 'furthermore', 'moreover']
-            if any(word in new_message.lower() for word in reference_words):
-                return True
-            
-            # Less than 2 hours and not a greeting
-            greeting_words = ['hi', 'hello', 'hey', 'good morning', 'good afternoon']
-            if (time_diff.total_seconds() < 7200 and  # 2 hours
-                not any(word in new_message.lower() for word in greeting_words)):
-                return True
-        except:
-            pass
+    def _start_cleanup_task(self):
+        """Start background task to clean up old TTS files"""
+        def cleanup_worker():
+            while True:
+                try:
+                    time.sleep(3600)  # Clean up every hour
+                    self.tts_manager.cleanup_old_files()
+                    self.db.shared_state.purge_expired()
+                    analyzer_cache.flush()
+                except Exception as e:
+                    print(f"TTS cleanup error: {e}")
         
-        return False
+        cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
+        cleanup_thread.start()
     
-    def _create_new_thread(self, phone: str, thread_id: str, conversation_type: str):
-        try:
-            conn = sqlite3.connect('hsse_reports.db')
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO conversation_threads 
-                (thread_id, phone, start_time, last_activity, total_turns, conversation_summary,
-                 key_topics_discussed, user_goals_identified, relationship_building_score,
-                 conversation_satisfaction_score, unresolved_issues, follow_up_needed,
-                 conversation_type, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                thread_id, phone, datetime.datetime.now().isoformat(),
-                datetime.datetime.now().isoformat(), 0, '',
-                json.dumps([]), json.dumps([]), 0.5, 0.5,
-                json.dumps([]), False, conversation_type, 'active'
-            ))
-            
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            print(f"Error creating new thread: {e}")
+    def process_message(self, from_number: str, message_body: str, media_urls: List[str] = None) -> Tuple[str, Optional[str]]:
+        """Enhanced message processing with smart conversation tracking, menu system, Laravel integration, and dual TTS messaging"""
+        
+        routed_response, user_profile = self._route_message(from_number, message_body, media_urls)
+        if routed_response:
+            return routed_response
+        
+        # Use smart conversation management for regular conversations
+        with llm_usage_meter.measure(LLM_MODE) as llm_usage:
+            combined = None
+            if LLM_MODE == 'combined':
+                combined = self._analyze_and_respond(from_number, message_body, user_profile)
+                if not combined:
+                    llm_usage['mode'] = 'combined_fallback'
+            
+            return self._respond_to_chat(from_number, message_body, media_urls, user_profile, combined)
     
-    def _update_thread_activity(self, thread_id: str):
-        try:
-            conn = sqlite3.connect('hsse_reports.db')
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE conversation_threads 
-                SET last_activity = ? 
-                WHERE thread_id = ?
-            ''', (datetime.datetime.now().isoformat(), thread_id))
+    async def process_message_async(self, from_number: str, message_body: str,
+                                    media_urls: List[str] = None) -> Tuple[str, Optional[str]]:
+        """process_message for the ASGI webhook.
+        
+        LLM calls (combined, legacy and fallback), OpenAI TTS for chat replies and the
+        Laravel report submission are awaited on the event loop; the local steps around
+        them (SQLite, menus and the rest of the report flow, gTTS/pyttsx3) run on the
+        worker pool.
+        """
+        
+        # Typing SUBMIT to confirm a report is checked here so the Laravel call can be awaited
+        if message_body.upper().strip() == 'SUBMIT':
+            submission = await asyncio.to_thread(self._pending_report_submission, from_number)
+            if submission:
+                return await self._submit_report_to_laravel_async(from_number, *submission)
+        
+        routed_response, user_profile = await asyncio.to_thread(
+            self._route_message, from_number, message_body, media_urls
+        )
+        if routed_response:
+            return routed_response
+        
+        with llm_usage_meter.measure(LLM_MODE) as llm_usage:
+            combined = None
+            if LLM_MODE == 'combined':
+                combined = await self._analyze_and_respond_async(from_number, message_body, user_profile)
+                if not combined:
+                    llm_usage['mode'] = 'combined_fallback'
             
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            print(f"Error updating thread activity: {e}")
+            return await self._respond_to_chat_async(from_number, message_body, media_urls, user_profile, combined)
     
-    def _analyze_conversation_turn(self, user_message: str, bot_response: str, 
-                                 intent_analysis: Dict, context_used: Dict) -> Dict:
-        analysis = {
-            'quality_score': 0.5,
-            'satisfaction_indicators': [],
-            'engagement_signals': [],
-            'confusion_signals': [],
-            'relationship_signals': []
-        }
+    def _route_message(self, from_number: str, message_body: str,
+                       media_urls: List[str] = None) -> Tuple[Optional[Tuple[str, Optional[str]]], Optional[UserProfile]]:
+        """Answer emergencies, commands, menus and report/FAQ flows locally.
         
-        user_lower = user_message.lower()
+        Returns (response, None) when one of them handled the message, otherwise
+        (None, user_profile) for the conversational path.
+        """
         
-        # Positive satisfaction indicators
-        positive_words = ['thanks', 'helpful', 'great', 'perfect', 'exactly', 'awesome', 'good']
-        if any(word in user_lower for word in positive_words):
-            analysis['satisfaction_indicators'].append('positive_feedback')
-            analysis['quality_score'] += 0.2
+        # Emergency detection
+        emergency_keywords = ['fire', 'emergency', 'urgent', 'accident', 'injury', 'help', 'danger', 'critical']
+        if any(keyword in message_body.lower() for keyword in emergency_keywords):
+            return self._handle_immediate_emergency(from_number, message_body), None
         
-        # Engagement signals
-        if '?' in user_message:
-            analysis['engagement_signals'].append('asking_questions')
-            analysis['quality_score'] += 0.1
+        # Get user profile
+        user_profile = self.db.get_user_profile(from_number)
+        if not user_profile:
+            user_profile = UserProfile(
+                phone=from_number,
+                name=None,
+                role=None,
+                department=None,
+                preferred_language='en',
+                interaction_history=[],
+                safety_interests=[],
+                last_active=datetime.datetime.now().isoformat(),
+                tts_enabled=True,
+                tts_voice_preference='female',
+                tts_speed_preference=150,
+                dual_messaging_enabled=True,
+                voice_for_emergencies=True,
+                voice_for_long_messages=True,
+                voice_delay_seconds=2,
+                preferred_message_format='both'
+            )
+            self.db.update_user_profile(user_profile)
         
-        if len(user_message) > 50:
-            analysis['engagement_signals'].append('detailed_response')
-            analysis['quality_score'] += 0.1
+        # Get current session state
+        current_state, session_data = self.db.get_user_session(from_number)
         
-        # Keep score between 0 and 1
-        analysis['quality_score'] = max(0, min(1, analysis['quality_score']))
+        # Check for dual messaging commands first
+        dual_messaging_response = self._handle_dual_messaging_commands(from_number, message_body, user_profile)
+        if dual_messaging_response:
+            return dual_messaging_response, None
         
-        return analysis
-    
-    def _save_conversation_turn(self, turn: ConversationTurn, thread_id: str):
-        try:
-            conn = sqlite3.connect('hsse_reports.db')
-            cursor = conn.cursor()
-            
-            # Get turn number
-            cursor.execute('SELECT COUNT(*) FROM conversation_turns WHERE thread_id = ?', (thread_id,))
-            turn_number = cursor.fetchone()[0] + 1
-            
-            cursor.execute('''
-                INSERT INTO conversation_turns 
-                (id, phone, thread_id, user_message, bot_response, timestamp, intent, topics, 
-                 sentiment, context_used, response_quality_score, user_satisfaction_indicators, 
-                 turn_number, tts_audio_url, tts_generated)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                turn.id, 
-                thread_id.split('_')[0],  # Extract phone from thread_id
-                thread_id,
-                turn.user_message,
-                turn.bot_response,
-                turn.timestamp,
-                turn.intent,
-                json.dumps(turn.topics),
-                turn.sentiment,
-                json.dumps(turn.context_used),
-                turn.response_quality_score,
-                json.dumps(turn.user_satisfaction_indicators),
-                turn_number,
-                turn.tts_audio_url,
-                turn.tts_generated
-            ))
-            
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            print(f"Error saving conversation turn: {e}")
-    
-    def _update_conversation_thread(self, thread_id: str, turn: ConversationTurn):
-        try:
-            conn = sqlite3.connect('hsse_reports.db')
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE conversation_threads 
-                SET last_activity = ?, total_turns = total_turns + 1
-                WHERE thread_id = ?
-            ''', (turn.timestamp, thread_id))
-            
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            print(f"Error updating conversation thread: {e}")
-    
-    # Additional helper methods
-    def _generate_conversation_summary(self, turns: deque) -> str:
-        if not turns:
-            return "No conversation yet."
+        # Check for menu commands
+        menu_response = self._handle_menu_commands(from_number, message_body, user_profile)
+        if menu_response:
+            return menu_response, None
+        
+        # Handle Laravel-integrated reporting flow
+        if current_state in [self.states['COLLECTING_REPORT'], self.states['WAITING_MEDIA'], 
+                            self.states['WAITING_LOCATION'], self.states['CONFIRMING_REPORT']]:
+            return self._handle_laravel_incident_reporting(from_number, message_body, media_urls, 
+                                                         current_state, session_data, {}), None
         
-        topics = []
-        for turn in turns:
-            topics.extend(turn.topics)
+        # Handle FAQ mode
+        if current_state == self.states['FAQ_MODE']:
+            return self._handle_faq_interaction(from_number, message_body, session_data, user_profile), None
         
-        unique_topics = list(set(topics))
-        return f"Discussed: {', '.join(unique_topics[:5])}" if unique_topics else "General conversation"
-    
-    def _extract_topics_from_turns(self, turns: deque) -> List[str]:
-        topics = []
-        for turn in turns:
-            topics.extend(turn.topics)
-        return list(set(topics))
+        return None, user_profile
     
-    def _analyze_sentiment_trend(self, turns: deque) -> str:
-        if not turns:
-            return "neutral"
+    def _respond_to_chat(self, from_number: str, message_body: str, media_urls: Optional[List[str]],
+                         user_profile: UserProfile, combined: Optional[Dict]) -> Tuple[str, Optional[str]]:
+        """Reply to a conversational message, using the combined call's result when there is one"""
         
-        recent_sentiments = [turn.sentiment for turn in list(turns)[-3:]]
-        positive_count = sum(1 for s in recent_sentiments if s in ['happy', 'excited'])
-        negative_count = sum(1 for s in recent_sentiments if s in ['sad', 'frustrated', 'angry'])
+        if combined:
+            intent_analysis = combined['intent']
+        else:
+            intent_analysis = self.conversation_analyzer.analyze_message_intent(message_body)
         
-        if positive_count > negative_count:
-            return "improving"
-        elif negative_count > positive_count:
-            return "declining"
+        # Handle specific intents
+        if intent_analysis.get('primary_intent') == 'emergency':
+            return self._handle_emergency(from_number, message_body, intent_analysis, user_profile)
+        elif intent_analysis.get('primary_intent') == 'report_incident':
+            return self._start_laravel_incident_reporting(from_number, intent_analysis, user_profile)
         else:
-            return "stable"
-    
-    def _analyze_conversation_flow(self, turns: deque) -> Dict:
-        return {
-            'total_turns': len(turns),
-            'avg_message_length': sum(len(turn.user_message) for turn in turns) / max(len(turns), 1),
-            'question_ratio': sum(1 for turn in turns if '?' in turn.user_message) / max(len(turns), 1)
-        }
+            # Check if this is a first interaction or user needs guidance
+            if self._should_show_menu(from_number, message_body, user_profile):
+                return self._show_main_menu(from_number, user_profile, message_body)
+            
+            # Use smart conversation manager for regular chat
+            response, conversation_metadata = self.conversation_manager.handle_smart_conversation(
+                from_number, message_body, intent_analysis, user_profile, media_urls,
+                precomputed_response=combined['reply'] if combined else None
+            )
+            
+            # Get TTS URL from metadata
+            tts_audio_url = conversation_metadata.get('tts_audio_url')
+            
+            # Update user profile with new information (an intent-only result has no user_info)
+            if combined and combined['user_info'] is not None:
+                user_info = combined['user_info']
+            elif user_info_gate.should_extract(message_body, user_profile):
+                user_info = self.conversation_analyzer.extract_user_info(message_body)
+            else:
+                user_info = {}
+            if user_info:
+                self._update_user_profile(user_profile, user_info)
+            
+            return self._with_menu_tip(response), tts_audio_url
     
-    def _calculate_engagement_level(self, turns: deque) -> float:
-        if not turns:
-            return 0.5
+    async def _respond_to_chat_async(self, from_number: str, message_body: str, media_urls: Optional[List[str]],
+                                     user_profile: UserProfile, combined: Optional[Dict]) -> Tuple[str, Optional[str]]:
+        """_respond_to_chat awaiting its LLM and TTS calls"""
         
-        engagement_score = 0.0
-        for turn in turns:
-            if len(turn.user_message) > 50:
-                engagement_score += 0.2
-            if '?' in turn.user_message:
-                engagement_score += 0.1
-            if turn.response_quality_score > 0.7:
-                engagement_score += 0.1
-        
-        return min(1.0, engagement_score / max(len(turns), 1))
-    
-    def _identify_unresolved_questions(self, turns: deque) -> List[str]:
-        questions = []
-        for turn in turns:
-            if '?' in turn.user_message:
-                questions.append(turn.user_message[:100])
-        return questions[-3:]  # Return last 3 questions
-    
-    def _identify_relationship_opportunities(self, turns: deque) -> List[str]:
-        opportunities = []
+        if combined:
+            intent_analysis = combined['intent']
+        else:
+            intent_analysis = await self.conversation_analyzer.analyze_message_intent_async(message_body)
         
-        # Check if we should ask about their role
-        has_personal_info = any('my name' in turn.user_message.lower() or 
-                               'i work' in turn.user_message.lower() 
-                               for turn in turns)
+        if intent_analysis.get('primary_intent') == 'emergency':
+            return await asyncio.to_thread(self._handle_emergency, from_number, message_body, intent_analysis, user_profile)
+        if intent_analysis.get('primary_intent') == 'report_incident':
+            return await asyncio.to_thread(self._start_laravel_incident_reporting, from_number, intent_analysis, user_profile)
+        if await asyncio.to_thread(self._should_show_menu, from_number, message_body, user_profile):
+            return await asyncio.to_thread(self._show_main_menu, from_number, user_profile, message_body)
+        
+        response, conversation_metadata = await self.conversation_manager.handle_smart_conversation_async(
+            from_number, message_body, intent_analysis, user_profile, media_urls,
+            precomputed_response=combined['reply'] if combined else None
+        )
         
-        if not has_personal_info and len(turns) > 2:
-            opportunities.append('ask_about_role')
+        if combined and combined['user_info'] is not None:
+            user_info = combined['user_info']
+        elif user_info_gate.should_extract(message_body, user_profile):
+            user_info = await self.conversation_analyzer.extract_user_info_async(message_body)
+        else:
+            user_info = {}
+        if user_info:
+            await asyncio.to_thread(self._update_user_profile, user_profile, user_info)
         
-        return opportunities
+        return self._with_menu_tip(response), conversation_metadata.get('tts_audio_url')
     
-    def _identify_conversation_goals(self, turns: deque) -> List[str]:
-        goals = []
-        for turn in turns:
-            if turn.intent == 'report_incident':
-                goals.append('Report safety incident')
-            elif 'learn' in turn.user_message.lower():
-                goals.append('Safety learning')
-            elif '?' in turn.user_message:
-                goals.append('Get information')
-        
-        return list(set(goals))
+    @staticmethod
+    def _with_menu_tip(response: str) -> str:
+        # Add menu hint for longer conversations
+        if len(response) < 800:
+            response += f"\n\n💡 *Tip: Type 'MENU' anytime for quick access to reports, FAQ, emergency contacts, and dual messaging settings!*"
+        return response
     
-    def _generate_smart_follow_ups(self, turns: deque) -> List[str]:
-        if not turns:
-            return ["How can I help you with workplace safety today?"]
+    def _analyze_and_respond(self, from_number: str, message: str,
+                             user_profile: UserProfile) -> Optional[Dict]:
+        """Intent, user info and reply from one structured LLM call; None means use the legacy calls.
         
-        last_turn = turns[-1]
-        follow_ups = []
+        When the reply would be thrown away (emergency, report or menu) only the intent is fetched,
+        and 'reply' and 'user_info' come back as None.
+        """
         
-        if last_turn.intent == 'question':
-            follow_ups.append("Do you have any other questions about this topic?")
-        elif 'ppe' in last_turn.topics:
-            follow_ups.append("Would you like to know about PPE inspection schedules?")
+        # Voice on/off commands are recognized locally and never need the LLM
+        tts_command = self.conversation_analyzer.detect_tts_command(message)
+        if tts_command:
+            return {'intent': tts_command, 'user_info': {}, 'reply': None}
         
-        if not follow_ups:
-            follow_ups = ["What else can I help you with today?"]
+        # Emergencies, reports and menus never use the reply, so only the intent is worth asking for
+        local_intent = local_intent_classifier.classify(message)
+        if self._reply_discarded(from_number, message, user_profile, local_intent):
+            intent_analysis = self.conversation_analyzer.analyze_message_intent(message)
+            return {'intent': intent_analysis, 'user_info': None, 'reply': None}
         
-        return follow_ups[:3]
-    
-    def _create_default_context(self, phone: str) -> Dict:
-        return {
-            'recent_turns': [],
-            'conversation_summary': 'New conversation',
-            'topics_discussed': [],
-            'user_sentiment_trend': 'neutral',
-            'conversation_flow': {'total_turns': 0},
-            'user_engagement_level': 0.5,
-            'unresolved_questions': [],
-            'relationship_building_opportunities': [],
-            'user_state': {},
-            'conversation_goals': [],
-            'suggested_follow_ups': ["How can I help you with workplace safety today?"]
-        }
-    
-    def _get_user_long_term_memory(self, phone: str) -> Dict:
-        try:
-            conn = sqlite3.connect('hsse_reports.db')
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM user_long_term_memory WHERE phone = ?', (phone,))
-            result = cursor.fetchone()
-            conn.close()
-            
-            if result:
-                return {
-                    'trust_level': result[8] or 0.5,
-                    'preferred_style': result[7] or 'professional',
-                    'expertise_areas': json.loads(result[3]) if result[3] else []
-                }
-        except Exception as e:
-            print(f"Error getting long term memory: {e}")
+        conversation_context = self.conversation_tracker.get_conversation_context(from_number)
+        combined = self.response_generator.generate_combined_response(
+            message, user_profile, conversation_context, local_intent
+        )
         
-        return {'trust_level': 0.5, 'preferred_style': 'professional', 'expertise_areas': []}
+        # A fresh reply needed the call anyway, so the local classifier only runs in shadow for agreement stats
+        if combined and combined['intent'] is not local_intent:
+            local_intent_classifier.record_comparison(local_intent, combined['intent'])
+        return combined
     
-    def _load_conversation_context(self, thread_id: str) -> Dict:
-        return {}
-    
-    def _load_user_state(self, phone: str) -> Dict:
-        return {}
-    
-    def _get_current_thread_id(self, phone: str) -> Optional[str]:
-        recent_thread = self._get_recent_active_thread(phone)
-        return recent_thread['thread_id'] if recent_thread else None
+    async def _analyze_and_respond_async(self, from_number: str, message: str,
+                                         user_profile: UserProfile) -> Optional[Dict]:
+        """_analyze_and_respond awaiting the combined LLM call"""
+        
+        tts_command = self.conversation_analyzer.detect_tts_command(message)
+        if tts_command:
+            return {'intent': tts_command, 'user_info': {}, 'reply': None}
+        
+        local_intent = local_intent_classifier.classify(message)
+        if self._reply_discarded(from_number, message, user_profile, local_intent):
+            intent_analysis = await self.conversation_analyzer.analyze_message_intent_async(message)
+            return {'intent': intent_analysis, 'user_info': None, 'reply': None}
+        
+        conversation_context = await asyncio.to_thread(self.conversation_tracker.get_conversation_context, from_number)
+        combined = await self.response_generator.generate_combined_response_async(
+            message, user_profile, conversation_context, local_intent
+        )
+        
+        if combined and combined['intent'] is not local_intent:
+            local_intent_classifier.record_comparison(local_intent, combined['intent'])
+        return combined
     
-    def _update_memory_context(self, thread_id: str, turn: ConversationTurn):
-        # Update in-memory context
-        pass
-
-class ConversationAnalyzer:
-    """Advanced conversation analysis and context understanding"""
+    def _reply_discarded(self, from_number: str, message: str, user_profile: UserProfile,
+                         local_intent: Optional[Dict]) -> bool:
+        """True when _respond_to_chat would most likely answer with the emergency, report or menu flow"""
+        if local_intent and local_intent['primary_intent'] in ('emergency', 'report_incident'):
+            return True
+        return self._should_show_menu(from_number, message, user_profile)
     
-    @staticmethod
-    def analyze_message_intent(message: str, context: Dict = None) -> Dict:
-        """Analyze message intent with deep understanding"""
-        try:
-            # Check for TTS control commands
-            message_lower = message.lower()
-            if any(phrase in message_lower for phrase in ['voice off', 'no voice', 'no audio', 'disable voice']):
-                return {
-                    "primary_intent": "tts_control",
-                    "secondary_intents": ["disable_tts"],
-                    "urgency_level": "low",
-                    "emotional_tone": "neutral",
-                    "conversation_style": "functional",
-                    "tts_command": "disable",
-                    "confidence_score": 0.9
-                }
-            
-            if any(phrase in message_lower for phrase in ['voice on', 'enable voice', 'enable audio', 'turn on voice']):
-                return {
-                    "primary_intent": "tts_control", 
-                    "secondary_intents": ["enable_tts"],
-                    "urgency_level": "low",
-                    "emotional_tone": "neutral",
-                    "conversation_style": "functional",
-                    "tts_command": "enable",
-                    "confidence_score": 0.9
-                }
+    def _handle_immediate_emergency(self, from_number: str, message: str) -> Tuple[str, Optional[str]]:
+        """Handle immediate emergency situations with instant response and emergency TTS"""
+        
+        # Get user name if available
+        user_profile = self.db.get_user_profile(from_number)
+        name = user_profile.name if user_profile and user_profile.name else "there"
+        
+        message_lower = message.lower()
+        
+        # Fire emergency
+        if 'fire' in message_lower:
+            response = (f"🚨 **FIRE EMERGENCY - {name.upper()}!** 🚨\n\n"
+                       f"**IMMEDIATE ACTIONS:**\n"
+                       f"🔥 **CALL 912 RIGHT NOW** (Fire Service)\n"
+                       f"📞 **OR CALL 911** (Emergency Services)\n\n"
+                       f"**IF SAFE TO DO SO:**\n"
+                       f"🚨 Activate fire alarm\n"
+                       f"👥 Evacuate everyone\n"
+                       f"🚪 Close doors behind you\n"
+                       f"📍 Meet at assembly point\n\n"
+                       f"**GUYANA EMERGENCY CONTACTS:**\n"
+                       f"🚒 Fire Service: **912**\n"
+                       f"🚑 Ambulance: **913** \n"
+                       f"👮 Police: **911**\n"
+                       f"🏥 Georgetown Hospital: **225-5200**\n\n"
+                       f"Stay safe, {name}! Emergency audio alert will follow this text!")
             
-            # Use OpenAI for intent analysis
-            prompt = f"""
-            Analyze this message and determine the user's intent, mood, and context needs.
+            # Use pre-generated emergency audio
+            tts_audio_url = self.tts_manager.get_emergency_audio('fire')
             
-            Message: "{message}"
+        # Medical emergency
+        elif any(word in message_lower for word in ['injury', 'hurt', 'accident', 'medical']):
+            response = (f"🚨 **MEDICAL EMERGENCY - {name.upper()}!** 🚨\n\n"
+                       f"**CALL 913 IMMEDIATELY** (Ambulance)\n"
+                       f"**OR CALL 911** (Emergency Services)\n\n"
+                       f"**WHILE WAITING FOR HELP:**\n"
+                       f"🩺 Check if person is conscious\n"
+                       f"🫁 Check breathing\n"
+                       f"🩸 Control any bleeding\n"
+                       f"🚫 DO NOT move if spinal injury suspected\n\n"
+                       f"**GUYANA EMERGENCY CONTACTS:**\n"
+                       f"🚑 Ambulance: **913**\n"
+                       f"🏥 Georgetown Hospital: **225-5200**\n\n"
+                       f"Stay with the injured person, {name}! Audio emergency guide will follow!")
             
-            Provide analysis in JSON format:
-            {{
-                "primary_intent": "greeting|question|report_incident|emergency|complaint|compliment|casual_chat|request_help|location_sharing|tts_control|other",
-                "secondary_intents": ["list", "of", "secondary", "intents"],
-                "urgency_level": "low|medium|high|critical",
-                "emotional_tone": "happy|sad|frustrated|angry|worried|excited|neutral|confused",
-                "conversation_style": "casual|professional|urgent|friendly|formal",
-                "expertise_level": "beginner|intermediate|expert",
-                "safety_related": true/false,
-                "needs_human_response": true/false,
-                "key_topics": ["topic1", "topic2"],
-                "response_style_needed": "empathetic|informative|reassuring|direct|detailed|simple",
-                "follow_up_questions": ["suggested", "questions", "to", "ask"],
-                "tts_suitable": true/false,
-                "confidence_score": 0.5
-            }}
-            """
+            tts_audio_url = self.tts_manager.get_emergency_audio('medical')
+        
+        # General emergency
+        else:
+            response = (f"🚨 **EMERGENCY DETECTED - {name.upper()}!** 🚨\n\n"
+                       f"**CALL 911 IMMEDIATELY!**\n\n"
+                       f"**GUYANA EMERGENCY SERVICES:**\n"
+                       f"🚨 General Emergency: **911**\n"
+                       f"🚒 Fire Service: **912**\n"
+                       f"🚑 Ambulance: **913**\n"
+                       f"👮 Police: **911**\n\n"
+                       f"Stay safe, {name}! Emergency voice alert is being sent!")
             
-            response = openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=400,
-                temperature=0.2
-            )
+            tts_audio_url = self.tts_manager.get_emergency_audio('emergency')
+        
+        return response, tts_audio_url
+    
+    def _handle_dual_messaging_commands(self, from_number: str, message: str, user_profile: UserProfile) -> Optional[Tuple[str, Optional[str]]]:
+        """Handle dual messaging control commands"""
+        
+        message_lower = message.lower().strip()
+        
+        # Voice control commands
+        if any(cmd in message_lower for cmd in ['voice off', 'disable voice', 'no voice', 'text only']):
+            user_profile.tts_enabled = False
+            user_profile.preferred_message_format = 'text'
+            self.db.update_user_profile(user_profile)
             
-            return json.loads(response.choices[0].message.content)
+            response = f"🔇 Voice messages disabled, {user_profile.name or 'there'}! You'll only receive text messages now.\n\nSay 'voice on' anytime to re-enable dual messaging (text + audio)."
+            return response, None  # No TTS for voice-off command
+        
+        elif any(cmd in message_lower for cmd in ['voice on', 'enable voice', 'dual messaging', 'both messages']):
+            user_profile.tts_enabled = True
+            user_profile.preferred_message_format = 'both'
+            self.db.update_user_profile(user_profile)
             
-        except Exception as e:
-            print(f"Intent analysis error: {e}")
-            # Enhanced fallback analysis
-            message_lower = message.lower()
-            
-            # Emergency detection fallback
-            if any(word in message_lower for word in ['fire', 'emergency', 'urgent', 'help', 'accident', 'injury', 'danger']):
-                return {
-                    "primary_intent": "emergency",
-                    "urgency_level": "critical",
-                    "emotional_tone": "urgent",
-                    "safety_related": True,
-                    "response_style_needed": "emergency",
-                    "tts_suitable": True,
-                    "confidence_score": 0.9,
-                    "key_topics": ["emergency"]
-                }
-            
-            # Incident reporting detection
-            elif any(word in message_lower for word in ['report', 'incident', 'happened', 'problem']):
-                return {
-                    "primary_intent": "report_incident",
-                    "urgency_level": "medium",
-                    "safety_related": True,
-                    "response_style_needed": "empathetic",
-                    "tts_suitable": True,
-                    "confidence_score": 0.7,
-                    "key_topics": ["incident"]
-                }
-            
-            return {
-                "primary_intent": "question" if "?" in message else "casual_chat",
-                "urgency_level": "low",
-                "emotional_tone": "neutral",
-                "safety_related": any(word in message_lower for word in ['safety', 'accident', 'injury', 'hazard', 'incident']),
-                "response_style_needed": "empathetic",
-                "tts_suitable": True,
-                "confidence_score": 0.3,
-                "key_topics": []
-            }
-    
-    @staticmethod
-    def extract_user_info(message: str) -> Dict:
-        """Extract user information from natural conversation"""
-        try:
-            prompt = f"""
-            Extract any personal or professional information mentioned in this message:
-            
-            Message: "{message}"
-            
-            Return JSON with any information found:
-            {{
-                "name": "if mentioned",
-                "role": "job title if mentioned", 
-                "department": "work department if mentioned",
-                "experience_level": "years or level if mentioned",
-                "location": "work location if mentioned",
-                "interests": ["safety", "topics", "mentioned"],
-                "concerns": ["specific", "safety", "concerns"],
-                "tts_preferences": {{"voice": "male/female if mentioned", "speed": "fast/slow if mentioned"}}
-            }}
-            
-            Only include fields where information was actually mentioned. Return empty object if nothing found.
-            """
-            
-            response = openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=200,
-                temperature=0.1
-            )
-            
-            return json.loads(response.choices[0].message.content)
-            
-        except Exception as e:
-            print(f"User info extraction error: {e}")
-            return {}
-
-class SmartResponseGenerator:
-    """Generate contextually appropriate and conversational responses with TTS support"""
-    
-    def __init__(self, tts_manager):
-        self.tts_manager = tts_manager
-        self.personality_traits = {
-            "helpful": True,
-            "empathetic": True,
-            "professional": True,
-            "safety_focused": True,
-            "conversational": True,
-            "adaptive": True
-        }
-    
-    def generate_contextual_response(self, message: str, intent_analysis: Dict, 
-                                   user_profile: Optional[UserProfile], 
-                                   conversation_context: Dict) -> Tuple[str, Optional[str]]:
-        """Generate intelligent, contextual responses with optional TTS"""
+            response = f"🎙️ Dual messaging enabled, {user_profile.name or 'there'}! You'll now receive both text and voice messages for better accessibility."
+            tts_audio_url = self.tts_manager.get_dual_messaging_audio('voice_enabled_dual')
+            return response, tts_audio_url
         
-        try:
-            # Build comprehensive context for AI
-            context_prompt = self._build_context_prompt(
-                message, intent_analysis, user_profile, conversation_context
-            )
-            
-            response = openai_client.chat.completions.create(
-                model="gpt-4o-mini",  # Use the available model
-                messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
-                    {"role": "user", "content": context_prompt}
-                ],
-                max_tokens=600,
-                temperature=0.7
-            )
-            
-            generated_response = response.choices[0].message.content
-            
-            # Post-process response for consistency and safety
-            processed_response = self._post_process_response(generated_response, intent_analysis)
-            
-            # Generate TTS if enabled and suitable
-            tts_audio_url = None
-            if (user_profile and user_profile.tts_enabled and 
-                intent_analysis.get('tts_suitable', True) and
-                TTS_ENABLED):
-                
-                user_preferences = {
-                    'tts_voice_preference': user_profile.tts_voice_preference,
-                    'tts_speed_preference': user_profile.tts_speed_preference,
-                    'language': user_profile.preferred_language
-                }
-                
-                # Check for emergency audio cache first
-                if intent_analysis.get('urgency_level') in ['high', 'critical']:
-                    emergency_type = intent_analysis.get('primary_intent', 'emergency')
-                    tts_audio_url = self.tts_manager.get_emergency_audio(emergency_type)
-                
-                # Generate TTS for regular responses
-                if not tts_audio_url:
-                    tts_audio_url = self.tts_manager.generate_for_dual_messaging(
-                        processed_response, 
-                        user_preferences,
-                        priority='emergency' if intent_analysis.get('urgency_level') in ['high', 'critical'] else 'normal'
-                    )
-            
-            return processed_response, tts_audio_url
-            
-        except Exception as e:
-            print(f"Smart response generation error: {e}")
-            fallback_response = self._generate_fallback_response(intent_analysis, user_profile)
-            
-            # Generate TTS for fallback if needed
-            tts_audio_url = None
-            if (user_profile and user_profile.tts_enabled and TTS_ENABLED):
-                tts_audio_url = self.tts_manager.generate_for_dual_messaging(fallback_response)
-            
-            return fallback_response, tts_audio_url
+        elif 'voice settings' in message_lower or message.upper().strip() == 'VOICE':
+            return self._show_enhanced_voice_settings(from_number, user_profile)
+        
+        # Voice preference changes
+        elif 'voice fast' in message_lower:
+            user_profile.tts_speed_preference = min(250, user_profile.tts_speed_preference + 25)
+            self.db.update_user_profile(user_profile)
+            response = f"🎙️ Speech speed increased to {user_profile.tts_speed_preference} WPM. Try saying something to test!"
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response, {'tts_speed_preference': user_profile.tts_speed_preference})
+            return response, tts_audio_url
+        
+        elif 'voice slow' in message_lower:
+            user_profile.tts_speed_preference = max(100, user_profile.tts_speed_preference - 25)
+            self.db.update_user_profile(user_profile)
+            response = f"🎙️ Speech speed decreased to {user_profile.tts_speed_preference} WPM. This message uses the new speed!"
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response, {'tts_speed_preference': user_profile.tts_speed_preference})
+            return response, tts_audio_url
+        
+        elif 'voice male' in message_lower:
+            user_profile.tts_voice_preference = 'male'
+            self.db.update_user_profile(user_profile)
+            response = f"🎙️ Voice changed to male. This message demonstrates the new voice!"
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response, {'tts_voice_preference': 'male'})
+            return response, tts_audio_url
+        
+        elif 'voice female' in message_lower:
+            user_profile.tts_voice_preference = 'female'
+            self.db.update_user_profile(user_profile)
+            response = f"🎙️ Voice changed to female. Listen to this message with the new voice!"
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response, {'tts_voice_preference': 'female'})
+            return response, tts_audio_url
+        
+        return None
     
-    def _get_system_prompt(self) -> str:
-        """Define the AI assistant's personality and capabilities"""
-        return """
-        You are ARIA (AI Risk Intelligence Assistant), a highly advanced HSSE (Health, Safety, Security, Environment) expert with these qualities:
-
-        PERSONALITY:
-        - Warm, empathetic, and genuinely caring about people's safety
-        - Conversational and natural, not robotic or overly formal
-        - Intelligent and knowledgeable, but explains things clearly
-        - Adapts communication style to match the user's needs and expertise level
-        - Remembers context and builds on previous conversations
-        - Uses appropriate emojis and formatting for WhatsApp
-        - Supports accessibility features including voice responses
+    def _show_enhanced_voice_settings(self, from_number: str, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
+        """Show enhanced voice settings with dual messaging options"""
+        
+        name = user_profile.name or "there"
+        
+        voice_menu = f"""🎙️ **Enhanced Dual Messaging Settings - {name}** 🎙️
 
-        EXPERTISE:
-        - 20+ years equivalent HSSE experience across all industries
-        - Deep knowledge of international safety standards and local regulations
-        - Specializes in Guyana/Caribbean workplace safety and climate considerations
-        - Expert in incident analysis, risk assessment, and emergency response
-        - Up-to-date with latest safety technologies and best practices
+**Current Setup:**
+📱 Text Messages: Always enabled (instant delivery)
+🔊 Voice Messages: {'✅ Enabled' if user_profile.tts_enabled else '❌ Disabled'}
+🎵 Voice Type: {user_profile.tts_voice_preference.title()}
+⚡ Speech Speed: {user_profile.tts_speed_preference} WPM
+⏱️ Voice Delay: {getattr(user_profile, 'voice_delay_seconds', 2)} seconds after text
 
-        CONVERSATION STYLE:
-        - Respond naturally like a human expert would in a WhatsApp chat
-        - Match the user's energy and communication style appropriately
-        - Use conversational phrases, contractions, and natural flow
-        - Ask follow-up questions when helpful
-        - Show genuine interest in the user's situation and well-being
-        - Provide practical, actionable advice
-        - Balance being thorough with being concise based on the situation
-        - Design responses that work well for both text and voice (TTS)
+**Quick Commands:**
+🔸 **"VOICE ON"** - Enable dual messaging (text + audio)
+🔸 **"VOICE OFF"** - Text messages only  
+🔸 **"VOICE FAST"** - Increase speech speed
+🔸 **"VOICE SLOW"** - Decrease speech speed
+🔸 **"VOICE MALE"** - Switch to male voice
+🔸 **"VOICE FEMALE"** - Switch to female voice
 
-        ACCESSIBILITY FEATURES:
-        - Create responses suitable for text-to-speech conversion
-        - Use clear, simple language when users prefer audio
-        - Avoid complex formatting when TTS is enabled
-        - Provide audio-friendly emergency instructions
+**How Dual Messaging Works:**
+📤 Text message sent immediately (0-1 second)
+🎙️ Voice message follows shortly (2-3 seconds later)
+🚨 Emergency messages get priority audio delivery
+♿ Perfect for accessibility and hands-free operation
 
-        SAFETY PRIORITIES:
-        - Always prioritize immediate safety and emergency response
-        - Provide clear, actionable guidance
-        - Escalate to human experts or emergency services when needed
-        - Never provide advice that could increase risk
-        - Consider environmental and cultural factors (especially tropical/Caribbean context)
+💬 *This message demonstrates dual messaging - you received text first, then this audio version!*
 
-        RESPONSE FORMAT:
-        - Use WhatsApp-friendly formatting (emojis, short paragraphs)
-        - Structure information clearly but naturally
-        - Include relevant contact information when appropriate
-        - End with helpful follow-up suggestions when relevant
-        - Make responses accessible for users who rely on voice features
-        """
-    
-    def _build_context_prompt(self, message: str, intent_analysis: Dict, 
-                            user_profile: Optional[UserProfile], 
-                            conversation_context: Dict) -> str:
-        """Build comprehensive context for response generation"""
+Type a voice command or 'MENU' to return to main menu."""
         
-        context = f"""
-        USER MESSAGE: "{message}"
+        # Always generate TTS for voice settings
+        tts_audio_url = self.tts_manager.generate_for_dual_messaging(voice_menu)
         
-        INTENT ANALYSIS:
-        {json.dumps(intent_analysis, indent=2)}
+        return voice_menu, tts_audio_url
+    
+    def _handle_menu_commands(self, from_number: str, message: str, user_profile: UserProfile) -> Optional[Tuple[str, Optional[str]]]:
+        """Handle menu-specific commands with TTS"""
         
-        USER PROFILE:
-        """
+        message_upper = message.upper().strip()
         
-        if user_profile:
-            context += f"""
-        - Name: {user_profile.name or 'Not provided'}
-        - Role: {user_profile.role or 'Not specified'}
-        - Department: {user_profile.department or 'Not specified'}
-        - Previous interests: {', '.join(user_profile.safety_interests) if user_profile.safety_interests else 'None recorded'}
-        - Interaction history: {len(user_profile.interaction_history)} previous conversations
-        - TTS enabled: {user_profile.tts_enabled}
-        - Voice preference: {user_profile.tts_voice_preference}
-        - Speech speed: {user_profile.tts_speed_preference} WPM
-        - Dual messaging: {getattr(user_profile, 'dual_messaging_enabled', True)}
-        """
-        else:
-            context += "- New user, no previous profile information"
+        # Main menu trigger
+        if message_upper in ['MENU', 'HELP', 'OPTIONS', 'START']:
+            return self._show_main_menu(from_number, user_profile, message)
         
-        context += f"""
+        # Direct menu options
+        elif message_upper == 'REPORT':
+            return self._start_incident_reporting_from_menu(from_number, user_profile)
         
-        CONVERSATION CONTEXT:
-        - Recent topics: {', '.join(conversation_context.get('topics_discussed', []))}
-        - Communication style: {conversation_context.get('conversation_summary', 'New conversation')}
-        - User engagement: {conversation_context.get('user_engagement_level', 0.5)}
-        - Suggested follow-ups: {', '.join(conversation_context.get('suggested_follow_ups', []))}
+        elif message_upper == 'FAQ':
+            return self._show_faq_menu(from_number, user_profile)
         
-        LOCATION CONTEXT:
-        - User is in Georgetown, Guyana (tropical climate, developing industrial sector)
-        - Consider local regulations, climate challenges, and emergency services
+        elif message_upper == 'EMERGENCY':
+            return self._show_emergency_contacts(from_number, user_profile)
         
-        ACCESSIBILITY REQUIREMENTS:
-        - TTS suitable: {intent_analysis.get('tts_suitable', True)}
-        - User prefers audio: {user_profile.tts_enabled if user_profile else 'Unknown'}
-        - Dual messaging active: User receives both text and voice messages
+        elif message_upper == 'STATUS':
+            return self._show_system_status(from_number, user_profile)
         
-        RESPONSE REQUIREMENTS:
-        1. Respond naturally and conversationally as ARIA
-        2. Match the user's communication style and emotional tone
-        3. Provide helpful, accurate HSSE information when relevant
-        4. Ask appropriate follow-up questions to be more helpful
-        5. Use WhatsApp-appropriate formatting (emojis, paragraphs)
-        6. Show genuine interest and care for the user's safety and well-being
-        7. Be concise but thorough based on the urgency and complexity of the query
-        8. Include relevant emergency information if there's any safety concern
-        9. Design response to work well with both text and voice delivery
-        10. Use clear, simple language for accessibility
-        
-        Generate a response that feels natural, helpful, and appropriately matches the context.
-        """
+        # Back to menu from any state
+        elif message_upper in ['BACK', 'MAIN', 'HOME']:
+            self.db.update_user_session(from_number, self.states['CONVERSING'], {})
+            return self._show_main_menu(from_number, user_profile, "returning to main menu")
         
-        return context
+        return None
     
-    def _post_process_response(self, response: str, intent_analysis: Dict) -> str:
-        """Post-process response for consistency and safety"""
+    def _show_main_menu(self, from_number: str, user_profile: UserProfile, context_message: str = "") -> Tuple[str, Optional[str]]:
+        """Display the main menu with personalized greeting and TTS"""
         
-        # Add emergency info for high urgency situations
-        if intent_analysis.get('urgency_level') in ['high', 'critical']:
-            if 'emergency' not in response.lower() and 'call' not in response.lower():
-                response += "\n\n🚨 *Emergency? Call 911 immediately!*"
+        name = user_profile.name or "there"
         
-        # Add helpful endings based on intent
-        if intent_analysis.get('primary_intent') == 'question' and '?' not in response:
-            response += "\n\nAnything else you'd like to know about this? 😊"
+        # Set menu navigation state
+        self.db.update_user_session(from_number, self.states['MENU_NAVIGATION'], {
+            'last_menu': 'main',
+            'timestamp': datetime.datetime.now().isoformat()
+        })
         
-        # Add dual messaging info for new users
-        if intent_analysis.get('primary_intent') == 'greeting':
-            response += "\n\n🎙️ *Dual messaging active! You'll receive both text and voice messages for better accessibility. Say 'voice off' to disable audio.*"
+        # Personalized greeting based on context
+        if "returning" in context_message.lower():
+            greeting = f"Welcome back, {name}! 👋"
+        elif user_profile.name:
+            greeting = f"Hi {name}! 😊 How can I help you today?"
+        else:
+            greeting = f"Hello there! 👋 I'm ARIA, your AI safety assistant."
         
-        # Ensure response isn't too long for WhatsApp
-        if len(response) > 1500:
-            response = response[:1400] + "...\n\nWould you like me to continue with more details?"
+        menu = f"""{greeting}
+
+🛡️ **ARIA Safety Assistant Menu** 🛡️
+
+Choose an option by typing the keyword:
+
+🔸 **REPORT** - Report incidents with AI analysis (sends to Laravel dashboard!)
+🔸 **FAQ** - Get safety information & policies  
+🔸 **EMERGENCY** - Get emergency contacts
+🔸 **STATUS** - Check system status
+🔸 **VOICE** - Dual messaging & voice controls 🎙️
+
+💬 *You can also just ask me anything about workplace safety naturally - I understand regular conversation too!*
+
+🚀 *NEW: Dual messaging active! You get both text (immediate) and voice (2 sec later) for optimal accessibility!*
+📊 *Reports automatically sent to Laravel safety dashboard with AI analysis!*
+
+What would you like to do?"""
         
-        return response
+        # Generate TTS
+        tts_audio_url = None
+        if user_profile.tts_enabled and TTS_ENABLED:
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(menu, cache_key='menu_dual')
+        
+        return menu, tts_audio_url
     
-    def _generate_fallback_response(self, intent_analysis: Dict, 
-                                  user_profile: Optional[UserProfile]) -> str:
-        """Generate fallback response when AI fails"""
+    def _start_incident_reporting_from_menu(self, from_number: str, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
+        """Start incident reporting from menu with TTS"""
         
-        name = user_profile.name if user_profile and user_profile.name else "there"
+        name = user_profile.name or "there"
         
-        if intent_analysis.get('urgency_level') in ['high', 'critical']:
-            return (f"Hi {name}! I'm having some technical difficulties right now, "
-                   f"but I can see this might be urgent. 🚨\n\n"
-                   f"For emergencies: Call 911\n"
-                   f"For workplace safety: Contact your safety officer\n\n"
-                   f"I'll be back online shortly to help you properly!")
+        # Initialize Laravel reporting session
+        session_data = {
+            'step': 'media',
+            'report_data': {
+                'reporter_name': user_profile.name or 'WhatsApp User',
+                'reporter_contact': from_number,
+                'source': 'whatsapp_chatbot',
+                'report_type': 'incident',
+                'industry': 'General'
+            },
+            'started_at': datetime.datetime.now().isoformat()
+        }
         
-        return (f"Hey {name}! 👋 I'm ARIA, your safety assistant with dual messaging. "
-               f"I'm here to help with all your workplace safety questions! "
-               f"How can I assist you today? 😊")
+        self.db.update_user_session(from_number, self.states['WAITING_MEDIA'], session_data)
+        
+        response = f"""🛡️ **Incident Report - {name}** 🛡️
 
-class SmartConversationManager:
-    """Manages smart conversation flow with enhanced memory, continuity, and TTS"""
+I'll help you quickly report this incident to our Laravel safety dashboard. The process is simple:
+
+**📸 STEP 1: Send photos or videos**
+Send me photos/videos of the incident scene, damage, or any relevant evidence.
+
+**📍 STEP 2: Share your location**  
+Share your location so responders can find you.
+
+**Let's start - please send your photos/videos now! 📱**
+
+*Tip: You can send multiple photos one after another*
+
+Your report will be automatically analyzed by AI and sent to the safety team through our Laravel dashboard! 🚀
+
+Both text and voice guidance will help you through each step."""
+        
+        # Generate TTS
+        tts_audio_url = None
+        if user_profile.tts_enabled and TTS_ENABLED:
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
+        
+        return response, tts_audio_url
     
-    def __init__(self, conversation_tracker, response_generator):
-        self.tracker = conversation_tracker
-        self.response_generator = response_generator
+    def _show_emergency_contacts(self, from_number: str, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
+        """Show emergency contacts with TTS"""
         
-    def handle_smart_conversation(self, phone: str, message: str, intent_analysis: Dict,
-                                user_profile, media_urls: List[str] = None) -> Tuple[str, Dict]:
-        """Handle conversation with enhanced intelligence, memory, and TTS"""
+        name = user_profile.name or "there"
         
-        # Handle TTS control commands
-        if intent_analysis.get('primary_intent') == 'tts_control':
-            return self._handle_tts_control(phone, intent_analysis, user_profile)
+        contacts = f"""🚨 **Emergency Contacts - {name}** 🚨
+
+**GUYANA EMERGENCY SERVICES:**
+🚨 General Emergency: **911**
+🚒 Fire Service: **912**
+🚑 Ambulance: **913**
+👮 Police: **911**
+🏥 Georgetown Hospital: **225-5200**
+
+**WORKPLACE EMERGENCY:**
+📞 Safety Officer: [Contact your safety team]
+🏢 Security: [Your company security]
+🚨 Emergency Assembly Point: [Your designated area]
+
+**IMPORTANT:**
+- Call 911 for life-threatening emergencies
+- Use specific numbers (912/913) for fire/medical
+- Report to dashboard after emergency response
+- This contact list is available in both text and audio
+
+Stay safe, {name}! 🛡️
+
+Type 'MENU' to return to main menu."""
         
-        # Start or continue conversation thread
-        conversation_type = self._determine_conversation_type(intent_analysis, message)
-        thread_id = self.tracker.start_conversation_thread(phone, message, conversation_type)
+        # Generate TTS
+        tts_audio_url = None
+        if user_profile.tts_enabled and TTS_ENABLED:
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(contacts, cache_key='emergency_contacts')
         
-        # Get rich conversation context
-        conversation_context = self.tracker.get_conversation_context(phone, thread_id)
+        return contacts, tts_audio_url
+    
+    def _show_system_status(self, from_number: str, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
+        """Show system status with TTS"""
         
-        # Enhance intent analysis with conversation memory
-        enhanced_intent = self._enhance_intent_with_memory(intent_analysis, conversation_context)
+        # Test Laravel connection
+        laravel_status = "🟢 Connected" 
+        try:
+            test_result = self.laravel_client.test_connection()
+            if not test_result.get('success'):
+                laravel_status = "🔴 Connection Issues"
+        except:
+            laravel_status = "🔴 Offline"
         
-        # Generate contextually aware response with optional TTS
-        response, tts_audio_url = self.response_generator.generate_contextual_response(
-            message, enhanced_intent, user_profile, conversation_context
-        )
+        # TTS system status
+        tts_engines = []
+        if TTS_AVAILABLE and self.tts_manager.pyttsx3_ready:
+            tts_engines.append("pyttsx3")
+        if GTTS_AVAILABLE:
+            tts_engines.append("gTTS")
+        if OPENAI_API_KEY:
+            tts_engines.append("OpenAI")
         
-        # Enhance response with conversation continuity
-        enhanced_response = self._enhance_response_with_continuity(
-            response, conversation_context, enhanced_intent
-        )
+        status = f"""📊 **System Status** 📊
+
+**Core Systems:**
+🤖 AI Chatbot: 🟢 Online
+🗄️ Database: 🟢 Connected
+📱 WhatsApp: 🟢 Active
+🚀 Laravel Dashboard: {laravel_status}
+
+**Dual Messaging System:**
+📱 Text Delivery: 🟢 Instant
+🎙️ Voice System: {'🟢 Active' if TTS_ENABLED else '🔴 Disabled'}
+🔧 TTS Engines: {', '.join(tts_engines) if tts_engines else 'None available'}
+💾 Audio Cache: {len(self.tts_manager.audio_cache)} pre-generated phrases
+
+**Your Settings:**
+📢 Dual Messaging: {'🟢 Enabled' if user_profile.tts_enabled else '🔴 Text Only'}
+🎵 Voice: {user_profile.tts_voice_preference.title()}
+⚡ Speed: {user_profile.tts_speed_preference} WPM
+
+**Features Active:**
+✅ Smart Conversation Tracking
+✅ Emergency Detection & Response
+✅ Laravel Dashboard Integration
+✅ Incident Reporting with AI Analysis
+✅ Dual Text+Voice Messaging
+✅ Voice Accessibility Features
+✅ Multi-engine TTS Fallback
+
+All systems operational! 🛡️
+
+Type 'MENU' to return to main menu."""
         
-        # Track this conversation turn with TTS info
-        turn_id = self.tracker.track_conversation_turn(
-            phone, thread_id, message, enhanced_response, enhanced_intent, 
-            conversation_context, tts_audio_url
-        )
+        # Generate TTS
+        tts_audio_url = None
+        if user_profile.tts_enabled and TTS_ENABLED:
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(status)
         
-        return enhanced_response, {
-            'thread_id': thread_id,
-            'turn_id': turn_id,
-            'conversation_type': conversation_type,
-            'context_used': conversation_context,
-            'follow_up_suggestions': conversation_context.get('suggested_follow_ups', []),
-            'tts_audio_url': tts_audio_url,
-            'tts_enabled': user_profile.tts_enabled if user_profile else False
-        }
+        return status, tts_audio_url
     
-    def _handle_tts_control(self, phone: str, intent_analysis: Dict, 
-                           user_profile: UserProfile) -> Tuple[str, Dict]:
-        """Handle TTS control commands"""
+    def _show_faq_menu(self, from_number: str, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
+        """Show FAQ menu with TTS"""
         
-        tts_command = intent_analysis.get('tts_command', '')
         name = user_profile.name or "there"
         
-        if tts_command == 'disable':
-            user_profile.tts_enabled = False
-            user_profile.preferred_message_format = 'text'
+        self.db.update_user_session(from_number, self.states['FAQ_MODE'], {
+            'faq_category': None,
+            'timestamp': datetime.datetime.now().isoformat()
+        })
+        
+        faq_menu = f"""❓ **Safety FAQ - {name}** ❓
+
+Choose a category by typing the keyword:
+
+🦺 **PPE** - Personal Protective Equipment
+🔥 **FIRE** - Fire Safety & Prevention
+🧪 **CHEMICAL** - Chemical Safety & Handling
+⚡ **ELECTRICAL** - Electrical Safety
+🚪 **CONFINED** - Confined Space Safety
+💺 **ERGONOMICS** - Workplace Ergonomics
+📚 **TRAINING** - Safety Training & Procedures
+
+💬 *You can also ask me any safety question naturally - I understand regular conversation and will provide detailed answers!*
+
+🎙️ *All FAQ responses include both text and voice for accessibility*
+
+Type a category keyword or ask any safety question!
+
+Type 'MENU' to return to main menu."""
+        
+        # Generate TTS
+        tts_audio_url = None
+        if user_profile.tts_enabled and TTS_ENABLED:
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(faq_menu)
+        
+        return faq_menu, tts_audio_url
+    
+    def _handle_faq_interaction(self, from_number: str, message: str, session_data: dict, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
+        """Handle FAQ interactions with TTS"""
+        
+        message_upper = message.upper().strip()
+        
+        # Check for FAQ categories
+        if message_upper in self.faq_categories:
+            category_name = self.faq_categories[message_upper]
+            
+            # Generate category-specific FAQ response
+            faq_response = self._generate_faq_response(message_upper, category_name, user_profile)
+            
+            # Generate TTS
+            tts_audio_url = None
+            if user_profile.tts_enabled and TTS_ENABLED:
+                tts_audio_url = self.tts_manager.generate_for_dual_messaging(faq_response)
+            
+            return faq_response, tts_audio_url
+        
+        # Handle natural questions
+        else:
+            # Exit FAQ mode and handle as regular conversation
+            self.db.update_user_session(from_number, self.states['CONVERSING'], {})
+            
+            # Process as regular conversation with FAQ context
+            intent_analysis = self.conversation_analyzer.analyze_message_intent(message)
+            
+            response, conversation_metadata = self.conversation_manager.handle_smart_conversation(
+                from_number, message, intent_analysis, user_profile
+            )
+            
+            response += "\n\nType 'FAQ' to return to FAQ menu or 'MENU' for main menu."
+            
+            return response, conversation_metadata.get('tts_audio_url')
+    
+    def _generate_faq_response(self, category: str, category_name: str, user_profile: UserProfile) -> str:
+        """Generate FAQ response for a specific category"""
+        
+        name = user_profile.name or "there"
+        
+        faq_responses = {
+            'PPE': f"""🦺 **Personal Protective Equipment - {name}** 🦺
+
+**Essential PPE for Guyana Workplaces:**
+👷 Hard hats for construction & industrial sites
+🥽 Safety glasses/goggles for eye protection
+👂 Hearing protection in noisy environments
+🧤 Cut-resistant gloves for handling materials
+👢 Steel-toed boots for foot protection
+🦺 High-visibility vests for outdoor work
+
+**PPE Inspection:**
+🔍 Check equipment before each use
+🚫 Replace damaged or worn PPE immediately
+📋 Follow manufacturer guidelines
+🧼 Keep PPE clean and properly stored
+
+**Tropical Climate Considerations:**
+🌡️ Choose breathable materials when possible
+💧 Stay hydrated when wearing full PPE
+🧴 Use anti-fog treatments for goggles
+🧽 Clean PPE regularly to prevent bacteria
+
+**Legal Requirements:**
+📜 Employers must provide appropriate PPE
+⚖️ Workers must use PPE as required
+📚 Training required for specialized equipment
+
+Need specific PPE guidance for your workplace? Just ask!""",
+            
+            'FIRE': f"""🔥 **Fire Safety & Prevention - {name}** 🔥
+
+**Guyana Fire Emergency Numbers:**
+🚒 Fire Service: **912**
+🚨 Emergency Services: **911**
+
+**Fire Prevention:**
+🚭 No smoking in designated areas
+⚡ Maintain electrical systems properly
+🧴 Store flammable materials safely
+🚪 Keep fire exits clear at all times
+🔥 Hot work permits for welding/cutting
+
+**Fire Response Steps:**
+1️⃣ Sound the alarm immediately
+2️⃣ Call 912 (Fire Service)
+3️⃣ Evacuate using nearest safe exit
+4️⃣ Meet at designated assembly point
+5️⃣ Do NOT re-enter until cleared
+
+**Fire Extinguisher Types:**
+💧 Water: Paper, wood, fabric fires
+🧯 Foam: Flammable liquid fires
+❄️ CO2: Electrical fires
+🧪 Dry Chemical: Multi-purpose
+
+**Tropical Considerations:**
+🌧️ Extra fire risk during dry seasons
+🌱 Vegetation management around buildings
+💧 Ensure water supply for fire fighting
+
+Remember: GET OUT, STAY OUT, and let professionals handle it!""",
+            
+            'CHEMICAL': f"""🧪 **Chemical Safety & Handling - {name}** 🧪
+
+**Before Working with Chemicals:**
+📋 Read Safety Data Sheets (SDS)
+🦺 Wear appropriate PPE
+🌬️ Ensure adequate ventilation
+🚿 Know location of emergency wash stations
+
+**Storage Requirements:**
+❄️ Temperature-controlled storage
+🚫 Separate incompatible chemicals
+🏷️ Proper labeling and dating
+🔒 Secure storage away from unauthorized access
+
+**Spill Response:**
+⚠️ Alert others and evacuate if necessary
+🧤 Use appropriate PPE for cleanup
+🧽 Follow spill kit procedures
+📞 Report all spills to supervision
+
+**Tropical Climate Challenges:**
+🌡️ Heat can increase chemical reactivity
+💧 Humidity affects some chemical properties
+🏢 Ensure climate-controlled storage
+🌀 Hurricane/storm preparedness for chemicals
+
+**Emergency Contacts:**
+☣️ Chemical Emergency: **911**
+🏥 Poison Control: Contact local hospital
+📞 Company Emergency: [Your safety officer]
+
+**Disposal:**
+♻️ Follow proper disposal procedures
+🚫 Never pour chemicals down drains
+📋 Keep disposal records
+🌍 Consider environmental impact
+
+Always err on the side of caution with chemicals!""",
+            
+            'ELECTRICAL': f"""⚡ **Electrical Safety - {name}** ⚡
+
+**Electrical Hazards in Guyana:**
+🌧️ Wet conditions increase shock risk
+⛈️ Lightning strikes during storms
+🌡️ Heat affecting electrical equipment
+🐭 Rodents damaging wiring
+
+**Safe Work Practices:**
+🔌 De-energize before working on equipment
+🔒 Lockout/Tagout procedures
+👷 Only qualified electricians do electrical work
+🧤 Use insulated tools and PPE
+
+**Extension Cord Safety:**
+✅ Inspect before each use
+🚫 Don't run through doorways
+💧 Keep away from water
+⚡ Match cord rating to equipment load
+
+**Ground Fault Protection:**
+🔌 Use GFCI outlets near water
+🧪 Test GFCI devices monthly
+🌧️ Extra important in humid climates
+⚡ Install surge protection
+
+**Storm Safety:**
+⛈️ Unplug equipment during storms
+💡 Have backup lighting ready
+📱 Charge devices before outages
+🌳 Stay away from downed power lines
+
+**Emergency Response:**
+⚡ Electrical Emergency: **911**
+🏥 Electrical shock: Call ambulance (913)
+🔥 Electrical fire: Call fire service (912)
+
+**Power Outage Procedures:**
+📋 Follow emergency lighting protocols
+🔋 Use battery-powered equipment only
+🚫 Don't use candles or open flames
+📞 Report outages to utility company
+
+Remember: When in doubt, turn it off and call an electrician!""",
+            
+            'CONFINED': f"""🚪 **Confined Space Safety - {name}** 🚪
+
+**What is a Confined Space?**
+🏗️ Tanks, vessels, silos
+🕳️ Manholes, pits, tunnels
+🏢 Storage bins, vaults
+⛽ Fuel tanks, sewers
+
+**Permit Required Spaces:**
+📋 Entry permit system mandatory
+👥 Attendant required outside
+📡 Continuous monitoring required
+🚨 Emergency rescue plan needed
+
+**Atmospheric Hazards:**
+💨 Oxygen deficiency/enrichment
+☠️ Toxic gases (H2S, CO, etc.)
+💥 Flammable vapors
+🌪️ Engulfment hazards
+
+**Testing Requirements:**
+🔬 Test atmosphere before entry
+📊 Continuous monitoring during work
+⚡ Test for oxygen, toxics, flammables
+📈 Document all readings
+
+**Tropical Considerations:**
+🌡️ Heat stress in confined spaces
+💧 Humidity affecting equipment
+🐍 Wildlife hazards in some spaces
+🌧️ Water accumulation risks
+
+**Entry Procedures:**
+1️⃣ Obtain entry permit
+2️⃣ Test atmosphere
+3️⃣ Ventilate space
+4️⃣ Position attendant
+5️⃣ Enter with proper PPE
+6️⃣ Maintain communication
+
+**Emergency Response:**
+🚨 Confined Space Emergency: **911**
+👷 Never enter to rescue without proper equipment
+📞 Alert emergency services immediately
+
+Never take shortcuts with confined space safety!""",
+            
+            'ERGONOMICS': f"""💺 **Workplace Ergonomics - {name}** 💺
+
+**Common Ergonomic Issues:**
+🖥️ Computer workstation setup
+📦 Manual lifting and handling
+🏭 Repetitive motion tasks
+🚶 Prolonged standing/sitting
+
+**Workstation Setup:**
+👀 Monitor at eye level
+⌨️ Keyboard and mouse at elbow height
+🪑 Feet flat on floor or footrest
+💡 Adequate lighting to reduce eye strain
+
+**Safe Lifting Techniques:**
+🦵 Lift with your legs, not your back
+📦 Keep load close to your body
+🔄 Avoid twisting while lifting
+👥 Get help for heavy items
+
+**Tropical Climate Factors:**
+🌡️ Heat stress affects physical capability
+💧 Stay hydrated during physical work
+🌀 Fan placement for air circulation
+❄️ Air conditioning for comfort
+
+**Repetitive Strain Prevention:**
+⏰ Take regular breaks
+🤸 Stretch exercises
+🔄 Rotate tasks when possible
+🛠️ Use ergonomic tools
+
+**Warning Signs:**
+⚠️ Pain or stiffness
+🤲 Numbness or tingling
+💪 Muscle fatigue
+🦴 Joint soreness
+
+**Solutions:**
+🪑 Adjustable furniture
+🛠️ Ergonomic tools
+📚 Training programs
+🏥 Early intervention
+
+Report ergonomic concerns early - prevention is better than treatment!""",
+            
+            'TRAINING': f"""📚 **Safety Training & Procedures - {name}** 📚
+
+**Required Training Programs:**
+🆔 New employee orientation
+🦺 PPE training and fit testing
+🔥 Fire safety and evacuation
+🩺 First aid and CPR
+🧪 Chemical safety (if applicable)
+
+**Guyana-Specific Training:**
+🌀 Hurricane/tropical storm procedures
+🐍 Local wildlife safety awareness
+🌡️ Heat stress prevention
+🌧️ Wet weather safety protocols
+
+**Training Documentation:**
+📋 Keep training records current
+✅ Track certification expiration dates
+📝 Document refresher training
+🏆 Recognize safety achievements
+
+**Competency Assessment:**
+✅ Practical demonstrations
+📝 Written assessments
+👥 Peer observations
+📊 Regular evaluations
+
+**Training Methods:**
+🎓 Classroom instruction
+🎮 Interactive simulations
+👷 Hands-on practice
+📱 Online modules
+🎥 Video demonstrations
+
+**Refresher Training:**
+📅 Annual safety updates
+🔄 Incident-based training
+🆕 New procedure training
+🏆 Continuous improvement
+
+**Training Resources:**
+📚 Safety manuals
+🎥 Training videos
+🌐 Online courses
+👨‍🏫 External trainers
+🏢 Internal expertise
+
+**Record Keeping:**
+📁 Individual training files
+📊 Training matrices
+📅 Schedule tracking
+✅ Compliance monitoring
+
+Invest in training - it's the foundation of workplace safety!"""
+        }
+        
+        return faq_responses.get(category, f"Information about {category_name} is being updated. Please contact your safety officer for specific guidance.")
+    
+    # Laravel incident reporting methods
+    def _start_laravel_incident_reporting(self, from_number: str, intent_analysis: Dict, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
+        """Start Laravel-integrated incident reporting with TTS"""
+        
+        name = user_profile.name or "there"
+        
+        # Initialize Laravel reporting session
+        session_data = {
+            'step': 'media',
+            'report_data': {
+                'reporter_name': user_profile.name or 'WhatsApp User',
+                'reporter_contact': from_number,
+                'source': 'whatsapp_chatbot',
+                'report_type': 'incident',
+                'industry': 'General'
+            },
+            'started_at': datetime.datetime.now().isoformat()
+        }
+        
+        self.db.update_user_session(from_number, self.states['WAITING_MEDIA'], session_data)
+        
+        response = f"""🛡️ **Incident Report - {name}** 🛡️
+
+I'll help you quickly report this incident to our Laravel safety dashboard with dual messaging support.
+
+**📸 STEP 1: Send photos or videos**
+Send me photos/videos of the incident scene, damage, or any relevant evidence.
+
+**📍 STEP 2: Share your location**  
+Share your location so responders can find you.
+
+**Let's start - please send your photos/videos now! 📱**
+
+*Tip: You can send multiple photos one after another*
+
+Your report will be:
+🤖 Automatically analyzed by AI
+📊 Sent to the Laravel safety dashboard
+🎙️ Confirmed with both text and voice messages
+
+Both visual and audio guidance will help you through each step."""
+        
+        # Generate TTS
+        tts_audio_url = None
+        if user_profile.tts_enabled and TTS_ENABLED:
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
+        
+        return response, tts_audio_url
+    
+    def _handle_laravel_incident_reporting(self, from_number: str, message: str, media_urls: List[str],
+                                         current_state: str, session_data: dict, intent_analysis: Dict) -> Tuple[str, Optional[str]]:
+        """Handle Laravel-integrated incident reporting flow with TTS"""
+        
+        user_profile = self.db.get_user_profile(from_number)
+        
+        if current_state == self.states['WAITING_MEDIA']:
+            response, tts_audio_url = self._handle_media_submission_laravel(from_number, message, media_urls, session_data, user_profile)
+        elif current_state == self.states['WAITING_LOCATION']:
+            response, tts_audio_url = self._handle_location_submission_laravel(from_number, message, session_data, user_profile)
+        elif current_state == self.states['CONFIRMING_REPORT']:
+            response, tts_audio_url = self._handle_report_confirmation_laravel(from_number, message, session_data, user_profile)
+        else:
+            response = "I'm having trouble with the reporting process. Let me reset this for you. Type 'REPORT' to start a new incident report."
+            tts_audio_url = None
+            if user_profile and user_profile.tts_enabled and TTS_ENABLED:
+                tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
+        
+        return response, tts_audio_url
+    
+    def _handle_media_submission_laravel(self, from_number: str, message: str, 
+                                       media_urls: List[str], session_data: dict, 
+                                       user_profile: UserProfile) -> Tuple[str, Optional[str]]:
+        """Handle media file submission for Laravel with TTS"""
+        
+        if not media_urls:
+            response = (
+                "📸 **I need photos or videos to complete your report.**\n\n"
+                "Please send:\n"
+                "🔸 Photos of the incident scene\n"
+                "🔸 Videos showing what happened\n"
+                "🔸 Images of any damage or injuries (if safe to take)\n\n"
+                "📱 Just attach them to your next message!\n\n"
+                "🎙️ Voice guidance: After you send the photos, I'll guide you through sharing your location."
+            )
+        else:
+            # Save media URLs to session
+            new_media = [{
+                'url': url,
+                'type': 'image' if any(ext in url.lower() for ext in ['.jpg', '.jpeg', '.png']) else 'video',
+                'uploaded_at': datetime.datetime.now().isoformat()
+            } for url in media_urls]
+            session_data['report_data'].setdefault('media_files', []).extend(new_media)
+            
+            # Move to location step (append only the new files; rewrite the session if it has gone)
+            if not self.db.sessions.append_media(from_number, self.states['WAITING_LOCATION'], new_media):
+                self.db.update_user_session(from_number, self.states['WAITING_LOCATION'], session_data)
+            
+            response = (
+                f"✅ **Excellent! I received {len(media_urls)} file(s).**\n\n"
+                "📍 **STEP 2: Share your location**\n\n"
+                "Please share your location by:\n"
+                "🔸 Using WhatsApp's location sharing button\n"
+                "🔸 Or typing coordinates like: `6.8013, -58.1551`\n"
+                "🔸 Or describe where you are (I'll help find coordinates)\n\n"
+                "This helps emergency responders reach you quickly! 🚨\n\n"
+                "🎙️ You'll receive both text confirmation and voice guidance for the next step."
+            )
+        
+        # Generate TTS
+        tts_audio_url = None
+        if user_profile and user_profile.tts_enabled and TTS_ENABLED:
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
+        
+        return response, tts_audio_url
+    
+    def _handle_location_submission_laravel(self, from_number: str, message: str, 
+                                          session_data: dict, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
+        """Handle location submission for Laravel with TTS"""
+        
+        # Try to extract coordinates
+        lat, lng = self.location_parser.extract_coordinates(message)
+        
+        if lat and lng:
+            # Save coordinates
+            session_data['report_data']['location_lat'] = lat
+            session_data['report_data']['location_long'] = lng
+            session_data['report_data']['location_description'] = f"Coordinates: {lat}, {lng}"
+        else:
+            # Use the message as location description
+            session_data['report_data']['location_description'] = message
+            # Set default coordinates for Georgetown, Guyana
+            session_data['report_data']['location_lat'] = DEFAULT_LOCATION_LAT
+            session_data['report_data']['location_long'] = DEFAULT_LOCATION_LONG
+        
+        # Flag fallback coordinates so they don't show up as a fake Georgetown hotspot
+        session_data['report_data']['location_approximate'] = not (lat and lng)
+        
+        # Move to confirmation
+        location_fields = {f'report_data.{key}': session_data['report_data'][key]
+                           for key in ['location_lat', 'location_long', 'location_description', 'location_approximate']}
+        if not self.db.sessions.update_fields(from_number, self.states['CONFIRMING_REPORT'], location_fields):
+            self.db.update_user_session(from_number, self.states['CONFIRMING_REPORT'], session_data)
+        
+        # Show confirmation
+        report_data = session_data['report_data']
+        media_count = len(report_data.get('media_files', []))
+        location = report_data.get('location_description', 'Location provided')
+        
+        response = f"""📋 **Report Ready for Laravel Dashboard Submission**
+
+**📸 Media:** {media_count} file(s) attached
+**📍 Location:** {location}
+**⏰ Time:** {datetime.datetime.now().strftime('%B %d, %Y at %I:%M %p')}
+**🚀 Destination:** Laravel Safety Dashboard
+**🤖 AI Analysis:** Will be automatically generated
+
+**Reply with:**
+✅ **"SUBMIT"** - to submit this report to the dashboard
+❌ **"CANCEL"** - to cancel and start over
+
+Your report will be automatically analyzed by AI and immediately sent to the safety team dashboard! 🛡️
+
+🎙️ Both text and voice confirmations will be provided after submission."""
+        
+        # Generate TTS
+        tts_audio_url = None
+        if user_profile and user_profile.tts_enabled and TTS_ENABLED:
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
+        
+        return response, tts_audio_url
+    
+    def _handle_report_confirmation_laravel(self, from_number: str, message: str, 
+                                          session_data: dict, user_profile: UserProfile) -> Tuple[str, Optional[str]]:
+        """Handle report confirmation for Laravel submission with TTS"""
+        
+        message_upper = message.upper().strip()
+        
+        if message_upper == "CANCEL":
+            self.db.update_user_session(from_number, self.states['CONVERSING'], {})
+            response = "❌ Report cancelled. Type 'REPORT' anytime to start a new incident report.\n\n🎙️ This cancellation is confirmed in both text and voice."
+        elif message_upper == "SUBMIT":
+            response, tts_audio_url = self._submit_report_to_laravel(from_number, session_data, user_profile)
+            return response, tts_audio_url
+        else:
+            response = (
+                "Please respond with:\n"
+                "✅ **SUBMIT** - to submit your report to the Laravel dashboard\n"
+                "❌ **CANCEL** - to cancel this report\n\n"
+                "🎙️ Voice guidance: Your choice will be confirmed in both text and audio."
+            )
+        
+        # Generate TTS
+        tts_audio_url = None
+        if user_profile and user_profile.tts_enabled and TTS_ENABLED:
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
+        
+        return response, tts_audio_url
+    
+    def _submit_report_to_laravel(self, from_number: str, session_data: dict, 
+                                user_profile: UserProfile) -> Tuple[str, Optional[str]]:
+        """Submit report to Laravel backend with enhanced data and TTS"""
+        
+        try:
+            report_data = session_data['report_data']
+            
+            # Enhance report data with AI analysis and Laravel-compatible format
+            enhanced_data = self._enhance_report_for_laravel(report_data)
+            
+            # Submit to Laravel
+            result = self.laravel_client.submit_report(enhanced_data)
+            local_id, laravel_report_id = self._save_laravel_submission(from_number, enhanced_data, result)
+            
+            # Try to submit media files if any
+            media_files = enhanced_data.get('media_files', [])
+            if media_files and laravel_report_id:
+                media_result = self.laravel_client.submit_media_files(str(laravel_report_id), media_files)
+                if not media_result.get('success'):
+                    print(f"Media upload warning: {media_result.get('error')}")
+            
+            response = self._laravel_submission_response(from_number, session_data, enhanced_data, result,
+                                                         local_id, laravel_report_id)
+        
+        except Exception as e:
+            response = self._laravel_submission_error(from_number, session_data, e)
+        
+        # Generate TTS
+        tts_audio_url = None
+        if user_profile and user_profile.tts_enabled and TTS_ENABLED:
+            tts_audio_url = self.tts_manager.generate_for_dual_messaging(response)
+        
+        return response, tts_audio_url
+    
+    async def _submit_report_to_laravel_async(self, from_number: str, session_data: dict,
+                                              user_profile: UserProfile) -> Tuple[str, Optional[str]]:
+        """_submit_report_to_laravel awaiting the Laravel and TTS calls; SQLite work runs on the worker pool"""
+        
+        try:
+            enhanced_data = await asyncio.to_thread(self._enhance_report_for_laravel, session_data['report_data'])
+            result = await self.laravel_client.submit_report_async(enhanced_data)
+            local_id, laravel_report_id = await asyncio.to_thread(
+                self._save_laravel_submission, from_number, enhanced_data, result
+            )
+            
+            media_files = enhanced_data.get('media_files', [])
+            if media_files and laravel_report_id:
+                media_result = await self.laravel_client.submit_media_files_async(str(laravel_report_id), media_files)
+                if not media_result.get('success'):
+                    print(f"Media upload warning: {media_result.get('error')}")
+            
+            response = await asyncio.to_thread(self._laravel_submission_response, from_number, session_data,
+                                               enhanced_data, result, local_id, laravel_report_id)
+        
+        except Exception as e:
+            response = await asyncio.to_thread(self._laravel_submission_error, from_number, session_data, e)
+        
+        tts_audio_url = None
+        if user_profile and user_profile.tts_enabled and TTS_ENABLED:
+            tts_audio_url = await self.tts_manager.generate_for_dual_messaging_async(response)
+        
+        return response, tts_audio_url
+    
+    def _pending_report_submission(self, from_number: str) -> Optional[Tuple[dict, UserProfile]]:
+        """(session data, user profile) if the user is confirming a report, so SUBMIT sends it"""
+        current_state, session_data = self.db.get_user_session(from_number)
+        if current_state != self.states['CONFIRMING_REPORT']:
+            return None
+        return session_data, self.db.get_user_profile(from_number)
+    
+    def _save_laravel_submission(self, from_number: str, enhanced_data: dict,
+                                 result: Dict) -> Tuple[Optional[str], Optional[str]]:
+        """Save the local copy of a report Laravel accepted; (local id, Laravel id)"""
+        if not result.get('success'):
+            return None, None
+        
+        # Save local reference
+        local_id = uuid.uuid4().hex
+        laravel_report_id = result.get('data', {}).get('id')
+        
+        if laravel_report_id:
+            self.db.save_local_report(local_id, from_number, str(laravel_report_id))
+        
+        # Also save to local database with Laravel ID
+        incident_report = IncidentReport(
+            id=local_id,
+            user_phone=from_number,
+            timestamp=enhanced_data.get('date_of_incident', datetime.datetime.now().isoformat()),
+            incident_type=enhanced_data.get('incident_type', 'other'),
+            severity=enhanced_data.get('severity', 'medium'),
+            description=enhanced_data.get('description', ''),
+            location=enhanced_data.get('location_description', ''),
+            location_lat=enhanced_data.get('location_lat'),
+            location_long=enhanced_data.get('location_long'),
+            media_urls=enhanced_data.get('media_files', []),
+            status='submitted_to_laravel',
+            ai_analysis={'laravel_report_id': laravel_report_id, 'submission_result': result},
+            created_at=datetime.datetime.now().isoformat(),
+            location_approximate=bool(enhanced_data.get('location_approximate'))
+        )
+        
+        self.db.save_report(incident_report)
+        return local_id, laravel_report_id
+    
+    def _laravel_submission_response(self, from_number: str, session_data: dict, enhanced_data: dict, result: Dict,
+                                     local_id: Optional[str], laravel_report_id: Optional[str]) -> str:
+        """Clear the session after a successful submission, or keep a local backup; the reply text"""
+        if result.get('success'):
+            # Clear session
+            self.db.update_user_session(from_number, self.states['CONVERSING'], {})
+            
+            response = f"""✅ **REPORT SUBMITTED TO LARAVEL DASHBOARD!** ✅
+
+**🆔 Dashboard Report ID:** {laravel_report_id or local_id[:8].upper()}
+**🚀 Status:** Successfully sent to Laravel safety dashboard
+**⚡ Priority:** {enhanced_data.get('severity', 'Medium')}
+**📊 AI Analysis:** Completed and included
+**🎙️ Confirmation:** Both text and voice notifications sent
+
+**What happens next:**
+🔍 Safety team will review your report on the Laravel dashboard
+📞 Someone may contact you for more details
+📊 Your report helps improve workplace safety analytics
+🚨 Emergency responses will be coordinated through the system
+
+**Laravel Dashboard Features:**
+📈 Real-time incident tracking
+🗺️ Location mapping with your coordinates
+📸 Media files attached and accessible
+🤖 AI-powered risk assessment included
+🎙️ Accessibility features for all users
+
+**Thank you for keeping everyone safe!** 🛡️💪
+
+Need to report something else? Just send me photos and location!
+Type 'MENU' for other options or ask me any safety questions."""
+            
+        else:
+            error_msg = result.get('error', 'Unknown error')
+            # Still save locally as backup
+            self._save_local_backup_report(from_number, session_data, error_msg)
+            
+            response = f"""⚠️ **Laravel Dashboard Submission Issue** ⚠️
+
+There was a problem submitting to the Laravel dashboard: {error_msg}
+
+**✅ Don't worry - your report has been saved locally as backup!**
+
+**Next steps:**
+🔄 Please try again in a moment
+📞 Or contact safety directly: [Your safety contact]
+💾 Your report data is safely stored and can be re-submitted
+
+**Emergency contacts:**
+📞 Emergency: 911
+📞 Safety Team: [Your safety team contact]
+
+Would you like me to try submitting again? Just type 'SUBMIT' once more.
+
+🎙️ This error notification is provided in both text and voice for your convenience."""
+        
+        return response
+    
+    def _laravel_submission_error(self, from_number: str, session_data: dict, error: Exception) -> str:
+        print(f"Error submitting report to Laravel: {error}")
+        # Save local backup
+        self._save_local_backup_report(from_number, session_data, str(error))
+        
+        return (
+            "❌ **Technical Error**\n\n"
+            "Sorry, I'm having technical difficulties connecting to the Laravel dashboard. "
+            "Your report has been saved locally as backup.\n\n"
+            "**Please try again in a moment or contact safety directly:**\n"
+            "📞 Emergency: 911\n"
+            "📞 Safety Team: [Your safety contact]\n\n"
+            "💾 Your report data is safe and will be submitted when the connection is restored.\n\n"
+            "🎙️ This technical update is provided in both text and voice formats."
+        )
+    
+    # Utility methods
+    def _enhance_report_for_laravel(self, report_data: dict) -> dict:
+        """Enhance report with AI analysis and Laravel-compatible format"""
+        
+        enhanced = report_data.copy()
+        
+        # Add required Laravel fields
+        enhanced.update({
+            'report_type': 'incident',
+            'date_of_incident': datetime.datetime.now().strftime('%Y-%m-%d'),
+            'time_of_incident': datetime.datetime.now().strftime('%H:%M:%S'),
+            'severity': self._analyze_severity_from_data(enhanced),
+            'incident_type': self._detect_incident_type(enhanced),
+            'status': 'submitted',
+            'industry': enhanced.get('industry', 'General'),
+            'description': self._generate_ai_description(enhanced),
+            'ai_analysis': self._generate_ai_analysis(enhanced),
+            'submitted_via': 'whatsapp_chatbot_dual_messaging',
+            'submission_timestamp': datetime.datetime.now().isoformat()
+        })
+        
+        return enhanced
+    
+    def _analyze_severity_from_data(self, report_data: dict) -> str:
+        """Analyze severity based on available data"""
+        
+        # Simple severity analysis based on media count and urgency indicators
+        media_count = len(report_data.get('media_files', []))
+        
+        if media_count >= 3:
+            return 'high'
+        elif media_count >= 1:
+            return 'medium'
+        else:
+            return 'low'
+    
+    def _detect_incident_type(self, report_data: dict) -> str:
+        """Detect incident type from available data"""
+        
+        # Simple incident type detection
+        location_desc = report_data.get('location_description', '').lower()
+        
+        if any(word in location_desc for word in ['office', 'desk', 'computer']):
+            return 'workplace_injury'
+        elif any(word in location_desc for word in ['machine', 'equipment', 'tool']):
+            return 'equipment_failure'
+        elif any(word in location_desc for word in ['chemical', 'spill', 'leak']):
+            return 'chemical_incident'
+        else:
+            return 'other'
+    
+    def _generate_ai_description(self, report_data: dict) -> str:
+        """Generate AI-enhanced description"""
+        
+        media_count = len(report_data.get('media_files', []))
+        location = report_data.get('location_description', 'Location not specified')
+        
+        description = f"Incident reported via WhatsApp chatbot with dual messaging support. {media_count} media file(s) submitted. "
+        description += f"Location: {location}. "
+        description += f"Reported by: {report_data.get('reporter_name', 'Anonymous')}. "
+        description += f"Submission time: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}. "
+        description += f"User received both text and voice confirmations for accessibility."
+        
+        return description
+    
+    def _generate_ai_analysis(self, report_data: dict) -> str:
+        """Generate AI analysis summary"""
+        
+        analysis = {
+            'source': 'WhatsApp Chatbot with Dual Messaging',
+            'media_analysis': f"{len(report_data.get('media_files', []))} files submitted",
+            'location_analysis': 'GPS coordinates provided' if report_data.get('location_lat') else 'Location description provided',
+            'urgency_assessment': 'Standard reporting flow followed',
+            'ai_confidence': 'High - complete data submitted',
+            'accessibility_features': 'Dual messaging (text + voice) used for user guidance',
+            'recommendation': 'Review media files and coordinate appropriate response',
+            'submission_method': 'Enhanced WhatsApp integration with Laravel dashboard'
+        }
+        
+        return json.dumps(analysis)
+    
+    def _save_local_backup_report(self, from_number: str, session_data: dict, error_reason: str):
+        """Save report locally as backup when Laravel submission fails"""
+        
+        try:
+            report_data = session_data['report_data']
+            
+            backup_report = IncidentReport(
+                id=uuid.uuid4().hex,
+                user_phone=from_number,
+                timestamp=datetime.datetime.now().isoformat(),
+                incident_type='backup_pending_laravel',
+                severity='medium',
+                description=f"BACKUP REPORT - Laravel submission failed: {error_reason}. Submitted via dual messaging system.",
+                location=report_data.get('location_description', ''),
+                location_lat=report_data.get('location_lat'),
+                location_long=report_data.get('location_long'),
+                media_urls=report_data.get('media_files', []),
+                status='backup_pending_submission',
+                ai_analysis={'error_reason': error_reason, 'requires_manual_submission': True, 'dual_messaging_used': True},
+                created_at=datetime.datetime.now().isoformat(),
+                location_approximate=bool(report_data.get('location_approximate'))
+            )
+            
+            self.db.save_report(backup_report)
+            print(f"Backup report saved: {backup_report.id}")
+            
+        except Exception as e:
+            print(f"Error saving backup report: {e}")
+    
+    def _should_show_menu(self, from_number: str, message: str, user_profile: UserProfile) -> bool:
+        """Determine if we should show the menu to the user"""
+        
+        # Show menu for first-time users
+        if not user_profile.name and len(user_profile.interaction_history) == 0:
+            return True
+        
+        # Show menu for simple greetings
+        simple_greetings = ['hi', 'hello', 'hey', 'start', 'begin']
+        if message.lower().strip() in simple_greetings:
+            return True
+        
+        # Show menu if user seems lost
+        confused_messages = ['what can you do', 'help me', 'i need help', 'what are my options']
+        if any(phrase in message.lower() for phrase in confused_messages):
+            return True
+        
+        return False
+    
+    def _update_user_profile(self, user_profile: UserProfile, user_info: Dict):
+        """Update user profile with extracted information including TTS and dual messaging preferences"""
+        
+        if user_info.get('name') and not user_profile.name:
+            user_profile.name = user_info['name']
+        
+        if user_info.get('role') and not user_profile.role:
+            user_profile.role = user_info['role']
+        
+        if user_info.get('department') and not user_profile.department:
+            user_profile.department = user_info['department']
+        
+        if user_info.get('interests'):
+            user_profile.safety_interests.extend(user_info['interests'])
+            user_profile.safety_interests = list(set(user_profile.safety_interests))
+        
+        # Update TTS preferences if mentioned
+        tts_prefs = user_info.get('tts_preferences', {})
+        if tts_prefs.get('voice'):
+            user_profile.tts_voice_preference = tts_prefs['voice']
+        if tts_prefs.get('speed'):
+            if tts_prefs['speed'] == 'fast':
+                user_profile.tts_speed_preference = 200
+            elif tts_prefs['speed'] == 'slow':
+                user_profile.tts_speed_preference = 120
+        
+        user_profile.last_active = datetime.datetime.now().isoformat()
+        self.db.update_user_profile(user_profile)
+
+# Initialize the enhanced chatbot with Laravel integration and dual TTS messaging
+hsse_bot = EnhancedHSSEChatbot()
+
+# ENHANCED WHATSAPP HANDLER WITH DUAL MESSAGING
+@app.route("/whatsapp", methods=['POST'])
+def whatsapp():
+    """Enhanced WhatsApp webhook handler with dual text+voice messaging"""
+    
+    # Reject requests that weren't signed by Twilio (needs the public URL Twilio posts to)
+    if WEBHOOK_VALIDATE_SIGNATURE and not RequestValidator(TWILIO_AUTH_TOKEN).validate(
+            request.url, request.form, request.headers.get('X-Twilio-Signature', '')):
+        print("⛔ Rejected webhook with invalid Twilio signature")
+        return Response('Invalid signature', status=403)
+    
+    # Get message data
+    incoming_msg = request.values.get('Body', '').strip()
+    from_number = request.values.get('From', '')
+    if not from_number:
+        return Response('Missing From', status=400)
+    
+    # Twilio retries webhooks that time out; process each MessageSid once across all workers
+    message_sid = request.values.get('MessageSid')
+    if message_sid and not hsse_bot.db.shared_state.add_if_absent(
+            f'inbound_sid:{message_sid}', from_number, ttl_seconds=MESSAGE_DEDUPE_TTL_SECONDS):
+        print(f"↩️  Duplicate webhook delivery ignored: {message_sid}")
+        return Response(str(MessagingResponse()), mimetype="application/xml")
+    
+    # Get media URLs if any
+    num_media = int(request.values.get('NumMedia', 0))
+    media_urls = []
+    for i in range(num_media):
+        media_url = request.values.get(f'MediaUrl{i}')
+        if media_url:
+            media_urls.append(media_url)
+    
+    print(f"=== INCOMING MESSAGE ===")
+    print(f"From: {from_number}")
+    print(f"Message: '{incoming_msg}'")
+    print(f"Media files: {len(media_urls)}")
+    
+    # Async mode: persist, acknowledge with empty TwiML and reply out of band
+    if WEBHOOK_MODE == 'async':
+        try:
+            hsse_bot.inbound_queue.enqueue(message_sid, from_number, incoming_msg, media_urls, request.url_root)
+        except Exception as e:
+            print(f"Error queueing inbound message: {e}")
+            if message_sid:
+                hsse_bot.db.shared_state.delete(f'inbound_sid:{message_sid}')  # Let Twilio's retry through
+            return Response('Could not queue message', status=500)
+        return Response(str(MessagingResponse()), mimetype="application/xml")
+    
+    response_text, tts_audio_url = _generate_reply(from_number, incoming_msg, media_urls)
+    
+    # STEP 1: ALWAYS send text message first (immediate response)
+    resp = MessagingResponse()
+    text_msg = resp.message()
+    text_msg.body(response_text)
+    
+    # STEP 2: Schedule voice message if TTS is enabled and available
+    _schedule_voice_message(from_number, response_text, tts_audio_url, request.url_root)
+    
+    print(f"📤 Text message sent immediately: {response_text[:100]}...")
+    
+    return Response(str(resp), mimetype="application/xml")
+
+def _generate_reply(from_number: str, incoming_msg: str, media_urls: List[str]) -> Tuple[str, Optional[str]]:
+    """Run a message through the chatbot; (reply text, TTS audio path or None)"""
+    try:
+        response_result = hsse_bot.process_message(from_number, incoming_msg, media_urls)
+        
+        if isinstance(response_result, tuple):
+            return response_result
+        return response_result, None
+            
+    except Exception as e:
+        print(f"Error processing message: {e}")
+        response_text = ("🤖 Hi there! I'm ARIA, your safety assistant with dual messaging (text + voice)! "
+                        "I'm here to help with all your workplace safety questions and incident reporting! "
+                        "How can I assist you today? 😊")
+        return response_text, None
+
+def _voice_message_delay(from_number: str, tts_audio_url: Optional[str]) -> Optional[int]:
+    """Seconds to wait before sending the audio version, or None when no voice message should go out"""
+    
+    # Get user profile for dual messaging preferences
+    user_profile = hsse_bot.db.get_user_profile(from_number)
+    
+    if not (tts_audio_url and 
+            os.path.exists(tts_audio_url) and
+            user_profile and 
+            user_profile.tts_enabled and
+            TTS_ENABLED):
+        return None
+    return getattr(user_profile, 'voice_delay_seconds', 2)
+
+def _voice_message_params(from_number: str, tts_audio_url: str, base_url: str) -> Dict:
+    audio_filename = os.path.basename(tts_audio_url)
+    return {
+        'media_url': [f"{base_url}tts-audio/{audio_filename}"],
+        'from_': TWILIO_WHATSAPP_NUMBER,
+        'to': from_number,
+        'body': "🎙️ Audio version"
+    }
+
+VOICE_FALLBACK_BODY = "🎙️ (Voice message generated but couldn't be delivered. Say 'voice off' to disable audio features.)"
+
+def _record_voice_delivery(from_number: str, response_text: str, tts_audio_url: str, message_sid: str, delay: int):
+    """Update dual messaging and TTS analytics for a delivered voice message"""
+    file_size = os.path.getsize(tts_audio_url) if os.path.exists(tts_audio_url) else 0
+    hsse_bot.db.save_dual_messaging_analytics(from_number, {
+        'message_id': message_sid,
+        'text_sent': True,
+        'voice_sent': True,
+        'text_delivery_time_ms': 500,  # Approximate
+        'voice_delivery_time_ms': delay * 1000,
+        'interaction_type': 'dual_messaging',
+        'message_length': len(response_text)
+    })
+    
+    # Update TTS analytics
+    hsse_bot.db.save_tts_analytics(
+        from_number, len(response_text), 'dual_messaging', 0, file_size
+    )
+
+def _schedule_voice_message(from_number: str, response_text: str, tts_audio_url: Optional[str], base_url: str):
+    """Send the audio version as a separate Twilio message after the user's voice delay"""
+    
+    delay = _voice_message_delay(from_number, tts_audio_url)
+    if delay is None:
+        return
+    
+    def send_voice_message_delayed():
+        """Send voice message as separate Twilio API call after brief delay"""
+        time.sleep(delay)
+        
+        try:
+            # Send voice message
+            voice_message = twilio_client.messages.create(
+                **_voice_message_params(from_number, tts_audio_url, base_url)
+            )
+            
+            print(f"✅ Voice message sent successfully: {voice_message.sid}")
+            _record_voice_delivery(from_number, response_text, tts_audio_url, voice_message.sid, delay)
+            
+        except Exception as voice_error:
+            print(f"❌ Error sending voice message: {voice_error}")
+            
+            # Send fallback notification
+            try:
+                fallback_message = twilio_client.messages.create(
+                    body=VOICE_FALLBACK_BODY,
+                    from_=TWILIO_WHATSAPP_NUMBER,
+                    to=from_number
+                )
+            except:
+                pass  # If fallback also fails, just log it
+    
+    # Start voice message in background thread
+    voice_thread = threading.Thread(target=send_voice_message_delayed)
+    voice_thread.daemon = True
+    voice_thread.start()
+    
+    print(f"🎙️ Voice message scheduled for delivery in {delay} seconds")
+
+_twilio_async_client = None
+
+def _get_twilio_async_client() -> Optional[Client]:
+    """Twilio client on aiohttp, created inside the running event loop (None without aiohttp)"""
+    global _twilio_async_client
+    if _twilio_async_client is None and ASYNC_TWILIO_AVAILABLE:
+        _twilio_async_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, http_client=AsyncTwilioHttpClient())
+        external_calls.instrument_async(_twilio_async_client.messages, 'twilio.messages.create', 'create_async')
+    return _twilio_async_client
+
+async def _deliver_voice_message_async(from_number: str, response_text: str, tts_audio_url: Optional[str], base_url: str):
+    """_schedule_voice_message for the ASGI webhook: the delay and the Twilio call are awaited"""
+    
+    delay = await asyncio.to_thread(_voice_message_delay, from_number, tts_audio_url)
+    if delay is None:
+        return
+    twilio_async = _get_twilio_async_client()
+    if twilio_async is None:
+        await asyncio.to_thread(_schedule_voice_message, from_number, response_text, tts_audio_url, base_url)
+        return
+    
+    print(f"🎙️ Voice message scheduled for delivery in {delay} seconds")
+    await asyncio.sleep(delay)
+    try:
+        voice_message = await twilio_async.messages.create_async(
+            **_voice_message_params(from_number, tts_audio_url, base_url)
+        )
+        print(f"✅ Voice message sent successfully: {voice_message.sid}")
+        await asyncio.to_thread(_record_voice_delivery, from_number, response_text, tts_audio_url,
+                                voice_message.sid, delay)
+    except Exception as voice_error:
+        print(f"❌ Error sending voice message: {voice_error}")
+        try:
+            await twilio_async.messages.create_async(body=VOICE_FALLBACK_BODY, from_=TWILIO_WHATSAPP_NUMBER, to=from_number)
+        except Exception:
+            pass  # If fallback also fails, just log it
+
+async def _generate_reply_async(from_number: str, incoming_msg: str, media_urls: List[str]) -> Tuple[str, Optional[str]]:
+    """_generate_reply through process_message_async"""
+    try:
+        response_result = await hsse_bot.process_message_async(from_number, incoming_msg, media_urls)
+        
+        if isinstance(response_result, tuple):
+            return response_result
+        return response_result, None
+            
+    except Exception as e:
+        print(f"Error processing message: {e}")
+        response_text = ("🤖 Hi there! I'm ARIA, your safety assistant with dual messaging (text + voice)! "
+                        "I'm here to help with all your workplace safety questions and incident reporting! "
+                        "How can I assist you today? 😊")
+        return response_text, None
+
+_flask_asgi = WsgiToAsgi(app) if ASGIREF_AVAILABLE else None
+_asgi_background_tasks = set()  # Strong references so pending voice deliveries aren't garbage collected
+
+async def _asgi_send(send, status: int, body: str, content_type: str = 'text/plain'):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type.encode())]})
+    await send({'type': 'http.response.body', 'body': body.encode()})
+
+async def _asgi_whatsapp(scope, receive, send):
+    """The /whatsapp webhook natively on asyncio (see whatsapp() for the WSGI version)"""
+    body = b''
+    while True:
+        event = await receive()
+        body += event.get('body', b'')
+        if not event.get('more_body'):
+            break
+    
+    form = dict(parse_qsl(body.decode('utf-8', 'replace'), keep_blank_values=True))
+    values = {**dict(parse_qsl(scope.get('query_string', b'').decode(), keep_blank_values=True)), **form}
+    headers = {key.decode().lower(): value.decode() for key, value in scope.get('headers', [])}
+    host = headers.get('host', 'localhost')
+    url_root = f"{scope.get('scheme', 'http')}://{host}{scope.get('root_path', '')}/"
+    
+    if WEBHOOK_VALIDATE_SIGNATURE:
+        query_string = scope.get('query_string', b'').decode()
+        url = f"{url_root.rstrip('/')}{scope['path']}" + (f"?{query_string}" if query_string else '')
+        if not RequestValidator(TWILIO_AUTH_TOKEN).validate(url, form, headers.get('x-twilio-signature', '')):
+            print("⛔ Rejected webhook with invalid Twilio signature")
+            return await _asgi_send(send, 403, 'Invalid signature')
+    
+    incoming_msg = values.get('Body', '').strip()
+    from_number = values.get('From', '')
+    if not from_number:
+        return await _asgi_send(send, 400, 'Missing From')
+    
+    message_sid = values.get('MessageSid')
+    if message_sid and not await asyncio.to_thread(
+            hsse_bot.db.shared_state.add_if_absent, f'inbound_sid:{message_sid}', from_number,
+            ttl_seconds=MESSAGE_DEDUPE_TTL_SECONDS):
+        print(f"↩️  Duplicate webhook delivery ignored: {message_sid}")
+        return await _asgi_send(send, 200, str(MessagingResponse()), 'application/xml')
+    
+    media_urls = [values[f'MediaUrl{i}'] for i in range(int(values.get('NumMedia', 0) or 0))
+                  if values.get(f'MediaUrl{i}')]
+    
+    if WEBHOOK_MODE == 'async':
+        try:
+            await asyncio.to_thread(hsse_bot.inbound_queue.enqueue, message_sid, from_number,
+                                    incoming_msg, media_urls, url_root)
+        except Exception as e:
+            print(f"Error queueing inbound message: {e}")
+            if message_sid:
+                await asyncio.to_thread(hsse_bot.db.shared_state.delete, f'inbound_sid:{message_sid}')
+            return await _asgi_send(send, 500, 'Could not queue message')
+        return await _asgi_send(send, 200, str(MessagingResponse()), 'application/xml')
+    
+    response_text, tts_audio_url = await _generate_reply_async(from_number, incoming_msg, media_urls)
+    
+    resp = MessagingResponse()
+    resp.message().body(response_text)
+    
+    voice_task = asyncio.create_task(_deliver_voice_message_async(from_number, response_text, tts_audio_url, url_root))
+    _asgi_background_tasks.add(voice_task)
+    voice_task.add_done_callback(_asgi_background_tasks.discard)
+    
+    print(f"📤 Text message sent immediately: {response_text[:100]}...")
+    await _asgi_send(send, 200, str(resp), 'application/xml')
+
+async def asgi_app(scope, receive, send):
+    """ASGI entry point: uvicorn app:asgi_app --port 5000
+    
+    POST /whatsapp is handled on the event loop, so a slow LLM reply holds a coroutine
+    rather than an OS thread; blocking work runs on an ASYNC_WORKER_THREADS pool. The
+    other routes are served by the Flask app through asgiref when it is installed.
+    """
+    if scope['type'] == 'lifespan':
+        while True:
+            event = await receive()
+            if event['type'] == 'lifespan.startup':
+                asyncio.get_running_loop().set_default_executor(
+                    ThreadPoolExecutor(max_workers=ASYNC_WORKER_THREADS, thread_name_prefix='asgi-worker')
+                )
+                await send({'type': 'lifespan.startup.complete'})
+            elif event['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    if scope['type'] == 'http' and scope['path'] == '/whatsapp' and scope['method'] == 'POST':
+        return await _asgi_whatsapp(scope, receive, send)
+    if _flask_asgi is not None:
+        return await _flask_asgi(scope, receive, send)
+    if scope['type'] == 'http':
+        await _asgi_send(send, 404, json.dumps({'error': 'Only POST /whatsapp is served over ASGI without asgiref'}),
+                         'application/json')
+
+# TTS Audio serving endpoint
+@app.route("/tts-audio/<filename>", methods=['GET'])
+def serve_tts_audio(filename):
+    """Serve TTS audio files"""
+    try:
+        audio_path = os.path.join(hsse_bot.tts_manager.temp_dir, filename)
+        
+        if os.path.exists(audio_path):
+            return send_file(
+                audio_path,
+                mimetype='audio/mpeg' if filename.endswith('.mp3') else 'audio/wav',
+                as_attachment=False
+            )
+        else:
+            return jsonify({'error': 'Audio file not found'}), 404
+            
+    except Exception as e:
+        print(f"Error serving TTS audio: {e}")
+        return jsonify({'error': 'Error serving audio file'}), 500
+
+# DUAL MESSAGING API ENDPOINTS
+
+@app.route("/dual-messaging/preferences/<phone>", methods=['GET', 'PUT'])
+def dual_messaging_preferences(phone):
+    """Get or update dual messaging preferences"""
+    
+    try:
+        user_profile = hsse_bot.db.get_user_profile(phone)
+        
+        if not user_profile:
+            return jsonify({'error': 'User not found'}), 404
+        
+        if request.method == 'GET':
+            return jsonify({
+                'phone': phone,
+                'dual_messaging_settings': {
+                    'dual_messaging_enabled': getattr(user_profile, 'dual_messaging_enabled', True),
+                    'voice_for_emergencies': getattr(user_profile, 'voice_for_emergencies', True),
+                    'voice_for_long_messages': getattr(user_profile, 'voice_for_long_messages', True),
+                    'voice_delay_seconds': getattr(user_profile, 'voice_delay_seconds', 2),
+                    'preferred_message_format': getattr(user_profile, 'preferred_message_format', 'both')
+                },
+                'tts_settings': {
+                    'tts_enabled': user_profile.tts_enabled,
+                    'tts_voice_preference': user_profile.tts_voice_preference,
+                    'tts_speed_preference': user_profile.tts_speed_preference
+                }
+            })
+        
+        elif request.method == 'PUT':
+            data = request.json
+            
+            # Update dual messaging preferences
+            if 'dual_messaging_enabled' in data:
+                user_profile.dual_messaging_enabled = bool(data['dual_messaging_enabled'])
+            if 'voice_for_emergencies' in data:
+                user_profile.voice_for_emergencies = bool(data['voice_for_emergencies'])
+            if 'voice_for_long_messages' in data:
+                user_profile.voice_for_long_messages = bool(data['voice_for_long_messages'])
+            if 'voice_delay_seconds' in data:
+                user_profile.voice_delay_seconds = int(data['voice_delay_seconds'])
+            if 'preferred_message_format' in data:
+                user_profile.preferred_message_format = data['preferred_message_format']
+            
+            # Update TTS settings
+            if 'tts_enabled' in data:
+                user_profile.tts_enabled = bool(data['tts_enabled'])
+            if 'tts_voice_preference' in data:
+                user_profile.tts_voice_preference = data['tts_voice_preference']
+            if 'tts_speed_preference' in data:
+                user_profile.tts_speed_preference = int(data['tts_speed_preference'])
+            
+            # Save updated profile
+            hsse_bot.db.update_user_profile(user_profile)
+            
+            return jsonify({
+                'success': True,
+                'message': 'Dual messaging preferences updated successfully',
+                'updated_preferences': {
+                    'dual_messaging_enabled': getattr(user_profile, 'dual_messaging_enabled', True),
+                    'voice_for_emergencies': getattr(user_profile, 'voice_for_emergencies', True),
+                    'voice_for_long_messages': getattr(user_profile, 'voice_for_long_messages', True),
+                    'voice_delay_seconds': getattr(user_profile, 'voice_delay_seconds', 2),
+                    'preferred_message_format': getattr(user_profile, 'preferred_message_format', 'both'),
+                    'tts_enabled': user_profile.tts_enabled
+                }
+            })
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route("/dual-messaging/test/<phone>", methods=['POST'])
+def test_dual_messaging(phone):
+    """Test dual messaging with a specific user"""
+    
+    try:
+        data = request.json
+        test_message = data.get('message', 'This is a test of dual messaging - you should receive both text and voice!')
+        
+        # Process test message
+        response_text, tts_audio_url = hsse_bot.process_message(f"whatsapp:{phone}", test_message)
+        
+        results = {
+            'text_sent': False,
+            'voice_sent': False,
+            'response_text': response_text,
+            'tts_audio_url': tts_audio_url
+        }
+        
+        # Send text message
+        try:
+            text_message = twilio_client.messages.create(
+                body=f"📧 TEST DUAL MESSAGING:\n{response_text}",
+                from_=TWILIO_WHATSAPP_NUMBER,
+                to=f"whatsapp:{phone}"
+            )
+            results['text_sent'] = True
+            results['text_message_sid'] = text_message.sid
+            
+        except Exception as e:
+            results['text_error'] = str(e)
+        
+        # Send voice message if available
+        if tts_audio_url and os.path.exists(tts_audio_url):
+            try:
+                audio_filename = os.path.basename(tts_audio_url)
+                audio_url = f"{request.url_root}tts-audio/{audio_filename}"
+                
+                voice_message = twilio_client.messages.create(
+                    media_url=[audio_url],
+                    from_=TWILIO_WHATSAPP_NUMBER,
+                    to=f"whatsapp:{phone}",
+                    body="🎙️ TEST: Audio version of the above message"
+                )
+                results['voice_sent'] = True
+                results['voice_message_sid'] = voice_message.sid
+                results['audio_url'] = audio_url
+                
+            except Exception as e:
+                results['voice_error'] = str(e)
+        
+        return jsonify(results)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route("/dual-messaging/analytics", methods=['GET'])
+def dual_messaging_analytics():
+    """Get analytics for dual messaging usage"""
+    
+    try:
+        week_ago_ms = _epoch_ms() - 7 * 86400 * 1000
+        with hsse_bot.db.analytics_pool.snapshot('dual_messaging_analytics') as cursor:
+            # Overall dual messaging stats
+            cursor.execute('''
+                SELECT 
+                    COUNT(*) as total_messages,
+                    SUM(CASE WHEN tts_generated = 1 THEN 1 ELSE 0 END) as voice_messages,
+                    AVG(response_quality_score) as avg_quality
+                FROM conversation_turns 
+                WHERE timestamp_ms > ?
+            ''', (week_ago_ms,))
+            
+            overall_stats = cursor.fetchone()
+            
+            # User adoption of dual messaging
+            cursor.execute('''
+                SELECT 
+                    COUNT(*) as total_users,
+                    SUM(CASE WHEN tts_enabled = 1 THEN 1 ELSE 0 END) as dual_messaging_users
+                FROM user_profiles
+            ''')
+            
+            adoption_stats = cursor.fetchone()
+            
+            # Dual messaging specific analytics
+            cursor.execute('''
+                SELECT 
+                    COUNT(*) as dual_messaging_sessions,
+                    AVG(voice_delivery_time_ms) as avg_voice_delay,
+                    AVG(message_length) as avg_message_length
+                FROM dual_messaging_analytics 
+                WHERE created_at_ms > ?
+            ''', (week_ago_ms,))
+            
+            dual_stats = cursor.fetchone()
+            
+            # TTS performance for dual messaging
+            cursor.execute('''
+                SELECT 
+                    AVG(generation_time_ms) as avg_generation_time,
+                    AVG(file_size_bytes) as avg_file_size,
+                    COUNT(*) as total_tts_requests
+                FROM tts_analytics 
+                WHERE created_at_ms > ?
+            ''', (week_ago_ms,))
+            
+            performance_stats = cursor.fetchone()
+            
+        voice_adoption_rate = (overall_stats[1] or 0) / max(overall_stats[0], 1) * 100
+        user_adoption_rate = (adoption_stats[1] or 0) / max(adoption_stats[0], 1) * 100
+        
+        return jsonify({
+            'summary': {
+                'total_messages_7d': overall_stats[0] or 0,
+                'voice_messages_7d': overall_stats[1] or 0,
+                'voice_adoption_rate_percent': round(voice_adoption_rate, 2),
+                'avg_conversation_quality': round(overall_stats[2] or 0, 2)
+            },
+            'user_adoption': {
+                'total_users': adoption_stats[0] or 0,
+                'dual_messaging_users': adoption_stats[1] or 0,
+                'user_adoption_rate_percent': round(user_adoption_rate, 2)
+            },
+            'dual_messaging_performance': {
+                'dual_messaging_sessions_7d': dual_stats[0] or 0,
+                'avg_voice_delay_ms': round(dual_stats[1] or 0, 2),
+                'avg_message_length': round(dual_stats[2] or 0, 2)
+            },
+            'tts_performance': {
+                'avg_tts_generation_time_ms': round(performance_stats[0] or 0, 2),
+                'avg_audio_file_size_bytes': round(performance_stats[1] or 0, 2),
+                'total_tts_requests_7d': performance_stats[2] or 0
+            },
+            'dual_messaging_status': 'active',
+            'features': [
+                'Text message sent immediately (0-1 second)',
+                'Voice message sent with configurable delay (1-5 seconds)',
+                'User-configurable preferences for both messaging types',
+                'Emergency priority audio delivery',
+                'Accessibility optimized for visual impairments',
+                'Multi-engine TTS fallback for reliability',
+                'Comprehensive analytics and monitoring',
+                'Laravel dashboard integration with dual confirmations'
+            ]
+        })
+        
+    except QueryBudgetExceeded as e:
+        return jsonify({'error': str(e), 'budget_ms': e.budget_ms}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# EXISTING ENDPOINTS (Enhanced)
+
+@app.route("/tts/generate", methods=['POST'])
+def generate_tts():
+    """API endpoint to generate TTS audio for dual messaging"""
+    try:
+        data = request.json
+        text = data.get('text', '')
+        phone = data.get('phone', '')
+        priority = data.get('priority', 'normal')
+        
+        if not text:
+            return jsonify({'error': 'Text is required'}), 400
+        
+        # Get user preferences
+        user_profile = hsse_bot.db.get_user_profile(phone) if phone else None
+        user_preferences = {}
+        
+        if user_profile:
+            user_preferences = {
+                'tts_voice_preference': user_profile.tts_voice_preference,
+                'tts_speed_preference': user_profile.tts_speed_preference,
+                'language': user_profile.preferred_language
+            }
+        
+        # Generate TTS with dual messaging optimization
+        start_time = datetime.datetime.now()
+        audio_file = hsse_bot.tts_manager.generate_for_dual_messaging(text, user_preferences, priority)
+        generation_time = (datetime.datetime.now() - start_time).total_seconds() * 1000
+        
+        if audio_file:
+            # Get file info
+            file_size = os.path.getsize(audio_file) if os.path.exists(audio_file) else 0
+            audio_url = f"{request.url_root}tts-audio/{os.path.basename(audio_file)}"
             
-            response = f"🔇 Voice messages disabled, {name}! You'll only receive text messages now. Say 'voice on' anytime to re-enable dual messaging."
+            # Save analytics if phone provided
+            if phone:
+                hsse_bot.db.save_tts_analytics(
+                    phone, len(text), 'dual_messaging_api', int(generation_time), file_size
+                )
             
-        elif tts_command == 'enable':
-            user_profile.tts_enabled = True
-            user_profile.preferred_message_format = 'both'
+            return jsonify({
+                'success': True,
+                'audio_url': audio_url,
+                'file_size_bytes': file_size,
+                'generation_time_ms': int(generation_time),
+                'text_length': len(text),
+                'optimized_for': 'dual_messaging'
+            })
+        else:
+            return jsonify({'error': 'Failed to generate TTS audio'}), 500
+            
+    except Exception as e:
+        print(f"TTS generation API error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# Laravel webhook endpoints (Enhanced)
+@app.route("/webhook/status-update", methods=['POST'])
+def receive_status_update():
+    """Receive status updates from Laravel backend with dual messaging"""
+    try:
+        data = request.json
+        report_id = data.get('report_id')
+        status = data.get('status')
+        phone_number = data.get('phone_number')
+        
+        if phone_number and status:
+            # Get user profile for dual messaging preferences
+            user_profile = hsse_bot.db.get_user_profile(phone_number)
+            
+            # Send status update to user via WhatsApp
+            message_body = f"""📊 **Laravel Dashboard Report Update**
+
+🆔 Report ID: {report_id}
+📋 New Status: {status}
+🚀 Updated on Laravel Dashboard
+
+Your safety report has been reviewed and updated. Thank you for helping keep everyone safe! 🛡️
+
+Type 'MENU' to access more safety features or ask me anything!
+
+🎙️ This update is provided in both text and voice for your convenience."""
+            
+            # Send text message
+            text_message = twilio_client.messages.create(
+                body=message_body,
+                from_=TWILIO_WHATSAPP_NUMBER,
+                to=phone_number
+            )
+            
+            # Generate and send TTS if user has dual messaging enabled
+            if user_profile and user_profile.tts_enabled and TTS_ENABLED:
+                try:
+                    tts_audio_url = hsse_bot.tts_manager.generate_for_dual_messaging(message_body)
+                    
+                    if tts_audio_url and os.path.exists(tts_audio_url):
+                        audio_filename = os.path.basename(tts_audio_url)
+                        audio_url = f"{request.url_root}tts-audio/{audio_filename}"
+                        
+                        voice_message = twilio_client.messages.create(
+                            media_url=[audio_url],
+                            from_=TWILIO_WHATSAPP_NUMBER,
+                            to=phone_number,
+                            body="🎙️ Audio update from Laravel dashboard"
+                        )
+                        
+                        print(f"✅ Dual messaging status update sent: text {text_message.sid}, voice {voice_message.sid}")
+                    
+                except Exception as e:
+                    print(f"Error sending voice status update: {e}")
+            
+        return jsonify({'success': True})
+    except Exception as e:
+        print(f"Error handling status update: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route("/test-laravel", methods=['GET'])
+def test_laravel_connection():
+    """Test connection to Laravel backend with dual messaging capabilities"""
+    try:
+        # First test basic connection
+        connection_test = hsse_bot.laravel_client.test_connection()
+        
+        if not connection_test.get('success'):
+            return jsonify({
+                'error': 'Laravel connection failed',
+                'details': connection_test,
+                'chatbot_status': 'Ready but Laravel backend unavailable',
+                'suggestion': 'Please check if Laravel server is running and LARAVEL_BASE_URL is correct'
+            })
+        
+        # Test data submission if connection works
+        test_data = {
+            'report_type': 'test',
+            'description': 'Test connection from enhanced chatbot with dual messaging (text + voice)',
+            'date_of_incident': datetime.datetime.now().strftime('%Y-%m-%d'),
+            'time_of_incident': datetime.datetime.now().strftime('%H:%M:%S'),
+            'reporter_name': 'Test User',
+            'reporter_contact': 'whatsapp:+1234567890',
+            'severity': 'low',
+            'source': 'whatsapp_chatbot_dual_messaging',
+            'industry': 'Testing',
+            'incident_type': 'test',
+            'status': 'test',
+            'ai_analysis': '{"test": "Automated test from dual messaging chatbot system"}',
+            'submitted_via': 'whatsapp_chatbot_dual_messaging',
+            'submission_timestamp': datetime.datetime.now().isoformat()
+        }
+        
+        submission_test = hsse_bot.laravel_client.submit_report(test_data)
+        
+        return jsonify({
+            'connection_test': connection_test,
+            'submission_test': submission_test,
+            'chatbot_status': 'Enhanced chatbot with Laravel integration and dual messaging ready',
+            'laravel_base_url': LARAVEL_BASE_URL,
+            'dual_messaging_status': {
+                'text_delivery': 'immediate',
+                'voice_delivery': 'delayed_configurable',
+                'tts_enabled': TTS_ENABLED,
+                'engines_available': {
+                    'pyttsx3': TTS_AVAILABLE and hsse_bot.tts_manager.pyttsx3_ready,
+                    'gtts': GTTS_AVAILABLE,
+                    'openai': bool(OPENAI_API_KEY)
+                }
+            },
+            'features': [
+                'Smart Conversation Tracking',
+                'Laravel Dashboard Integration', 
+                'AI-Enhanced Incident Reporting',
+                'Real-time Status Updates',
+                'Emergency Detection & Response',
+                'Multi-media Support',
+                'DUAL TEXT+VOICE MESSAGING',
+                'Immediate text delivery (0-1 second)',
+                'Delayed voice delivery (2-3 seconds)',
+                'Voice Accessibility Features',
+                'Multi-engine TTS Fallback',
+                'Emergency Audio Alerts',
+                'User-configurable Voice Settings',
+                'Comprehensive Dual Messaging Analytics'
+            ]
+        })
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'chatbot_status': 'Error during Laravel integration test',
+            'suggestion': 'Check Laravel server status and configuration'
+        })
+
+# Enhanced analytics endpoints
+@app.route("/conversation-analytics/<phone>", methods=['GET'])
+def get_conversation_analytics(phone):
+    """Get conversation analytics including dual messaging usage"""
+    try:
+        week_ago_ms = _epoch_ms() - 7 * 86400 * 1000
+        with hsse_bot.db.analytics_pool.snapshot('conversation_analytics') as cursor:
+            # Get recent conversation data
+            cursor.execute('''
+                SELECT COUNT(*) as total_turns,
+                       AVG(response_quality_score) as avg_quality,
+                       COUNT(DISTINCT thread_id) as total_conversations,
+                       SUM(CASE WHEN tts_generated = 1 THEN 1 ELSE 0 END) as tts_responses
+                FROM conversation_turns 
+                WHERE phone = ? AND timestamp_ms > ?
+            ''', (phone, week_ago_ms))
+            
+            stats = cursor.fetchone()
+            
+            # Dual messaging specific stats
+            cursor.execute('''
+                SELECT COUNT(*) as dual_sessions,
+                       AVG(voice_delivery_time_ms) as avg_voice_delay
+                FROM dual_messaging_analytics 
+                WHERE phone = ? AND created_at_ms > ?
+            ''', (phone, week_ago_ms))
+            
+            dual_stats = cursor.fetchone()
+            
+            # Laravel integration stats
+            cursor.execute('''
+                SELECT COUNT(*) as laravel_reports
+                FROM local_reports 
+                WHERE user_phone = ? AND status = 'submitted'
+            ''', (phone,))
+            
+            laravel_stats = cursor.fetchone()
+            
+            # TTS usage stats
+            cursor.execute('''
+                SELECT COUNT(*) as tts_requests,
+                       AVG(generation_time_ms) as avg_generation_time,
+                       AVG(file_size_bytes) as avg_file_size
+                FROM tts_analytics 
+                WHERE phone = ? AND created_at_ms > ?
+            ''', (phone, week_ago_ms))
+            
+            tts_stats = cursor.fetchone()
+        
+        return jsonify({
+            'total_turns': stats[0] or 0,
+            'avg_quality_score': round(stats[1] or 0, 2),
+            'total_conversations': stats[2] or 0,
+            'tts_responses_generated': stats[3] or 0,
+            'dual_messaging_sessions': dual_stats[0] or 0,
+            'avg_voice_delay_ms': round(dual_stats[1] or 0, 2),
+            'laravel_reports_submitted': laravel_stats[0] or 0,
+            'tts_usage': {
+                'total_requests': tts_stats[0] or 0,
+                'avg_generation_time_ms': round(tts_stats[1] or 0, 2),
+                'avg_file_size_bytes': round(tts_stats[2] or 0, 2)
+            },
+            'dual_messaging_efficiency': round((dual_stats[0] or 0) / max(stats[0], 1) * 100, 2)
+        })
+    except QueryBudgetExceeded as e:
+        return jsonify({'error': str(e), 'budget_ms': e.budget_ms}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+# Columns the reports API can return (media_urls and ai_analysis stay internal)
+REPORT_API_FIELDS = ['id', 'user_phone', 'timestamp', 'incident_type', 'severity', 'description',
+                     'location', 'location_lat', 'location_long', 'location_approximate', 'status', 'created_at',
+                     'laravel_report_id']
+
+def _encode_cursor(values: List) -> str:
+    """Encode keyset values as an opaque URL-safe cursor"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor: str, length: int = 2) -> List:
+    """Decode a cursor produced by _encode_cursor holding `length` keyset values"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError('Malformed cursor')
+    return values
+
+def _parse_time_param(value: Optional[str]) -> Optional[int]:
+    """Parse a since/until query value (epoch milliseconds or local-time ISO) into epoch ms"""
+    if not value:
+        return None
+    if value.lstrip('-').isdigit():
+        return int(value)
+    parsed = _iso_to_epoch_ms(value)
+    if parsed is None:
+        raise ValueError(f'Unrecognised timestamp {value!r}')
+    return parsed
+
+@app.route("/reports", methods=['GET'])
+def get_reports():
+    """API endpoint to page through reports (for dashboard), newest first.
+    
+    Query params: limit, cursor, status, severity, incident_type, phone, since, until
+    (ISO or epoch ms), fields (comma separated projection) and include_total.
+    
+    include_total=true reads the trigger-maintained report_counters, so a total is only
+    available with no filter or a single equality filter (status, severity, incident_type
+    or phone). With a since/until range or several filters, 'total' is null and
+    'total_available' is false - unsupported, not zero.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', REPORTS_PAGE_SIZE)), 1), REPORTS_MAX_PAGE_SIZE)
+        
+        fields = REPORT_API_FIELDS
+        if request.args.get('fields'):
+            fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+            unknown = [f for f in fields if f not in REPORT_API_FIELDS]
+            if unknown:
+                return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+        
+        # created_at_ms and id are always selected - the cursor is built from them
+        select_columns = list(dict.fromkeys(fields + ['created_at_ms', 'id']))
+        
+        conditions = []
+        params = []
+        
+        equality_filters = {
+            'status': request.args.get('status'),
+            'severity': request.args.get('severity'),
+            'incident_type': request.args.get('incident_type'),
+            'user_phone': request.args.get('phone')
+        }
+        equality_filters = {column: value for column, value in equality_filters.items() if value}
+        for column, value in equality_filters.items():
+            conditions.append(f'{column} = ?')
+            params.append(value)
+        
+        since_ms = _parse_time_param(request.args.get('since'))
+        until_ms = _parse_time_param(request.args.get('until'))
+        if since_ms is not None:
+            conditions.append('created_at_ms >= ?')
+            params.append(since_ms)
+        if until_ms is not None:
+            conditions.append('created_at_ms < ?')
+            params.append(until_ms)
+        
+        if request.args.get('cursor'):
+            try:
+                cursor_created_at, cursor_id = _decode_cursor(request.args['cursor'])
+            except Exception:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            conditions.append('(created_at_ms, id) < (?, ?)')
+            params.extend([cursor_created_at, cursor_id])
+        
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        with hsse_bot.db.analytics_pool.snapshot('reports') as cursor:
+            cursor.execute(f'''
+                SELECT {', '.join(select_columns)} FROM reports
+                {where_clause}
+                ORDER BY created_at_ms DESC, id DESC
+                LIMIT ?
+            ''', params + [limit + 1])
+            rows = cursor.fetchall()
+            
+            # Totals come from the trigger-maintained counters, never from a scan
+            total = None
+            if request.args.get('include_total', '').lower() == 'true':
+                has_range = since_ms is not None or until_ms is not None
+                if not has_range and len(equality_filters) <= 1:
+                    dimension, value = next(iter(equality_filters.items()), ('all', ''))
+                    cursor.execute('SELECT count FROM report_counters WHERE dimension = ? AND value = ?',
+                                   (dimension, value))
+                    counter = cursor.fetchone()
+                    total = counter[0] if counter else 0
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        reports = []
+        for row in rows:
+            record = dict(zip(select_columns, row))
+            reports.append({field: record[field] for field in fields})
+        
+        next_cursor = None
+        if has_more and rows:
+            last = dict(zip(select_columns, rows[-1]))
+            next_cursor = _encode_cursor([last['created_at_ms'], last['id']])
+        
+        return jsonify({
+            'reports': reports,
+            'count': len(reports),
+            'next_cursor': next_cursor,
+            'total': total,
+            'total_available': total is not None
+        })
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}'}), 400
+    except QueryBudgetExceeded as e:
+        return jsonify({'error': str(e), 'budget_ms': e.budget_ms}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+KM_PER_DEGREE_LAT = 111.32
+
+def _haversine_km(lat1: float, long1: float, lat2: float, long2: float) -> float:
+    """Great-circle distance between two coordinates in kilometres"""
+    d_lat = math.radians(lat2 - lat1)
+    d_long = math.radians(long2 - long1)
+    a = (math.sin(d_lat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_long / 2) ** 2)
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+def _parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """Parse 'min_lat,min_long,max_lat,max_long'"""
+    min_lat, min_long, max_lat, max_long = [float(v) for v in value.split(',')]
+    if min_lat > max_lat or min_long > max_long:
+        raise ValueError('bbox must be min_lat,min_long,max_lat,max_long')
+    return min_lat, min_long, max_lat, max_long
+
+def _radius_bbox(lat: float, long: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Bounding box enclosing a radius around a point (pre-filter for the R*Tree)"""
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    d_long = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+    return lat - d_lat, long - d_long, lat + d_lat, long + d_long
+
+@app.route("/reports/nearby", methods=['GET'])
+def get_nearby_reports():
+    """Reports near a point (lat, lng, radius_km) or inside a bbox, via the R*Tree index.
+    
+    Approximate locations (the Georgetown fallback) are excluded unless include_approximate=true.
+    In radius mode the SPATIAL_MAX_CANDIDATES bounding-box candidates are the nearest ones
+    (planar distance), so older nearby reports are never crowded out by newer distant ones;
+    'truncated' is true when that cap was reached and reports at the edge of the radius may be missing.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', REPORTS_PAGE_SIZE)), 1), REPORTS_MAX_PAGE_SIZE)
+        include_approximate = request.args.get('include_approximate', '').lower() == 'true'
+        
+        center = None
+        if request.args.get('bbox'):
+            min_lat, min_long, max_lat, max_long = _parse_bbox(request.args['bbox'])
+        elif request.args.get('lat') and request.args.get('lng'):
+            center = (float(request.args['lat']), float(request.args['lng']))
+            radius_km = float(request.args.get('radius_km', 5))
+            if radius_km <= 0:
+                return jsonify({'error': 'radius_km must be positive'}), 400
+            min_lat, min_long, max_lat, max_long = _radius_bbox(center[0], center[1], radius_km)
+        else:
+            return jsonify({'error': 'Provide lat and lng (with optional radius_km) or bbox'}), 400
+        
+        params = [min_lat, max_lat, min_long, max_long]
+        if center:
+            # Squared equirectangular distance in degrees, longitude scaled to the latitude
+            order_by = '(s.min_lat - ?) * (s.min_lat - ?) + (s.min_long - ?) * (s.min_long - ?) * ?'
+            params += [center[0], center[0], center[1], center[1], math.cos(math.radians(center[0])) ** 2]
+        else:
+            order_by = 'r.created_at_ms DESC'
+        
+        with hsse_bot.db.analytics_pool.snapshot('spatial') as cursor:
+            cursor.execute(f'''
+                SELECT r.id, r.user_phone, r.incident_type, r.severity, r.description, r.location,
+                       r.location_lat, r.location_long, r.location_approximate, r.status, r.created_at,
+                       r.laravel_report_id
+                FROM reports_rtree s
+                JOIN reports r ON r.index_key = s.id
+                WHERE s.max_lat >= ? AND s.min_lat <= ? AND s.max_long >= ? AND s.min_long <= ?
+                {'' if include_approximate else 'AND COALESCE(r.location_approximate, 0) = 0'}
+                ORDER BY {order_by}
+                LIMIT ?
+            ''', params + [SPATIAL_MAX_CANDIDATES if center else limit])
+            rows = cursor.fetchall()
+        truncated = bool(center) and len(rows) == SPATIAL_MAX_CANDIDATES
+        
+        reports = [{
+            'id': r[0], 'user_phone': r[1], 'incident_type': r[2], 'severity': r[3],
+            'description': r[4], 'location': r[5], 'location_lat': r[6], 'location_long': r[7],
+            'location_approximate': bool(r[8]), 'status': r[9], 'created_at': r[10], 'laravel_report_id': r[11]
+        } for r in rows]
+        
+        if center:
+            # Exact radius check on the bounding-box candidates, nearest first
+            for report in reports:
+                report['distance_km'] = round(_haversine_km(center[0], center[1],
+                                                            report['location_lat'], report['location_long']), 3)
+            reports = sorted((r for r in reports if r['distance_km'] <= radius_km),
+                             key=lambda r: r['distance_km'])[:limit]
+        
+        return jsonify({'reports': reports, 'count': len(reports), 'truncated': truncated})
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}'}), 400
+    except QueryBudgetExceeded as e:
+        return jsonify({'error': str(e), 'budget_ms': e.budget_ms}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route("/reports/hotspots", methods=['GET'])
+def get_report_hotspots():
+    """Aggregate reports into a grid of cell_km squares and return the busiest cells.
+    
+    Query params: cell_km, bbox, since, min_count, limit, include_approximate.
+    """
+    try:
+        cell_km = float(request.args.get('cell_km', 1))
+        min_count = max(int(request.args.get('min_count', 2)), 1)
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        include_approximate = request.args.get('include_approximate', '').lower() == 'true'
+        if cell_km <= 0:
+            return jsonify({'error': 'cell_km must be positive'}), 400
+        
+        if request.args.get('bbox'):
+            min_lat, min_long, max_lat, max_long = _parse_bbox(request.args['bbox'])
+        else:
+            min_lat, min_long, max_lat, max_long = -90.0, -180.0, 90.0, 180.0
+        
+        # Longitude cells are widened by latitude so cells stay roughly square on the ground
+        reference_lat = (min_lat + max_lat) / 2 if request.args.get('bbox') else DEFAULT_LOCATION_LAT
+        cell_lat = cell_km / KM_PER_DEGREE_LAT
+        cell_long = cell_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(reference_lat)), 0.01))
+        
+        conditions = ['s.max_lat >= ?', 's.min_lat <= ?', 's.max_long >= ?', 's.min_long <= ?']
+        params = [min_lat, max_lat, min_long, max_long]
+        if not include_approximate:
+            conditions.append('COALESCE(r.location_approximate, 0) = 0')
+        since_ms = _parse_time_param(request.args.get('since'))
+        if since_ms is not None:
+            conditions.append('r.created_at_ms >= ?')
+            params.append(since_ms)
+        
+        with hsse_bot.db.analytics_pool.snapshot('spatial') as cursor:
+            # Offsets keep the cell index non-negative so CAST truncation acts as floor
+            cursor.execute(f'''
+                SELECT CAST((r.location_lat + 90) / ? AS INTEGER) AS cell_y,
+                       CAST((r.location_long + 180) / ? AS INTEGER) AS cell_x,
+                       COUNT(*) AS report_count,
+                       AVG(r.location_lat), AVG(r.location_long),
+                       SUM(CASE WHEN r.severity IN ('high', 'critical') THEN 1 ELSE 0 END),
+                       MAX(r.created_at)
+                FROM reports_rtree s
+                JOIN reports r ON r.index_key = s.id
+                WHERE {' AND '.join(conditions)}
+                GROUP BY cell_y, cell_x
+                HAVING COUNT(*) >= ?
+                ORDER BY report_count DESC
+                LIMIT ?
+            ''', [cell_lat, cell_long] + params + [min_count, limit])
+            rows = cursor.fetchall()
+        
+        hotspots = [{
+            'cell': {
+                'min_lat': round(r[0] * cell_lat - 90, 6),
+                'min_long': round(r[1] * cell_long - 180, 6),
+                'max_lat': round((r[0] + 1) * cell_lat - 90, 6),
+                'max_long': round((r[1] + 1) * cell_long - 180, 6)
+            },
+            'report_count': r[2],
+            'centroid': {'lat': round(r[3], 6), 'long': round(r[4], 6)},
+            'high_severity_count': r[5],
+            'latest_report_at': r[6]
+        } for r in rows]
+        
+        return jsonify({'cell_km': cell_km, 'hotspots': hotspots, 'count': len(hotspots)})
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}'}), 400
+    except QueryBudgetExceeded as e:
+        return jsonify({'error': str(e), 'budget_ms': e.budget_ms}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Exportable datasets: time column + unique key define the resumable keyset order
+EXPORT_DATASETS = {
+    'reports': {
+        'time_column': 'created_at_ms',
+        'key_column': 'id',
+        'columns': ['id', 'user_phone', 'timestamp', 'incident_type', 'severity', 'description', 'location',
+                    'location_lat', 'location_long', 'location_approximate', 'media_urls', 'status', 'ai_analysis',
+                    'created_at', 'created_at_ms', 'laravel_report_id']
+    },
+    'conversation_turns': {
+        'time_column': 'timestamp_ms',
+        'key_column': 'id',
+        'columns': ['id', 'phone', 'thread_id', 'turn_number', 'user_message', 'bot_response', 'timestamp',
+                    'timestamp_ms', 'intent', 'topics', 'sentiment', 'response_quality_score',
+                    'user_satisfaction_indicators', 'tts_generated']
+    },
+    'conversation_threads': {
+        'time_column': 'start_time_ms',
+        'key_column': 'thread_id',
+        'columns': ['thread_id', 'phone', 'start_time', 'start_time_ms', 'last_activity', 'total_turns', 'conversation_summary',
+                    'key_topics_discussed', 'user_goals_identified', 'relationship_building_score',
+                    'conversation_satisfaction_score', 'unresolved_issues', 'follow_up_needed',
+                    'conversation_type', 'status']
+    }
+}
+
+def _fetch_export_chunk(dataset: Dict, since: Optional[int], until: Optional[int],
+                        after: Optional[List], limit: int) -> List[tuple]:
+    """Fetch the next chunk of an export in its own short read snapshot"""
+    
+    time_column, key_column = dataset['time_column'], dataset['key_column']
+    conditions = [f'{time_column} IS NOT NULL']
+    params = []
+    
+    if since is not None:
+        conditions.append(f'{time_column} >= ?')
+        params.append(since)
+    if until is not None:
+        conditions.append(f'{time_column} < ?')
+        params.append(until)
+    if after:
+        conditions.append(f'({time_column}, {key_column}) > (?, ?)')
+        params.extend(after)
+    
+    with hsse_bot.db.analytics_pool.snapshot('export') as cursor:
+        cursor.execute(f'''
+            SELECT {', '.join(dataset['columns'])} FROM {dataset['name']}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {time_column}, {key_column}
+            LIMIT ?
+        ''', params + [limit])
+        return cursor.fetchall()
+
+@app.route("/export/<dataset_name>", methods=['GET'])
+def export_dataset(dataset_name):
+    """Stream reports, conversation turns or threads as NDJSON or CSV with constant memory.
+    
+    Query params: format (ndjson|csv), since, until (ISO or epoch ms), cursor, max_rows. Every row carries
+    a _cursor value; pass the last one received as cursor to resume an interrupted export.
+    
+    A failure after streaming has started ends the export with a marker: an NDJSON {"_error", "_rows_sent"}
+    line, or a CSV row whose first cell is _error followed by the message and the rows sent.
+    """
+    if dataset_name not in EXPORT_DATASETS:
+        return jsonify({'error': f"Unknown dataset. Choose from: {', '.join(EXPORT_DATASETS)}"}), 404
+    
+    dataset = dict(EXPORT_DATASETS[dataset_name], name=dataset_name)
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ['ndjson', 'csv']:
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    
+    try:
+        since = _parse_time_param(request.args.get('since'))
+        until = _parse_time_param(request.args.get('until'))
+        max_rows = int(request.args['max_rows']) if request.args.get('max_rows') else None
+        after = _decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except Exception:
+        return jsonify({'error': 'Invalid since, until, cursor or max_rows'}), 400
+    
+    if max_rows is not None and max_rows < 1:
+        return jsonify({'error': 'max_rows must be at least 1'}), 400
+    
+    columns = dataset['columns']
+    time_index = columns.index(dataset['time_column'])
+    key_index = columns.index(dataset['key_column'])
+    
+    # Fetch the first chunk eagerly so errors still get a proper status code
+    try:
+        first_chunk = _fetch_export_chunk(dataset, since, until, after,
+                                          min(EXPORT_CHUNK_SIZE, max_rows or EXPORT_CHUNK_SIZE))
+    except QueryBudgetExceeded as e:
+        return jsonify({'error': str(e), 'budget_ms': e.budget_ms}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        chunk = first_chunk
+        sent = 0
+        
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns + ['_cursor'])
+            yield buffer.getvalue()
+        
+        while chunk:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer) if export_format == 'csv' else None
+            
+            for row in chunk:
+                row_cursor = _encode_cursor([row[time_index], row[key_index]])
+                if writer:
+                    writer.writerow(list(row) + [row_cursor])
+                else:
+                    record = dict(zip(columns, row))
+                    record['_cursor'] = row_cursor
+                    buffer.write(json.dumps(record) + '\n')
             
-            response = f"🎙️ Dual messaging enabled, {name}! You'll now receive both text and voice messages for better accessibility."
+            sent += len(chunk)
+            yield buffer.getvalue()
             
-        else:
-            response = f"🎙️ Voice Controls:\n• Say 'voice on' to enable dual messaging\n• Say 'voice off' to disable audio\n• Current status: {'Dual messaging enabled' if user_profile.tts_enabled else 'Text only'}"
-        
-        return response, {
-            'tts_control_handled': True,
-            'new_tts_status': user_profile.tts_enabled,
-            'tts_audio_url': None  # Don't generate TTS for TTS control commands
-        }
+            if len(chunk) < EXPORT_CHUNK_SIZE or (max_rows and sent >= max_rows):
+                break
+            
+            last = chunk[-1]
+            limit = min(EXPORT_CHUNK_SIZE, max_rows - sent) if max_rows else EXPORT_CHUNK_SIZE
+            try:
+                chunk = _fetch_export_chunk(dataset, since, until, [last[time_index], last[key_index]], limit)
+            except Exception as e:
+                # Headers are already sent; stop cleanly and let the client resume from its last _cursor
+                print(f"Export of {dataset_name} stopped after {sent} rows: {e}")
+                if export_format == 'ndjson':
+                    yield json.dumps({'_error': str(e), '_rows_sent': sent}) + '\n'
+                else:
+                    buffer = io.StringIO()
+                    marker = ['_error', str(e), sent]
+                    csv.writer(buffer).writerow(marker + [''] * (len(columns) + 1 - len(marker)))
+                    yield buffer.getvalue()
+                return
     
-    def _determine_conversation_type(self, intent_analysis: Dict, message: str) -> str:
-        """Determine the type of conversation"""
-        intent = intent_analysis.get('primary_intent', 'casual')
-        urgency = intent_analysis.get('urgency_level', 'low')
-        
-        if intent == 'emergency' or urgency == 'critical':
-            return 'emergency'
-        elif intent == 'report_incident':
-            return 'incident_reporting'
-        elif any(word in message.lower() for word in ['training', 'learn', 'course']):
-            return 'training'
-        elif any(word in message.lower() for word in ['policy', 'procedure', 'regulation']):
-            return 'procedural'
-        else:
-            return 'casual'
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    filename = f"{dataset_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
     
-    def _enhance_intent_with_memory(self, intent_analysis: Dict, conversation_context: Dict) -> Dict:
-        """Enhance intent analysis with conversation memory"""
-        enhanced = intent_analysis.copy()
-        
-        # Add context from recent turns
-        recent_topics = conversation_context.get('topics_discussed', [])
-        if recent_topics:
-            enhanced['contextual_topics'] = recent_topics
+    return Response(generate(), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={filename}',
+        'X-Accel-Buffering': 'no'
+    })
+
+def _build_fts_query(text: str) -> str:
+    """Turn free text into a safe FTS5 query: every word quoted, all words required, trailing * = prefix"""
+    terms = []
+    for word, prefix in re.findall(r'(\w+)(\*?)', text):
+        terms.append(f'"{word}"{prefix}')
+    return ' '.join(terms)
+
+@app.route("/search", methods=['GET'])
+def search_conversations_and_reports():
+    """Full-text search over what workers told the bot and over report descriptions/locations.
+    
+    Query params: q, scope (all|conversations|reports), phone, limit, offset.
+    Results carry a highlighted snippet and are ranked by BM25 normalised within their source
+    (score 1.0 = best match among conversations / among reports), since raw BM25 depends on
+    each index's own document lengths and term statistics and isn't comparable across them.
+    """
+    if not hsse_bot.db.fts_available:
+        return jsonify({'error': 'Full-text search is not available on this SQLite build'}), 501
+    
+    fts_query = _build_fts_query(request.args.get('q', ''))
+    if not fts_query:
+        return jsonify({'error': 'q is required'}), 400
+    
+    scope = request.args.get('scope', 'all')
+    if scope not in ['all', 'conversations', 'reports']:
+        return jsonify({'error': 'scope must be all, conversations or reports'}), 400
+    
+    try:
+        limit = min(max(int(request.args.get('limit', SEARCH_PAGE_SIZE)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    
+    phone = request.args.get('phone')
+    selects = []
+    params = []
+    
+    if scope in ['all', 'conversations']:
+        selects.append(f'''
+            SELECT 'conversation' AS kind, t.id, t.phone, t.thread_id, t.timestamp,
+                   snippet(conversation_turns_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet,
+                   bm25(conversation_turns_fts) AS rank
+            FROM conversation_turns_fts
+            JOIN conversation_turns t ON t.index_key = conversation_turns_fts.rowid
+            WHERE conversation_turns_fts MATCH ? {'AND t.phone = ?' if phone else ''}
+        ''')
+        params.extend([fts_query] + ([phone] if phone else []))
+    
+    if scope in ['all', 'reports']:
+        selects.append(f'''
+            SELECT 'report' AS kind, r.id, r.user_phone AS phone, NULL AS thread_id, r.created_at AS timestamp,
+                   snippet(reports_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet,
+                   bm25(reports_fts) AS rank
+            FROM reports_fts
+            JOIN reports r ON r.index_key = reports_fts.rowid
+            WHERE reports_fts MATCH ? {'AND r.user_phone = ?' if phone else ''}
+        ''')
+        params.extend([fts_query] + ([phone] if phone else []))
+    
+    # bm25() can't feed a window function directly, so each source is normalised around its subquery
+    ranked = [f'SELECT kind, id, phone, thread_id, timestamp, snippet, rank / MIN(rank) OVER () AS score FROM ({select})'
+              for select in selects]
+    
+    try:
+        with hsse_bot.db.analytics_pool.snapshot('search') as cursor:
+            cursor.execute(f"{' UNION ALL '.join(ranked)} ORDER BY score DESC, timestamp DESC LIMIT ? OFFSET ?",
+                           params + [limit + 1, offset])
+            rows = cursor.fetchall()
         
-        # Add conversation flow awareness
-        conversation_flow = conversation_context.get('conversation_flow', {})
-        enhanced['conversation_flow'] = conversation_flow
+        has_more = len(rows) > limit
+        results = [{
+            'type': r[0], 'id': r[1], 'phone': r[2], 'thread_id': r[3],
+            'timestamp': r[4], 'snippet': r[5], 'score': round(r[6], 6)
+        } for r in rows[:limit]]
         
-        # Add relationship context
-        relationship_score = conversation_context.get('long_term_memory', {}).get('trust_level', 0.5)
-        enhanced['relationship_level'] = relationship_score
+        return jsonify({
+            'query': request.args.get('q'),
+            'results': results,
+            'count': len(results),
+            'next_offset': offset + limit if has_more else None
+        })
+    except QueryBudgetExceeded as e:
+        return jsonify({'error': str(e), 'budget_ms': e.budget_ms}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route("/metrics/llm", methods=['GET'])
+def llm_metrics():
+    """Latency, tokens and estimated cost of OpenAI calls per call site and model.
+    
+    Query params: hours (window over llm_call_metrics, default 24, all worker processes).
+    'process' holds this worker's in-memory aggregates since startup.
+    """
+    try:
+        hours = float(request.args.get('hours', 24))
+    except ValueError:
+        return jsonify({'error': 'hours must be a number'}), 400
+    if not math.isfinite(hours) or hours <= 0:
+        return jsonify({'error': 'hours must be a positive number'}), 400
+    
+    llm_telemetry.flush()
+    since_ms = _epoch_ms() - int(hours * 3600 * 1000)
+    bucket_case = ' '.join(f'WHEN wall_ms <= {bound} THEN {i}' for i, bound in enumerate(LLM_LATENCY_BUCKETS_MS))
+    
+    try:
+        with hsse_bot.db.analytics_pool.snapshot('llm_metrics') as cursor:
+            cursor.execute(f'''
+                SELECT call_site, model, CASE {bucket_case} ELSE {len(LLM_LATENCY_BUCKETS_MS)} END AS bucket,
+                       COUNT(*), SUM(1 - success), SUM(wall_ms), SUM(prompt_tokens),
+                       SUM(completion_tokens), SUM(input_characters), SUM(cost_usd)
+                FROM llm_call_metrics
+                WHERE started_at_ms > ?
+                GROUP BY call_site, model, bucket
+            ''', (since_ms,))
+            rows = cursor.fetchall()
+        
+        call_sites = {}
+        for call_site, model, bucket, calls, errors, wall_ms, prompt_tokens, completion_tokens, characters, cost in rows:
+            entry = call_sites.setdefault(call_site, {}).setdefault(model, {
+                'calls': 0, 'errors': 0, 'total_wall_ms': 0.0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                'input_characters': 0, 'cost_usd': 0.0, 'histogram': [0] * (len(LLM_LATENCY_BUCKETS_MS) + 1)
+            })
+            entry['calls'] += calls
+            entry['errors'] += errors or 0
+            entry['total_wall_ms'] += wall_ms or 0.0
+            entry['prompt_tokens'] += prompt_tokens or 0
+            entry['completion_tokens'] += completion_tokens or 0
+            entry['input_characters'] += characters or 0
+            entry['cost_usd'] += cost or 0.0
+            entry['histogram'][bucket] += calls
+        
+        totals = {'calls': 0, 'cost_usd': 0.0, 'total_wall_ms': 0.0}
+        for models in call_sites.values():
+            for entry in models.values():
+                entry['latency_histogram'] = LLMTelemetry.histogram(entry.pop('histogram'))
+                entry['avg_wall_ms'] = round(entry['total_wall_ms'] / entry['calls'], 1)
+                entry['total_wall_ms'] = round(entry['total_wall_ms'], 1)
+                entry['cost_usd'] = round(entry['cost_usd'], 6)
+                totals['calls'] += entry['calls']
+                totals['cost_usd'] += entry['cost_usd']
+                totals['total_wall_ms'] += entry['total_wall_ms']
+        totals = {key: round(value, 6) for key, value in totals.items()}
         
-        return enhanced
+        return jsonify({
+            'window_hours': hours,
+            'totals': totals,
+            'call_sites': call_sites,
+            'process': llm_telemetry.get_stats()
+        })
+    except QueryBudgetExceeded as e:
+        return jsonify({'error': str(e), 'budget_ms': e.budget_ms}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route("/health", methods=['GET'])
+def health_check():
+    """Health check endpoint with Laravel integration status and dual messaging capabilities"""
     
-    def _enhance_response_with_continuity(self, response: str, conversation_context: Dict, 
-                                        enhanced_intent: Dict) -> str:
-        """Enhance response with conversation continuity and smart follow-ups"""
+    # Test Laravel connection
+    try:
+        test_result = hsse_bot.laravel_client.get_report_status('test')
+        laravel_status = "connected" if test_result.get('success') != False else "connection_issues"
+    except:
+        laravel_status = "offline"
+    
+    # Dual messaging system status
+    dual_messaging_status = {
+        'text_delivery': 'immediate_via_twiml',
+        'voice_delivery': 'delayed_via_api',
+        'tts_enabled': TTS_ENABLED,
+        'engines': {
+            'pyttsx3': TTS_AVAILABLE and hsse_bot.tts_manager.pyttsx3_ready,
+            'gtts': GTTS_AVAILABLE,
+            'openai_tts': bool(OPENAI_API_KEY)
+        },
+        'cache_size': len(hsse_bot.tts_manager.audio_cache),
+        'temp_files_count': len([f for f in os.listdir(hsse_bot.tts_manager.temp_dir) if f.startswith('tts_')]),
+        'performance_stats': hsse_bot.tts_manager.get_performance_stats()
+    }
+    
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.datetime.now().isoformat(),
+        'laravel_integration': laravel_status,
+        'dual_messaging_system': dual_messaging_status,
+        'analytics_pool': hsse_bot.db.analytics_pool.get_stats(),
+        'conversation_memory': hsse_bot.conversation_tracker.get_memory_stats(),
+        'long_term_memory': hsse_bot.memory_consolidator.get_stats(),
+        'thread_summaries': hsse_bot.thread_summarizer.get_stats(),
+        'llm_usage': llm_usage_meter.get_stats(),
+        'openai_client': resilient_openai.get_stats(),
+        'external_calls': external_calls.get_stats(),
+        'llm_telemetry': {key: value for key, value in llm_telemetry.get_stats().items() if key != 'call_sites'},
+        'local_intent': local_intent_classifier.get_stats(),
+        'response_cache': hsse_bot.response_generator.response_cache.get_stats(),
+        'analyzer_cache': analyzer_cache.get_stats(),
+        'user_info_extraction': user_info_gate.get_stats(),
+        'prompts': hsse_bot.response_generator.prompt_builder.get_stats(),
+        'inbound_queue': hsse_bot.inbound_queue.get_stats(),
+        'sessions': hsse_bot.db.sessions.get_stats(),
+        'shared_state': hsse_bot.db.shared_state.get_stats(),
+        'features': [
+            'Smart Conversation Tracking',
+            'Long-term Memory & Relationship Building',
+            'Conversation Thread Continuity', 
+            'Turn-by-turn Quality Analysis',
+            'User Satisfaction Monitoring',
+            'Conversation Pattern Learning',
+            'Smart Follow-up Suggestions',
+            'Engagement Level Tracking',
+            'Conversation Analytics & Insights',
+            'Laravel Dashboard Integration',
+            'AI-Enhanced Incident Reporting',
+            'Real-time Status Updates',
+            'Emergency Detection & Response',
+            'Media File Processing',
+            'Location Services Integration',
+            '🎙️ DUAL TEXT+VOICE MESSAGING',
+            '📱 Immediate text delivery (TwiML)',
+            '🎙️ Delayed voice delivery (Twilio API)',
+            'Multi-engine TTS Fallback',
+            'Voice Accessibility Features',
+            'Emergency Audio Alerts',
+            'Personalized Voice Settings',
+            'Comprehensive Dual Messaging Analytics'
+        ]
+    })
+
+@app.cli.command('train-intent-model')
+def train_intent_model():
+    """Fit the local intent classifier from labelled conversation history"""
+    result = local_intent_classifier.train()
+    if result['trained']:
+        print(f"✅ Trained local intent model on {result['samples']} turns "
+              f"({result['intents']} intents, {result['vocabulary']} features) -> {LOCAL_INTENT_MODEL_PATH}")
+    else:
+        print(f"⚠️  Not enough labelled turns to train: {result['samples']} turns across {result['intents']} intents "
+              f"(need {LOCAL_INTENT_MIN_TRAINING_SAMPLES} across at least 2)")
+
+def create_openai_standin_app(latency_ms: int = 0, error_rate: float = 0.0, retry_after: float = None) -> Flask:
+    """Minimal local stand-in for the OpenAI endpoints this app calls, for tests and load runs.
+
+    Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1. Replies are canned
+    but shaped like the real API; latency_ms and error_rate inject slowness and 503s. With
+    retry_after set, injected failures are 429s carrying that Retry-After (in seconds).
+    """
+    standin = Flask('openai_standin')
+
+    def _delay_or_fail():
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        if error_rate and random.random() < error_rate:
+            if retry_after is not None:
+                return jsonify({'error': {'message': 'Stand-in rate limit', 'type': 'rate_limit_error'}}), 429, {
+                    'Retry-After': str(retry_after)}
+            return jsonify({'error': {'message': 'Stand-in injected failure', 'type': 'server_error'}}), 503
+        return None
+
+    def _canned_reply(body: Dict) -> str:
+        messages = body.get('messages') or [{}]
+        prompt = str(messages[-1].get('content', ''))
+        intent = {
+            'primary_intent': 'question' if '?' in prompt else 'casual_chat', 'secondary_intents': [],
+            'urgency_level': 'low', 'emotional_tone': 'neutral', 'conversation_style': 'casual',
+            'expertise_level': 'intermediate', 'safety_related': True, 'needs_human_response': False,
+            'key_topics': [], 'response_style_needed': 'informative', 'follow_up_questions': [],
+            'tts_suitable': True, 'confidence_score': 0.9
+        }
+        if (body.get('response_format') or {}).get('type') == 'json_object':
+            return json.dumps({'intent': intent, 'user_info': {}, 'reply': 'Stand-in reply: stay safe out there!'})
+        if 'Analyze this message' in prompt:
+            return json.dumps(intent)
+        if 'Extract any personal' in prompt:
+            return '{}'
+        if 'running summary' in prompt:
+            return 'Stand-in summary of the conversation so far.'
+        return 'Stand-in reply: stay safe out there!'
+
+    @standin.route('/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        failure = _delay_or_fail()
+        if failure:
+            return failure
+        body = request.get_json(force=True) or {}
+        content = _canned_reply(body)
+        prompt_tokens = sum(len(str(m.get('content', ''))) for m in body.get('messages', [])) // 4
+        return jsonify({
+            'id': f"chatcmpl-standin-{uuid.uuid4().hex[:12]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'gpt-4o-mini'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(content) // 4,
+                      'total_tokens': prompt_tokens + len(content) // 4}
+        })
+
+    @standin.route('/v1/audio/speech', methods=['POST'])
+    def audio_speech():
+        failure = _delay_or_fail()
+        if failure:
+            return failure
+        return Response(b'ID3' + b'\x00' * 256, mimetype='audio/mpeg')  # Silent placeholder, not playable audio
+
+    return standin
+
+@app.cli.command('openai-standin')
+@click.option('--port', default=8765, show_default=True, help='Port to listen on (127.0.0.1 only)')
+@click.option('--latency-ms', default=0, show_default=True, help='Delay added to every response')
+@click.option('--error-rate', default=0.0, show_default=True, help='Share of requests answered with a 503')
+@click.option('--retry-after', default=None, type=float, help='Answer failures with 429 and this Retry-After instead')
+def openai_standin(port, latency_ms, error_rate, retry_after):
+    """Serve canned OpenAI responses locally for tests"""
+    print(f"🧪 OpenAI stand-in on http://127.0.0.1:{port}/v1 (latency {latency_ms} ms, error rate {error_rate:.0%})")
+    create_openai_standin_app(latency_ms, error_rate, retry_after).run(host='127.0.0.1', port=port, threaded=True)
+
+@app.cli.command('load-test')
+@click.argument('script', type=click.Path(exists=True, dir_okay=False))
+@click.option('--users', default=10, show_default=True, help='Simulated users sending the script concurrently')
+@click.option('--repeat', default=1, show_default=True, help='Times each user sends the whole script')
+def load_test(script, users, repeat):
+    """Drive process_message with a scripted conversation (a JSON list of messages) for many users"""
+    with open(script) as script_file:
+        messages = json.load(script_file)
+    if not messages:
+        print("⚠️  The script has no messages")
+        return
+    if external_calls.mode != 'replay':
+        print("⚠️  EXTERNAL_CALLS_MODE is not 'replay' - this load test will call the live services")
+    
+    latencies_ms = []
+    errors = Counter()
+    lock = threading.Lock()
+    
+    def run_user(index: int):
+        phone = f"whatsapp:+1555{index:07d}"
+        for _ in range(repeat):
+            for message in messages:
+                started = time.perf_counter()
+                try:
+                    hsse_bot.process_message(phone, message)
+                except Exception as e:
+                    with lock:
+                        errors[type(e).__name__] += 1
+                with lock:
+                    latencies_ms.append((time.perf_counter() - started) * 1000)
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(run_user, range(users)))
+    elapsed = time.perf_counter() - started
+    
+    latencies_ms.sort()
+    print(f"📊 {len(latencies_ms)} messages from {users} users in {elapsed:.2f}s "
+          f"({len(latencies_ms) / elapsed:.1f} msg/s)")
+    print(f"   latency avg {sum(latencies_ms) / len(latencies_ms):.1f} ms, "
+          f"p50 {latencies_ms[len(latencies_ms) // 2]:.1f} ms, "
+          f"p95 {latencies_ms[int(len(latencies_ms) * 0.95) - 1]:.1f} ms, max {latencies_ms[-1]:.1f} ms")
+    print(f"   errors {dict(errors) or 0}; external calls {external_calls.get_stats()}")
+
+if __name__ == "__main__":
+    print("🚀 Starting Enhanced AI-Powered HSSE Chatbot with Dual Text+Voice Messaging...")
+    print("🧠 All existing features enabled PLUS:")
+    print()
+    print("🎙️ DUAL MESSAGING FEATURES:")
+    print("✅ Text message sent immediately (0-1 second)")
+    print("✅ Voice message sent with configurable delay (2-3 seconds later)")
+    print("✅ Emergency messages get instant voice alerts")
+    print("✅ User-configurable messaging preferences")
+    print("✅ Smart delay timing for optimal user experience")
+    print("✅ Pre-generated emergency audio for instant delivery")
+    print("✅ Comprehensive dual messaging analytics")
+    print("✅ Voice control commands for easy management")
+    print("✅ Laravel dashboard integration with dual confirmations")
+    print()
+    print("🎯 HOW DUAL MESSAGING WORKS:")
+    print("  1. User sends message to chatbot")
+    print("  2. Bot processes and generates intelligent response")
+    print("  3. TEXT: Sent immediately via TwiML response (instant)")
+    print("  4. TTS: Audio generated in background using best engine")
+    print("  5. VOICE: Sent via Twilio API after configurable delay")
+    print("  6. User receives BOTH text AND voice for optimal accessibility")
+    print()
+    print("🎯 USER EXPERIENCE:")
+    print("  • Text arrives instantly for immediate reading")
+    print("  • Voice follows shortly for hands-free listening")
+    print("  • Emergency situations get priority voice delivery")
+    print("  • Users can customize voice preferences and timing")
+    print("  • Perfect accessibility for users with visual impairments")
+    print("  • Users can disable voice with simple commands")
+    print()
+    print("🔧 DUAL MESSAGING ENDPOINTS:")
+    print("  • /dual-messaging/preferences/<phone> - Manage dual messaging settings")
+    print("  • /dual-messaging/test/<phone> - Test dual messaging with a user")
+    print("  • /dual-messaging/analytics - Get dual messaging usage statistics")
+    print("  • /tts-audio/<filename> - Serve TTS audio files")
+    print("  • /tts/generate - Generate TTS audio via API")
+    print()
+    print("💬 VOICE COMMANDS FOR USERS:")
+    print("  • 'voice off' - Disable voice messages (text only)")
+    print("  • 'voice on' - Enable dual messaging (text + voice)")
+    print("  • 'both messages' - Enable text + voice")
+    print("  • 'text only' - Text messages only")
+    print("  • 'voice fast' - Increase speech speed") 
+    print("  • 'voice slow' - Decrease speech speed")
+    print("  • 'voice male' - Switch to male voice")
+    print("  • 'voice female' - Switch to female voice")
+    print("  • 'voice settings' - Show voice control panel")
+    print()
+    print("📊 ANALYTICS & MONITORING:")
+    print("  • Dual messaging usage statistics")
+    print("  • Voice adoption rates and user preferences")
+    print("  • TTS performance metrics and optimization")
+    print("  • Emergency response effectiveness")
+    print("  • User accessibility improvements")
+    print()
+    
+    # Initialize enhanced TTS manager for dual messaging
+    if TTS_ENABLED:
+        print("🎙️ Initializing Enhanced TTS System for Dual Messaging...")
+        print("✅ Enhanced TTS system ready for dual messaging!")
+        print("✅ Database updated with dual messaging support!")
+        print("✅ Pre-generated emergency audio phrases ready!")
+        print("✅ Multi-engine TTS fallback configured!")
         
-        # Add conversational continuity
-        recent_turns = conversation_context.get('recent_turns', [])
-        if recent_turns and len(recent_turns) > 1:
-            # Reference previous conversation if relevant
-            last_topics = recent_turns[-1].topics if hasattr(recent_turns[-1], 'topics') else []
-            current_topics = enhanced_intent.get('key_topics', [])
+        # Test TTS system on startup
+        print("🎙️ Testing TTS engines...")
+        if TTS_AVAILABLE and hsse_bot.tts_manager.pyttsx3_ready:
+            print("✅ pyttsx3 engine available (fastest for emergencies)")
+        else:
+            print("⚠️  pyttsx3 not available")
             
-            if any(topic in current_topics for topic in last_topics):
-                response = f"Building on what we discussed earlier, {response}"
-        
-        # Add smart follow-ups based on context
-        unresolved_questions = conversation_context.get('unresolved_questions', [])
-        if unresolved_questions and len(response) < 800:
-            response += f"\n\nBy the way, did I fully answer your earlier question about {unresolved_questions[0][:50]}...?"
-        
-        return response
+        if GTTS_AVAILABLE:
+            print("✅ Google TTS (gTTS) available (high quality)")
+        else:
+            print("⚠️  gTTS not available")
+            
+        if OPENAI_API_KEY:
+            print("✅ OpenAI TTS available (premium quality)")
+        else:
+            print("⚠️  OpenAI TTS not available (no API key)")
+            
+        print("🎙️ TTS system ready with multi-engine fallback support!")
+    else:
+        print("🔇 TTS system disabled - dual messaging will use text only")
+    
+    print()
+    print("🌟 READY FOR DUAL TEXT+VOICE MESSAGING!")
+    print("🌟 Users will now receive both text and voice messages for optimal accessibility!")
+    print("🌟 Laravel dashboard integration with dual confirmations!")
+    print("🌟 Emergency situations get priority audio delivery!")
+    print("🌟 Complete accessibility support for all users!")
+    
+    app.run(debug=True, port=5000)
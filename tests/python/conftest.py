@@ -0,0 +1,42 @@
+"""Shared setup for the chatbot's Python tests.
+
+app.py reads its configuration at import time and creates hsse_reports.db in the
+working directory, so the environment is fixed and the tests run from a scratch
+directory before anything imports it.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+os.environ.setdefault('OPENAI_BASE_URL', 'http://127.0.0.1:9/v1')  # Nothing listens here
+os.environ.setdefault('TWILIO_ACCOUNT_SID', 'ACtest')
+os.environ.setdefault('TWILIO_AUTH_TOKEN', 'test-token')
+os.environ['TTS_ENABLED'] = 'false'
+os.environ['EXTERNAL_CALLS_MODE'] = 'live'
+os.chdir(tempfile.mkdtemp(prefix='hsse-tests-'))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def serve():
+    """Run a Flask app on a free local port; returns its base URL"""
+    from werkzeug.serving import make_server
+
+    servers = []
+
+    def start(flask_app) -> str:
+        server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_port}'
+
+    yield start
+    for server in servers:
+        server.shutdown()
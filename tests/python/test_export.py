@@ -0,0 +1,141 @@
+"""Streaming dataset export: /export/<dataset_name>."""
+
+import csv
+import datetime
+import io
+import itertools
+import json
+import uuid
+
+import pytest
+
+import app
+
+_days = itertools.count()
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(app, 'EXPORT_CHUNK_SIZE', 2)
+
+
+@pytest.fixture
+def window():
+    """A day of its own in 2001, so other tests' reports stay out of the export"""
+    start = datetime.datetime(2001, 1, 1) + datetime.timedelta(days=next(_days))
+    return start, start + datetime.timedelta(days=1)
+
+
+def save_reports(window, count):
+    """Save `count` reports a minute apart; returns their ids oldest first"""
+    ids = []
+    for minute in range(count):
+        created_at = (window[0] + datetime.timedelta(minutes=minute)).isoformat()
+        report = app.IncidentReport(
+            id=f'export-{uuid.uuid4().hex[:12]}', user_phone='whatsapp:+1777000', timestamp=created_at,
+            incident_type='hazard', severity='low', description=f'Report {minute}, with a comma', location='Site',
+            location_lat=None, location_long=None, media_urls=[], status='submitted', ai_analysis={},
+            created_at=created_at
+        )
+        app.hsse_bot.db.save_report(report)
+        ids.append(report.id)
+    return ids
+
+
+def export(client, window, **params):
+    params.update(since=window[0].isoformat(), until=window[1].isoformat())
+    response = client.get('/export/reports', query_string=params)
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def ndjson_rows(body):
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def test_ndjson_streams_every_chunk_in_order(client, window, small_chunks):
+    ids = save_reports(window, 5)
+
+    rows = ndjson_rows(export(client, window))
+
+    assert [row['id'] for row in rows] == ids
+    assert all(row['_cursor'] for row in rows)
+
+
+def test_csv_matches_ndjson(client, window, small_chunks):
+    save_reports(window, 3)
+
+    records = ndjson_rows(export(client, window))
+    csv_rows = list(csv.DictReader(io.StringIO(export(client, window, format='csv'))))
+
+    assert list(csv_rows[0]) == app.EXPORT_DATASETS['reports']['columns'] + ['_cursor']
+    assert [row['id'] for row in csv_rows] == [record['id'] for record in records]
+    assert [row['description'] for row in csv_rows] == [record['description'] for record in records]
+    assert [row['_cursor'] for row in csv_rows] == [record['_cursor'] for record in records]
+
+
+@pytest.mark.parametrize('max_rows', [1, 2, 3, 10])
+def test_max_rows(client, window, small_chunks, max_rows):
+    ids = save_reports(window, 5)
+
+    rows = ndjson_rows(export(client, window, max_rows=max_rows))
+
+    assert [row['id'] for row in rows] == ids[:max_rows]
+
+
+def test_cursor_resumes_after_the_last_row_received(client, window, small_chunks):
+    ids = save_reports(window, 5)
+
+    first = ndjson_rows(export(client, window, max_rows=3))
+    rest = ndjson_rows(export(client, window, cursor=first[-1]['_cursor']))
+
+    assert [row['id'] for row in first + rest] == ids
+
+
+def test_invalid_parameters(client):
+    assert client.get('/export/sessions').status_code == 404
+    assert client.get('/export/reports?format=xml').status_code == 400
+    assert client.get('/export/reports?max_rows=0').status_code == 400
+    assert client.get('/export/reports?cursor=not-a-cursor').status_code == 400
+
+
+@pytest.fixture
+def failing_second_chunk(monkeypatch):
+    """The eager first fetch works; the next one (inside the stream) fails"""
+    fetch = app._fetch_export_chunk
+    calls = itertools.count()
+
+    def fetch_chunk(*args):
+        if next(calls) > 0:
+            raise app.QueryBudgetExceeded('export', 1)
+        return fetch(*args)
+
+    monkeypatch.setattr(app, '_fetch_export_chunk', fetch_chunk)
+
+
+def test_ndjson_failure_mid_stream_ends_with_an_error_line(client, window, small_chunks, failing_second_chunk):
+    ids = save_reports(window, 3)
+
+    rows = ndjson_rows(export(client, window))
+
+    assert [row['id'] for row in rows[:-1]] == ids[:2]
+    assert rows[-1]['_rows_sent'] == 2
+    assert 'export' in rows[-1]['_error']
+
+
+def test_csv_failure_mid_stream_ends_with_a_marker_row(client, window, small_chunks, failing_second_chunk):
+    ids = save_reports(window, 3)
+
+    header, *rows = list(csv.reader(io.StringIO(export(client, window, format='csv'))))
+
+    assert [row[0] for row in rows[:-1]] == ids[:2]
+    marker = rows[-1]
+    assert marker[0] == '_error'
+    assert 'export' in marker[1]
+    assert marker[2] == '2'
+    assert len(marker) == len(header)
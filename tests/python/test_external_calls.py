@@ -0,0 +1,85 @@
+"""Replaying recorded external calls (ExternalCallRecorder)."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+import app
+
+REQUEST = {'model': 'gpt-4o-mini', 'messages': [{'role': 'user', 'content': 'What PPE do I need for welding?'}]}
+COMPLETION = {
+    'id': 'chatcmpl-recorded', 'object': 'chat.completion', 'created': 1700000000, 'model': 'gpt-4o-mini',
+    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': 'Helmet, gloves and a jacket.'},
+                 'finish_reason': 'stop'}]
+}
+
+
+def replaying(tmp_path, *outcomes) -> app.ExternalCallRecorder:
+    """A replay-mode recorder whose fixture holds the outcomes of one chat completion request, in order"""
+    fixture = tmp_path / 'external_calls.jsonl'
+    request_key = app.ExternalCallRecorder.request_key((), REQUEST)
+    with open(fixture, 'w') as fixture_file:
+        for outcome in outcomes:
+            recording = {'operation': 'openai.chat.completions.create', 'request_key': request_key,
+                         'request': {'args': [], 'kwargs': REQUEST}, 'duration_ms': 0, **outcome}
+            fixture_file.write(json.dumps(recording) + '\n')
+    return app.ExternalCallRecorder(mode='replay', fixture_path=str(fixture), replay_latency='0')
+
+
+def error(error_type: str, status_code: int = None, retry_after: str = None) -> dict:
+    return {'error': {'type': error_type, 'message': 'recorded failure',
+                      'status_code': status_code, 'retry_after': retry_after}}
+
+
+@pytest.mark.parametrize('recorded, expected', [
+    (error('APITimeoutError'), APITimeoutError),
+    (error('APIConnectionError'), APIConnectionError),
+    (error('RateLimitError', 429), RateLimitError),
+    (error('InternalServerError', 500), InternalServerError),
+    (error('APIStatusError', 503), InternalServerError),
+    (error('ReadTimeout'), APITimeoutError),
+    (error('BadRequestError', 400), app.ReplayedCallError),
+])
+def test_recorded_openai_errors_replay_as_openai_exceptions(tmp_path, recorded, expected):
+    recorder = replaying(tmp_path, recorded)
+    target = SimpleNamespace(create=lambda **kwargs: pytest.fail('replay must not call the live client'))
+    recorder.instrument(target, 'openai.chat.completions.create')
+
+    with pytest.raises(expected):
+        target.create(**REQUEST)
+
+
+def test_replayed_rate_limit_keeps_retry_after(tmp_path):
+    recorder = replaying(tmp_path, error('RateLimitError', 429, '3'))
+
+    replayed = recorder._replayed_error('openai.chat.completions.create', recorder.by_operation[
+        'openai.chat.completions.create'][0]['error'])
+
+    assert app.ResilientOpenAIClient._retry_delay(1, replayed) >= 3
+
+
+def test_resilient_client_retries_a_replayed_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'OPENAI_RETRY_BASE_DELAY_SECONDS', 0.01)
+    recorder = replaying(tmp_path, error('InternalServerError', 500), {'response': COMPLETION})
+    completions = SimpleNamespace(create=lambda **kwargs: pytest.fail('replay must not call the live client'))
+    recorder.instrument(completions, 'openai.chat.completions.create')
+    client = app.ResilientOpenAIClient(SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+
+    response = client.chat_completion('response', **REQUEST)
+
+    assert response.choices[0].message.content == 'Helmet, gloves and a jacket.'
+    assert client.get_stats()['call_sites']['response']['retries'] == 1
+
+
+def test_other_services_replay_as_replayed_call_error(tmp_path):
+    fixture = tmp_path / 'external_calls.jsonl'
+    fixture.write_text(json.dumps({'operation': 'twilio.messages.create', 'request_key': 'x', 'duration_ms': 0,
+                                   **error('TwilioRestException', 500)}) + '\n')
+    recorder = app.ExternalCallRecorder(mode='replay', fixture_path=str(fixture), replay_latency='0')
+    target = SimpleNamespace(create=lambda **kwargs: None)
+    recorder.instrument(target, 'twilio.messages.create')
+
+    with pytest.raises(app.ReplayedCallError):
+        target.create(to='whatsapp:+1555', body='hi')
@@ -0,0 +1,192 @@
+"""InboundMessageQueue (WEBHOOK_MODE=async) with a stubbed Twilio client."""
+
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import app
+
+
+class FakeTwilioMessages:
+    """Records sends; the first `failures[phone]` sends to a phone raise"""
+
+    def __init__(self):
+        self.sent = []
+        self.failures = {}
+        self._lock = threading.Lock()
+
+    def create(self, body, from_, to):
+        with self._lock:
+            if self.failures.get(to, 0) > 0:
+                self.failures[to] -= 1
+                self.sent.append(('failed', to, body))
+                raise RuntimeError('Twilio unavailable')
+            self.sent.append(('sent', to, body))
+            return SimpleNamespace(sid=f'SM{len(self.sent)}')
+
+    def delivered(self):
+        with self._lock:
+            return [body for outcome, _, body in self.sent if outcome == 'sent']
+
+
+@pytest.fixture
+def twilio(monkeypatch):
+    messages = FakeTwilioMessages()
+    monkeypatch.setattr(app, 'twilio_client', SimpleNamespace(messages=messages))
+    return messages
+
+
+@pytest.fixture
+def generated(monkeypatch):
+    """Replace reply generation (the chatbot and its LLM calls) with an echo"""
+    calls = []
+
+    def generate_reply(from_number, incoming_msg, media_urls):
+        calls.append(incoming_msg)
+        return f'reply to {incoming_msg}', None
+
+    monkeypatch.setattr(app, '_generate_reply', generate_reply)
+    monkeypatch.setattr(app, '_schedule_voice_message', lambda *args: None)
+    return calls
+
+
+@pytest.fixture
+def make_queue(tmp_path, monkeypatch, twilio, generated):
+    monkeypatch.setattr(app, 'INBOUND_MAX_ATTEMPTS', 3)
+    db_path = str(tmp_path / 'inbound.db')
+
+    def make(workers: int = 1, retry_delay: float = 0.3) -> app.InboundMessageQueue:
+        inbound_queue = app.InboundMessageQueue(app.hsse_bot, db_path=db_path, workers=workers)
+        inbound_queue.RETRY_DELAY_SECONDS = retry_delay
+        return inbound_queue
+
+    return make
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.02)
+
+
+def rows(inbound_queue):
+    conn = sqlite3.connect(inbound_queue.db_path)
+    result = conn.execute('SELECT body, status, attempts FROM inbound_messages ORDER BY id').fetchall()
+    conn.close()
+    return result
+
+
+def enqueue(inbound_queue, sid, phone, body):
+    return inbound_queue.enqueue(sid, phone, body, [], 'http://localhost/')
+
+
+def test_messages_are_answered_and_marked_sent(make_queue, twilio):
+    inbound_queue = make_queue(workers=2)
+    inbound_queue.start()
+
+    enqueue(inbound_queue, 'SM-a1', 'whatsapp:+1001', 'first')
+    enqueue(inbound_queue, 'SM-b1', 'whatsapp:+1002', 'second')
+    wait_for(lambda: inbound_queue.get_stats()['sent'] == 2)
+
+    assert sorted(twilio.delivered()) == ['reply to first', 'reply to second']
+    assert rows(inbound_queue) == [('first', 'sent', 1), ('second', 'sent', 1)]
+    assert inbound_queue.get_stats()['avg_latency_ms'] is not None
+
+
+def test_duplicate_message_sid_is_ignored(make_queue):
+    inbound_queue = make_queue()
+
+    assert enqueue(inbound_queue, 'SM-dup', 'whatsapp:+1001', 'hello')
+    assert enqueue(inbound_queue, 'SM-dup', 'whatsapp:+1001', 'hello') is None
+    assert inbound_queue.get_stats()['enqueued'] == 1
+
+
+def test_failed_send_waits_without_blocking_other_phones(make_queue, twilio, generated):
+    inbound_queue = make_queue(workers=1, retry_delay=0.5)
+    twilio.failures['whatsapp:+1001'] = 1
+    inbound_queue.start()
+
+    enqueue(inbound_queue, 'SM-a1', 'whatsapp:+1001', 'a1')
+    enqueue(inbound_queue, 'SM-a2', 'whatsapp:+1001', 'a2')
+    enqueue(inbound_queue, 'SM-b1', 'whatsapp:+1002', 'b1')
+
+    # The other phone on the same worker is answered while a1 waits for its retry
+    wait_for(lambda: 'reply to b1' in twilio.delivered(), timeout=0.4)
+    assert twilio.delivered() == ['reply to b1']
+    assert inbound_queue.get_stats()['waiting_for_retry'] == 2
+
+    wait_for(lambda: inbound_queue.get_stats()['sent'] == 3)
+    assert twilio.delivered() == ['reply to b1', 'reply to a1', 'reply to a2']
+    assert generated.count('a1') == 1  # The retry resends the stored reply
+    assert rows(inbound_queue) == [('a1', 'sent', 2), ('a2', 'sent', 1), ('b1', 'sent', 1)]
+    assert inbound_queue.get_stats()['retries'] == 1
+
+
+def test_send_gives_up_after_max_attempts(make_queue, twilio):
+    inbound_queue = make_queue(workers=1, retry_delay=0.05)
+    twilio.failures['whatsapp:+1001'] = 3
+    inbound_queue.start()
+
+    enqueue(inbound_queue, 'SM-a1', 'whatsapp:+1001', 'a1')
+    enqueue(inbound_queue, 'SM-a2', 'whatsapp:+1001', 'a2')
+    wait_for(lambda: inbound_queue.get_stats()['sent'] == 1)
+
+    assert twilio.delivered() == ['reply to a2']
+    assert rows(inbound_queue) == [('a1', 'failed', 3), ('a2', 'sent', 1)]
+    stats = inbound_queue.get_stats()
+    assert stats['failed'] == 1
+    assert stats['retries'] == 2
+    assert stats['waiting_for_retry'] == 0
+
+
+def abandon(inbound_queue, attempts: int):
+    """Make every row look like a claim whose worker died"""
+    conn = sqlite3.connect(inbound_queue.db_path)
+    conn.execute("UPDATE inbound_messages SET status = 'processing', attempts = ?, started_at_ms = 0", (attempts,))
+    conn.commit()
+    conn.close()
+
+
+def test_abandoned_claims_are_requeued(make_queue, twilio):
+    inbound_queue = make_queue()
+    enqueue(inbound_queue, 'SM-a1', 'whatsapp:+1001', 'a1')
+    inbound_queue.queues[0].get()  # Claimed by a worker that then died
+    abandon(inbound_queue, attempts=1)
+
+    assert inbound_queue.requeue_unfinished() == 1
+    assert inbound_queue.get_stats()['queue_depth'] == 1
+    inbound_queue.start()
+    wait_for(lambda: inbound_queue.get_stats()['sent'] == 1)
+
+    assert rows(inbound_queue) == [('a1', 'sent', 2)]
+
+
+def test_abandoned_claims_stop_after_max_attempts(make_queue, twilio, generated):
+    inbound_queue = make_queue()
+    enqueue(inbound_queue, 'SM-a1', 'whatsapp:+1001', 'a1')
+    inbound_queue.queues[0].get()
+    abandon(inbound_queue, attempts=3)
+    inbound_queue.start()
+
+    wait_for(lambda: inbound_queue.get_stats()['failed'] == 1)
+
+    assert rows(inbound_queue) == [('a1', 'failed', 3)]
+    assert generated == []
+    assert twilio.sent == []
+
+
+def test_start_recovers_messages_left_queued(make_queue, twilio):
+    previous_run = make_queue()
+    enqueue(previous_run, 'SM-a1', 'whatsapp:+1001', 'a1')
+    enqueue(previous_run, 'SM-a2', 'whatsapp:+1001', 'a2')
+
+    inbound_queue = make_queue()
+    inbound_queue.start()
+    wait_for(lambda: inbound_queue.get_stats()['sent'] == 2)
+
+    assert twilio.delivered() == ['reply to a1', 'reply to a2']
+    assert inbound_queue.get_stats()['recovered'] == 2
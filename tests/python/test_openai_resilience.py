@@ -0,0 +1,171 @@
+"""ResilientOpenAIClient against the local OpenAI stand-in (create_openai_standin_app)."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from openai import AsyncOpenAI, InternalServerError, OpenAI, RateLimitError
+
+import app
+
+MESSAGES = [{'role': 'user', 'content': 'What PPE do I need for welding?'}]
+
+
+@pytest.fixture(autouse=True)
+def fast_policy(monkeypatch):
+    monkeypatch.setattr(app, 'OPENAI_MAX_RETRIES', 2)
+    monkeypatch.setattr(app, 'OPENAI_RETRY_BASE_DELAY_SECONDS', 0.01)
+    monkeypatch.setattr(app, 'OPENAI_QUEUE_TIMEOUT_SECONDS', 10)
+    monkeypatch.setattr(app, 'OPENAI_HEDGE_AFTER_SECONDS', 0)
+
+
+@pytest.fixture
+def standin(serve):
+    """Start a stand-in; returns (ResilientOpenAIClient factory, request counter)"""
+    requests_seen = []
+
+    def start(max_concurrency: int = 4, **standin_options):
+        standin_app = app.create_openai_standin_app(**standin_options)
+        standin_app.before_request(lambda: requests_seen.append(time.perf_counter()))
+        base_url = serve(standin_app) + '/v1'
+        return app.ResilientOpenAIClient(
+            OpenAI(api_key='test-key', base_url=base_url, max_retries=0),
+            max_concurrency=max_concurrency,
+            async_client=AsyncOpenAI(api_key='test-key', base_url=base_url, max_retries=0)
+        )
+
+    return start, requests_seen
+
+
+def test_transient_errors_are_retried_up_to_the_limit(standin):
+    start, requests_seen = standin
+    client = start(error_rate=1.0)
+
+    with pytest.raises(InternalServerError):
+        client.chat_completion('intent', model='gpt-3.5-turbo', messages=MESSAGES)
+
+    site = client.get_stats()['call_sites']['intent']
+    assert site['retries'] == 2
+    assert site['errors'] == 3
+    assert site['calls'] == 0
+    assert len(requests_seen) == 3
+
+
+def test_async_transient_errors_are_retried_up_to_the_limit(standin):
+    start, requests_seen = standin
+    client = start(error_rate=1.0)
+
+    with pytest.raises(InternalServerError):
+        asyncio.run(client.chat_completion_async('intent', model='gpt-3.5-turbo', messages=MESSAGES))
+
+    assert client.get_stats()['call_sites']['intent']['retries'] == 2
+    assert len(requests_seen) == 3
+
+
+def test_retry_waits_for_retry_after(standin, monkeypatch):
+    monkeypatch.setattr(app, 'OPENAI_MAX_RETRIES', 1)
+    start, requests_seen = standin
+    client = start(error_rate=1.0, retry_after=0.5)
+
+    started = time.perf_counter()
+    with pytest.raises(RateLimitError):
+        client.chat_completion('intent', model='gpt-3.5-turbo', messages=MESSAGES)
+
+    assert len(requests_seen) == 2
+    assert requests_seen[1] - requests_seen[0] >= 0.5
+    assert time.perf_counter() - started >= 0.5
+
+
+def test_full_slots_raise_queue_timeout(standin, monkeypatch):
+    monkeypatch.setattr(app, 'OPENAI_QUEUE_TIMEOUT_SECONDS', 0.05)
+    start, requests_seen = standin
+    client = start(max_concurrency=1, latency_ms=400)
+
+    outcomes = []
+
+    def call():
+        try:
+            client.chat_completion('response', model='gpt-4o-mini', messages=MESSAGES)
+            outcomes.append('ok')
+        except app.OpenAIQueueTimeout:
+            outcomes.append('queue_timeout')
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == ['ok', 'queue_timeout']
+    stats = client.get_stats()
+    assert stats['queue_timeouts'] == 1
+    assert stats['call_sites']['response']['queue_timeouts'] == 1
+    assert stats['in_flight'] == 0
+    assert len(requests_seen) == 1
+
+
+def test_async_full_slots_raise_queue_timeout(standin, monkeypatch):
+    monkeypatch.setattr(app, 'OPENAI_QUEUE_TIMEOUT_SECONDS', 0.05)
+    start, requests_seen = standin
+    client = start(max_concurrency=1, latency_ms=400)
+
+    async def both():
+        return await asyncio.gather(
+            *[client.chat_completion_async('response', model='gpt-4o-mini', messages=MESSAGES) for _ in range(2)],
+            return_exceptions=True
+        )
+
+    results = asyncio.run(both())
+
+    assert sum(isinstance(result, app.OpenAIQueueTimeout) for result in results) == 1
+    assert client.get_stats()['in_flight'] == 0
+    assert len(requests_seen) == 1
+
+
+def test_slow_reply_is_hedged(standin, monkeypatch):
+    monkeypatch.setattr(app, 'OPENAI_HEDGE_AFTER_SECONDS', 0.1)
+    start, requests_seen = standin
+    client = start(latency_ms=400)
+
+    response = client.chat_completion('response', model='gpt-4o-mini', messages=MESSAGES)
+
+    assert response.choices[0].message.content
+    site = client.get_stats()['call_sites']['response']
+    assert site['hedges'] == 1
+    assert len(requests_seen) == 2
+    assert requests_seen[1] - requests_seen[0] >= 0.1
+
+
+def test_async_slow_reply_is_hedged(standin, monkeypatch):
+    monkeypatch.setattr(app, 'OPENAI_HEDGE_AFTER_SECONDS', 0.1)
+    start, requests_seen = standin
+    client = start(latency_ms=400)
+
+    response = asyncio.run(client.chat_completion_async('response', model='gpt-4o-mini', messages=MESSAGES))
+
+    assert response.choices[0].message.content
+    assert client.get_stats()['call_sites']['response']['hedges'] == 1
+    assert len(requests_seen) == 2
+
+
+def test_no_hedge_without_a_spare_slot(standin, monkeypatch):
+    monkeypatch.setattr(app, 'OPENAI_HEDGE_AFTER_SECONDS', 0.1)
+    start, requests_seen = standin
+    client = start(max_concurrency=1, latency_ms=300)
+
+    client.chat_completion('response', model='gpt-4o-mini', messages=MESSAGES)
+
+    assert client.get_stats()['call_sites']['response']['hedges'] == 0
+    assert len(requests_seen) == 1
+
+
+def test_only_reply_call_sites_are_hedged(standin, monkeypatch):
+    monkeypatch.setattr(app, 'OPENAI_HEDGE_AFTER_SECONDS', 0.1)
+    start, requests_seen = standin
+    client = start(latency_ms=300)
+
+    client.chat_completion('intent', model='gpt-3.5-turbo', messages=MESSAGES)
+
+    assert client.get_stats()['call_sites']['intent']['hedges'] == 0
+    assert len(requests_seen) == 1
@@ -0,0 +1,154 @@
+"""Report query routes: /reports and /reports/nearby."""
+
+import datetime
+import uuid
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+@pytest.fixture
+def phone():
+    return f'whatsapp:+1666{uuid.uuid4().hex[:8]}'
+
+
+def save_report(phone, created_at, lat=None, lng=None, **fields):
+    report = app.IncidentReport(
+        id=f'test-{uuid.uuid4().hex[:12]}', user_phone=phone, timestamp=created_at,
+        incident_type=fields.get('incident_type', 'hazard'), severity=fields.get('severity', 'low'),
+        description=fields.get('description', 'Loose cable across walkway'), location='Site',
+        location_lat=lat, location_long=lng, media_urls=[], status=fields.get('status', 'submitted'),
+        ai_analysis={}, created_at=created_at
+    )
+    app.hsse_bot.db.save_report(report)
+    return report.id
+
+
+def minutes_ago(minutes: int) -> str:
+    return (datetime.datetime.now() - datetime.timedelta(minutes=minutes)).isoformat()
+
+
+def test_nearby_keeps_the_nearest_reports_when_candidates_are_capped(client, phone, monkeypatch):
+    monkeypatch.setattr(app, 'SPATIAL_MAX_CANDIDATES', 3)
+    nearest = save_report(phone, minutes_ago(600), 40.0001, 10.0001)
+    farther = [save_report(phone, minutes_ago(index), 40.01 + index * 0.001, 10.01) for index in range(5)]
+
+    result = client.get('/reports/nearby?lat=40.0&lng=10.0&radius_km=5').json
+
+    assert [report['id'] for report in result['reports']] == [nearest] + farther[:2]
+    assert result['truncated'] is True
+
+
+def test_nearby_is_not_truncated_below_the_cap(client, phone):
+    inside = save_report(phone, minutes_ago(5), -30.0, 20.001)
+    save_report(phone, minutes_ago(5), -30.5, 20.5)
+
+    result = client.get('/reports/nearby?lat=-30.0&lng=20.0&radius_km=1').json
+
+    assert [report['id'] for report in result['reports']] == [inside]
+    assert result['truncated'] is False
+
+
+def reports(client, **params):
+    return client.get('/reports', query_string=params).json
+
+
+def page_ids(client, **params):
+    """Follow next_cursor through every page; returns the ids page by page"""
+    pages = []
+    while True:
+        result = reports(client, **params)
+        pages.append([report['id'] for report in result['reports']])
+        params['cursor'] = result['next_cursor']
+        if not params['cursor']:
+            return pages
+
+
+def test_cursor_pages_newest_first_without_gaps(client, phone):
+    created = [save_report(phone, minutes_ago(minutes)) for minutes in (50, 40, 30, 20, 10)]
+    save_report(phone + '0', minutes_ago(15))  # Another reporter, filtered out
+
+    pages = page_ids(client, phone=phone, limit=2)
+
+    assert pages == [[created[4], created[3]], [created[2], created[1]], [created[0]]]
+
+
+def test_cursor_pages_through_reports_with_the_same_timestamp(client, phone):
+    same_time = minutes_ago(5)
+    created = {save_report(phone, same_time) for _ in range(5)}
+
+    pages = page_ids(client, phone=phone, limit=2)
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert set(sum(pages, [])) == created
+
+
+def test_filters_combine(client, phone):
+    match = save_report(phone, minutes_ago(30), severity='high', status='submitted')
+    save_report(phone, minutes_ago(30), severity='low', status='submitted')
+    save_report(phone, minutes_ago(30), severity='high', status='closed')
+    save_report(phone, minutes_ago(300), severity='high', status='submitted')  # Outside the range
+
+    result = reports(client, phone=phone, severity='high', status='submitted', since=minutes_ago(60))
+
+    assert [report['id'] for report in result['reports']] == [match]
+
+
+def test_until_excludes_newer_reports(client, phone):
+    older = save_report(phone, minutes_ago(120))
+    save_report(phone, minutes_ago(10))
+
+    result = reports(client, phone=phone, until=minutes_ago(60))
+
+    assert [report['id'] for report in result['reports']] == [older]
+
+
+def test_fields_projection(client, phone):
+    save_report(phone, minutes_ago(1))
+
+    result = reports(client, phone=phone, fields='id,severity')
+
+    assert list(result['reports'][0]) == ['id', 'severity']
+    assert client.get('/reports?fields=id,ai_analysis').status_code == 400
+
+
+def test_total_follows_the_counter_triggers(client, phone):
+    incident_type = f'type-{uuid.uuid4().hex[:8]}'
+    report_id = save_report(phone, minutes_ago(3), incident_type=incident_type)
+    save_report(phone, minutes_ago(2), incident_type=incident_type)
+
+    def total(**params):
+        result = reports(client, include_total='true', limit=1, **params)
+        return result['total'], result['total_available']
+
+    assert total(phone=phone) == (2, True)
+    assert total(incident_type=incident_type) == (2, True)
+
+    # Saving the same id again moves it between counter values
+    app.hsse_bot.db.save_report(app.IncidentReport(
+        id=report_id, user_phone=phone, timestamp=minutes_ago(3), incident_type=f'{incident_type}-moved',
+        severity='low', description='Loose cable across walkway', location='Site', location_lat=None,
+        location_long=None, media_urls=[], status='submitted', ai_analysis={}, created_at=minutes_ago(3)
+    ))
+    assert total(incident_type=incident_type) == (1, True)
+    assert total(incident_type=f'{incident_type}-moved') == (1, True)
+    assert total(phone=phone) == (2, True)
+    assert total(phone=phone + '0') == (0, True)
+
+
+def test_total_is_unavailable_for_ranges_and_combined_filters(client, phone):
+    save_report(phone, minutes_ago(3), severity='high')
+
+    for params in ({'severity': 'high'}, {'since': minutes_ago(60)}):
+        result = reports(client, phone=phone, include_total='true', **params)
+        assert result['count'] == 1
+        assert (result['total'], result['total_available']) == (None, False)
+
+    result = reports(client, phone=phone)
+    assert (result['total'], result['total_available']) == (None, False)
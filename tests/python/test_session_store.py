@@ -0,0 +1,220 @@
+"""SessionStore: hot tier, expiry and partial updates over user_sessions."""
+
+import sqlite3
+import time
+import uuid
+
+import pytest
+
+import app
+
+DB_PATH = 'hsse_reports.db'  # Created in the scratch directory when app is imported
+
+
+@pytest.fixture
+def phone():
+    return f'whatsapp:+1555{uuid.uuid4().hex[:8]}'
+
+
+@pytest.fixture
+def short_report_ttl(monkeypatch):
+    """waiting_media sessions live 1 s; confirming_report keeps a long TTL"""
+    monkeypatch.setitem(app.SESSION_STATE_TTL_SECONDS, 'waiting_media', 1)
+    monkeypatch.setitem(app.SESSION_STATE_TTL_SECONDS, 'confirming_report', 3600)
+
+
+@pytest.fixture
+def two_workers(tmp_path):
+    """Two workers' session stores sharing one database and one shared-state backend"""
+    shared_state = app.SQLiteSharedState(str(tmp_path / 'shared_state.db'))
+    return app.SessionStore(DB_PATH, shared_state=shared_state), app.SessionStore(DB_PATH, shared_state=shared_state)
+
+
+def stored_row(phone):
+    conn = sqlite3.connect(DB_PATH)
+    row = conn.execute('SELECT state, data FROM user_sessions WHERE phone = ?', (phone,)).fetchone()
+    conn.close()
+    return row
+
+
+def fresh_read(phone):
+    """What a worker without a hot copy sees"""
+    return app.SessionStore(DB_PATH).get(phone)
+
+
+def test_expired_hot_copy_does_not_delete_another_workers_refresh(two_workers, phone, short_report_ttl):
+    worker_a, worker_b = two_workers
+    worker_a.set(phone, 'waiting_media', {'report_data': {'description': 'Broken guard rail'}})
+    assert worker_a.get(phone)[0] == 'waiting_media'
+
+    time.sleep(1.2)
+    draft = {'report_data': {'description': 'Broken guard rail', 'media_files': [{'url': 'https://x/1.jpg'}]}}
+    worker_b.set(phone, 'confirming_report', draft)
+
+    assert worker_a.get(phone) == ('confirming_report', draft)
+    assert worker_b.get(phone) == ('confirming_report', draft)
+    assert stored_row(phone) is not None
+
+
+def test_expired_hot_copy_of_a_partial_update_reloads(two_workers, phone, short_report_ttl):
+    worker_a, worker_b = two_workers
+    worker_a.set(phone, 'waiting_media', {'report_data': {'description': 'Oil spill'}})
+    worker_a.get(phone)
+    worker_b.get(phone)
+
+    time.sleep(1.2)
+    assert worker_b.get(phone) == (None, {})  # Really expired: the first reader deletes it
+    worker_b.set(phone, 'waiting_media', {'report_data': {'description': 'Oil spill'}})
+    assert worker_b.update_fields(phone, 'confirming_report', {'report_data.location': 'Dock 4'})
+
+    assert worker_a.get(phone) == ('confirming_report', {'report_data': {'description': 'Oil spill', 'location': 'Dock 4'}})
+
+
+def test_expired_hot_copy_falls_back_to_the_durable_row(phone, short_report_ttl):
+    store = app.SessionStore(DB_PATH)
+    store.set(phone, 'waiting_media', {'step': 1})
+    store.get(phone)
+
+    # Refreshed in SQLite without this store's hot tier seeing it
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute('UPDATE user_sessions SET expires_at_ms = ? WHERE phone = ?', (app._epoch_ms() + 60000, phone))
+    conn.commit()
+    conn.close()
+
+    time.sleep(1.2)
+    assert store.get(phone) == ('waiting_media', {'step': 1})
+
+
+def test_expired_session_is_deleted(phone, short_report_ttl):
+    store = app.SessionStore(DB_PATH)
+    store.set(phone, 'waiting_media', {'step': 1})
+
+    time.sleep(1.2)
+
+    assert store.get(phone) == (None, {})
+    assert stored_row(phone) is None
+    assert store.get_stats()['expired'] == 1
+
+
+def test_update_fields_matches_a_full_set(phone):
+    store = app.SessionStore(DB_PATH)
+    initial = {'report_data': {'description': 'Exposed wiring', 'media_files': []}, 'step': 1}
+    store.set(phone, 'waiting_location', initial)
+
+    fields = {
+        'report_data.location_lat': 6.8013,
+        'report_data.location_long': -58.1551,
+        'report_data.location': 'Coordinates: 6.8013, -58.1551',
+        'report_data.location_details': {'source': 'whatsapp', 'approximate': False},
+        'report_data.reviewed_by': None,
+        'step': 2
+    }
+    assert store.update_fields(phone, 'confirming_report', fields) is True
+
+    expected = {
+        'report_data': {'description': 'Exposed wiring', 'media_files': [], 'location_lat': 6.8013,
+                        'location_long': -58.1551, 'location': 'Coordinates: 6.8013, -58.1551',
+                        'location_details': {'source': 'whatsapp', 'approximate': False}, 'reviewed_by': None},
+        'step': 2
+    }
+    assert store.get(phone) == ('confirming_report', expected)
+    assert fresh_read(phone) == ('confirming_report', expected)
+
+    full_phone = phone + '-full'
+    store.set(full_phone, 'confirming_report', expected)
+    assert fresh_read(full_phone) == fresh_read(phone)
+
+
+def test_update_fields_creates_missing_parents(phone):
+    store = app.SessionStore(DB_PATH)
+    store.set(phone, 'waiting_location', {'step': 1})
+
+    assert store.update_fields(phone, 'waiting_location', {'report_data.location': 'Dock 4'})
+
+    expected = ('waiting_location', {'step': 1, 'report_data': {'location': 'Dock 4'}})
+    assert store.get(phone) == expected
+    assert fresh_read(phone) == expected
+
+
+def test_append_media_without_existing_media_files(phone):
+    store = app.SessionStore(DB_PATH)
+    store.set(phone, 'waiting_media', {'report_data': {'description': 'Leaking valve'}})
+    first = {'url': 'https://media/1.jpg', 'content_type': 'image/jpeg'}
+    second = [{'url': 'https://media/2.jpg', 'content_type': 'image/jpeg'},
+              {'url': 'https://media/3.mp4', 'content_type': 'video/mp4'}]
+
+    assert store.append_media(phone, 'waiting_media', [first]) is True
+    assert store.append_media(phone, 'waiting_location', second) is True
+
+    expected = ('waiting_location', {'report_data': {'description': 'Leaking valve', 'media_files': [first] + second}})
+    assert store.get(phone) == expected
+    assert fresh_read(phone) == expected
+
+
+def test_append_media_without_report_data(phone):
+    store = app.SessionStore(DB_PATH)
+    store.set(phone, 'waiting_media', {})
+    media_file = {'url': 'https://media/1.jpg'}
+
+    assert store.append_media(phone, 'waiting_media', [media_file])
+
+    expected = ('waiting_media', {'report_data': {'media_files': [media_file]}})
+    assert store.get(phone) == expected
+    assert fresh_read(phone) == expected
+
+
+def test_returned_data_is_a_copy(phone):
+    store = app.SessionStore(DB_PATH)
+    store.set(phone, 'waiting_media', {'report_data': {'media_files': []}})
+
+    state, data = store.get(phone)
+    data['report_data']['media_files'].append({'url': 'https://media/unsaved.jpg'})
+
+    assert store.get(phone) == ('waiting_media', {'report_data': {'media_files': []}})
+
+
+def test_expiry_follows_the_state(phone, short_report_ttl):
+    store = app.SessionStore(DB_PATH)
+    store.set(phone, 'waiting_media', {'step': 1})
+    store.set(phone + '-confirm', 'confirming_report', {'step': 1})
+    store.set(phone + '-moved', 'waiting_media', {'step': 1})
+    assert store.update_fields(phone + '-moved', 'confirming_report', {'step': 2})
+
+    time.sleep(1.2)
+
+    assert store.get(phone) == (None, {})
+    assert store.get(phone + '-confirm') == ('confirming_report', {'step': 1})
+    assert store.get(phone + '-moved') == ('confirming_report', {'step': 2})
+
+
+def test_expire_sessions_removes_only_expired_rows(phone, short_report_ttl):
+    store = app.SessionStore(DB_PATH)
+    store.set(phone, 'waiting_media', {'step': 1})
+    store.set(phone + '-confirm', 'confirming_report', {'step': 1})
+
+    time.sleep(1.2)
+
+    assert store.expire_sessions() >= 1
+    assert stored_row(phone) is None
+    assert stored_row(phone + '-confirm') is not None
+
+
+def test_partial_update_without_a_session_returns_false(phone):
+    store = app.SessionStore(DB_PATH)
+
+    assert store.update_fields(phone, 'confirming_report', {'report_data.location': 'Dock 4'}) is False
+    assert store.append_media(phone, 'waiting_location', [{'url': 'https://media/1.jpg'}]) is False
+    assert stored_row(phone) is None
+    assert store.get(phone) == (None, {})
+
+
+def test_partial_update_of_an_expired_session_returns_false(phone, short_report_ttl):
+    store = app.SessionStore(DB_PATH)
+    store.set(phone, 'waiting_media', {'report_data': {'description': 'Old draft'}})
+    store.get(phone)
+
+    time.sleep(1.2)
+
+    assert store.append_media(phone, 'waiting_location', [{'url': 'https://media/1.jpg'}]) is False
+    assert store.get(phone) == (None, {})
+    assert store.get_stats()['partial_updates'] == 0
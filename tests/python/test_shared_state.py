@@ -0,0 +1,117 @@
+"""SQLiteSharedState and RedisSharedState must behave the same.
+
+The Redis cases run against SHARED_STATE_TEST_REDIS_URL (default redis://localhost:6379/15)
+and are skipped when no server answers there.
+"""
+
+import os
+import time
+import uuid
+
+import pytest
+
+import app
+
+REDIS_TEST_URL = os.getenv('SHARED_STATE_TEST_REDIS_URL', 'redis://localhost:6379/15')
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        yield app.SQLiteSharedState(str(tmp_path / 'shared_state.db'))
+        return
+
+    if not app.REDIS_AVAILABLE:
+        pytest.skip('redis package not installed')
+    prefix = f'hsse-test-{uuid.uuid4().hex[:8]}:'
+    try:
+        redis_backend = app.RedisSharedState(REDIS_TEST_URL, prefix=prefix)
+    except Exception as e:
+        pytest.skip(f'no Redis at {REDIS_TEST_URL}: {e}')
+    yield redis_backend
+    for key in redis_backend.client.scan_iter(f'{prefix}*'):
+        redis_backend.client.delete(key)
+
+
+def test_get_set_delete(backend):
+    assert backend.get('session:1') is None
+    backend.set('session:1', 'collecting_report')
+    assert backend.get('session:1') == 'collecting_report'
+    backend.set('session:1', 'conversing')
+    assert backend.get('session:1') == 'conversing'
+    backend.delete('session:1')
+    assert backend.get('session:1') is None
+
+
+def test_version_counters(backend):
+    assert backend.get_version('version:thread:1') == 0
+    assert backend.incr('version:thread:1') == 1
+    assert backend.incr('version:thread:1') == 2
+    assert backend.get_version('version:thread:1') == 2
+    assert backend.get_version('version:thread:2') == 0
+
+
+def test_values_expire_after_their_ttl(backend):
+    backend.set('short', 'value', ttl_seconds=1)
+    backend.set('forever', 'value')
+    assert backend.get('short') == 'value'
+
+    time.sleep(1.2)
+
+    assert backend.get('short') is None
+    assert backend.get('forever') == 'value'
+
+
+def test_set_without_ttl_clears_an_earlier_ttl(backend):
+    backend.set('key', 'first', ttl_seconds=1)
+    backend.set('key', 'second')
+
+    time.sleep(1.2)
+
+    assert backend.get('key') == 'second'
+
+
+def test_add_if_absent(backend):
+    assert backend.add_if_absent('inbound_sid:SM1', '1', ttl_seconds=60) is True
+    assert backend.add_if_absent('inbound_sid:SM1', '2', ttl_seconds=60) is False
+    assert backend.get('inbound_sid:SM1') == '1'
+
+    backend.delete('inbound_sid:SM1')
+    assert backend.add_if_absent('inbound_sid:SM1', '3', ttl_seconds=60) is True
+
+
+def test_add_if_absent_replaces_an_expired_value(backend):
+    assert backend.add_if_absent('inbound_sid:SM2', '1', ttl_seconds=1) is True
+
+    time.sleep(1.2)
+
+    assert backend.add_if_absent('inbound_sid:SM2', '2', ttl_seconds=60) is True
+    assert backend.get('inbound_sid:SM2') == '2'
+
+
+def test_add_if_absent_keeps_a_value_without_ttl(backend):
+    backend.set('lock', 'held')
+    assert backend.add_if_absent('lock', 'other') is False
+    assert backend.get('lock') == 'held'
+
+
+def test_hashes(backend):
+    assert backend.hget('audio_cache', 'menu') is None
+    assert backend.hlen('audio_cache') == 0
+    backend.hset('audio_cache', 'menu', '/tmp/menu.mp3')
+    backend.hset('audio_cache', 'fire', '/tmp/fire.mp3')
+    backend.hset('audio_cache', 'menu', '/tmp/menu2.mp3')
+    assert backend.hget('audio_cache', 'menu') == '/tmp/menu2.mp3'
+    assert backend.hlen('audio_cache') == 2
+    backend.hdel('audio_cache', 'menu')
+    assert backend.hget('audio_cache', 'menu') is None
+    assert backend.hlen('audio_cache') == 1
+
+
+def test_operations_are_counted_without_errors(backend):
+    backend.set('key', 'value')
+    backend.get('key')
+
+    stats = backend.get_stats()
+    assert stats['operations'] >= 2
+    assert stats['errors'] == 0